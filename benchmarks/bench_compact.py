@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+録音ファイルの圧縮（compact）のベンチマーク
+
+会議の録音に近い合成音声（発話の区間と小さな背景雑音の区間が交互に続く）の WAV を作成し、
+compact_directory で FLAC に置き換えたときの圧縮率と処理時間を確認する。
+
+    python -m benchmarks.bench_compact [--files 4] [--minutes 10] [--rate 48000] [--workers N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from unittest.mock import patch
+import numpy as np
+import soundfile as sf
+from src.functions.compact import RESULT_CONVERTED, compact_directory
+
+def synthesize_meeting(path, minutes, rate, seed):
+    """
+    発話（基本周波数と倍音を音節ごとに変えた波形）と背景雑音が数秒ずつ交互に続く録音を書き出す
+
+    録音と同じく sf.write の既定形式（16bit PCM）で保存する。
+    """
+    rng = np.random.default_rng(seed)
+    with sf.SoundFile(path, "w", rate, 1, "PCM_16") as f:
+        remaining = int(minutes * 60 * rate)
+        speaking = True
+        while remaining > 0:
+            length = min(remaining, int(rng.uniform(1.0, 6.0) * rate))
+            t = np.arange(length) / rate
+            noise = 0.003 * rng.standard_normal(length)
+            if speaking:
+                pitch = rng.uniform(100, 250)
+                syllables = np.repeat(rng.uniform(0.3, 1.0, length // (rate // 5) + 1), rate // 5)[:length]
+                voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+                block = 0.15 * syllables * voice + noise
+            else:
+                block = noise
+            f.write(block.astype(np.float32))
+            remaining -= length
+            speaking = not speaking
+
+def run(files, minutes, rate, workers):
+    """ベンチマークを実行し、結果を辞書で返す"""
+    with tempfile.TemporaryDirectory() as recordings_dir:
+        for i in range(files):
+            synthesize_meeting(os.path.join(recordings_dir, f"meeting{i}.wav"), minutes, rate, seed=i)
+        start = time.perf_counter()
+        with patch("builtins.print"):
+            results = compact_directory(recordings_dir, workers=workers, min_age_seconds=0)
+        elapsed = time.perf_counter() - start
+    converted = [result for result in results if result["status"] == RESULT_CONVERTED]
+    return {
+        "converted": len(converted),
+        "original_bytes": sum(result["original_bytes"] for result in converted),
+        "compacted_bytes": sum(result["compacted_bytes"] for result in converted),
+        "audio_seconds": files * minutes * 60,
+        "elapsed": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="録音ファイルの圧縮のベンチマーク")
+    parser.add_argument("--files", type=int, default=4, help="録音ファイルの数")
+    parser.add_argument("--minutes", type=float, default=10.0, help="1ファイルの長さ（分）")
+    parser.add_argument("--rate", type=int, default=48000, help="サンプリングレート（Hz）")
+    parser.add_argument("--workers", type=int, default=None, help="変換するプロセス数（デフォルト: CPUコア数）")
+    args = parser.parse_args()
+
+    result = run(args.files, args.minutes, args.rate, args.workers)
+    ratio = result["compacted_bytes"] / result["original_bytes"]
+    print(f"\n入力: {args.files}ファイル x {args.minutes:.0f}分（{args.rate}Hz・16bit・モノラル）")
+    print(f"サイズ: {result['original_bytes'] / 1024 / 1024:.1f}MB → {result['compacted_bytes'] / 1024 / 1024:.1f}MB"
+          f"（{ratio * 100:.0f}%、1/{1 / ratio:.1f}）")
+    print(f"処理時間: {result['elapsed']:.2f}秒（音声 {result['audio_seconds'] / result['elapsed'] / 60:.1f}分/秒、"
+          f"変換・検証を含む）")
+    return 0 if result["converted"] == args.files else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+キャプチャ時ダウンサンプリングのベンチマーク
+
+リサンプラーのCPU負荷と、それによって削減されるメモリ・ファイルサイズを比較する。
+
+    python -m benchmarks.bench_resample [--rate 48000] [--channels 2] [--seconds 60]
+"""
+import argparse
+import io
+import time
+import numpy as np
+import soundfile as sf
+from src.functions.resample import SpeechCapturePipeline, SPEECH_SAMPLE_RATE, DEFAULT_TAPS_PER_PHASE
+
+# 録音ループと同じブロックサイズ
+BLOCK_SIZE = 1024
+
+def _encoded_size(samples, rate):
+    """WAVとして書き出した場合のバイト数（録音時と同じ sf.write の既定形式）"""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, rate, format="WAV")
+    return buffer.tell()
+
+def run(rate, channels, seconds, taps_per_phase):
+    """ベンチマークを実行し、結果を辞書で返す"""
+    rng = np.random.default_rng(0)
+    num_blocks = rate * seconds // BLOCK_SIZE
+    blocks = [rng.uniform(-0.5, 0.5, (BLOCK_SIZE, channels)).astype(np.float32) for _ in range(num_blocks)]
+
+    # 従来の経路：float32のブロックをそのまま保持し、最後にモノラル化して書き出す
+    start = time.process_time()
+    recording = np.concatenate(blocks, axis=0)
+    raw_buffer_bytes = recording.nbytes
+    if recording.ndim > 1 and recording.shape[1] > 1:
+        recording = np.mean(recording, axis=1)
+    raw_cpu = time.process_time() - start
+    raw_file_bytes = _encoded_size(recording, rate)
+
+    # 変換経路：ブロックごとにモノラル化・リサンプリング・int16量子化する
+    pipeline = SpeechCapturePipeline(rate, SPEECH_SAMPLE_RATE, taps_per_phase)
+    start = time.process_time()
+    converted = [pipeline.process(block) for block in blocks]
+    speech = np.concatenate(converted)
+    speech_cpu = time.process_time() - start
+    speech_buffer_bytes = sum(block.nbytes for block in converted)
+    speech_file_bytes = _encoded_size(speech, SPEECH_SAMPLE_RATE)
+
+    audio_seconds = num_blocks * BLOCK_SIZE / rate
+    return {
+        "audio_seconds": audio_seconds,
+        "raw_cpu": raw_cpu,
+        "speech_cpu": speech_cpu,
+        "realtime_factor": speech_cpu / audio_seconds,
+        "raw_buffer_bytes": raw_buffer_bytes,
+        "speech_buffer_bytes": speech_buffer_bytes,
+        "raw_file_bytes": raw_file_bytes,
+        "speech_file_bytes": speech_file_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="キャプチャ時ダウンサンプリングのベンチマーク")
+    parser.add_argument("--rate", type=int, default=48000, help="キャプチャのサンプリングレート（Hz）")
+    parser.add_argument("--channels", type=int, default=2, help="キャプチャのチャンネル数")
+    parser.add_argument("--seconds", type=int, default=60, help="音声の長さ（秒）")
+    parser.add_argument("--taps", type=int, default=DEFAULT_TAPS_PER_PHASE, help="1位相あたりのフィルタ長")
+    args = parser.parse_args()
+
+    result = run(args.rate, args.channels, args.seconds, args.taps)
+    minutes = result["audio_seconds"] / 60
+    mb = 1024 * 1024
+
+    print(f"入力: {args.rate}Hz / {args.channels}ch / {result['audio_seconds']:.1f}秒（ブロック {BLOCK_SIZE} フレーム）")
+    print(f"リサンプラーのCPU時間: {result['speech_cpu']:.3f}秒"
+          f"（実時間比 {result['realtime_factor'] * 100:.2f}%、録音1分あたり {result['speech_cpu'] / minutes * 1000:.1f}ms）")
+    print(f"録音バッファ: {result['raw_buffer_bytes'] / minutes / mb:.2f}MB/分 -> "
+          f"{result['speech_buffer_bytes'] / minutes / mb:.2f}MB/分"
+          f"（{result['raw_buffer_bytes'] / result['speech_buffer_bytes']:.1f}倍削減）")
+    print(f"ファイルサイズ: {result['raw_file_bytes'] / minutes / mb:.2f}MB/分 -> "
+          f"{result['speech_file_bytes'] / minutes / mb:.2f}MB/分"
+          f"（{result['raw_file_bytes'] / result['speech_file_bytes']:.1f}倍削減、アップロード量も同じ比率で削減）")
+
+if __name__ == "__main__":
+    main()
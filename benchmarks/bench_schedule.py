@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+バッチ文字起こしのスケジューリング方針ごとの平均ターンアラウンド時間の比較
+
+1週間分の録音（長い全体会議と多数の短い会議）を想定し、1つのワーカーで順に処理した場合の
+平均ターンアラウンド時間（全ファイルを同時に登録してから各ファイルが完了するまで）を方針ごとに求める。
+ディレクトリを指定した場合は、その中の音声ファイルの長さをヘッダーから読んで使用する。
+
+    python -m benchmarks.bench_schedule [--dir recordings] [--speed 0.1]
+"""
+import argparse
+import os
+from pathlib import Path
+
+# transcribe.py はインポート時にAPIキーを確認するため、ダミーを設定する（APIは呼び出さない）
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from src.functions.scheduler import POLICIES, POLICY_FIFO, mean_turnaround, order_files, sort_key
+from src.functions.transcribe import AUDIO_EXTENSIONS
+
+def sample_backlog():
+    """1週間分の録音を模したファイルの情報（名前順が到着順）"""
+    entries = []
+    for day in range(5):
+        entries.append({"path": f"day{day}_0900_allhands.wav", "duration": 4 * 3600.0 if day == 0 else 3600.0})
+        for i in range(8):
+            entries.append({"path": f"day{day}_{10 + i:02d}00_standup.wav", "duration": 600.0 + 60 * i})
+    for time, entry in enumerate(entries):
+        entry.update(mtime=float(time), priority=0, deadline=None)
+    return entries
+
+def run(entries, speed):
+    """方針ごとの平均ターンアラウンド時間（秒）を辞書で返す"""
+    return {policy: mean_turnaround(sorted(entries, key=lambda entry: sort_key(policy, entry)), speed)
+            for policy in POLICIES}
+
+def main():
+    parser = argparse.ArgumentParser(description="スケジューリング方針ごとの平均ターンアラウンド時間の比較")
+    parser.add_argument("--dir", type=str, default=None, help="音声ファイルのディレクトリ（省略時は1週間分の模擬データ）")
+    parser.add_argument("--speed", type=float, default=0.1, help="音声1秒あたりの処理時間（秒）")
+    args = parser.parse_args()
+
+    if args.dir:
+        paths = [path for path in sorted(Path(args.dir).iterdir()) if path.suffix.lower() in AUDIO_EXTENSIONS]
+        entries = order_files(paths, POLICY_FIFO)
+    else:
+        entries = sample_backlog()
+
+    total_hours = sum(entry["duration"] for entry in entries) / 3600
+    print(f"\n入力: {len(entries)}ファイル / 合計 {total_hours:.1f}時間（処理速度 音声1秒あたり{args.speed}秒）")
+    results = run(entries, args.speed)
+    for policy, turnaround in results.items():
+        print(f"{policy}: 平均ターンアラウンド {turnaround / 60:.1f}分"
+              f"（fifo比 {turnaround / results[POLICY_FIFO]:.2f}）")
+
+if __name__ == "__main__":
+    main()
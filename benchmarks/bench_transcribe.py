@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+文字起こし経路のエンドツーエンドのスループット計測（オフライン）
+
+ローカルのモックサーバーに対して、分割・アップロード・統合を含む文字起こしを実行し、
+逐次処理（transcribe.py）・自動調整付きの処理（transcribe.py --autotune）・非同期処理（async_transcribe.py）の
+処理時間を比較する。
+
+    python -m benchmarks.bench_transcribe [--files 4] [--minutes 12] [--latency 1.0] [--bandwidth 5000000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
+
+# transcribe.py はインポート時にAPIキーを確認するため、モックサーバー用のダミーを設定する
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from src.functions import transcribe
+from src.functions.async_transcribe import DEFAULT_CONCURRENCY, process_files
+from src.functions.autotune import AutoTuner, format_report
+from src.functions.http_client import create_async_client, create_client
+from src.functions.mock_whisper import MockWhisperConfig, MockWhisperServer
+
+# 生成する音声のサンプリングレート（16kHz・int16・モノラル）
+SAMPLE_RATE = 16000
+
+def _write_audio(directory, count, minutes):
+    """無音に近い雑音の音声ファイルを作成"""
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(int(minutes * 60 * SAMPLE_RATE)) * 100).astype(np.int16)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"meeting_{i}.wav")
+        sf.write(path, samples, SAMPLE_RATE)
+        paths.append(path)
+    return paths
+
+def _run_sequential(server, paths, output_dir, concurrency):
+    """transcribe.py の逐次処理"""
+    transcribe.client = create_client(max_connections=concurrency, base_url=server.base_url)
+    try:
+        start = time.perf_counter()
+        for path in paths:
+            transcribe.process_single_file(path, output_dir)
+        return time.perf_counter() - start
+    finally:
+        transcribe.client.close()
+
+def _run_autotune(server, paths, output_dir, concurrency):
+    """transcribe.py の自動調整付きの処理（計測値はファイル間で引き継ぐ）"""
+    transcribe.client = create_client(max_connections=concurrency, base_url=server.base_url)
+    tuner = AutoTuner(max_concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        for path in paths:
+            transcribe.process_single_file(path, output_dir, tuner=tuner)
+        return time.perf_counter() - start
+    finally:
+        transcribe.client.close()
+        print(format_report(tuner.report()))
+
+def _run_async(server, paths, output_dir, concurrency):
+    """async_transcribe.py の並行処理"""
+    async def run():
+        async with create_async_client(max_connections=concurrency, base_url=server.base_url) as client:
+            return await process_files(paths, output_dir, client, concurrency=concurrency)
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+def run(files, minutes, concurrency, config):
+    """ベンチマークを実行し、方式ごとの結果を辞書で返す"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = _write_audio(work_dir, files, minutes)
+        upload_bytes = sum(os.path.getsize(path) for path in paths)
+        for name, runner in (("sequential", _run_sequential), ("autotune", _run_autotune),
+                             ("async", _run_async)):
+            with MockWhisperServer(config=config) as server:
+                elapsed = runner(server, paths, os.path.join(work_dir, name), concurrency)
+                stats = server.stats.snapshot()
+            results[name] = {
+                "elapsed": elapsed,
+                "audio_minutes": files * minutes,
+                "upload_bytes": upload_bytes,
+                "requests": stats["requests"],
+                "peak_concurrency": stats["peak_concurrency"],
+                "status_counts": stats["status_counts"],
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こし経路のエンドツーエンドのスループット計測")
+    parser.add_argument("--files", type=int, default=4, help="音声ファイルの数")
+    parser.add_argument("--minutes", type=float, default=12.0, help="1ファイルの長さ（分）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="非同期処理の同時リクエスト数（自動調整の上限）")
+    parser.add_argument("--latency", type=float, default=1.0, help="モックサーバーの固定遅延（秒）")
+    parser.add_argument("--latency-per-second", type=float, default=0.002,
+                        help="モックサーバーの音声1秒あたりの遅延（秒）")
+    parser.add_argument("--bandwidth", type=float, default=5_000_000, help="接続ごとの受信速度の上限（バイト/秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429を返す確率")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="5xxを返す確率")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="モックサーバーの同時処理数の上限")
+    args = parser.parse_args()
+
+    config = MockWhisperConfig(
+        latency=args.latency,
+        latency_per_audio_second=args.latency_per_second,
+        bandwidth=args.bandwidth,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=0.1,
+        max_concurrency=args.max_concurrency,
+        queue_over_limit=True
+    )
+    results = run(args.files, args.minutes, args.concurrency, config)
+
+    mb = 1024 * 1024
+    print(f"\n入力: {args.files}ファイル x {args.minutes:.1f}分（16kHz・モノラル）")
+    for name, result in results.items():
+        print(f"{name}: {result['elapsed']:.2f}秒"
+              f"（音声 {result['audio_minutes'] / result['elapsed']:.1f}分/秒、"
+              f"アップロード {result['upload_bytes'] / mb / result['elapsed']:.2f}MB/秒、"
+              f"リクエスト {result['requests']}件、最大同時処理 {result['peak_concurrency']}、"
+              f"応答 {result['status_counts']}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+録音経路の負荷試験
+
+仮想ソース（合成音声）を録音ループに流し、取り込み・ミックス・書き出しの全経路で
+メモリ使用量が上限以下に収まり、フレームが欠落しないことを確認する。
+
+    python -m benchmarks.load_capture [--hours 3] [--rate 96000] [--channels 8] [--realtime]
+
+条件を満たさない場合は終了コード1を返す。
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import soundfile as sf
+from src.functions.audio_source import SyntheticSource
+from src.functions.capture_buffer import DEFAULT_MEMORY_LIMIT
+from src.functions.recorder import AudioRecorder, BLOCK_SIZE
+
+MB = 1024 * 1024
+
+def run(hours, rate, channels, memory_limit=DEFAULT_MEMORY_LIMIT, realtime=False, directory=None):
+    """
+    負荷試験を実行し、結果を辞書で返す
+
+    Parameters:
+    - hours: 録音の長さ（時間）
+    - rate: サンプリングレート（Hz）
+    - channels: 各ソースのチャンネル数
+    - memory_limit: 録音データをメモリに保持する上限（バイト）
+    - realtime: 実時間と同じ速さでソースを供給するかどうか
+    - directory: 録音ファイルの保存先（省略時は一時ディレクトリ、終了後に削除）
+    """
+    duration = hours * 3600
+    with tempfile.TemporaryDirectory(dir=directory) as recordings_dir:
+        recorder = AudioRecorder(recordings_dir, memory_limit=memory_limit)
+        microphone = SyntheticSource(rate, channels, duration, seed=1, realtime=realtime)
+        loopback = SyntheticSource(rate, channels, duration, seed=2, realtime=realtime)
+        filepath = os.path.join(recordings_dir, "load_test.wav")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = recorder.capture(microphone, loopback, filepath, rate)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        written_frames = sf.info(filepath).frames if result else 0
+        return {
+            "audio_seconds": duration,
+            "expected_frames": int(round(duration * rate)),
+            "written_frames": written_frames,
+            "dropped_frames": microphone.dropped_frames + loopback.dropped_frames,
+            "peak_bytes": peak,
+            "elapsed": elapsed,
+            "cpu": cpu,
+            "file_bytes": os.path.getsize(filepath) if result else 0,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="録音経路の負荷試験")
+    parser.add_argument("--hours", type=float, default=3.0, help="録音の長さ（時間）")
+    parser.add_argument("--rate", type=int, default=96000, help="サンプリングレート（Hz）")
+    parser.add_argument("--channels", type=int, default=8, help="各ソースのチャンネル数")
+    parser.add_argument("--memory-limit-mb", type=float, default=DEFAULT_MEMORY_LIMIT / MB,
+                        help="録音データをメモリに保持する上限（MB）")
+    parser.add_argument("--ceiling-mb", type=float, default=None,
+                        help="許容するメモリ使用量のピーク（MB、デフォルト: 上限の2倍+32MB）")
+    parser.add_argument("--realtime", action="store_true", help="実時間と同じ速さでソースを供給する")
+    parser.add_argument("--dir", type=str, default=None, help="録音ファイルを書き出すディレクトリ")
+    args = parser.parse_args()
+
+    memory_limit = int(args.memory_limit_mb * MB)
+    # 書き出し時にブロックを連結するため、保持データの2倍に加えて固定の余裕を見る
+    ceiling = int(args.ceiling_mb * MB) if args.ceiling_mb else 2 * memory_limit + 32 * MB
+
+    result = run(args.hours, args.rate, args.channels, memory_limit, args.realtime, args.dir)
+
+    print(f"\n入力: {args.rate}Hz / {args.channels}ch x 2 / {result['audio_seconds'] / 3600:.2f}時間"
+          f"（ブロック {BLOCK_SIZE} フレーム）")
+    print(f"処理時間: {result['elapsed']:.1f}秒（CPU {result['cpu']:.1f}秒、"
+          f"実時間の{result['audio_seconds'] / result['elapsed']:.1f}倍速）")
+    print(f"メモリのピーク: {result['peak_bytes'] / MB:.1f}MB（上限 {ceiling / MB:.1f}MB）")
+    print(f"書き出したフレーム: {result['written_frames']} / {result['expected_frames']}"
+          f"（{result['file_bytes'] / MB:.1f}MB）")
+    print(f"欠落したフレーム: {result['dropped_frames']}")
+
+    failures = []
+    if result["peak_bytes"] > ceiling:
+        failures.append("メモリ使用量が上限を超えました")
+    if result["dropped_frames"] or result["written_frames"] != result["expected_frames"]:
+        failures.append("フレームが欠落しました")
+    for failure in failures:
+        print(f"失敗: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
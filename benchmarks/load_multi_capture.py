@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+複数セッションの同時録音の負荷試験
+
+実時間で供給する仮想ソース（合成音声）を入力とするセッションを CaptureManager で同時に録音し、
+CPU使用率・スレッド数・欠落フレーム数と、各セッションの書き出したフレーム数を確認する。
+
+    python -m benchmarks.load_multi_capture [--sessions 16] [--seconds 30] [--rate 48000] [--channels 2]
+
+フレームが欠落した場合は終了コード1を返す。
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import soundfile as sf
+from src.functions.audio_source import SyntheticSource
+from src.functions.capture_manager import DEFAULT_WRITER_THREADS, CaptureManager
+
+def run(sessions, seconds, rate, channels, writer_threads=DEFAULT_WRITER_THREADS, target_rate=None):
+    """
+    負荷試験を実行し、結果を辞書で返す
+
+    Parameters:
+    - sessions: 同時に録音するセッション数（各セッションはマイクとループバックの2入力をミックスする）
+    - seconds: 録音の長さ（秒）
+    - rate: サンプリングレート（Hz）
+    - channels: 各入力のチャンネル数
+    - writer_threads: 書き出しを行う共有スレッドの数
+    - target_rate: 指定した場合、キャプチャ時にこのレートに変換する
+    """
+    with tempfile.TemporaryDirectory() as recordings_dir:
+        sources = []
+        threads_before = threading.active_count()
+        with CaptureManager(writer_threads) as manager:
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            for i in range(sessions):
+                inputs = [SyntheticSource(rate, channels, seconds, seed=2 * i, realtime=True),
+                          SyntheticSource(rate, channels, seconds, seed=2 * i + 1, realtime=True)]
+                sources.extend(inputs)
+                manager.start(f"room{i}", inputs, os.path.join(recordings_dir, f"room{i}.wav"), rate,
+                              target_rate=target_rate)
+            threads = threading.active_count() - threads_before
+            for i in range(sessions):
+                manager.wait(f"room{i}")
+            elapsed = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+
+        written = [sf.info(os.path.join(recordings_dir, f"room{i}.wav")).frames for i in range(sessions)]
+        return {
+            "expected_frames": int(round(seconds * (target_rate or rate))),
+            "written_frames": written,
+            "dropped_frames": sum(source.dropped_frames for source in sources),
+            "threads": threads,
+            "elapsed": elapsed,
+            "cpu": cpu,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="複数セッションの同時録音の負荷試験")
+    parser.add_argument("--sessions", type=int, default=16, help="同時に録音するセッション数")
+    parser.add_argument("--seconds", type=float, default=30.0, help="録音の長さ（秒）")
+    parser.add_argument("--rate", type=int, default=48000, help="サンプリングレート（Hz）")
+    parser.add_argument("--channels", type=int, default=2, help="各入力のチャンネル数")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITER_THREADS, help="書き出しを行う共有スレッドの数")
+    parser.add_argument("--downsample", action="store_true", help="キャプチャ時に16kHzに変換する")
+    args = parser.parse_args()
+
+    result = run(args.sessions, args.seconds, args.rate, args.channels, args.writers,
+                 16000 if args.downsample else None)
+
+    print(f"\n入力: {args.sessions}セッション x 2入力 / {args.rate}Hz / {args.channels}ch / {args.seconds:.0f}秒")
+    print(f"追加されたスレッド: {result['threads']}（読み込み 1 + 書き出し {args.writers}）")
+    print(f"CPU使用率: {result['cpu'] / result['elapsed'] * 100:.1f}%（1コア比、"
+          f"1セッションあたり {result['cpu'] / result['elapsed'] * 100 / args.sessions:.2f}%）")
+    print(f"書き出したフレーム: 最小 {min(result['written_frames'])} / {result['expected_frames']}")
+    print(f"欠落したフレーム: {result['dropped_frames']}")
+
+    if result["dropped_frames"] or min(result["written_frames"]) != result["expected_frames"]:
+        print("失敗: フレームが欠落しました")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
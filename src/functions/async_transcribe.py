@@ -0,0 +1,221 @@
+import asyncio
+import inspect
+import os
+from pathlib import Path
+from src.functions.http_client import create_async_client
+from src.functions.segments import parse_response
+from src.functions.stitch import chunk_bounds, stitch_segments
+from src.functions.transcribe import (
+    CHUNK_OVERLAP_SECONDS,
+    MIN_CHUNK_SECONDS,
+    TRANSCRIBE_LANGUAGE,
+    WHISPER_MODEL,
+    build_prompt_info,
+    cleanup_chunks,
+    format_transcription,
+    split_audio_chunks,
+    validate_audio_file,
+    write_transcript,
+)
+
+# 1ファイルあたりの同時リクエスト数の上限
+DEFAULT_CONCURRENCY = 4
+
+def _read_bytes(path):
+    """チャンクファイルの内容を読み込む"""
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _notify(progress, event):
+    """
+    進捗コールバックを呼び出す（同期関数・コルーチン関数のどちらにも対応）
+    """
+    if progress is None:
+        return
+    result = progress(event)
+    if inspect.isawaitable(result):
+        await result
+
+def _default_client(concurrency):
+    """同時リクエスト数に合わせたコネクションプールを持つクライアントを作成"""
+    return create_async_client(max_connections=concurrency)
+
+async def _transcribe_chunk(client, chunk, semaphore):
+    """
+    1チャンクを文字起こしし、サンプル位置とセグメントを持つ辞書を返す
+    """
+    async with semaphore:
+        data = await asyncio.to_thread(_read_bytes, chunk["path"])
+        response = await client.audio.transcriptions.with_raw_response.create(
+            model=WHISPER_MODEL,
+            file=(os.path.basename(chunk["path"]), data),
+            language=TRANSCRIBE_LANGUAGE,
+            response_format="verbose_json"
+        )
+    segments, duration = parse_response(response.content)
+    return dict(chunk, segments=segments, duration=duration)
+
+def _final_segment_count(stitched, emitted, next_chunk_start):
+    """
+    後続チャンクとの統合で変化しないセグメントが先頭から何件あるかを返す
+
+    次のチャンクの開始時刻より前に終わるセグメントは、重なり区間の統合対象にならない
+    """
+    if next_chunk_start is None:
+        return len(stitched)
+    count = emitted
+    while count < len(stitched) and stitched[count].end < next_chunk_start:
+        count += 1
+    return count
+
+async def iter_segments(audio_path, client, overlap_seconds=CHUNK_OVERLAP_SECONDS,
+                        concurrency=DEFAULT_CONCURRENCY, progress=None, usage=None, semaphore=None):
+    """
+    音声ファイルを文字起こしし、確定したセグメントから順に返す非同期イテレータ
+
+    チャンクは最大 concurrency 件まで並行して送信する。完了順に関わらず、
+    タイムライン上で確定したセグメント（start, end, text を持つ Segment）を時刻順に返す。
+    キャンセルされた場合は送信中のリクエストを中断し、一時ファイルを削除する。
+
+    Args:
+        audio_path (str): 音声ファイルのパス
+        client (AsyncOpenAI): 使用するクライアント
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        concurrency (int): 同時リクエスト数の上限
+        progress (callable): 進捗コールバック。チャンク完了ごとにイベント辞書を渡す
+        usage (dict): 指定した場合、完了時にAPI使用情報を格納する
+        semaphore (asyncio.Semaphore): 複数ファイルで同時リクエスト数を共有する場合に指定する
+    """
+    audio_path = str(audio_path)
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    chunks = []
+    tasks = {}
+    # 分割のスレッドは中断できないため、キャンセルされても書き出したチャンクを受け取って削除する
+    split = asyncio.ensure_future(asyncio.to_thread(split_audio_chunks, audio_path, overlap_seconds))
+
+    try:
+        chunks = await asyncio.shield(split)
+        targets = []
+        for chunk in chunks:
+            chunk_start, chunk_end = chunk_bounds(chunk)
+            if chunk_end - chunk_start < MIN_CHUNK_SECONDS:
+                continue
+            targets.append(chunk)
+            tasks[asyncio.ensure_future(_transcribe_chunk(client, chunk, semaphore))] = chunk["index"]
+
+        if not targets:
+            raise ValueError("処理可能な音声チャンクがありません。全てのチャンクが0.1秒未満です。")
+
+        order = [chunk["index"] for chunk in targets]
+        starts = [chunk_bounds(chunk)[0] for chunk in targets]
+        results = {}
+        ready = 0
+        emitted = 0
+        pending = set(tasks)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                results[result["index"]] = result
+                await _notify(progress, {
+                    "file": audio_path,
+                    "completed_chunks": len(results),
+                    "total_chunks": len(targets),
+                    "chunk_index": result["index"],
+                })
+
+            # 先頭から連続して完了したチャンクまでを統合し、確定分を返す
+            while ready < len(order) and order[ready] in results:
+                ready += 1
+            if ready == 0:
+                continue
+            stitched = stitch_segments([results[i] for i in order[:ready]])
+            next_start = starts[ready] if ready < len(order) else None
+            final = _final_segment_count(stitched, emitted, next_start)
+            for segment in stitched[emitted:final]:
+                yield segment
+            emitted = final
+
+        if usage is not None:
+            completed = [results[i] for i in order]
+            usage.update(build_prompt_info(
+                sum(result["duration"] for result in completed),
+                sum(result["overlap_samples"] / result["sample_rate"] for result in completed)
+            ))
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if not chunks:
+            produced = (await asyncio.gather(split, return_exceptions=True))[0]
+            chunks = produced if isinstance(produced, list) else []
+        await asyncio.to_thread(cleanup_chunks, chunks, audio_path)
+
+async def transcribe_file(audio_path, client=None, overlap_seconds=CHUNK_OVERLAP_SECONDS,
+                          concurrency=DEFAULT_CONCURRENCY, progress=None, semaphore=None):
+    """
+    音声ファイルを非同期で文字起こしする（標準出力には何も表示しない）
+
+    Args:
+        audio_path (str): 音声ファイルのパス
+        client (AsyncOpenAI): 使用するクライアント。省略時はこの呼び出し専用に作成する
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        concurrency (int): 同時リクエスト数の上限
+        progress (callable): 進捗コールバック
+        semaphore (asyncio.Semaphore): 複数ファイルで同時リクエスト数を共有する場合に指定する
+
+    Returns:
+        tuple: (文字起こしテキスト, API使用情報)
+    """
+    input_path = validate_audio_file(audio_path)
+    if client is None:
+        async with _default_client(concurrency) as own_client:
+            return await transcribe_file(input_path, own_client, overlap_seconds, concurrency, progress, semaphore)
+
+    usage = {}
+    segments = [segment async for segment in iter_segments(
+        input_path, client, overlap_seconds, concurrency, progress, usage, semaphore
+    )]
+    return format_transcription(segments), usage
+
+async def process_file(input_file, output_dir="src/transcripts", client=None,
+                       overlap_seconds=CHUNK_OVERLAP_SECONDS, concurrency=DEFAULT_CONCURRENCY, progress=None,
+                       semaphore=None):
+    """
+    単一の音声ファイルを非同期で文字起こしし、結果をファイルに保存する
+
+    Returns:
+        Path: 出力ファイルのパス
+    """
+    input_path = validate_audio_file(input_file)
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+
+    transcription, prompt_info = await transcribe_file(
+        input_path, client, overlap_seconds, concurrency, progress, semaphore
+    )
+    output_file = output_path / f"{input_path.stem}.txt"
+    await asyncio.to_thread(write_transcript, output_file, transcription, prompt_info)
+    return output_file
+
+async def process_files(input_files, output_dir="src/transcripts", client=None,
+                        overlap_seconds=CHUNK_OVERLAP_SECONDS, concurrency=DEFAULT_CONCURRENCY, progress=None):
+    """
+    複数の音声ファイルを1つのクライアント（コネクションプール）を共有して並行処理する
+
+    同時リクエスト数は全ファイル合計で concurrency 件までに抑え、プールの接続数と揃える。
+
+    Returns:
+        list: ファイルごとの出力パス。失敗したファイルは例外オブジェクト
+    """
+    if client is None:
+        async with _default_client(concurrency) as own_client:
+            return await process_files(input_files, output_dir, own_client, overlap_seconds, concurrency, progress)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(
+        process_file(input_file, output_dir, client, overlap_seconds, concurrency, progress, semaphore)
+        for input_file in input_files
+    ), return_exceptions=True)
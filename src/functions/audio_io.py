@@ -0,0 +1,613 @@
+#!/usr/bin/env python
+import io
+import math
+import multiprocessing
+import os
+import queue
+import struct
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import soundfile as sf
+from src.functions.profiler import staged
+
+# ffmpeg / ffprobe の実行ファイル（環境変数 FFMPEG_BINARY / FFPROBE_BINARY で変更できる）
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# 再符号化せずにそのまま取り出せる（APIが受け付ける）音声コーデックと、取り出し先の (拡張子, ffmpeg の出力形式)
+STREAM_COPY_FORMATS = {
+    "aac": (".m4a", "ipod"),
+    "mp3": (".mp3", "mp3"),
+    "opus": (".ogg", "ogg"),
+    "vorbis": (".ogg", "ogg"),
+    "flac": (".flac", "flac"),
+}
+
+# それ以外のコーデックを再符号化する形式と (拡張子, ffmpeg の出力形式)
+TRANSCODE_CODEC = "aac"
+TRANSCODE_BITRATE = "96k"
+TRANSCODE_FORMAT = (".m4a", "ipod")
+
+# パイプから一度に読み込むフレーム数
+DEFAULT_BLOCK_FRAMES = 64 * 1024
+
+# 書き出すWAVのヘッダーの大きさ（バイト）。チャンクの大きさの計算に使用する
+WAV_HEADER_BYTES = 44
+
+# 書き出すPCMの1サンプルあたりのバイト数（int16）
+SAMPLE_BYTES = 2
+
+# libsndfile で開けても ffmpeg でデコードする形式
+# （libsndfile 1.2 の MPEG デコーダーはブロック単位の読み込みやシークで音声が崩れる）
+FFMPEG_FORMATS = {"MP3", "MPEG"}
+
+# 符号化済みチャンクの先読み数（送信待ちでメモリに保持するチャンクの上限）
+DEFAULT_PREFETCH = 2
+
+def ffmpeg_command(path: str) -> list:
+    """最初の音声ストリームをint16のWAVとして標準出力に書き出す ffmpeg のコマンド"""
+    return [FFMPEG_BINARY, "-nostdin", "-v", "error", "-i", path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+            "-acodec", "pcm_s16le", "-f", "wav", "pipe:1"]
+
+def _run(command: list, binary: str) -> str:
+    """コマンドを実行して標準出力を返す（失敗した場合はエラー出力を含めて例外にする）"""
+    try:
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True)
+    except FileNotFoundError:
+        raise ValueError(f"{os.path.basename(binary)} が見つかりません（{binary}）。"
+                         "ffmpeg をインストールするか FFMPEG_BINARY / FFPROBE_BINARY を設定してください")
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip()
+        raise ValueError(f"{os.path.basename(binary)} の実行に失敗しました（終了コード {result.returncode}）: {message}")
+    return result.stdout.decode("utf-8", "replace")
+
+def probe_audio_codec(path: str) -> Optional[str]:
+    """
+    ファイルの最初の音声ストリームのコーデック名を ffprobe で調べる（ヘッダーのみを読む）
+
+    Returns:
+    - Optional[str]: コーデック名（aac, opus など）。音声ストリームがなければNone
+    """
+    output = _run([FFPROBE_BINARY, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=codec_name",
+                   "-of", "csv=p=0", path], FFPROBE_BINARY)
+    codec = output.strip().splitlines()[0].strip() if output.strip() else ""
+    return codec or None
+
+def extract_audio(path: str, output_dir: str) -> str:
+    """
+    動画コンテナ（mp4/webmなど）から最初の音声ストリームだけを取り出してファイルに保存
+
+    APIが受け付けるコーデック（AAC/MP3/Opus/Vorbis/FLAC）はパケットをそのままコピーし、
+    それ以外は音声のみをAACに再符号化する。映像のパケットは読み飛ばすだけでデコードしない。
+
+    Parameters:
+    - path: 動画ファイルのパス
+    - output_dir: 取り出した音声の保存先ディレクトリ
+
+    Returns:
+    - str: 取り出した音声ファイルのパス（<output_dir>/<元のファイル名><拡張子>）
+    """
+    path = str(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ファイルが見つかりません: {path}")
+    codec = probe_audio_codec(path)
+    if codec is None:
+        raise ValueError(f"音声ストリームがありません: {path}")
+    if codec in STREAM_COPY_FORMATS:
+        extension, container = STREAM_COPY_FORMATS[codec]
+        codec_args = ["-c:a", "copy"]
+    else:
+        extension, container = TRANSCODE_FORMAT
+        codec_args = ["-c:a", TRANSCODE_CODEC, "-b:a", TRANSCODE_BITRATE]
+    output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + extension)
+    _run([FFMPEG_BINARY, "-nostdin", "-v", "error", "-y", "-i", path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+          *codec_args, "-f", container, output_path], FFMPEG_BINARY)
+    return output_path
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    """パイプから size バイトを読み込む（終端に達した場合はそれまでの分）"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+def read_wav_header(stream: BinaryIO) -> Tuple[int, int]:
+    """
+    ストリームの先頭のWAVヘッダーを読み、data チャンクの直前まで進める
+
+    ffmpeg がパイプに書き出すWAVはデータ長が未定のため、長さは読まない
+
+    Returns:
+    - Tuple[int, int]: (サンプリングレート, チャンネル数)
+    """
+    header = _read_exact(stream, 12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise ValueError("WAVヘッダーを読み込めません")
+    samplerate = channels = None
+    while True:
+        chunk_header = _read_exact(stream, 8)
+        if len(chunk_header) < 8:
+            raise ValueError("WAVのデータが見つかりません")
+        kind, size = struct.unpack("<4sI", chunk_header)
+        if kind == b"data":
+            break
+        body = _read_exact(stream, size + (size & 1))
+        if kind == b"fmt ":
+            _, channels, samplerate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if bits != SAMPLE_BYTES * 8:
+                raise ValueError(f"未対応のビット深度です: {bits}")
+    if samplerate is None:
+        raise ValueError("WAVの fmt チャンクが見つかりません")
+    return samplerate, channels
+
+class AudioReader:
+    """
+    音声ファイルをint16のブロックとして先頭から順に読み込む
+
+    libsndfile で開ける形式（WAV/FLAC/Oggなど）はファイルから直接、それ以外（MP3/m4aなど）は
+    1つの ffmpeg プロセスにデコードさせ、パイプから固定長のブロックで読み込む。
+    どちらもファイル全体をメモリに展開しないため、長い録音でもメモリ使用量は一定になる。
+    """
+
+    def __init__(self, path: str, block_frames: int = DEFAULT_BLOCK_FRAMES):
+        """
+        Parameters:
+        - path: 音声ファイルのパス
+        - block_frames: パイプから一度に読み込むフレーム数
+        """
+        self.path = str(path)
+        self.block_frames = block_frames
+        self._file: Optional[sf.SoundFile] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr = None
+        try:
+            self._file = sf.SoundFile(self.path)
+        except Exception:
+            self._open_ffmpeg()
+            return
+        if self._file.format in FFMPEG_FORMATS:
+            self._file.close()
+            self._file = None
+            self._open_ffmpeg()
+            return
+        self.samplerate = self._file.samplerate
+        self.channels = self._file.channels
+        # 総フレーム数（ffmpeg でデコードする場合は読み終えるまで分からないためNone）
+        self.frames: Optional[int] = self._file.frames
+
+    @property
+    def seekable(self) -> bool:
+        """任意のフレームに正確にシークできるかどうか（libsndfile で読む場合のみ。途中から並行して読み込める）"""
+        return self._file is not None
+
+    def _open_ffmpeg(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"ファイルが見つかりません: {self.path}")
+        # エラー出力をパイプにすると、読み出さない間に ffmpeg が停止することがあるため一時ファイルに受ける
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(ffmpeg_command(self.path), stdin=subprocess.DEVNULL,
+                                             stdout=subprocess.PIPE, stderr=self._stderr)
+        except FileNotFoundError:
+            self._stderr.close()
+            raise ValueError(f"ffmpeg が見つかりません（{FFMPEG_BINARY}）。インストールするか FFMPEG_BINARY を設定してください")
+        try:
+            self.samplerate, self.channels = read_wav_header(self._process.stdout)
+        except ValueError:
+            self._raise_ffmpeg_error()
+            self.close()
+            raise
+        self.frames = None
+
+    def _raise_ffmpeg_error(self) -> None:
+        """ffmpeg が異常終了していればエラー出力を含めて例外にする"""
+        returncode = self._process.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode("utf-8", "replace").strip()
+            self.close()
+            raise ValueError(f"ffmpeg でデコードできません（終了コード {returncode}）: {message}")
+
+    def __enter__(self) -> "AudioReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ファイルを閉じ、ffmpeg が実行中であれば終了させる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    def read(self, frames: int) -> np.ndarray:
+        """
+        frames フレームを読み込む
+
+        Returns:
+        - np.ndarray: (フレーム数, チャンネル数) のint16配列。終端では短く、読み終えた後は空になる
+        """
+        if self._file is not None:
+            return self._file.read(frames, dtype="int16", always_2d=True)
+        if self._process is None:
+            return np.zeros((0, self.channels), dtype=np.int16)
+        frame_bytes = self.channels * SAMPLE_BYTES
+        parts = []
+        remaining = frames
+        while remaining > 0:
+            size = min(remaining, self.block_frames) * frame_bytes
+            data = _read_exact(self._process.stdout, size)
+            parts.append(data)
+            remaining -= len(data) // frame_bytes
+            if len(data) < size:
+                # 終端に達した（異常終了であれば例外にする）
+                self._raise_ffmpeg_error()
+                self.close()
+                break
+        data = b"".join(parts)
+        data = data[:len(data) - len(data) % frame_bytes]
+        return np.frombuffer(data, dtype="<i2").reshape(-1, self.channels)
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        """ファイルの終わりまで block_frames フレームずつ返す"""
+        while True:
+            block = self.read(self.block_frames)
+            if len(block) == 0:
+                return
+            yield block
+
+def audio_info(path: str) -> Tuple[int, int]:
+    """
+    音声ファイルのサンプリングレートと総フレーム数を求める
+
+    libsndfile で開ける形式（MP3を含む）はヘッダーから、それ以外はデコードしながら数える（メモリには保持しない）
+
+    Returns:
+    - Tuple[int, int]: (サンプリングレート, 総フレーム数)
+    """
+    try:
+        info = sf.info(str(path))
+        return info.samplerate, info.frames
+    except Exception:
+        pass
+    with AudioReader(path) as reader:
+        if reader.frames is not None:
+            return reader.samplerate, reader.frames
+        return reader.samplerate, sum(len(block) for block in reader.blocks())
+
+def encode_wav(samples: np.ndarray, samplerate: int) -> bytes:
+    """int16のサンプルをメモリ上でWAVに符号化する"""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, samplerate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+def max_chunk_frames(chunk_bytes: int, channels: int) -> int:
+    """chunk_bytes 以下のWAVに収まる最大のフレーム数"""
+    return (chunk_bytes - WAV_HEADER_BYTES) // (channels * SAMPLE_BYTES)
+
+def _chunk_frames(total: Optional[int], limit: int, overlap: int) -> int:
+    """重なり分を含めて limit フレームに収まるよう、均等にしたチャンクごとの新しいフレーム数"""
+    if not total:
+        return limit - overlap
+    num_chunks = max(1, math.ceil(total / (limit - overlap)))
+    return math.ceil(total / num_chunks)
+
+def plan_chunks(total: int, samplerate: int, channels: int, chunk_bytes: int,
+                overlap_seconds: float) -> List[Tuple[int, int, int]]:
+    """
+    総フレーム数が分かっている音声のチャンクの範囲を求める
+
+    Returns:
+    - List[Tuple[int, int, int]]: (開始フレーム, 終了フレーム, 重なりのフレーム数) のリスト
+    """
+    limit = max_chunk_frames(chunk_bytes, channels)
+    overlap = int(overlap_seconds * samplerate)
+    if overlap >= limit:
+        raise ValueError(f"チャンクの重なり幅が大きすぎます: {overlap_seconds}秒")
+    step = _chunk_frames(total, limit, overlap)
+    bounds = []
+    for cut in range(0, total, step):
+        start = max(0, cut - overlap)
+        bounds.append((start, min(cut + step, total), cut - start))
+    return bounds
+
+def iter_pcm_chunks(path: str, chunk_bytes: int, overlap_seconds: float,
+                    estimated_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    音声ファイルをデコードしながら、WAVにして chunk_bytes 以下になるチャンクに分けて順に返す
+
+    2番目以降のチャンクは直前のチャンクの末尾 overlap_seconds 秒分を先頭に含む。
+    同時にメモリに保持するのは1チャンク分のみ。
+
+    Parameters:
+    - path: 音声ファイルのパス
+    - chunk_bytes: 1チャンクのWAVの最大サイズ（バイト）
+    - overlap_seconds: 隣接チャンクの重なり幅（秒）
+    - estimated_seconds: 長さの見積もり（秒）。ffmpeg でデコードする形式でチャンクの長さを揃えるために使用
+
+    Returns:
+    - Iterator[Dict[str, Any]]: index, start_sample, end_sample, overlap_samples, sample_rate,
+      samples（int16配列）を含む辞書
+    """
+    with AudioReader(path) as reader:
+        yield from _read_chunks(reader, chunk_bytes, overlap_seconds, estimated_seconds)
+
+def _read_chunks(reader: AudioReader, chunk_bytes: int, overlap_seconds: float,
+                 estimated_seconds: Optional[float]) -> Iterator[Dict[str, Any]]:
+    """開いている reader から先頭から順にチャンクを読み込む（iter_pcm_chunks を参照）"""
+    rate = reader.samplerate
+    limit = max_chunk_frames(chunk_bytes, reader.channels)
+    overlap = int(overlap_seconds * rate)
+    if overlap >= limit:
+        raise ValueError(f"チャンクの重なり幅が大きすぎます: {overlap_seconds}秒")
+    total = reader.frames
+    if total is None and estimated_seconds:
+        total = int(estimated_seconds * rate)
+    chunk_frames = _chunk_frames(total, limit, overlap)
+
+    tail = np.zeros((0, reader.channels), dtype=np.int16)
+    position = 0
+    index = 0
+    while True:
+        new = reader.read(chunk_frames)
+        if len(new) == 0:
+            break
+        samples = np.concatenate((tail, new)) if len(tail) else new
+        yield {
+            "index": index,
+            "start_sample": position - len(tail),
+            "end_sample": position + len(new),
+            "overlap_samples": len(tail),
+            "sample_rate": rate,
+            "samples": samples,
+        }
+        tail = samples[len(samples) - min(overlap, len(samples)):]
+        position += len(new)
+        index += 1
+
+def encode_range(path: str, start: int, end: int) -> bytes:
+    """
+    ファイルの start〜end フレームを読み込んでWAVに符号化する
+
+    libsndfile で読む（AudioReader.seekable な）形式専用。プロセスプールの各プロセスで実行するため、
+    ファイルは呼び出しごとに開く（プロセス間で受け渡すのは範囲と符号化済みのバイト列のみ）。
+    """
+    with sf.SoundFile(path) as f:
+        f.seek(start)
+        samples = f.read(end - start, dtype="int16", always_2d=True)
+        return encode_wav(samples, f.samplerate)
+
+def prefetch(items: Iterable[Any], size: int = DEFAULT_PREFETCH) -> Iterator[Any]:
+    """
+    items をバックグラウンドのスレッドで先に取り出し、最大 size 件の上限付きキューを通して順に返す
+
+    取り出し側（デコード・符号化）と利用側（送信）を並行して進めるために使用する。
+    利用側が途中でやめた場合はスレッドを停止し、items を閉じる。
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+    finished = object()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((finished, None))
+        except Exception as e:
+            put((None, e))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def _encode_stream(reader: AudioReader, chunk_bytes: int, overlap_seconds: float,
+                   estimated_seconds: Optional[float]) -> Iterator[Dict[str, Any]]:
+    for chunk in _read_chunks(reader, chunk_bytes, overlap_seconds, estimated_seconds):
+        samples = chunk.pop("samples")
+        yield dict(chunk, data=encode_wav(samples, chunk["sample_rate"]))
+
+def iter_adaptive_chunks(path: str, next_seconds: Callable[[Optional[float], float], float], chunk_bytes: int,
+                         overlap_seconds: float, estimated_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    音声ファイルを先頭から順に読み込み、チャンクごとに長さを問い合わせながらWAVに符号化して返す
+
+    各チャンクを読み込む直前に next_seconds(残りの秒数, 上限の秒数) を呼び、返された長さ（秒）の新しい音声を読み込む。
+    残りの秒数は総フレーム数（または estimated_seconds）が分からない場合はNone。
+    上限の秒数は重なり分を含めて chunk_bytes 以下のWAVに収まる長さで、これより長い値は切り詰める。
+
+    Parameters:
+    - path: 音声ファイルのパス
+    - next_seconds: 次のチャンクの新しい音声の長さ（秒）を返す関数
+    - chunk_bytes: 1チャンクのWAVの最大サイズ（バイト）
+    - overlap_seconds: 隣接チャンクの重なり幅（秒）
+    - estimated_seconds: 長さの見積もり（秒）。ffmpeg でデコードする形式で残りの秒数の算出に使用
+
+    Returns:
+    - Iterator[Dict[str, Any]]: iter_encoded_chunks と同じ形式の辞書
+    """
+    with AudioReader(path) as reader:
+        rate = reader.samplerate
+        limit = max_chunk_frames(chunk_bytes, reader.channels)
+        overlap = int(overlap_seconds * rate)
+        if overlap >= limit:
+            raise ValueError(f"チャンクの重なり幅が大きすぎます: {overlap_seconds}秒")
+        total = reader.frames
+        if total is None and estimated_seconds:
+            total = int(estimated_seconds * rate)
+
+        tail = np.zeros((0, reader.channels), dtype=np.int16)
+        position = 0
+        index = 0
+        while True:
+            remaining = max(0, total - position) / rate if total is not None else None
+            frames = min(max(1, int(next_seconds(remaining, (limit - len(tail)) / rate) * rate)), limit - len(tail))
+            new = reader.read(frames)
+            if len(new) == 0:
+                break
+            samples = np.concatenate((tail, new)) if len(tail) else new
+            yield {
+                "index": index,
+                "start_sample": position - len(tail),
+                "end_sample": position + len(new),
+                "overlap_samples": len(tail),
+                "sample_rate": rate,
+                "data": encode_wav(samples, rate),
+            }
+            tail = samples[len(samples) - min(overlap, len(samples)):]
+            position += len(new)
+            index += 1
+
+class EncodePool:
+    """
+    チャンクの符号化に使うプロセスプール
+
+    複数のファイル（バッチ・監視・サービスのジョブ）で共有し、ファイルごとにインタープリタを起動する
+    コストを避ける。プロセスは最初に符号化を依頼されたときに起動し、複数のスレッドから同時に使用できる。
+    子プロセスが異常終了してプールが使えなくなった場合は、次の依頼で起動し直す。
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Parameters:
+        - workers: 符号化するプロセス数（省略時はCPUコア数）
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._executor is None or getattr(self._executor, "_broken", False):
+                # 子プロセスに親のスレッド（HTTPクライアントなど）を引き継がないよう spawn で起動する
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor.submit(fn, *args)
+
+    def shutdown(self) -> None:
+        """プロセスを終了する（再び submit した場合は起動し直す）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "EncodePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+def iter_encoded_chunks(path: str, chunk_bytes: int, overlap_seconds: float,
+                        estimated_seconds: Optional[float] = None, workers: Optional[int] = None,
+                        prefetch_size: int = DEFAULT_PREFETCH, start_frame: int = 0,
+                        pool: Optional[EncodePool] = None) -> Iterator[Dict[str, Any]]:
+    """
+    音声ファイルを chunk_bytes 以下のWAVのチャンクに符号化し、順に返す
+
+    シークできる形式（WAV/FLAC/Oggなど）は、チャンクごとにプロセスプールで並行して読み込み・符号化する。
+    ffmpeg でデコードする形式（MP3/m4aなど）はパイプを先頭から順に読むため、バックグラウンドのスレッドで符号化する。
+    どちらも符号化を送信と並行して進め、最初のチャンクは全体の符号化を待たずに返す。
+    符号化済みで送信を待つチャンクは workers + prefetch_size 件までに抑える。
+
+    Parameters:
+    - path: 音声ファイルのパス
+    - chunk_bytes: 1チャンクのWAVの最大サイズ（バイト）
+    - overlap_seconds: 隣接チャンクの重なり幅（秒）
+    - estimated_seconds: 長さの見積もり（秒）。ffmpeg でデコードする形式で使用
+    - workers: 符号化するプロセス数（省略時はCPUコア数）
+    - prefetch_size: 先読みするチャンク数
+    - start_frame: このフレームから後ろだけを符号化する（シークできる形式のみ）。start_sample は先頭からの位置
+    - pool: 符号化に使う共有のプロセスプール（workers はプールのプロセス数になる）。
+      省略時はこのファイルのためにプールを起動し、終了時に停止する
+
+    Returns:
+    - Iterator[Dict[str, Any]]: index, start_sample, end_sample, overlap_samples, sample_rate,
+      data（WAVのバイト列）を含む辞書
+    """
+    reader = AudioReader(path)
+    try:
+        if not reader.seekable:
+            if start_frame:
+                raise ValueError(f"途中から読み込めない形式です: {path}")
+            # デコードは1つの ffmpeg プロセスで先頭から順に行う
+            yield from prefetch(staged("decode", _encode_stream(reader, chunk_bytes, overlap_seconds,
+                                                                estimated_seconds)), prefetch_size)
+            return
+        rate, channels, total = reader.samplerate, reader.channels, reader.frames
+    finally:
+        reader.close()
+
+    bounds = [(start + start_frame, end + start_frame, overlap)
+              for start, end, overlap in plan_chunks(total - start_frame, rate, channels, chunk_bytes, overlap_seconds)]
+    workers = min(pool.workers if pool is not None else workers or os.cpu_count() or 1, len(bounds))
+
+    def describe(index: int, data: bytes) -> Dict[str, Any]:
+        start, end, overlap = bounds[index]
+        return {"index": index, "start_sample": start, "end_sample": end, "overlap_samples": overlap,
+                "sample_rate": rate, "data": data}
+
+    if workers <= 1:
+        yield from prefetch(staged("decode", (describe(index, encode_range(path, start, end))
+                                              for index, (start, end, _) in enumerate(bounds))), prefetch_size)
+        return
+
+    owned = pool is None
+    if owned:
+        pool = EncodePool(workers)
+    pending: deque = deque()
+    try:
+        for index, (start, end, _) in enumerate(bounds):
+            pending.append(pool.submit(encode_range, path, start, end))
+            # 送信が追いつかない場合は、先頭のチャンクが取り出されるまで新しい符号化を待たせる
+            if len(pending) >= workers + prefetch_size:
+                yield describe(index - len(pending) + 1, pending.popleft().result())
+        while pending:
+            yield describe(len(bounds) - len(pending), pending.popleft().result())
+    finally:
+        if owned:
+            pool.shutdown()
+        else:
+            # 共有のプールは止めず、途中で終了した場合はこのファイルの未着手の符号化だけを取り消す
+            for future in pending:
+                future.cancel()
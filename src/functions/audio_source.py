@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+import math
+import sys
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import soundfile as sf
+from typing import Optional, Sequence, Tuple
+
+# リアルタイム再生時に読み出しが遅れても保持できるブロック数（超えた分は欠落として扱う）
+DEFAULT_LATENCY_BLOCKS = 16
+
+class AudioSource(ABC):
+    """
+    録音ループに音声ブロックを供給するソースの基底クラス
+
+    sounddevice.InputStream と同じ start / read / stop / close を持つため、
+    AudioRecorder.capture にはデバイスのストリームの代わりにそのまま渡せる。
+    サブクラスは _generate(frames) で次のブロックを返す。
+
+    realtime=True の場合は実時間と同じ速さでブロックを供給し、読み出しが
+    latency_blocks 以上遅れるとデバイスと同様に古いデータを捨ててオーバーフローを通知する。
+    realtime=False の場合は待たずに供給する（負荷試験で長時間の録音を短時間で流すため）。
+    """
+
+    def __init__(self, samplerate: int, channels: int, duration: Optional[float] = None,
+                 realtime: bool = False, latency_blocks: int = DEFAULT_LATENCY_BLOCKS):
+        """
+        Parameters:
+        - samplerate: サンプリングレート（Hz）
+        - channels: チャンネル数
+        - duration: 供給する長さ（秒）。Noneの場合はソースが尽きるまで
+        - realtime: 実時間と同じ速さで供給するかどうか
+        - latency_blocks: リアルタイム時に保持できるブロック数
+        """
+        self.samplerate = samplerate
+        self.channels = channels
+        self.realtime = realtime
+        self.latency_blocks = latency_blocks
+        self.total_frames = None if duration is None else int(round(duration * samplerate))
+        self.frames_read = 0
+        self.dropped_frames = 0
+        self._exhausted = False
+        self._started_at: Optional[float] = None
+        self._position = 0
+
+    @property
+    def finished(self) -> bool:
+        """全てのブロックを供給し終えたかどうか"""
+        if self._exhausted:
+            return True
+        return self.total_frames is not None and self._position >= self.total_frames
+
+    @property
+    def read_available(self) -> int:
+        """
+        待たずに読み込めるフレーム数（sounddevice.InputStream.read_available と同じ）
+
+        realtime=False の場合は常に読み込めるため、終わりに達するまでは上限のない値を返す。
+        """
+        if self.finished:
+            return 0
+        if not self.realtime:
+            return sys.maxsize
+        if self._started_at is None:
+            return 0
+        return max(0, int((time.monotonic() - self._started_at) * self.samplerate) - self._position)
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+
+    def stop(self) -> None:
+        self._started_at = None
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def _generate(self, frames: int) -> np.ndarray:
+        """現在位置から frames フレーム分のブロックを作成（サブクラスで実装）"""
+
+    def _skip(self, frames: int) -> None:
+        """欠落した frames フレーム分だけ現在位置を進める"""
+        self._generate(frames)
+
+    def read(self, frames: int) -> Tuple[np.ndarray, bool]:
+        """
+        次のブロックを読み込む
+
+        Returns:
+        - Tuple[np.ndarray, bool]: ((フレーム数, チャンネル数) のfloat32配列, オーバーフローしたかどうか)
+        """
+        overflowed = False
+        if self.realtime and self._started_at is not None:
+            available = int((time.monotonic() - self._started_at) * self.samplerate) - self._position
+            if available < frames:
+                time.sleep((frames - available) / self.samplerate)
+            elif available > frames * self.latency_blocks:
+                # 保持できない古いデータは捨てる（デバイスの入力オーバーフローと同じ扱い）
+                lost = available - frames * self.latency_blocks
+                if self.total_frames is not None:
+                    lost = min(lost, max(0, self.total_frames - self._position))
+                self._skip(lost)
+                self._position += lost
+                self.dropped_frames += lost
+                overflowed = lost > 0
+
+        if self.total_frames is not None:
+            frames = min(frames, max(0, self.total_frames - self._position))
+        block = self._generate(frames)
+        self._position += frames
+        self.frames_read += frames
+        return block, overflowed
+
+class SyntheticSource(AudioSource):
+    """
+    正弦波と白色雑音を合成する決定的なソース（チャンネルごとに周波数をずらす）
+
+    周波数が整数（Hz）の場合、波形は1秒周期で繰り返すため、1秒分の波形を最初に作成して
+    ブロックごとに切り出す。負荷試験で合成処理が録音経路より重くならないようにするため。
+    """
+
+    def __init__(self, samplerate: int, channels: int, duration: Optional[float] = None,
+                 frequencies: Optional[Sequence[float]] = None, amplitude: float = 0.25,
+                 noise: float = 0.01, seed: int = 0, realtime: bool = False,
+                 latency_blocks: int = DEFAULT_LATENCY_BLOCKS):
+        """
+        Parameters:
+        - frequencies: チャンネルごとの周波数（Hz）。省略時は220Hzから110Hz間隔
+        - amplitude: 正弦波の振幅
+        - noise: 白色雑音の振幅
+        - seed: 白色雑音の乱数シード
+        """
+        super().__init__(samplerate, channels, duration, realtime, latency_blocks)
+        if frequencies is None:
+            frequencies = [110.0 * (i + 2) for i in range(channels)]
+        self.amplitude = amplitude
+        self._steps = np.asarray(frequencies, dtype=np.float64) * 2 * math.pi / samplerate
+        # 雑音は1秒分を作成して繰り返す
+        self._noise = np.zeros((samplerate, channels), dtype=np.float32)
+        if noise:
+            self._noise += np.random.default_rng(seed).uniform(-noise, noise, self._noise.shape)
+        self._table: Optional[np.ndarray] = None
+        if all(float(f).is_integer() for f in frequencies):
+            self._table = self._sine(np.arange(samplerate)) + self._noise
+
+    def _sine(self, index: np.ndarray) -> np.ndarray:
+        return (self.amplitude * np.sin(np.outer(index, self._steps))).astype(np.float32)
+
+    def _generate(self, frames: int) -> np.ndarray:
+        # 1秒分の表の中の位置（np.takeのwrapは大きな添字ほど遅いため先に剰余を取る）
+        offset = np.arange(frames) + self._position % self.samplerate
+        if self._table is not None:
+            return np.take(self._table, offset, axis=0, mode='wrap')
+        index = np.arange(self._position, self._position + frames)
+        return self._sine(index) + np.take(self._noise, offset, axis=0, mode='wrap')
+
+    def _skip(self, frames: int) -> None:
+        # 波形は位置から求めるため、読み飛ばす処理は不要
+        pass
+
+class FileSource(AudioSource):
+    """音声ファイルをブロック単位で供給するソース"""
+
+    def __init__(self, path: str, samplerate: Optional[int] = None, duration: Optional[float] = None,
+                 loop: bool = False, realtime: bool = False,
+                 latency_blocks: int = DEFAULT_LATENCY_BLOCKS):
+        """
+        Parameters:
+        - path: 音声ファイルのパス
+        - samplerate: 録音のサンプリングレート（ファイルと異なる場合はエラー）
+        - duration: 供給する長さ（秒）
+        - loop: ファイルの終わりで先頭に戻って供給を続けるかどうか
+        """
+        self._file = sf.SoundFile(path)
+        if samplerate is not None and samplerate != self._file.samplerate:
+            self._file.close()
+            raise ValueError(f"サンプリングレートが一致しません: {path}（{self._file.samplerate}Hz）")
+        super().__init__(self._file.samplerate, self._file.channels, duration, realtime, latency_blocks)
+        self.loop = loop
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _generate(self, frames: int) -> np.ndarray:
+        block = self._file.read(frames, dtype='float32', always_2d=True)
+        while self.loop and len(block) < frames and self._file.frames > 0:
+            self._file.seek(0)
+            rest = self._file.read(frames - len(block), dtype='float32', always_2d=True)
+            block = np.concatenate((block, rest))
+        if len(block) < frames:
+            # ファイルの終わりは無音で埋めてブロックの長さを揃える
+            self._exhausted = True
+            block = np.concatenate((block, np.zeros((frames - len(block), self.channels), dtype=np.float32)))
+        return block
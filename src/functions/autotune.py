@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from src.functions.http_client import DEFAULT_MAX_CONNECTIONS
+
+# チャンクの長さの下限（秒）。短すぎるとリクエストごとの固定の待ち時間と重なり区間の課金が増える
+DEFAULT_MIN_CHUNK_SECONDS = 30.0
+
+# 計測値が揃うまで使うチャンクの長さ（秒）
+DEFAULT_INITIAL_CHUNK_SECONDS = 300.0
+
+# 最初のチャンクは初期値の 1/PROBE_RATIO の長さにする（早く最初の計測値を得て、2点から処理時間の傾向を求める）
+PROBE_RATIO = 4
+
+# リクエストの固定の待ち時間が1チャンクの処理時間に占める割合の目標
+TARGET_OVERHEAD_RATIO = 0.1
+
+# 処理時間の傾向を求める直近のチャンク数
+SAMPLE_WINDOW = 32
+
+# 同時リクエスト数を増やしたと判断する改善率（これ未満の改善は誤差とみなす）
+IMPROVEMENT_THRESHOLD = 0.05
+
+# 同時リクエスト数が定まった後、再び増やしてみるまでの完了チャンク数（時間帯による回線・APIの変化に追従する）
+REPROBE_CHUNKS = 24
+
+def fit_latency(samples: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """
+    チャンクの長さと処理時間の組から、処理時間 = 固定の待ち時間 + 音声1秒あたりの時間 × 長さ の直線を求める
+
+    Parameters:
+    - samples: (音声の長さ（秒）, 処理時間（秒）) のリスト
+
+    Returns:
+    - Optional[Tuple[float, float]]: (固定の待ち時間（秒）, 音声1秒あたりの時間（秒）)。長さがほぼ同じで求められない場合はNone
+    """
+    if len(samples) < 2:
+        return None
+    mean_x = sum(x for x, _ in samples) / len(samples)
+    mean_y = sum(y for _, y in samples) / len(samples)
+    variance = sum((x - mean_x) ** 2 for x, _ in samples)
+    if variance < len(samples) * 1.0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in samples) / variance
+    return mean_y - slope * mean_x, slope
+
+class AutoTuner:
+    """
+    チャンクごとの処理時間を計測し、チャンクの長さと同時リクエスト数を自動で調整するクラス
+
+    チャンクの長さは、計測した処理時間を固定の待ち時間と音声の長さに比例する部分に分け、
+    固定の待ち時間の割合が TARGET_OVERHEAD_RATIO になる長さにする（残りの音声は同時リクエスト数で均等に分ける）。
+    同時リクエスト数は1から1つずつ増やし、推定スループット（音声秒/秒）が改善しなくなったら直前の数に戻す
+    （REPROBE_CHUNKS チャンクごとに再び増やしてみる）。リクエストが失敗した場合は半分にする。
+    複数のスレッドから呼び出せる。
+    """
+
+    def __init__(self, min_chunk_seconds: float = DEFAULT_MIN_CHUNK_SECONDS,
+                 max_chunk_seconds: Optional[float] = None,
+                 initial_chunk_seconds: float = DEFAULT_INITIAL_CHUNK_SECONDS,
+                 max_concurrency: int = DEFAULT_MAX_CONNECTIONS, initial_concurrency: int = 1):
+        """
+        Parameters:
+        - min_chunk_seconds: チャンクの長さの下限（秒）
+        - max_chunk_seconds: チャンクの長さの上限（秒）。省略時はチャンクの最大サイズ（20MB）のみで制限する
+        - initial_chunk_seconds: 計測値が揃うまで使うチャンクの長さ（秒）
+        - max_concurrency: 同時リクエスト数の上限（コネクションプールの最大接続数以下にする）
+        - initial_concurrency: 最初の同時リクエスト数
+        """
+        if min_chunk_seconds <= 0 or (max_chunk_seconds is not None and max_chunk_seconds < min_chunk_seconds):
+            raise ValueError(f"チャンクの長さの範囲が正しくありません: {min_chunk_seconds}〜{max_chunk_seconds}秒")
+        if max_concurrency < 1:
+            raise ValueError(f"同時リクエスト数の上限は1以上にしてください: {max_concurrency}")
+        self.min_chunk_seconds = min_chunk_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_concurrency = max_concurrency
+        self.chunk_seconds = self._clamp_seconds(initial_chunk_seconds)
+        self.concurrency = min(max(1, initial_concurrency), max_concurrency)
+        # 直前のファイルでチャンクの最大サイズ（20MB）に収まる長さ（秒）
+        self.size_limit_seconds: Optional[float] = None
+        self.model: Optional[Tuple[float, float]] = None
+        self.throughput: Optional[float] = None
+        self.chunks = 0
+        self.failures = 0
+        self.audio_seconds = 0.0
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=SAMPLE_WINDOW)
+        self._epoch: List[Tuple[float, float, int]] = []
+        self._best: Optional[Tuple[int, float]] = None
+        self._hold = 0
+        self._latency = 0.0
+        self._upload = [0.0, 0]
+        self._wait = [0.0, 0]
+
+    def _clamp_seconds(self, seconds: float) -> float:
+        seconds = max(self.min_chunk_seconds, seconds)
+        if self.max_chunk_seconds is not None:
+            seconds = min(self.max_chunk_seconds, seconds)
+        return seconds
+
+    def next_chunk_seconds(self, remaining: Optional[float] = None, limit: Optional[float] = None) -> float:
+        """
+        次に送信するチャンクの長さ（秒）を返す
+
+        Parameters:
+        - remaining: まだ送信していない音声の長さ（秒）。分からない場合はNone
+        - limit: チャンクの最大サイズに収まる長さ（秒）。選んだ長さがこれを超える場合は limit にする
+
+        Returns:
+        - float: チャンクの新しい音声の長さ（秒）
+        """
+        with self._lock:
+            self.size_limit_seconds = limit
+            self._issued += 1
+            if self._issued == 1 and self.model is None:
+                return self._clamp_seconds(self.chunk_seconds / PROBE_RATIO)
+            seconds = self._effective_chunk_seconds()
+            if remaining is None or remaining <= 0:
+                return seconds
+            # 残りを同時リクエスト数の倍数のチャンクに均等に分け、最後の回で一部の接続だけが使われないようにする
+            waves = math.ceil(math.ceil(remaining / seconds) / self.concurrency)
+            seconds = max(self.min_chunk_seconds, remaining / (waves * self.concurrency))
+            # 下限より短い端数が残る場合は、このチャンクに含める
+            if remaining - seconds < self.min_chunk_seconds:
+                seconds = remaining
+            return seconds
+
+    def record(self, audio_seconds: float, latency: float, in_flight: int = 1,
+               upload_seconds: Optional[float] = None, wait_seconds: Optional[float] = None) -> None:
+        """
+        完了したチャンクの処理時間を記録し、チャンクの長さと同時リクエスト数を見直す
+
+        Parameters:
+        - audio_seconds: チャンクの音声の長さ（秒）
+        - latency: 送信を始めてから結果を受け取るまでの時間（秒）
+        - in_flight: 送信時の同時リクエスト数（このチャンクを含む）
+        - upload_seconds: リクエスト本文の送信にかかった時間（秒、計測できた場合）
+        - wait_seconds: 送信後に応答を待った時間（秒、計測できた場合）
+        """
+        with self._lock:
+            self.chunks += 1
+            self.audio_seconds += audio_seconds
+            self._latency += latency
+            if upload_seconds is not None:
+                self._upload[0] += upload_seconds
+                self._upload[1] += 1
+            if wait_seconds is not None:
+                self._wait[0] += wait_seconds
+                self._wait[1] += 1
+            self._samples.append((audio_seconds, latency))
+            self._update_chunk_seconds()
+            self._epoch.append((audio_seconds, latency, max(1, in_flight)))
+            self._hold = max(0, self._hold - 1)
+            self._update_concurrency()
+
+    def record_failure(self) -> None:
+        """リクエストの失敗（レート制限など）を記録し、同時リクエスト数を半分にする"""
+        with self._lock:
+            self.failures += 1
+            self.concurrency = max(1, self.concurrency // 2)
+            self._epoch = []
+            self._best = None
+            self._hold = REPROBE_CHUNKS
+
+    def _effective_chunk_seconds(self) -> float:
+        if self.size_limit_seconds is not None:
+            return min(self.chunk_seconds, self.size_limit_seconds)
+        return self.chunk_seconds
+
+    def _update_chunk_seconds(self) -> None:
+        model = fit_latency(list(self._samples))
+        if model is None:
+            return
+        self.model = model
+        overhead, per_second = model
+        if per_second <= 0:
+            # 処理時間が長さによらない場合は、長いほど固定の待ち時間の割合が下がる
+            seconds = self.max_chunk_seconds or self.chunk_seconds * 2
+        elif overhead <= 0:
+            seconds = self.min_chunk_seconds
+        else:
+            seconds = overhead * (1 - TARGET_OVERHEAD_RATIO) / (TARGET_OVERHEAD_RATIO * per_second)
+        self.chunk_seconds = self._clamp_seconds(seconds)
+
+    def _update_concurrency(self) -> None:
+        # 現在の同時リクエスト数で、同時に送信した数以上のチャンクが完了するまで判断しない
+        if len(self._epoch) < max(2, self.concurrency):
+            return
+        audio = sum(entry[0] for entry in self._epoch)
+        latency = sum(entry[1] for entry in self._epoch)
+        in_flight = sum(entry[2] for entry in self._epoch) / len(self._epoch)
+        self._epoch = []
+        if latency <= 0:
+            return
+        # 1リクエストあたりの速度 × 同時リクエスト数
+        self.throughput = in_flight * audio / latency
+
+        if self._best is None or self._best[0] == self.concurrency:
+            self._best = (self.concurrency, self.throughput)
+        elif self.throughput >= self._best[1] * (1 + IMPROVEMENT_THRESHOLD):
+            self._best = (self.concurrency, self.throughput)
+        else:
+            # 増やしても改善しなかった（帯域・APIの上限に達した）ため元に戻す
+            self.concurrency = self._best[0]
+            self._hold = REPROBE_CHUNKS
+            return
+        if self._hold == 0 and self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+
+    def report(self) -> Dict[str, Any]:
+        """
+        選んだ設定と計測値を返す
+
+        Returns:
+        - Dict[str, Any]: chunk_seconds（チャンクの最大サイズで切り詰めた長さ）, size_limited, concurrency, chunks, audio_seconds, throughput（推定の音声秒/秒）,
+          overhead_seconds, seconds_per_audio_second, latency_seconds, upload_seconds, wait_seconds（チャンクあたりの平均）, failures
+        """
+        with self._lock:
+            overhead, per_second = self.model if self.model else (None, None)
+            return {
+                "chunk_seconds": self._effective_chunk_seconds(),
+                "size_limited": self._effective_chunk_seconds() < self.chunk_seconds,
+                "concurrency": self.concurrency,
+                "chunks": self.chunks,
+                "audio_seconds": self.audio_seconds,
+                "throughput": self.throughput,
+                "overhead_seconds": overhead,
+                "seconds_per_audio_second": per_second,
+                "latency_seconds": self._latency / self.chunks if self.chunks else None,
+                "upload_seconds": self._upload[0] / self._upload[1] if self._upload[1] else None,
+                "wait_seconds": self._wait[0] / self._wait[1] if self._wait[1] else None,
+                "failures": self.failures,
+            }
+
+def format_report(report: Dict[str, Any]) -> str:
+    """自動調整の結果を1行にする"""
+    limited = "（最大サイズの上限）" if report["size_limited"] else ""
+    line = f"自動調整: チャンク {report['chunk_seconds']:.0f}秒{limited} / 同時リクエスト {report['concurrency']}"
+    details = []
+    if report["throughput"] is not None:
+        details.append(f"推定 {report['throughput']:.1f}音声秒/秒")
+    if report["latency_seconds"] is not None:
+        details.append(f"{report['chunks']}チャンク 平均 {report['latency_seconds']:.2f}秒")
+    if report["upload_seconds"] is not None:
+        details.append(f"うちアップロード {report['upload_seconds']:.2f}秒")
+    if report["wait_seconds"] is not None:
+        details.append(f"応答待ち {report['wait_seconds']:.2f}秒")
+    if report["overhead_seconds"] is not None:
+        details.append(f"固定の待ち時間 {report['overhead_seconds']:.2f}秒")
+    if report["failures"]:
+        details.append(f"失敗 {report['failures']}件")
+    return line + (f"（{'、'.join(details)}）" if details else "")
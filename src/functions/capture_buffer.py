@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+import os
+import numpy as np
+import soundfile as sf
+from typing import List, Optional
+
+# メモリに保持する録音データの上限（超えると一時ファイルに書き出す）
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# 既存の録音ファイルに追記する際に1回で読み書きするフレーム数
+APPEND_BLOCK_FRAMES = 64 * 1024
+
+def append_audio(target_path: str, source_path: str) -> int:
+    """
+    source_path の音声を target_path の末尾に追記する（サンプリングレートとチャンネル数が一致すること）
+
+    Returns:
+    - int: 追記したフレーム数
+    """
+    frames = 0
+    with sf.SoundFile(source_path) as source, sf.SoundFile(target_path, mode='r+') as target:
+        if (source.samplerate, source.channels) != (target.samplerate, target.channels):
+            raise ValueError(f"追記する音声の形式が一致しません: {source.samplerate}Hz/{source.channels}ch → "
+                             f"{target.samplerate}Hz/{target.channels}ch")
+        target.seek(0, sf.SEEK_END)
+        for block in source.blocks(APPEND_BLOCK_FRAMES, dtype='int16'):
+            target.write(block)
+            frames += len(block)
+    return frames
+
+def recover_spool(filepath: str) -> int:
+    """
+    異常終了で残った一時ファイル（保存先.part）の録音データを保存先に戻す
+
+    保存先がある場合は末尾に追記し、ない場合は一時ファイルをそのまま保存先にする。
+
+    Returns:
+    - int: 戻したフレーム数（一時ファイルがない場合は0）
+    """
+    spool_path = f"{filepath}.part"
+    if not os.path.exists(spool_path):
+        return 0
+    try:
+        frames = sf.info(spool_path).frames
+    except RuntimeError:
+        # ヘッダーを書き出す前に終了した場合は読めない
+        os.remove(spool_path)
+        return 0
+    if frames and os.path.exists(filepath):
+        append_audio(filepath, spool_path)
+        os.remove(spool_path)
+    elif frames:
+        os.replace(spool_path, filepath)
+    else:
+        os.remove(spool_path)
+    return frames
+
+class CaptureBuffer:
+    """
+    録音ブロックをモノラルで保持し、上限を超えた分を一時ファイルに書き出すバッファ
+
+    短い録音は従来どおりメモリ上で保持して最後に一括で書き出す。長い録音では
+    上限に達するたびにまとめて一時ファイル（保存先.part）に追記し、最後に保存先へ
+    リネームするため、録音時間に関係なくメモリ使用量は上限以下に保たれる。
+    一時ファイルは書き出しのたびにヘッダーを更新するため、異常終了しても recover_spool で読み出せる。
+
+    append=True の場合は、保存先が既にあれば上書きせずに末尾へ追記する（録音セッションの再開）。
+    """
+
+    def __init__(self, filepath: str, sample_rate: int, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                 append: bool = False):
+        """
+        Parameters:
+        - filepath: 保存先のパス
+        - sample_rate: 保存するサンプリングレート（Hz）
+        - memory_limit: メモリに保持する上限（バイト）
+        - append: 既存の保存先に追記するかどうか
+        """
+        self.filepath = filepath
+        self.sample_rate = sample_rate
+        self.memory_limit = memory_limit
+        self.append_existing = append
+        self.frames = 0
+        self.buffered_bytes = 0
+        self._blocks: List[np.ndarray] = []
+        self._spool: Optional[sf.SoundFile] = None
+
+    @property
+    def spool_path(self) -> str:
+        return f"{self.filepath}.part"
+
+    @property
+    def spilled(self) -> bool:
+        """一時ファイルへの書き出しが発生したかどうか"""
+        return self._spool is not None
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def append(self, block: np.ndarray) -> None:
+        """
+        ブロックを追加（複数チャンネルの場合はモノラルに平均する）
+
+        Parameters:
+        - block: (フレーム数, チャンネル数) または (フレーム数,) の配列
+        """
+        if block.ndim > 1 and block.shape[1] > 1:
+            block = np.mean(block, axis=1)
+        elif block.ndim > 1:
+            block = block[:, 0]
+        self._blocks.append(block)
+        self.frames += len(block)
+        self.buffered_bytes += block.nbytes
+        if self.buffered_bytes >= self.memory_limit:
+            self._spill()
+
+    def _spill(self) -> None:
+        """メモリ上のブロックを一時ファイルに追記"""
+        if self._spool is None:
+            self._spool = sf.SoundFile(self.spool_path, mode='w', samplerate=self.sample_rate,
+                                       channels=1, format='WAV')
+        self._spool.write(np.concatenate(self._blocks))
+        self._spool.flush()
+        self._blocks = []
+        self.buffered_bytes = 0
+
+    def finalize(self) -> str:
+        """
+        録音データを保存先に書き出す
+
+        Returns:
+        - str: 保存先のパス
+        """
+        if self.append_existing and os.path.exists(self.filepath):
+            if self._blocks:
+                self._spill()
+            self._spool.close()
+            append_audio(self.filepath, self.spool_path)
+            os.remove(self.spool_path)
+        elif self._spool is None:
+            sf.write(self.filepath, np.concatenate(self._blocks, axis=0), self.sample_rate)
+        else:
+            if self._blocks:
+                self._spill()
+            self._spool.close()
+            os.replace(self.spool_path, self.filepath)
+        self._blocks = []
+        self.buffered_bytes = 0
+        return self.filepath
+
+    def discard(self) -> None:
+        """録音データを破棄し、一時ファイルを削除"""
+        self._blocks = []
+        self.buffered_bytes = 0
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            try:
+                os.remove(self.spool_path)
+            except FileNotFoundError:
+                pass
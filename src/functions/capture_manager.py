@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import sounddevice as sd
+from src.functions.capture_buffer import DEFAULT_MEMORY_LIMIT, CaptureBuffer
+from src.functions.devices import DeviceRegistry
+from src.functions.progress import CaptureMonitor
+from src.functions.recorder import BLOCK_SIZE
+from src.functions.resample import SpeechCapturePipeline
+
+# ミックス・リサンプリング・書き出しを行う共有スレッドの数（セッション数に関係なく一定）
+DEFAULT_WRITER_THREADS = min(4, os.cpu_count() or 1)
+
+# セッションごとに書き出し待ちにできるブロック数。
+# 超えた場合はそのセッションの読み込みを止める（デバイス側では入力のオーバーフローとして通知される）
+DEFAULT_MAX_PENDING_BLOCKS = 64
+
+# 書き出しスレッドが1つのセッションを続けて処理するブロック数（他のセッションを待たせないため）
+DRAIN_BATCH_BLOCKS = 16
+
+# 読み込めるブロックがない場合に読み込みスレッドが待つ時間の上限（秒）
+MAX_IDLE_SECONDS = 0.02
+
+# セッションの状態
+STATE_RUNNING = "running"
+STATE_STOPPING = "stopping"
+STATE_STOPPED = "stopped"
+STATE_FAILED = "failed"
+
+def mix_blocks(blocks: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    複数の入力ブロックをチャンネル数とフレーム数の少ない方に揃えて平均する（AudioRecorder.capture と同じミックス）
+
+    Parameters:
+    - blocks: (フレーム数, チャンネル数) の配列のリスト
+
+    Returns:
+    - np.ndarray: ミックスしたブロック
+    """
+    if len(blocks) == 1:
+        return blocks[0]
+    channels = min(block.shape[1] for block in blocks)
+    frames = min(len(block) for block in blocks)
+    mixed = blocks[0][:frames, :channels].copy()
+    for block in blocks[1:]:
+        mixed += block[:frames, :channels]
+    return mixed / len(blocks)
+
+class CaptureSession:
+    """
+    CaptureManager で並行して録音する1つのセッション
+
+    入力ストリームのブロックは読み込みスレッドが受信箱に入れるだけで、ミックス・リサンプリング・
+    録音バッファへの追加は共有の書き出しスレッドが行う。1つのセッションの受信箱は同時に1つの
+    書き出しスレッドでのみ処理するため、ブロックの順序は保たれる。録音バッファと保存先はセッションごとに持つ。
+    """
+
+    def __init__(self, name: str, streams: Sequence[Any], filepath: str, sample_rate: int,
+                 executor: ThreadPoolExecutor, target_rate: Optional[int] = None,
+                 memory_limit: int = DEFAULT_MEMORY_LIMIT, append: bool = False,
+                 labels: Optional[Sequence[str]] = None, max_pending: int = DEFAULT_MAX_PENDING_BLOCKS,
+                 wake: Optional[threading.Event] = None):
+        """
+        Parameters:
+        - name: セッション名
+        - streams: 入力ストリーム（sounddevice.InputStream または AudioSource）。複数の場合はミックスする
+        - filepath: 保存先のパス
+        - sample_rate: 入力のサンプリングレート（Hz）
+        - executor: 書き出しに使用する共有のスレッドプール
+        - target_rate: 指定した場合、モノラル・int16・このレートに変換して保持・保存する
+        - memory_limit: 録音データをメモリに保持する上限（バイト）
+        - append: 保存先が既にある場合に末尾へ追記するかどうか
+        - labels: 入力ストリームの表示名
+        - max_pending: 書き出し待ちにできるブロック数
+        - wake: 書き出し待ちが減ったことを読み込みスレッドに知らせるイベント
+        """
+        self.name = name
+        self.streams = list(streams)
+        self.filepath = filepath
+        self.sample_rate = sample_rate
+        self.target_rate = target_rate
+        self.max_pending = max_pending
+        self.labels = list(labels) if labels else [f"入力{i + 1}" for i in range(len(self.streams))]
+        self.buffer = CaptureBuffer(filepath, target_rate or sample_rate, memory_limit, append=append)
+        self.pipeline = SpeechCapturePipeline(sample_rate, target_rate) if target_rate else None
+        self.monitor = CaptureMonitor(self.labels, memory_limit)
+        self.state = STATE_RUNNING
+        self.error: Optional[str] = None
+        self.result: Optional[str] = None
+        self.captured_frames = 0
+        self.started_at = time.time()
+        self.done = threading.Event()
+        self._executor = executor
+        self._wake = wake
+        self._inbox: deque = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._input_closed = False
+        self._write_failed = False
+
+    @property
+    def seconds(self) -> float:
+        """書き出し済みの録音時間（秒）"""
+        return self.captured_frames / self.sample_rate
+
+    @property
+    def pending(self) -> int:
+        """書き出し待ちのブロック数"""
+        return len(self._inbox)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        セッションの状態（レベルは前回の取得以降の集計）
+
+        Returns:
+        - Dict[str, Any]: 名前・状態・保存先・録音時間・書き出し待ちのブロック数・入力のレベルと欠落数など
+        """
+        snapshot = self.monitor.take_snapshot()
+        return dict(snapshot, name=self.name, state=self.state, filepath=self.filepath, seconds=self.seconds,
+                    pending=self.pending, error=self.error, result=self.result)
+
+    def read_available(self) -> int:
+        """全ての入力から待たずに読み込めるフレーム数"""
+        return min(stream.read_available for stream in self.streams)
+
+    def input_finished(self) -> bool:
+        """入力のいずれかが終わりに達したかどうか（仮想ソースのみ）"""
+        return any(getattr(stream, 'finished', False) for stream in self.streams)
+
+    def request_stop(self) -> None:
+        """停止を要求する（入力は読み込みスレッドが閉じる）"""
+        with self._lock:
+            if self.state == STATE_RUNNING:
+                self.state = STATE_STOPPING
+
+    @property
+    def stop_requested(self) -> bool:
+        return self.state != STATE_RUNNING
+
+    def _submit_locked(self) -> None:
+        """受信箱の処理をスレッドプールに登録（_lock を保持して呼び出す）"""
+        if not self._scheduled:
+            self._scheduled = True
+            self._executor.submit(self._drain)
+
+    def read(self, frames: int) -> None:
+        """各入力から1ブロックずつ読み込んで受信箱に入れる（読み込みスレッドから呼び出す）"""
+        blocks = []
+        overflows = []
+        for stream in self.streams:
+            data, overflowed = stream.read(frames)
+            blocks.append(data)
+            overflows.append(bool(overflowed))
+        with self._lock:
+            self._inbox.append((blocks, overflows))
+            self._submit_locked()
+
+    def close_input(self) -> None:
+        """入力ストリームを停止して閉じ、残りのブロックを書き出した後に保存する（読み込みスレッドから呼び出す）"""
+        for stream in self.streams:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                # 取り外されたデバイスは閉じる時にもエラーになるが、録音済みのデータは保存する
+                pass
+        with self._lock:
+            self._input_closed = True
+            self._submit_locked()
+
+    @property
+    def input_closed(self) -> bool:
+        return self._input_closed
+
+    def fail(self, error: Exception) -> None:
+        """エラーを記録して停止する（読み込み済みのブロックは書き出して保存する）"""
+        with self._lock:
+            self.state = STATE_FAILED
+            self.error = str(error)
+
+    def _write(self, blocks: List[np.ndarray], overflows: List[bool]) -> None:
+        """1ブロック分をミックス・変換して録音バッファに追加"""
+        for label, block, overflowed in zip(self.labels, blocks, overflows):
+            self.monitor.update_source(label, block, overflowed)
+        mixed = mix_blocks(blocks)
+        if self.pipeline is not None:
+            self.buffer.append(self.pipeline.process(mixed))
+        else:
+            self.buffer.append(mixed)
+        self.captured_frames += len(mixed)
+        self.monitor.update_progress(self.seconds, self.buffer.buffered_bytes)
+
+    def _drain(self) -> None:
+        """受信箱のブロックを順に書き出す（書き出しスレッドで実行）"""
+        for _ in range(DRAIN_BATCH_BLOCKS):
+            with self._lock:
+                if not self._inbox:
+                    break
+                blocks, overflows = self._inbox.popleft()
+            if self._write_failed:
+                # 書き出しに失敗した後のブロックは捨てる
+                continue
+            try:
+                self._write(blocks, overflows)
+            except Exception as e:
+                self._write_failed = True
+                self.fail(e)
+        if self._wake is not None:
+            self._wake.set()
+        with self._lock:
+            if self._inbox:
+                # 残りは他のセッションの後に続けて処理する
+                self._executor.submit(self._drain)
+                return
+            if not self._input_closed or self.done.is_set():
+                self._scheduled = False
+                return
+        self._finish()
+
+    def _finish(self) -> None:
+        """録音バッファを保存先に書き出す（入力を閉じて受信箱が空になった後に1回だけ実行）"""
+        try:
+            if len(self.buffer):
+                self.buffer.finalize()
+                self.result = self.filepath
+            else:
+                self.buffer.discard()
+        except Exception as e:
+            # 一時ファイルは残し、次回の追記時に recover_spool で戻せるようにする
+            self.fail(e)
+        with self._lock:
+            if self.state != STATE_FAILED:
+                self.state = STATE_STOPPED
+        self.done.set()
+
+class CaptureManager:
+    """
+    複数の録音セッションを1つのプロセスで並行して録音する
+
+    全てのセッションの入力は1つの読み込みスレッドが巡回し、待たずに読み込めるブロックだけを読む
+    （セッションごとのループが読み込みを待ち続けたり、CPUを使い続けたりすることはない）。
+    ミックス・リサンプリング・書き出しは共有の書き出しスレッドプールで行い、セッションごとの
+    録音バッファと保存先に書き出す。セッションは start / stop で個別に開始・停止できる。
+    """
+
+    def __init__(self, writer_threads: int = DEFAULT_WRITER_THREADS, block_size: int = BLOCK_SIZE,
+                 registry: Optional[DeviceRegistry] = None):
+        """
+        Parameters:
+        - writer_threads: 書き出しを行う共有スレッドの数
+        - block_size: 1回に読み込むフレーム数
+        - registry: デバイス名の解決に使用するデバイス一覧（start_devices で使用）
+        """
+        self.block_size = block_size
+        self.registry = registry or DeviceRegistry()
+        self._executor = ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="capture-writer")
+        self._sessions: Dict[str, CaptureSession] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="capture-reader", daemon=True)
+        self._reader.start()
+
+    def __enter__(self) -> "CaptureManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self, name: str, streams: Sequence[Any], filepath: str, sample_rate: int,
+              target_rate: Optional[int] = None, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+              append: bool = False, labels: Optional[Sequence[str]] = None) -> CaptureSession:
+        """
+        入力ストリームを開始してセッションの録音を始める
+
+        Parameters:
+        - name: セッション名（録音中のセッションと重複しないこと）
+        - streams: 入力ストリーム。複数の場合はミックスして1つのファイルに保存する
+        - filepath: 保存先のパス（録音中の他のセッションと重複しないこと）
+
+        Returns:
+        - CaptureSession: 開始したセッション
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("CaptureManager は終了しています")
+            for session in self._sessions.values():
+                if session.done.is_set():
+                    continue
+                if session.name == name:
+                    raise ValueError(f"セッション {name} は録音中です")
+                if os.path.abspath(session.filepath) == os.path.abspath(filepath):
+                    raise ValueError(f"保存先 {filepath} はセッション {session.name} が使用しています")
+            session = CaptureSession(name, streams, filepath, sample_rate, self._executor, target_rate,
+                                     memory_limit, append, labels, wake=self._wake)
+            started = []
+            try:
+                for stream in session.streams:
+                    stream.start()
+                    started.append(stream)
+            except Exception:
+                for stream in session.streams:
+                    if stream in started:
+                        stream.stop()
+                    stream.close()
+                raise
+            self._sessions[name] = session
+        self._wake.set()
+        return session
+
+    def start_devices(self, name: str, devices: Sequence[str], filepath: str, sample_rate: int = 48000,
+                      hostapi: Optional[str] = None, **kwargs) -> CaptureSession:
+        """
+        デバイス名（またはID）を指定してセッションの録音を始める
+
+        録音中のセッションがある間は、そのストリームを止めないようPortAudioを再初期化せずに解決する。
+
+        Parameters:
+        - devices: 入力デバイスの名前（一部でも可）またはIDのリスト。複数の場合はミックスする
+        - hostapi: デバイスをホストAPI名で絞り込む場合に指定
+        - kwargs: start に渡す引数
+
+        Returns:
+        - CaptureSession: 開始したセッション
+        """
+        with self._lock:
+            reinit = all(session.done.is_set() for session in self._sessions.values())
+        resolved = []
+        for device in devices:
+            device_id, info = self.registry.resolve(device, hostapi, reinit=reinit)
+            if info is None:
+                raise ValueError(f"入力デバイスが見つかりません: {device}")
+            resolved.append((device_id, info))
+        streams = []
+        try:
+            for device_id, info in resolved:
+                streams.append(sd.InputStream(device=device_id, channels=info['max_input_channels'],
+                                              samplerate=sample_rate, callback=None))
+            return self.start(name, streams, filepath, sample_rate,
+                              labels=[info['name'] for _, info in resolved], **kwargs)
+        except Exception:
+            for stream in streams:
+                stream.close()
+            raise
+
+    def get(self, name: str) -> CaptureSession:
+        """名前でセッションを取得（存在しない場合はエラー）"""
+        with self._lock:
+            if name not in self._sessions:
+                raise ValueError(f"セッションが見つかりません: {name}")
+            return self._sessions[name]
+
+    def stop(self, name: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        セッションを停止し、残りの録音データを書き出すまで待つ
+
+        Returns:
+        - Optional[str]: 保存先のパス。録音データがない場合や保存に失敗した場合はNone
+        """
+        session = self.get(name)
+        session.request_stop()
+        self._wake.set()
+        session.done.wait(timeout)
+        return session.result
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        セッションが終わる（入力が終わりに達するか停止される）まで待つ
+
+        Returns:
+        - Optional[str]: 保存先のパス
+        """
+        session = self.get(name)
+        session.done.wait(timeout)
+        return session.result
+
+    def sessions(self) -> List[CaptureSession]:
+        """全てのセッション（停止したものを含む、開始順）"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def status(self) -> List[Dict[str, Any]]:
+        """全てのセッションの状態"""
+        return [session.status() for session in self.sessions()]
+
+    def close(self) -> None:
+        """録音中の全てのセッションを停止して保存し、読み込みスレッドと書き出しスレッドを終了する"""
+        for session in self.sessions():
+            session.request_stop()
+        self._wake.set()
+        for session in self.sessions():
+            session.done.wait()
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._reader.join()
+        self._executor.shutdown(wait=True)
+
+    def _read_loop(self) -> None:
+        """全てのセッションの入力を巡回して、読み込めるブロックを読む（読み込みスレッド）"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                active = [session for session in self._sessions.values() if not session.input_closed]
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            wait = MAX_IDLE_SECONDS
+            read_any = False
+            for session in active:
+                if session.stop_requested or session.input_finished():
+                    session.close_input()
+                    continue
+                if session.pending >= session.max_pending:
+                    # 書き出しが追いつくまで待つ（デバイスのバッファに残る）
+                    continue
+                try:
+                    available = session.read_available()
+                    if available >= self.block_size:
+                        session.read(self.block_size)
+                        read_any = True
+                    else:
+                        wait = min(wait, (self.block_size - available) / session.sample_rate)
+                except Exception as e:
+                    session.fail(e)
+                    session.close_input()
+            if not read_any:
+                # 次のブロックが揃う頃まで待つ（停止や新しいセッションの開始ではすぐに起きる）
+                self._wake.wait(wait)
+                self._wake.clear()
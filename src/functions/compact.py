@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import soundfile as sf
+from src.functions.job_queue import STATUS_RUNNING, QueueBackend
+from src.functions.session import RecordingSession, is_session_audio, session_state_path
+
+# 変換後の形式と拡張子
+COMPACT_FORMAT = "FLAC"
+COMPACT_EXTENSION = ".flac"
+
+# 圧縮する音声ファイルの拡張子
+SOURCE_EXTENSIONS = {".wav"}
+
+# FLACで可逆に保存できるWAVのサンプル形式と、変換後のサンプル形式（32bit整数・浮動小数点は対象外）
+LOSSLESS_SUBTYPES = {"PCM_U8": "PCM_S8", "PCM_S8": "PCM_S8", "PCM_16": "PCM_16", "PCM_24": "PCM_24"}
+
+# 読み込み・書き出し・ハッシュの計算を1回で行うフレーム数
+BLOCK_FRAMES = 64 * 1024
+
+# 更新されてからこの秒数が経っていないファイルは対象にしない（書き込み中・文字起こし待ちのファイル）
+DEFAULT_MIN_AGE_SECONDS = 600.0
+
+# 変換結果の状態
+RESULT_CONVERTED = "converted"
+RESULT_SKIPPED = "skipped"
+RESULT_FAILED = "failed"
+
+def sample_hash(path: str) -> str:
+    """
+    音声ファイルをデコードしたサンプルのハッシュ（形式によらず、同じサンプルであれば同じ値になる）
+
+    サンプリングレート・チャンネル数・フレーム数も含める。
+    """
+    digest = hashlib.sha256()
+    with sf.SoundFile(path) as f:
+        digest.update(f"{f.samplerate}:{f.channels}:{f.frames}".encode("ascii"))
+        for block in f.blocks(BLOCK_FRAMES, dtype="int32", always_2d=True):
+            digest.update(block.tobytes())
+    return digest.hexdigest()
+
+def compacted_path(path: str) -> str:
+    """圧縮後のファイルのパス（拡張子だけを変える）"""
+    return os.path.splitext(path)[0] + COMPACT_EXTENSION
+
+def temp_path(path: str) -> str:
+    """圧縮中の一時ファイルのパス（監視・文字起こしの対象にならない拡張子）"""
+    return f"{compacted_path(path)}.tmp"
+
+def convert_file(path: str) -> Dict[str, Any]:
+    """
+    WAVファイルをFLACの一時ファイルに変換し、デコードしたサンプルのハッシュが一致することを確かめる
+
+    プロセスプールの子プロセスで実行する。元のファイルは変更しない（置き換えは compact_directory で行う）。
+    一時ファイルの更新時刻は元のファイルに合わせる。
+    前回の実行が置き換えの途中で終了し、変換後のファイルが既にある場合は、その内容を確かめるだけにする。
+
+    Parameters:
+    - path: WAVファイルのパス
+
+    Returns:
+    - Dict[str, Any]: path, target, status（converted / skipped / failed）, reason, original_bytes,
+      compacted_bytes, temp（置き換える一時ファイル。変換後のファイルが既にある場合はNone）
+    """
+    target = compacted_path(path)
+    result: Dict[str, Any] = {"path": path, "target": target, "status": RESULT_SKIPPED, "reason": None,
+                              "original_bytes": os.path.getsize(path), "compacted_bytes": None, "temp": None}
+    try:
+        info = sf.info(path)
+        subtype = LOSSLESS_SUBTYPES.get(info.subtype)
+        if subtype is None:
+            result["reason"] = f"FLACで可逆に保存できない形式です（{info.subtype}）"
+            return result
+        if os.path.exists(target):
+            if sample_hash(target) != sample_hash(path):
+                result.update(status=RESULT_FAILED, reason=f"内容の異なる {os.path.basename(target)} が既にあります")
+                return result
+            result.update(status=RESULT_CONVERTED, compacted_bytes=os.path.getsize(target))
+            return result
+
+        temp = temp_path(path)
+        digest = hashlib.sha256()
+        with sf.SoundFile(path) as source, \
+                sf.SoundFile(temp, "w", source.samplerate, source.channels, subtype, format=COMPACT_FORMAT) as output:
+            digest.update(f"{source.samplerate}:{source.channels}:{source.frames}".encode("ascii"))
+            # 元のファイルは1回だけ読み、書き出すブロックからハッシュを計算する
+            for block in source.blocks(BLOCK_FRAMES, dtype="int32", always_2d=True):
+                digest.update(block.tobytes())
+                output.write(block)
+        if sample_hash(temp) != digest.hexdigest():
+            os.remove(temp)
+            result.update(status=RESULT_FAILED, reason="変換後のサンプルが一致しません")
+            return result
+        stat = os.stat(path)
+        shutil.copymode(path, temp)
+        os.utime(temp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        result.update(status=RESULT_CONVERTED, compacted_bytes=os.path.getsize(temp), temp=temp)
+    except (OSError, RuntimeError) as e:
+        if os.path.exists(temp_path(path)):
+            os.remove(temp_path(path))
+        result.update(status=RESULT_FAILED, reason=str(e))
+    return result
+
+def find_candidates(input_dir: str, min_age_seconds: float = DEFAULT_MIN_AGE_SECONDS,
+                    busy_paths: Optional[set] = None) -> List[Dict[str, Any]]:
+    """
+    ディレクトリ内の圧縮の対象を探す
+
+    録音中（一時ファイル .part がある）・更新されたばかり・文字起こし中のファイルは、理由を付けてスキップする。
+
+    Parameters:
+    - busy_paths: 文字起こし中のファイルの絶対パス
+
+    Returns:
+    - List[Dict[str, Any]]: path と、スキップする場合は reason を含む辞書のリスト（ファイル名の順）
+    """
+    now = time.time()
+    candidates = []
+    for path in sorted(Path(input_dir).iterdir()):
+        if path.suffix.lower() not in SOURCE_EXTENSIONS or not path.is_file():
+            continue
+        reason = None
+        if os.path.exists(f"{path}.part"):
+            reason = "録音中です"
+        elif now - path.stat().st_mtime < min_age_seconds:
+            reason = "更新されたばかりです"
+        elif busy_paths and os.path.abspath(path) in busy_paths:
+            reason = "文字起こし中です"
+        candidates.append({"path": str(path), "reason": reason})
+    return candidates
+
+def _swap(result: Dict[str, Any], queue: Optional[QueueBackend]) -> bool:
+    """
+    変換後のファイルで元のファイルを置き換え、元のファイルを参照する記録を更新する
+
+    ジョブキューの記録を先に移すため、置き換えた直後に監視がFLACを見つけても同じファイルとして扱われる。
+
+    Returns:
+    - bool: 置き換えた場合は True。変換中に文字起こしが始まっていた場合は変換後のファイルを削除して False
+    """
+    path, target = result["path"], result["target"]
+    stat = os.stat(result["temp"] or target)
+    if queue is not None and queue.relocate(path, target, stat.st_size, stat.st_mtime) is None:
+        if result["temp"]:
+            os.remove(result["temp"])
+        return False
+    if result["temp"]:
+        os.replace(result["temp"], target)
+    if is_session_audio(path):
+        session = RecordingSession.load(session_state_path(path))
+        session.state["audio_file"] = os.path.basename(target)
+        session.save()
+    os.remove(path)
+    return True
+
+def compact_directory(input_dir: str, queue: Optional[QueueBackend] = None, workers: Optional[int] = None,
+                      min_age_seconds: float = DEFAULT_MIN_AGE_SECONDS) -> List[Dict[str, Any]]:
+    """
+    ディレクトリ内のWAVファイルをFLACに可逆圧縮して置き換える
+
+    変換と検証はプロセスプールで並行して行い、置き換えは検証を終えたものから1件ずつ行う。
+    置き換えでは、ジョブキューのジョブと録音セッションの状態ファイルが参照するパスも更新する。
+    FLACファイルの更新時刻は元のファイルに合わせるため、文字起こし済みかどうかの判定は変わらない。
+
+    Parameters:
+    - input_dir: 録音ファイルのディレクトリ
+    - queue: 指定した場合、ジョブのパスを更新する（文字起こし中のファイルは対象にしない）
+    - workers: 変換するプロセス数（Noneの場合はCPUコア数）
+    - min_age_seconds: 更新されてからこの秒数が経っていないファイルは対象にしない
+
+    Returns:
+    - List[Dict[str, Any]]: ファイルごとの結果（convert_file の戻り値。スキップしたものを含む）
+    """
+    busy = {job["path"] for job in queue.list_jobs(STATUS_RUNNING)} if queue is not None else set()
+    results = []
+    paths = []
+    for candidate in find_candidates(input_dir, min_age_seconds, busy):
+        if candidate["reason"] is None:
+            paths.append(candidate["path"])
+        else:
+            result = {"path": candidate["path"], "target": None, "status": RESULT_SKIPPED,
+                      "reason": candidate["reason"], "original_bytes": os.path.getsize(candidate["path"]),
+                      "compacted_bytes": None, "temp": None}
+            print(format_result(result))
+            results.append(result)
+    if not paths:
+        return results
+
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(convert_file, path) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            if result["status"] == RESULT_CONVERTED:
+                try:
+                    if not _swap(result, queue):
+                        result.update(status=RESULT_SKIPPED, reason="文字起こし中です", compacted_bytes=None, temp=None)
+                except (OSError, ValueError) as e:
+                    result.update(status=RESULT_FAILED, reason=f"置き換えに失敗しました: {e}")
+            print(format_result(result))
+            results.append(result)
+    return sorted(results, key=lambda result: result["path"])
+
+def _megabytes(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f}MB"
+
+def format_result(result: Dict[str, Any]) -> str:
+    """1ファイルの結果を1行にする"""
+    name = os.path.basename(result["path"])
+    if result["status"] == RESULT_CONVERTED:
+        ratio = result["compacted_bytes"] / result["original_bytes"] if result["original_bytes"] else 0.0
+        return (f"圧縮: {name} -> {os.path.basename(result['target'])}（{_megabytes(result['original_bytes'])} → "
+                f"{_megabytes(result['compacted_bytes'])}、{ratio * 100:.0f}%）")
+    if result["status"] == RESULT_FAILED:
+        return f"失敗: {name}: {result['reason']}"
+    return f"スキップ: {name}（{result['reason']}）"
+
+def format_summary(results: List[Dict[str, Any]]) -> str:
+    """全体の結果を1行にする"""
+    converted = [result for result in results if result["status"] == RESULT_CONVERTED]
+    original = sum(result["original_bytes"] for result in converted)
+    compacted = sum(result["compacted_bytes"] for result in converted)
+    skipped = sum(result["status"] == RESULT_SKIPPED for result in results)
+    failed = sum(result["status"] == RESULT_FAILED for result in results)
+    saved = f"{_megabytes(original)} → {_megabytes(compacted)}（{_megabytes(original - compacted)} 削減）" \
+        if converted else "変換なし"
+    return f"圧縮: {len(converted)}ファイル {saved}、スキップ {skipped}件、失敗 {failed}件"
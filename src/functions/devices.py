@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+import time
+import sounddevice as sd
+from typing import Any, Dict, List, Optional, Tuple
+
+# ループバック（システム音声の取り込み）に使用するデバイス名のデフォルト
+DEFAULT_LOOPBACK = "BlackHole"
+
+class DeviceRegistry:
+    """
+    オーディオデバイスの一覧をキャッシュし、ID・名前・ホストAPIで検索するクラス
+
+    デバイスの列挙は最初の参照時に一度だけ行う。検索で見つからない場合は
+    ホットプラグされた可能性があるため、PortAudioを再初期化して一度だけ列挙し直す。
+    """
+
+    def __init__(self, max_age: Optional[float] = None):
+        """
+        Parameters:
+        - max_age: キャッシュの有効期間（秒）。Noneの場合は見つからない場合のみ列挙し直す。
+          期限切れでは録音中のストリームを止めないよう、PortAudioを再初期化せずに列挙し直す
+        """
+        self.max_age = max_age
+        self._devices: Optional[List[Dict[str, Any]]] = None
+        self._by_name: Dict[str, int] = {}
+        self._hostapis: Optional[List[str]] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> None:
+        """デバイスを列挙して索引を作成"""
+        self._devices = list(sd.query_devices())
+        self._by_name = {}
+        for i, device in enumerate(self._devices):
+            self._by_name.setdefault(device['name'].lower(), i)
+        self._hostapis = None
+        self._loaded_at = time.monotonic()
+
+    def refresh(self, reinit: bool = True) -> None:
+        """
+        デバイスを列挙し直す
+
+        PortAudioは初期化時のデバイス一覧を保持し続けるため、再初期化してから列挙する
+
+        Parameters:
+        - reinit: PortAudioを再初期化するかどうか。開いているストリームは再初期化で止まるため、
+          録音中は False を指定する（ホットプラグされたデバイスは見つからない）
+        """
+        terminate = getattr(sd, '_terminate', None)
+        initialize = getattr(sd, '_initialize', None)
+        if reinit and terminate is not None and initialize is not None:
+            try:
+                terminate()
+                initialize()
+            except Exception:
+                # 再初期化できない場合も既存の一覧を取り直す
+                pass
+        self._load()
+
+    @property
+    def devices(self) -> List[Dict[str, Any]]:
+        """キャッシュされたデバイスの一覧（リストの位置がデバイスID）"""
+        if self._devices is None:
+            self._load()
+        elif self.max_age is not None and time.monotonic() - self._loaded_at > self.max_age:
+            self.refresh(reinit=False)
+        return self._devices
+
+    def get(self, device_id: int) -> Optional[Dict[str, Any]]:
+        """IDでデバイスを取得（存在しない場合はNone）"""
+        devices = self.devices
+        if 0 <= device_id < len(devices):
+            return devices[device_id]
+        return None
+
+    def hostapi_name(self, device: Dict[str, Any]) -> Optional[str]:
+        """デバイスのホストAPI名を取得"""
+        if 'hostapi' not in device:
+            return None
+        if self._hostapis is None:
+            self._hostapis = [api['name'] for api in sd.query_hostapis()]
+        index = device['hostapi']
+        return self._hostapis[index] if 0 <= index < len(self._hostapis) else None
+
+    def _match(self, pattern: str, input_only: bool,
+               hostapi: Optional[str]) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """キャッシュ内で名前に一致するデバイスを検索（完全一致を部分一致より優先）"""
+        devices = self.devices
+        pattern = pattern.lower()
+        candidates = []
+        exact = self._by_name.get(pattern)
+        if exact is not None:
+            candidates.append(exact)
+        candidates.extend(i for i, device in enumerate(devices) if pattern in device['name'].lower())
+        for i in candidates:
+            device = devices[i]
+            if input_only and device['max_input_channels'] == 0:
+                continue
+            if hostapi is not None:
+                name = self.hostapi_name(device)
+                if name is None or hostapi.lower() not in name.lower():
+                    continue
+            return i, device
+        return None, None
+
+    def find(self, pattern: str, input_only: bool = True, hostapi: Optional[str] = None,
+             reinit: bool = True) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """
+        名前でデバイスを検索（大文字小文字を区別しない部分一致）
+
+        見つからない場合はデバイスの一覧を更新してもう一度検索する
+
+        Parameters:
+        - pattern: デバイス名、またはその一部
+        - input_only: 入力チャンネルを持つデバイスのみを対象とするかどうか
+        - hostapi: ホストAPI名（一部でも可）で絞り込む場合に指定
+        - reinit: 一覧を更新する際にPortAudioを再初期化するかどうか（refresh を参照）
+
+        Returns:
+        - Tuple[Optional[int], Optional[Dict[str, Any]]]: (デバイスID, デバイス)。見つからない場合は(None, None)
+        """
+        index, device = self._match(pattern, input_only, hostapi)
+        if device is None:
+            self.refresh(reinit)
+            index, device = self._match(pattern, input_only, hostapi)
+        return index, device
+
+    def resolve(self, spec: str, hostapi: Optional[str] = None,
+                reinit: bool = True) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """
+        コマンドラインで指定された入力デバイス（IDまたは名前）を解決
+
+        Parameters:
+        - reinit: 一覧を更新する際にPortAudioを再初期化するかどうか（refresh を参照）
+
+        Returns:
+        - Tuple[Optional[int], Optional[Dict[str, Any]]]: (デバイスID, 入力デバイス)。見つからない場合は(None, None)
+        """
+        if spec.isdigit():
+            device_id = int(spec)
+            device = self.get(device_id)
+            if device is None:
+                self.refresh(reinit)
+                device = self.get(device_id)
+            if device is not None and device['max_input_channels'] > 0:
+                return device_id, device
+            return None, None
+        return self.find(spec, hostapi=hostapi, reinit=reinit)
@@ -0,0 +1,210 @@
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+# コネクションプールの最大接続数（同時リクエスト数に合わせて指定する）
+DEFAULT_MAX_CONNECTIONS = 4
+
+# アイドル状態の接続を保持する秒数
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+# リクエストごとのタイムアウト（秒）。20MBのアップロードとWhisperの処理時間を考慮する
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_WRITE_TIMEOUT = 120.0
+DEFAULT_READ_TIMEOUT = 300.0
+DEFAULT_POOL_TIMEOUT = 30.0
+
+class ConnectionStats:
+    """HTTPリクエスト数・新規接続数・TLSハンドシェイク数を集計するクラス"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tls_requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def record_request(self, secure: bool = False) -> None:
+        """リクエストの送信を記録（secure: HTTPSのリクエストかどうか）"""
+        with self._lock:
+            self.requests += 1
+            if secure:
+                self.tls_requests += 1
+
+    def record_event(self, name: str) -> None:
+        """httpcoreのトレースイベントから新規接続とTLSハンドシェイクを記録"""
+        if name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+        elif name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    @staticmethod
+    def _derive(counts: dict) -> dict:
+        """
+        集計値から再利用の指標を求める
+
+        - connections_reused: 既存の接続で送信したリクエスト数（新規の TCP 接続を省略できた回数）
+        - handshakes_avoided: HTTPSのリクエストのうち、TLSハンドシェイクを省略できた回数（平文HTTPでは0）
+        """
+        return dict(counts,
+                    connections_reused=max(0, counts["requests"] - counts["connections"]),
+                    handshakes_avoided=max(0, counts["tls_requests"] - counts["tls_handshakes"]))
+
+    @property
+    def connections_reused(self) -> int:
+        """接続の再利用によって新規接続を省略できた回数"""
+        return self.snapshot()["connections_reused"]
+
+    @property
+    def handshakes_avoided(self) -> int:
+        """接続の再利用によって省略できたTLSハンドシェイクの回数"""
+        return self.snapshot()["handshakes_avoided"]
+
+    def snapshot(self) -> dict:
+        """現在の集計値を辞書で返す"""
+        with self._lock:
+            counts = {
+                "requests": self.requests,
+                "tls_requests": self.tls_requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+            }
+        return ConnectionStats._derive(counts)
+
+    @staticmethod
+    def diff(before: dict, after: dict) -> dict:
+        """2つのスナップショットの差分（バッチ単位の集計）を返す"""
+        return ConnectionStats._derive({key: after[key] - before[key]
+                                        for key in ("requests", "tls_requests", "connections", "tls_handshakes")})
+
+class RequestTiming:
+    """1回の呼び出し（SDKの自動リトライを含む）のアップロード時間と、送信後に応答を待った時間"""
+
+    def __init__(self):
+        self.upload_seconds: Optional[float] = None
+        self.wait_seconds: Optional[float] = None
+        self._send_started = None
+        self._sent_at = None
+
+    def record_event(self, name: str) -> None:
+        """httpcoreのトレースイベントから本文の送信と応答ヘッダーの受信の時刻を記録（リトライ時は最後の試行の値）"""
+        now = time.perf_counter()
+        if name.endswith("send_request_body.started"):
+            self._send_started = now
+        elif name.endswith("send_request_body.complete") and self._send_started is not None:
+            self.upload_seconds = now - self._send_started
+            self._sent_at = now
+        elif name.endswith("receive_response_headers.complete") and self._sent_at is not None:
+            self.wait_seconds = now - self._sent_at
+
+# measure_request の中で送信したリクエストの時間を記録する先（スレッドごと）
+_timing = threading.local()
+
+@contextmanager
+def measure_request() -> Iterator[RequestTiming]:
+    """
+    このスレッドで送信するリクエストのアップロード時間と応答待ちの時間を計測する
+
+    create_client で作成した同期クライアントのリクエストのみ計測できる。
+    """
+    timing = RequestTiming()
+    previous = getattr(_timing, "current", None)
+    _timing.current = timing
+    try:
+        yield timing
+    finally:
+        _timing.current = previous
+
+def _trace(stats: Optional[ConnectionStats]):
+    """接続数の集計と measure_request の計測を行うトレースのコールバック"""
+    def trace(name, info):
+        if stats is not None:
+            stats.record_event(name)
+        timing = getattr(_timing, "current", None)
+        if timing is not None:
+            timing.record_event(name)
+    return trace
+
+def build_timeout(connect=DEFAULT_CONNECT_TIMEOUT, write=DEFAULT_WRITE_TIMEOUT,
+                  read=DEFAULT_READ_TIMEOUT, pool=DEFAULT_POOL_TIMEOUT) -> httpx.Timeout:
+    """リクエストごとのタイムアウト設定を作成"""
+    return httpx.Timeout(connect=connect, write=write, read=read, pool=pool)
+
+def _resolve_http2(http2: bool) -> bool:
+    """HTTP/2はh2パッケージがある場合のみ有効にする（ない場合はHTTP/1.1のkeep-aliveを使用）"""
+    return http2 and importlib.util.find_spec("h2") is not None
+
+def _build_limits(max_connections: int, keepalive_expiry: float) -> httpx.Limits:
+    """同時リクエスト数に合わせたコネクションプールの上限を作成"""
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+
+def create_client(max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                  keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                  timeout: Optional[httpx.Timeout] = None, http2: bool = False,
+                  stats: Optional[ConnectionStats] = None, base_url: Optional[str] = None,
+                  max_retries: int = 2) -> OpenAI:
+    """
+    コネクションプールを調整したOpenAIクライアントを作成
+
+    Parameters:
+    - max_connections: プールの最大接続数（ワーカーの同時実行数に合わせる）
+    - keepalive_expiry: アイドル接続を保持する秒数
+    - timeout: リクエストごとのタイムアウト（省略時は build_timeout() の既定値）
+    - http2: HTTP/2を使用するかどうか（h2パッケージが必要）
+    - stats: 接続数を集計する ConnectionStats
+    - base_url: APIのベースURL（省略時は環境変数 OPENAI_BASE_URL または公式API）
+    - max_retries: SDKの自動リトライ回数
+    """
+    timeout = timeout or build_timeout()
+
+    def on_request(request):
+        if stats is not None:
+            stats.record_request(request.url.scheme == "https")
+        request.extensions["trace"] = _trace(stats)
+
+    http_client = DefaultHttpxClient(
+        limits=_build_limits(max_connections, keepalive_expiry),
+        timeout=timeout,
+        http2=_resolve_http2(http2),
+        event_hooks={"request": [on_request]}
+    )
+    return OpenAI(base_url=base_url, timeout=timeout, max_retries=max_retries, http_client=http_client)
+
+def create_async_client(max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                        timeout: Optional[httpx.Timeout] = None, http2: bool = False,
+                        stats: Optional[ConnectionStats] = None, base_url: Optional[str] = None,
+                        max_retries: int = 2) -> AsyncOpenAI:
+    """
+    コネクションプールを調整したAsyncOpenAIクライアントを作成
+
+    パラメータは create_client と同じ
+    """
+    timeout = timeout or build_timeout()
+    event_hooks = {}
+    if stats is not None:
+        async def trace(name, info):
+            stats.record_event(name)
+
+        async def on_request(request):
+            stats.record_request(request.url.scheme == "https")
+            request.extensions["trace"] = trace
+        event_hooks["request"] = [on_request]
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=_build_limits(max_connections, keepalive_expiry),
+        timeout=timeout,
+        http2=_resolve_http2(http2),
+        event_hooks=event_hooks
+    )
+    return AsyncOpenAI(base_url=base_url, timeout=timeout, max_retries=max_retries, http_client=http_client)
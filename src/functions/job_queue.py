@@ -0,0 +1,645 @@
+#!/usr/bin/env python
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable
+from src.functions.scheduler import (
+    POLICIES, POLICY_DEADLINE, POLICY_FIFO, POLICY_PRIORITY, POLICY_SJF, header_duration
+)
+
+# ジョブの状態
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# チャンクジョブに分割され、全てのチャンクの完了を待っている
+STATUS_SPLIT = "split"
+
+# ジョブの種類（ファイル全体、または分割された1チャンク）
+KIND_FILE = "file"
+KIND_CHUNK = "chunk"
+
+# 失敗したジョブを再試行する最大回数
+DEFAULT_MAX_ATTEMPTS = 3
+
+# ワーカーがジョブを保持できる期間（秒）。期限までに延長されないジョブは待機中に戻る
+DEFAULT_LEASE_SECONDS = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'file',
+    parent_id INTEGER,
+    chunk TEXT,
+    result TEXT,
+    worker TEXT,
+    lease_expires REAL,
+    started_at REAL,
+    finished_at REAL,
+    audio_seconds REAL,
+    duration REAL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    deadline REAL,
+    UNIQUE (path, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent_id);
+"""
+
+# 以前のバージョンで作成されたキューに追加する列
+_ADDED_COLUMNS = {
+    "kind": "TEXT NOT NULL DEFAULT 'file'",
+    "parent_id": "INTEGER",
+    "chunk": "TEXT",
+    "result": "TEXT",
+    "worker": "TEXT",
+    "lease_expires": "REAL",
+    "started_at": "REAL",
+    "finished_at": "REAL",
+    "audio_seconds": "REAL",
+    "duration": "REAL",
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "deadline": "REAL",
+}
+
+# JSONで保存する列
+_JSON_COLUMNS = ("chunk", "result")
+
+# 残りの処理量（秒）。チャンクジョブは同じファイルの未完了のチャンクの合計とし、
+# 処理が進んだ大きなファイルの残りのチャンクが、後から届いた短いファイルと交互に処理されるようにする
+_REMAINING = (
+    "CASE WHEN jobs.kind = 'chunk' THEN (SELECT SUM(COALESCE(c.duration, 0)) FROM jobs AS c "
+    "WHERE c.parent_id = jobs.parent_id AND c.status IN ('pending', 'running')) "
+    "ELSE COALESCE(jobs.duration, 1e18) END"
+)
+
+# 方針ごとの取り出し順
+_ORDER_BY = {
+    POLICY_FIFO: "jobs.id",
+    POLICY_SJF: f"{_REMAINING}, jobs.id",
+    POLICY_DEADLINE: f"COALESCE(jobs.deadline, 1e18), {_REMAINING}, jobs.id",
+    POLICY_PRIORITY: f"jobs.priority DESC, {_REMAINING}, jobs.id",
+}
+
+def default_worker_id() -> str:
+    """ホスト名とプロセスIDからワーカー名を作成"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class QueueBackend(ABC):
+    """
+    ジョブキューのバックエンドの基底クラス
+
+    ワーカーは claim でジョブをリース付きで取り出し、処理中は renew でリースを延長し、
+    complete / fail で結果を書き戻す。期限が切れたリースのジョブは待機中に戻り、
+    他のワーカーが取り出す。別の保存先を使う場合はこのクラスを継承して
+    register_backend で登録する。
+    """
+
+    # チャンクなど、ワーカー間で受け渡すファイルを置くディレクトリ
+    shared_dir: str
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    @abstractmethod
+    def enqueue(self, path: str, priority: int = 0, deadline: Optional[float] = None,
+                duration: Optional[float] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def claim(self, worker: Optional[str] = None, lease_seconds: Optional[float] = None,
+              kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def renew(self, job_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: int, output: Optional[str] = None, worker: Optional[str] = None,
+                 audio_seconds: Optional[float] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: int, error: str, worker: Optional[str] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def split(self, job_id: int, chunks: List[Dict[str, Any]], worker: Optional[str] = None) -> List[int]:
+        ...
+
+    @abstractmethod
+    def relocate(self, old_path: str, new_path: str, size: int, mtime: float) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def complete_chunk(self, job_id: int, result: Optional[Dict[str, Any]], worker: Optional[str] = None,
+                       audio_seconds: Optional[float] = None,
+                       lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list_chunks(self, parent_id: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def requeue_running(self) -> int:
+        ...
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, worker: str) -> None:
+        ...
+
+    @abstractmethod
+    def worker_stats(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        ...
+
+class JobQueue(QueueBackend):
+    """
+    SQLiteに永続化される文字起こしジョブのキュー
+
+    複数のホストから共有ボリューム上の同じファイルを開いて使用できる。取り出しは
+    BEGIN IMMEDIATE のトランザクションで行うため、同じジョブが二重に取り出されることはない。
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, policy: str = POLICY_FIFO):
+        """
+        Parameters:
+        - db_path: キューを保存するSQLiteファイルのパス
+        - max_attempts: 失敗したジョブを再試行する最大回数
+        - policy: ジョブを取り出す順序の方針（scheduler.POLICIES のいずれか）
+        """
+        if policy not in _ORDER_BY:
+            raise ValueError(f"未対応のスケジューリング方針です: {policy}（対応: {', '.join(POLICIES)}）")
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.policy = policy
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.shared_dir = directory
+        # リースの延長はワーカーの別スレッドから行うため、接続をロックで保護して共有する
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.executescript(_INDEXES)
+
+    def _migrate(self) -> None:
+        """以前のバージョンで作成されたキューに不足している列を追加"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def close(self) -> None:
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """書き込みロックを取得したトランザクション"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """1つの更新文を実行し、変更した行数を返す"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """問い合わせを実行し、JSONの列を展開した辞書のリストを返す"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            for column in _JSON_COLUMNS:
+                if job.get(column) is not None:
+                    job[column] = json.loads(job[column])
+            jobs.append(job)
+        return jobs
+
+    def enqueue(self, path: str, priority: int = 0, deadline: Optional[float] = None,
+                duration: Optional[float] = None) -> bool:
+        """
+        音声ファイルをジョブとして登録
+
+        同じパス・サイズ・更新時刻のファイルは一度だけ登録される
+
+        Parameters:
+        - priority: 優先度（大きいほど先に処理する）
+        - deadline: 期限（UNIX時間）
+        - duration: 音声の長さ（秒）。省略時はヘッダーから求める
+
+        Returns:
+        - bool: 新しく登録された場合はTrue
+        """
+        stat = os.stat(path)
+        if duration is None:
+            duration = header_duration(path)
+        now = time.time()
+        return self._execute(
+            "INSERT OR IGNORE INTO jobs (path, size, mtime, status, duration, priority, deadline, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(path), stat.st_size, stat.st_mtime, STATUS_PENDING, duration, priority, deadline,
+             now, now)
+        ) == 1
+
+    def claim(self, worker: Optional[str] = None, lease_seconds: Optional[float] = None,
+              kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        待機中のジョブをキューの方針に従って1件取り出し、実行中にする
+
+        取り出す前に、リースの期限が切れたジョブを待機中に戻す
+
+        Parameters:
+        - worker: 取り出すワーカーの名前
+        - lease_seconds: リースの期間（秒）。省略時は期限なし（単一プロセスでの使用）
+        - kind: 指定した場合、その種類（KIND_FILE / KIND_CHUNK）のジョブだけを取り出す
+
+        Returns:
+        - Optional[Dict[str, Any]]: ジョブ。待機中のジョブがない場合はNone
+        """
+        now = time.time()
+        lease_expires = now + lease_seconds if lease_seconds else None
+        with self._transaction():
+            self._expire_leases(now)
+            where, params = "status = ?", (STATUS_PENDING,)
+            if kind is not None:
+                where, params = where + " AND kind = ?", params + (kind,)
+            rows = self._query(
+                f"SELECT * FROM jobs WHERE {where} ORDER BY {_ORDER_BY[self.policy]} LIMIT 1", params
+            )
+            if not rows:
+                return None
+            job = rows[0]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, lease_expires = ?, "
+                "started_at = ?, updated_at = ? WHERE id = ?",
+                (STATUS_RUNNING, worker, lease_expires, now, now, job["id"])
+            )
+            if worker is not None:
+                self._touch_worker(worker, now)
+        job.update(status=STATUS_RUNNING, attempts=job["attempts"] + 1, worker=worker,
+                   lease_expires=lease_expires, started_at=now)
+        return job
+
+    def renew(self, job_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """
+        ジョブのリースを延長
+
+        Returns:
+        - bool: 延長できた場合はTrue。期限切れで他のワーカーに移っていた場合はFalse
+        """
+        now = time.time()
+        with self._transaction():
+            renewed = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                (now + lease_seconds, now, job_id, STATUS_RUNNING, worker)
+            ).rowcount == 1
+            self._touch_worker(worker, now)
+        return renewed
+
+    def complete(self, job_id: int, output: Optional[str] = None, worker: Optional[str] = None,
+                 audio_seconds: Optional[float] = None) -> bool:
+        """
+        ジョブを完了にする
+
+        Parameters:
+        - worker: 指定した場合、そのワーカーがリースを保持しているときのみ完了にする
+        - audio_seconds: 処理した音声の長さ（秒、ワーカーごとのスループットの集計に使用）
+
+        Returns:
+        - bool: 完了にした場合はTrue
+        """
+        now = time.time()
+        sql = ("UPDATE jobs SET status = ?, output = ?, error = NULL, lease_expires = NULL, "
+               "finished_at = ?, audio_seconds = ?, updated_at = ? WHERE id = ?")
+        params = (STATUS_DONE, output, now, audio_seconds, now, job_id)
+        if worker is not None:
+            sql += " AND status = ? AND worker = ?"
+            params += (STATUS_RUNNING, worker)
+        return self._execute(sql, params) == 1
+
+    def fail(self, job_id: int, error: str, worker: Optional[str] = None) -> bool:
+        """
+        ジョブの失敗を記録
+
+        再試行回数が上限に達していない場合は待機中に戻す。チャンクジョブが失敗した場合は
+        元のファイルのジョブも失敗にする
+
+        Returns:
+        - bool: 記録した場合はTrue
+        """
+        now = time.time()
+        sql = ("UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+               "error = ?, lease_expires = NULL, finished_at = ?, updated_at = ? WHERE id = ?")
+        params = (self.max_attempts, STATUS_PENDING, STATUS_FAILED, error, now, now, job_id)
+        if worker is not None:
+            sql += " AND status = ? AND worker = ?"
+            params += (STATUS_RUNNING, worker)
+        with self._transaction():
+            failed = self._conn.execute(sql, params).rowcount == 1
+            self._propagate_failures(now)
+        return failed
+
+    def _expire_leases(self, now: float) -> int:
+        """リースの期限が切れたジョブを待機中（再試行の上限に達した場合は失敗）に戻す"""
+        expired = self._conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+            "error = 'リースの期限切れ（ワーカー: ' || COALESCE(worker, '') || '）', "
+            "worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires IS NOT NULL AND lease_expires < ?",
+            (self.max_attempts, STATUS_PENDING, STATUS_FAILED, now, STATUS_RUNNING, now)
+        ).rowcount
+        if expired:
+            self._propagate_failures(now)
+        return expired
+
+    def _propagate_failures(self, now: float) -> None:
+        """失敗したチャンクの親ジョブと、失敗した親ジョブの残りのチャンクを失敗にする"""
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = 'チャンクの文字起こしに失敗しました', updated_at = ? "
+            "WHERE status = ? AND id IN (SELECT parent_id FROM jobs WHERE kind = ? AND status = ?)",
+            (STATUS_FAILED, now, STATUS_SPLIT, KIND_CHUNK, STATUS_FAILED)
+        )
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = '元のファイルのジョブが失敗しました', updated_at = ? "
+            "WHERE kind = ? AND status = ? AND parent_id IN (SELECT id FROM jobs WHERE status = ?)",
+            (STATUS_FAILED, now, KIND_CHUNK, STATUS_PENDING, STATUS_FAILED)
+        )
+
+    def relocate(self, old_path: str, new_path: str, size: int, mtime: float) -> Optional[int]:
+        """
+        ファイルのジョブが参照する音声ファイルを new_path に移す（形式を変換して置き換えた場合など）
+
+        new_path のサイズ・更新時刻で記録し直すため、置き換えた後のファイルを登録し直しても重複しない。
+        実行中のジョブがあるかどうかの確認と更新は1つのトランザクションで行う。
+
+        Parameters:
+        - size: new_path のファイルサイズ（バイト）
+        - mtime: new_path の更新時刻
+
+        Returns:
+        - Optional[int]: 移したジョブの数。実行中のジョブが old_path を参照している場合は None（何も移さない）
+        """
+        old_path = os.path.abspath(old_path)
+        with self._transaction():
+            if self._query("SELECT id FROM jobs WHERE path = ? AND kind = ? AND status = ?",
+                           (old_path, KIND_FILE, STATUS_RUNNING)):
+                return None
+            return self._conn.execute(
+                "UPDATE OR IGNORE jobs SET path = ?, size = ?, mtime = ?, updated_at = ? WHERE path = ? AND kind = ?",
+                (os.path.abspath(new_path), size, mtime, time.time(), old_path, KIND_FILE)
+            ).rowcount
+
+    def split(self, job_id: int, chunks: List[Dict[str, Any]], worker: Optional[str] = None) -> List[int]:
+        """
+        ファイルのジョブをチャンクごとのジョブに分割
+
+        元のジョブは全てのチャンクが完了するまで STATUS_SPLIT で待機する。
+        チャンクジョブは元のジョブの優先度と期限を引き継ぐ
+
+        Parameters:
+        - chunks: split_audio_chunks が返したチャンク（path は共有ボリューム上のファイル）
+
+        Returns:
+        - List[int]: 登録したチャンクジョブのID。リースを失っていた場合は空のリスト
+        """
+        now = time.time()
+        ids = []
+        with self._transaction():
+            sql = "UPDATE jobs SET status = ?, lease_expires = NULL, updated_at = ? WHERE id = ?"
+            params = (STATUS_SPLIT, now, job_id)
+            if worker is not None:
+                sql += " AND status = ? AND worker = ?"
+                params += (STATUS_RUNNING, worker)
+            if self._conn.execute(sql, params).rowcount != 1:
+                return []
+            parent = self._conn.execute("SELECT priority, deadline FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            for chunk in chunks:
+                stat = os.stat(chunk["path"])
+                info = {key: value for key, value in chunk.items() if key != "path"}
+                duration = (chunk["end_sample"] - chunk["start_sample"]) / chunk["sample_rate"]
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (path, size, mtime, status, kind, parent_id, chunk, duration, priority, "
+                    "deadline, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (os.path.abspath(chunk["path"]), stat.st_size, stat.st_mtime, STATUS_PENDING,
+                     KIND_CHUNK, job_id, json.dumps(info), duration, parent["priority"], parent["deadline"],
+                     now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def complete_chunk(self, job_id: int, result: Optional[Dict[str, Any]], worker: Optional[str] = None,
+                       audio_seconds: Optional[float] = None,
+                       lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        チャンクジョブを完了にし、最後のチャンクであれば元のジョブを統合のために取り出す
+
+        Parameters:
+        - result: チャンクの文字起こし結果（segments と duration）。短すぎて送信しなかった場合はNone
+        - lease_seconds: 元のジョブを取り出す場合のリースの期間（秒）
+
+        Returns:
+        - Optional[Dict[str, Any]]: 統合を担当する元のジョブ。まだ残りのチャンクがある場合はNone
+        """
+        now = time.time()
+        sql = ("UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires = NULL, "
+               "finished_at = ?, audio_seconds = ?, updated_at = ? WHERE id = ? AND kind = ?")
+        params = (STATUS_DONE, json.dumps(result), now, audio_seconds, now, job_id, KIND_CHUNK)
+        if worker is not None:
+            sql += " AND status = ? AND worker = ?"
+            params += (STATUS_RUNNING, worker)
+        with self._transaction():
+            if self._conn.execute(sql, params).rowcount != 1:
+                return None
+            parent_id = self._conn.execute("SELECT parent_id FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE parent_id = ? AND status != ?", (parent_id, STATUS_DONE)
+            ).fetchone()[0]
+            if remaining:
+                return None
+            lease_expires = now + lease_seconds if lease_seconds else None
+            if self._conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, started_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (STATUS_RUNNING, worker, lease_expires, now, now, parent_id, STATUS_SPLIT)
+            ).rowcount != 1:
+                return None
+            return self._query("SELECT * FROM jobs WHERE id = ?", (parent_id,))[0]
+
+    def list_chunks(self, parent_id: int) -> List[Dict[str, Any]]:
+        """元のジョブに属するチャンクジョブの一覧を取得（チャンクの順）"""
+        chunks = self._query("SELECT * FROM jobs WHERE parent_id = ? ORDER BY id", (parent_id,))
+        return sorted(chunks, key=lambda job: job["chunk"]["index"])
+
+    def requeue_running(self) -> int:
+        """
+        実行中のまま残っているジョブ（前回のプロセスが異常終了した場合など）を待機中に戻す
+
+        リースの期限内のジョブは他のワーカーが処理中のため戻さない
+
+        Returns:
+        - int: 戻したジョブの数
+        """
+        now = time.time()
+        return self._execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+            (STATUS_PENDING, now, STATUS_RUNNING, now)
+        )
+
+    def requeue_expired(self) -> int:
+        """
+        リースの期限が切れたジョブを待機中に戻す
+
+        Returns:
+        - int: 戻したジョブ（再試行の上限に達して失敗にしたものを含む）の数
+        """
+        with self._transaction():
+            return self._expire_leases(time.time())
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """IDでジョブを取得"""
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """ジョブの一覧を取得（状態を指定した場合はその状態のみ）"""
+        if status is None:
+            return self._query("SELECT * FROM jobs ORDER BY id")
+        return self._query("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数を取得"""
+        rows = self._query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    def _touch_worker(self, worker: str, now: float) -> None:
+        self._conn.execute(
+            "INSERT INTO workers (name, host, pid, started_at, last_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET last_seen = excluded.last_seen",
+            (worker, socket.gethostname(), os.getpid(), now, now)
+        )
+
+    def heartbeat(self, worker: str) -> None:
+        """ワーカーが稼働中であることを記録"""
+        with self._transaction():
+            self._touch_worker(worker, time.time())
+
+    def worker_stats(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        ワーカーごとの処理実績を集計
+
+        Parameters:
+        - since: この時刻（UNIX時間）以降に更新されたジョブのみを集計する
+
+        Returns:
+        - List[Dict[str, Any]]: worker, host, last_seen, done, failed, running,
+          audio_seconds（完了したジョブの音声の長さ）, busy_seconds（完了したジョブの処理時間）,
+          first_started, last_finished を含む辞書のリスト（ワーカー名の順）
+        """
+        since = since or 0.0
+        rows = self._query(
+            "SELECT worker, "
+            "SUM(CASE WHEN status = ? THEN 1 ELSE 0 END) AS done, "
+            "SUM(CASE WHEN status = ? THEN 1 ELSE 0 END) AS failed, "
+            "SUM(CASE WHEN status = ? THEN 1 ELSE 0 END) AS running, "
+            "SUM(CASE WHEN status = ? THEN COALESCE(audio_seconds, 0) ELSE 0 END) AS audio_seconds, "
+            "SUM(CASE WHEN status = ? THEN finished_at - started_at ELSE 0 END) AS busy_seconds, "
+            "MIN(started_at) AS first_started, MAX(finished_at) AS last_finished "
+            "FROM jobs WHERE worker IS NOT NULL AND updated_at >= ? GROUP BY worker",
+            (STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, STATUS_DONE, STATUS_DONE, since)
+        )
+        stats = {row["worker"]: row for row in rows}
+        for worker in self._query("SELECT * FROM workers WHERE last_seen >= ?", (since,)):
+            row = stats.setdefault(worker["name"], {
+                "worker": worker["name"], "done": 0, "failed": 0, "running": 0,
+                "audio_seconds": 0.0, "busy_seconds": 0.0, "first_started": None, "last_finished": None
+            })
+            row.update(host=worker["host"], last_seen=worker["last_seen"])
+        for row in stats.values():
+            row.setdefault("host", None)
+            row.setdefault("last_seen", None)
+        return [stats[name] for name in sorted(stats)]
+
+# URLのスキームごとのバックエンド
+_BACKENDS: Dict[str, Callable[..., QueueBackend]] = {"sqlite": JobQueue}
+
+def register_backend(scheme: str, factory: Callable[..., QueueBackend]) -> None:
+    """
+    ジョブキューのバックエンドを登録
+
+    Parameters:
+    - scheme: open_queue に渡す場所のスキーム（例: "redis" なら "redis://..."）
+    - factory: スキームを除いた場所と open_queue のキーワード引数を受け取り、QueueBackend を返す関数
+    """
+    _BACKENDS[scheme] = factory
+
+def open_queue(location: str, **kwargs) -> QueueBackend:
+    """
+    場所を指定してジョブキューを開く
+
+    Parameters:
+    - location: "sqlite:///path/to/queue.sqlite3" のようなURL、またはSQLiteファイルのパス
+
+    Returns:
+    - QueueBackend: ジョブキュー
+    """
+    scheme, separator, rest = location.partition("://")
+    if not separator:
+        return JobQueue(location, **kwargs)
+    factory = _BACKENDS.get(scheme)
+    if factory is None:
+        raise ValueError(f"未対応のジョブキューです: {scheme}（対応: {', '.join(sorted(_BACKENDS))}）")
+    return factory(rest, **kwargs)
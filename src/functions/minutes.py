@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 1ウィンドウに含める文字起こしのトークン数の上限
+DEFAULT_WINDOW_TOKENS = 3000
+
+# 1回の統合に渡す部分要約のトークン数の上限と件数の上限
+DEFAULT_REDUCE_TOKENS = 3000
+DEFAULT_FAN_IN = 4
+
+# 同時に実行する要約の数
+DEFAULT_CONCURRENCY = 4
+
+# OpenAIで使用するモデル
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# ウィンドウを内容で区切る頻度（平均で何行に1回区切り候補にするか）。
+# 行の内容だけで区切り位置が決まるため、一部を編集しても前後のウィンドウの境界は変わらない
+BOUNDARY_MODULUS = 8
+
+# プロンプトを変更したらキャッシュを無効にするため更新する
+PROMPT_VERSION = 1
+
+# 要約結果のキャッシュのファイル名
+MINUTES_CACHE_FILENAME = ".minutes_cache.sqlite3"
+
+# 1行あたりのタイムスタンプ（[HH:MM:SS]）のトークン数
+_TIMESTAMP_TOKENS = 4
+
+# 文字起こし結果の行（[HH:MM:SS] 発言内容）
+_LINE_PATTERN = re.compile(r"^\[(\d+):(\d{2}):(\d{2})\]\s?(.*)$")
+
+# 文字起こし結果の末尾のAPI使用情報の区切り
+_USAGE_SEPARATOR = "=" * 50
+
+MAP_INSTRUCTIONS = """あなたは会議の議事録を作成するアシスタントです。
+以下は会議の文字起こしの一部です（各行は [HH:MM:SS] 発言内容）。
+この部分について、次のキーを持つJSONオブジェクトだけを出力してください。
+- "summary": 議論の要約（日本語、3文程度）
+- "decisions": 決定事項のリスト（各要素は "[HH:MM:SS] 内容" の文字列）
+- "action_items": アクションアイテムのリスト（各要素は "[HH:MM:SS] 担当者: 内容（期限）" の文字列、不明な項目は省略）
+該当がない場合は空のリストにしてください。"""
+
+REDUCE_INSTRUCTIONS = """あなたは会議の議事録を作成するアシスタントです。
+以下は会議を時間順に区切って作成した部分ごとの議事録（JSONの配列）です。
+これらを1つに統合し、次のキーを持つJSONオブジェクトだけを出力してください。
+- "summary": 会議全体の要約（日本語、5文程度）
+- "decisions": 決定事項のリスト（重複をまとめ、時刻順。各要素は "[HH:MM:SS] 内容"）
+- "action_items": アクションアイテムのリスト（重複をまとめ、時刻順。各要素は "[HH:MM:SS] 担当者: 内容（期限）"）"""
+
+def format_time(seconds: float) -> str:
+    """秒数を HH:MM:SS 形式にする"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を見積もる
+
+    日本語などASCII以外の文字は1文字1トークン、ASCII文字は4文字で1トークンとみなす
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return len(text) - ascii_chars + math.ceil(ascii_chars / 4)
+
+def parse_transcript(text: str) -> List[Dict[str, Any]]:
+    """
+    文字起こし結果のテキストを行に分ける（末尾のAPI使用情報は除く）
+
+    Returns:
+    - List[Dict[str, Any]]: start（秒）と text を持つ辞書のリスト
+    """
+    lines = []
+    for raw in text.split(_USAGE_SEPARATOR)[0].splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        match = _LINE_PATTERN.match(raw)
+        if match:
+            hours, minutes, seconds, content = match.groups()
+            lines.append({"start": int(hours) * 3600 + int(minutes) * 60 + int(seconds), "text": content})
+        elif lines:
+            # タイムスタンプのない行は直前の発言の続きとして扱う
+            lines[-1]["text"] += raw
+    return lines
+
+def _is_boundary(text: str) -> bool:
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % BOUNDARY_MODULUS == 0
+
+def split_windows(lines: List[Dict[str, Any]], max_tokens: int = DEFAULT_WINDOW_TOKENS) -> List[Dict[str, Any]]:
+    """
+    文字起こしの行をトークン数の上限以下のウィンドウに分ける
+
+    上限の半分を超えた後は、内容から決まる区切り候補の行で区切る。
+    区切り位置が前後の行の長さに依存しないため、一部を編集しても他のウィンドウは変わらず、
+    キャッシュした要約をそのまま使える。
+
+    Returns:
+    - List[Dict[str, Any]]: index, start, end（秒）, text（[HH:MM:SS] 形式の行）, tokens を持つ辞書のリスト
+    """
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    tokens = 0
+    for line in lines:
+        line_tokens = estimate_tokens(line["text"]) + _TIMESTAMP_TOKENS
+        if current and tokens + line_tokens > max_tokens:
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(line)
+        tokens += line_tokens
+        if tokens >= max_tokens // 2 and _is_boundary(line["text"]):
+            groups.append(current)
+            current, tokens = [], 0
+    if current:
+        groups.append(current)
+
+    windows = []
+    for index, group in enumerate(groups):
+        text = "\n".join(f"[{format_time(line['start'])}] {line['text']}" for line in group)
+        windows.append({"index": index, "start": group[0]["start"], "end": group[-1]["start"],
+                        "text": text, "tokens": estimate_tokens(text)})
+    return windows
+
+def normalize_minutes(data: Dict[str, Any]) -> Dict[str, Any]:
+    """言語モデルの出力を summary, decisions, action_items を持つ辞書に整える"""
+    def as_list(value: Any) -> List[str]:
+        if not value:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    summary = data.get("summary") or ""
+    if isinstance(summary, list):
+        summary = "\n".join(str(item) for item in summary)
+    return {
+        "summary": str(summary).strip(),
+        "decisions": as_list(data.get("decisions")),
+        "action_items": as_list(data.get("action_items")),
+    }
+
+class MinutesBackend(ABC):
+    """
+    議事録の要約に使用する言語モデルの基底クラス
+
+    ウィンドウごとの要約（summarize）と部分要約の統合（merge）を実装し、
+    register_minutes_backend で登録する。
+    """
+
+    @abstractmethod
+    def cache_id(self) -> str:
+        """キャッシュのキーに含める識別子（モデルが変われば要約をやり直す）"""
+
+    @abstractmethod
+    def summarize(self, window_text: str) -> Dict[str, Any]:
+        """文字起こしの一部を要約する（summary, decisions, action_items を持つ辞書を返す）"""
+
+    @abstractmethod
+    def merge(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """時間順の部分要約を1つに統合する"""
+
+class OpenAIMinutesBackend(MinutesBackend):
+    """OpenAIのChat Completions APIで要約するバックエンド"""
+
+    def __init__(self, model: str = DEFAULT_MODEL, client: Any = None):
+        """
+        Parameters:
+        - model: 使用するモデル
+        - client: OpenAIクライアント（省略時は文字起こしと同じ接続設定で作成）
+        """
+        if client is None:
+            from src.functions.http_client import create_client
+            client = create_client()
+        self.model = model
+        self.client = client
+
+    def cache_id(self) -> str:
+        return f"openai:{self.model}"
+
+    def _complete(self, instructions: str, content: str) -> Dict[str, Any]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "system", "content": instructions}, {"role": "user", "content": content}],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+        text = response.choices[0].message.content
+        try:
+            return normalize_minutes(json.loads(text))
+        except (TypeError, ValueError):
+            raise ValueError(f"言語モデルの出力をJSONとして読み込めません: {text!r:.200}")
+
+    def summarize(self, window_text: str) -> Dict[str, Any]:
+        return self._complete(MAP_INSTRUCTIONS, window_text)
+
+    def merge(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._complete(REDUCE_INSTRUCTIONS, json.dumps(partials, ensure_ascii=False))
+
+class StubMinutesBackend(MinutesBackend):
+    """
+    言語モデルを使わずに規則で要約するローカルのバックエンド（テストとオフラインでの動作確認用）
+
+    決まった表現を含む発言を決定事項・アクションアイテムとして抜き出す。同じ入力には常に同じ結果を返す。
+    """
+
+    DECISION_PATTERN = re.compile(r"決定|決まり|決めます|合意|承認|採用")
+    ACTION_PATTERN = re.compile(r"お願いします|対応します|やります|までに|TODO", re.IGNORECASE)
+
+    # 要約に使用する先頭の発言の文字数（タイムスタンプを含む）
+    SUMMARY_CHARS = 50
+
+    def cache_id(self) -> str:
+        return "stub"
+
+    def summarize(self, window_text: str) -> Dict[str, Any]:
+        lines = window_text.splitlines()
+        first = lines[0] if lines else ""
+        return {
+            "summary": first[:self.SUMMARY_CHARS],
+            "decisions": [line for line in lines if self.DECISION_PATTERN.search(line)],
+            "action_items": [line for line in lines if self.ACTION_PATTERN.search(line)],
+        }
+
+    def merge(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        def unique(items: List[str]) -> List[str]:
+            return list(dict.fromkeys(items))
+        return {
+            "summary": "\n".join(partial["summary"] for partial in partials if partial["summary"]),
+            "decisions": unique([item for partial in partials for item in partial["decisions"]]),
+            "action_items": unique([item for partial in partials for item in partial["action_items"]]),
+        }
+
+_BACKENDS: Dict[str, Callable[..., MinutesBackend]] = {
+    "openai": lambda **kwargs: OpenAIMinutesBackend(**kwargs),
+    "stub": lambda **kwargs: StubMinutesBackend(),
+}
+
+def register_minutes_backend(name: str, factory: Callable[..., MinutesBackend]) -> None:
+    """
+    議事録のバックエンドを登録
+
+    Parameters:
+    - name: open_minutes_backend に渡す名前
+    - factory: open_minutes_backend のキーワード引数を受け取り、MinutesBackend を返す関数
+    """
+    _BACKENDS[name] = factory
+
+def minutes_backends() -> List[str]:
+    """登録されているバックエンドの名前"""
+    return sorted(_BACKENDS)
+
+def open_minutes_backend(name: str, **kwargs) -> MinutesBackend:
+    """名前を指定してバックエンドを作成"""
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"未対応の議事録バックエンドです: {name}（対応: {', '.join(minutes_backends())}）")
+    return factory(**kwargs)
+
+class MinutesCache:
+    """ウィンドウごとの要約と統合結果をSQLiteに保存するキャッシュ（複数スレッドから使用できる）"""
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(kind: str, backend: MinutesBackend, content: str) -> str:
+        """入力の内容・処理の種類・バックエンドから決まるキー"""
+        source = f"{PROMPT_VERSION}\0{kind}\0{backend.cache_id()}\0{content}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False), time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+class MinutesGenerator:
+    """
+    長い文字起こしから議事録を作成する
+
+    文字起こしをトークン数の上限以下のウィンドウに分けて並行して要約し（map）、
+    部分要約を上限以下のまとまりごとに段階的に統合する（reduce）。
+    要約と統合の結果は入力の内容をキーにキャッシュするため、文字起こしの一部を編集した場合は
+    変わったウィンドウとそれを含む統合だけをやり直す。
+    """
+
+    def __init__(self, backend: MinutesBackend, cache: Optional[MinutesCache] = None,
+                 window_tokens: int = DEFAULT_WINDOW_TOKENS, reduce_tokens: int = DEFAULT_REDUCE_TOKENS,
+                 fan_in: int = DEFAULT_FAN_IN, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Parameters:
+        - backend: 要約に使用するバックエンド
+        - cache: 要約結果のキャッシュ（Noneの場合は毎回要約する）
+        - window_tokens: 1ウィンドウのトークン数の上限
+        - reduce_tokens: 1回の統合に渡す部分要約のトークン数の上限
+        - fan_in: 1回の統合に渡す部分要約の件数の上限（2以上）
+        - concurrency: 同時に実行する要約の数
+        """
+        self.backend = backend
+        self.cache = cache
+        self.window_tokens = window_tokens
+        self.reduce_tokens = reduce_tokens
+        self.fan_in = max(2, fan_in)
+        self.concurrency = max(1, concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats = {"windows": 0, "summarized": 0, "merged": 0, "cached": 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _cached(self, kind: str, content: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        key = MinutesCache.key(kind, self.backend, content)
+        if self.cache is not None:
+            value = self.cache.get(key)
+            if value is not None:
+                self._count("cached")
+                return value
+        value = compute()
+        if self.cache is not None:
+            self.cache.put(key, value)
+        return value
+
+    def _summarize(self, window: Dict[str, Any]) -> Dict[str, Any]:
+        def compute():
+            self._count("summarized")
+            return normalize_minutes(self.backend.summarize(window["text"]))
+        partial = self._cached("map", window["text"], compute)
+        return dict(partial, start=window["start"], end=window["end"])
+
+    def _merge(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        content = json.dumps(partials, ensure_ascii=False, sort_keys=True)
+
+        def compute():
+            self._count("merged")
+            return normalize_minutes(self.backend.merge(partials))
+        merged = self._cached("reduce", content, compute)
+        return dict(merged, start=partials[0]["start"], end=partials[-1]["end"])
+
+    def _group(self, partials: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """時間順の部分要約を、トークン数と件数の上限以下のまとまりに分ける（1回の統合で最低2件は減らす）"""
+        groups: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        tokens = 0
+        for partial in partials:
+            partial_tokens = estimate_tokens(json.dumps(partial, ensure_ascii=False))
+            if len(current) >= 2 and (tokens + partial_tokens > self.reduce_tokens or len(current) >= self.fan_in):
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(partial)
+            tokens += partial_tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def generate(self, transcript: str) -> Dict[str, Any]:
+        """
+        文字起こしのテキストから議事録を作成
+
+        Returns:
+        - Dict[str, Any]: summary, decisions, action_items, start, end を持つ辞書
+        """
+        windows = split_windows(parse_transcript(transcript), self.window_tokens)
+        if not windows:
+            raise ValueError("文字起こしに発言がありません")
+        self.stats["windows"] += len(windows)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            level = list(executor.map(self._summarize, windows))
+            while len(level) > 1:
+                level = list(executor.map(self._merge, self._group(level)))
+        return level[0]
+
+def format_minutes(minutes: Dict[str, Any], title: str) -> str:
+    """議事録をMarkdownにする"""
+    lines = [f"# 議事録: {title}", "", f"対象: {format_time(minutes['start'])} 〜 {format_time(minutes['end'])}", "",
+             "## 要約", "", minutes["summary"] or "（なし）", "", "## 決定事項", ""]
+    lines += [f"- {item}" for item in minutes["decisions"]] or ["（なし）"]
+    lines += ["", "## アクションアイテム", ""]
+    lines += [f"- {item}" for item in minutes["action_items"]] or ["（なし）"]
+    return "\n".join(lines) + "\n"
+
+def write_minutes(transcript_path: str, output_dir: str, generator: MinutesGenerator) -> Path:
+    """
+    文字起こし結果のファイルから議事録を作成して保存
+
+    Returns:
+    - Path: 出力ファイル（<出力ディレクトリ>/<元のファイル名>_minutes.md）のパス
+    """
+    transcript_path = Path(transcript_path)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    minutes = generator.generate(transcript_path.read_text(encoding="utf-8"))
+    output_file = output_path / f"{transcript_path.stem}_minutes.md"
+    output_file.write_text(format_minutes(minutes, transcript_path.stem), encoding="utf-8")
+    return output_file
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+"""
+Whisper API（/v1/audio/transcriptions）のローカルモックサーバー
+
+音声の長さから決定的なセグメントを返し、遅延・帯域制限・429/5xxエラー・同時接続数の上限を
+設定できる。APIキーやネットワーク接続なしで、アップロードを含む文字起こし経路の動作確認や
+スループットの計測に使用する。
+
+    python -m src.functions.mock_whisper --port 8000 --latency 0.5 --bandwidth 2000000
+    python -m src.functions.transcribe -f recording.wav --base-url http://127.0.0.1:8000/v1
+"""
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from email.parser import Parser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+import soundfile as sf
+
+# 生成するセグメントの長さ（秒）
+DEFAULT_SEGMENT_SECONDS = 5.0
+
+# 長さを判別できない形式の音声に仮定するビットレート（bps）
+FALLBACK_BITRATE = 128000
+
+# 帯域制限時にリクエスト本文を読み込む単位（バイト）
+_READ_SIZE = 64 * 1024
+
+def audio_duration(data: bytes) -> float:
+    """
+    アップロードされた音声の長さ（秒）を求める
+
+    WAV/FLACなどlibsndfileで読める形式はヘッダーから、それ以外はpydub（ffmpeg）で、
+    どちらも使えない場合はサイズと既定のビットレートから推定する
+    """
+    try:
+        return sf.info(io.BytesIO(data)).duration
+    except Exception:
+        pass
+    try:
+        from pydub import AudioSegment
+        return len(AudioSegment.from_file(io.BytesIO(data))) / 1000.0
+    except Exception:
+        return len(data) * 8 / FALLBACK_BITRATE
+
+def build_segments(duration: float, segment_seconds: float = DEFAULT_SEGMENT_SECONDS) -> List[Dict[str, Any]]:
+    """音声の長さから一定間隔のセグメントを作成する（同じ長さなら常に同じ結果）"""
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        index = len(segments)
+        segments.append({
+            "id": index, "seek": int(start * 100), "start": round(start, 3), "end": round(end, 3),
+            "text": f"セグメント{index + 1}（{start:.1f}秒から{end:.1f}秒）",
+            "tokens": [], "temperature": 0.0, "avg_logprob": -0.2,
+            "compression_ratio": 1.0, "no_speech_prob": 0.0,
+        })
+        start = end
+    return segments
+
+class MockWhisperConfig:
+    """モックサーバーの応答特性"""
+
+    def __init__(self, latency: float = 0.0, latency_per_audio_second: float = 0.0,
+                 bandwidth: Optional[float] = None, rate_limit_rate: float = 0.0,
+                 server_error_rate: float = 0.0, server_error_status: int = 500,
+                 retry_after: float = 1.0, max_concurrency: Optional[int] = None,
+                 queue_over_limit: bool = False, segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+                 seed: int = 0):
+        """
+        Parameters:
+        - latency: 応答までの固定の遅延（秒）
+        - latency_per_audio_second: 音声1秒あたりに加える遅延（秒、処理時間の模擬）
+        - bandwidth: リクエスト本文の受信速度の上限（バイト/秒、接続ごと）。Noneの場合は無制限
+        - rate_limit_rate: 429を返す確率
+        - server_error_rate: 5xxを返す確率
+        - server_error_status: 返す5xxのステータスコード
+        - retry_after: 429/5xxで返すRetry-Afterヘッダー（秒）
+        - max_concurrency: 同時に処理するリクエスト数の上限。Noneの場合は無制限
+        - queue_over_limit: 上限を超えたリクエストを待たせる（Falseの場合は429を返す）
+        - segment_seconds: 生成するセグメントの長さ（秒）
+        - seed: エラーを注入する乱数のシード
+        """
+        self.latency = latency
+        self.latency_per_audio_second = latency_per_audio_second
+        self.bandwidth = bandwidth
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.server_error_status = server_error_status
+        self.retry_after = retry_after
+        self.max_concurrency = max_concurrency
+        self.queue_over_limit = queue_over_limit
+        self.segment_seconds = segment_seconds
+        self.seed = seed
+
+class MockWhisperStats:
+    """モックサーバーが受け付けたリクエストの集計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_received = 0
+        self.audio_seconds = 0.0
+        self.active = 0
+        self.peak_concurrency = 0
+        self.status_counts: Dict[int, int] = {}
+
+    def begin(self) -> None:
+        """同時接続数の枠を得て処理を開始した"""
+        with self._lock:
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+
+    def end(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def record(self, status: int, received: int = 0, audio_seconds: float = 0.0) -> None:
+        """応答したリクエストを集計"""
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += received
+            self.audio_seconds += audio_seconds
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """現在の集計値を取得"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_received": self.bytes_received,
+                "audio_seconds": self.audio_seconds,
+                "peak_concurrency": self.peak_concurrency,
+                "status_counts": dict(self.status_counts),
+            }
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """
+    multipart/form-data を解析する
+
+    ヘッダー部分だけをemailパッケージで解析し、本文は境界文字列で切り出す
+    （数十MBの音声でもコピー以上の処理をしないため）
+
+    Returns:
+    - Dict[str, Tuple[Optional[str], bytes]]: フィールド名 -> (ファイル名, 内容)
+    """
+    boundary = Parser(policy=HTTP).parsestr(f"Content-Type: {content_type}\r\n\r\n").get_param("boundary")
+    if not boundary:
+        return {}
+    fields = {}
+    for part in body.split(b"--" + boundary.encode("latin-1"))[1:]:
+        if part.startswith(b"--"):
+            break
+        header_end = part.find(b"\r\n\r\n")
+        if header_end < 0:
+            continue
+        headers = Parser(policy=HTTP).parsestr(part[:header_end].lstrip(b"\r\n").decode("utf-8", "replace"))
+        content = part[header_end + 4:]
+        if content.endswith(b"\r\n"):
+            content = content[:-2]
+        name = headers.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = (headers.get_filename(), content)
+    return fields
+
+# 応答（ステータスコード, 本文, Content-Type, 追加のヘッダー）
+_Response = Tuple[int, bytes, str, Dict[str, str]]
+
+def _json(status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> _Response:
+    return status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json", headers or {}
+
+def _error(status: int, message: str, error_type: str,
+           headers: Optional[Dict[str, str]] = None) -> _Response:
+    """OpenAI APIと同じ形式のエラー応答を作成"""
+    return _json(status, {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+                 headers)
+
+class _TranscriptionHandler(BaseHTTPRequestHandler):
+    """/v1/audio/transcriptions を処理するハンドラ"""
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, length: int) -> bytes:
+        """リクエスト本文を読み込む（帯域制限がある場合は受信速度を抑える）"""
+        bandwidth = self.server.config.bandwidth
+        if not bandwidth:
+            return self.rfile.read(length)
+        chunks = []
+        received = 0
+        start = time.monotonic()
+        while received < length:
+            chunk = self.rfile.read(min(_READ_SIZE, length - received))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+            wait = received / bandwidth - (time.monotonic() - start)
+            if wait > 0:
+                time.sleep(wait)
+        return b"".join(chunks)
+
+    def _transcribe(self, length: int) -> Tuple[_Response, int, float]:
+        """
+        リクエストを処理して応答を作成する
+
+        Returns:
+        - Tuple[_Response, int, float]: (応答, 受信したバイト数, 音声の長さ)
+        """
+        server = self.server
+        config = server.config
+        retry_headers = {"Retry-After": str(config.retry_after)}
+
+        # 同時接続数の上限（超えた場合は待たせるか429を返す）
+        if server.slots is not None and not server.slots.acquire(blocking=config.queue_over_limit):
+            self.rfile.read(length)
+            return _error(429, "Too many concurrent requests", "rate_limit_error", retry_headers), length, 0.0
+        server.stats.begin()
+        try:
+            body = self._read_body(length)
+
+            # エラーの注入（本文を受信した後に判定し、アップロードの負荷は常に発生させる）
+            fault = server.draw_fault()
+            if fault == 429:
+                return _error(429, "Rate limit reached", "rate_limit_error", retry_headers), len(body), 0.0
+            if fault is not None:
+                return _error(fault, "The server had an error while processing your request",
+                              "server_error", retry_headers), len(body), 0.0
+
+            fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+            if "file" not in fields:
+                return _error(400, "Missing file", "invalid_request_error"), len(body), 0.0
+            duration = audio_duration(fields["file"][1])
+            delay = config.latency + config.latency_per_audio_second * duration
+            if delay > 0:
+                time.sleep(delay)
+
+            segments = build_segments(duration, config.segment_seconds)
+            text = "".join(segment["text"] for segment in segments)
+            response_format = fields.get("response_format", (None, b"json"))[1].decode()
+            language = fields.get("language", (None, b""))[1].decode() or "japanese"
+            if response_format == "verbose_json":
+                payload = {"task": "transcribe", "language": language, "duration": duration,
+                           "text": text, "segments": segments}
+            elif response_format == "text":
+                return (200, text.encode("utf-8"), "text/plain; charset=utf-8", {}), len(body), duration
+            else:
+                payload = {"text": text}
+            return _json(200, payload), len(body), duration
+        finally:
+            server.stats.end()
+            if server.slots is not None:
+                server.slots.release()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if self.path.rstrip("/") != "/v1/audio/transcriptions":
+            self.rfile.read(length)
+            self._send(*_error(404, f"Unknown path: {self.path}", "invalid_request_error"))
+            return
+
+        # 集計は応答を返す前に確定させる（応答を受け取った時点で参照できるように）
+        try:
+            response, received, duration = self._transcribe(length)
+        except Exception as e:
+            response, received, duration = _error(500, str(e), "server_error"), 0, 0.0
+        self.server.stats.record(response[0], received, duration if response[0] == 200 else 0.0)
+        self._send(*response)
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockWhisperConfig):
+        super().__init__(address, _TranscriptionHandler)
+        self.config = config
+        self.stats = MockWhisperStats()
+        self.slots = threading.BoundedSemaphore(config.max_concurrency) if config.max_concurrency else None
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+
+    def draw_fault(self) -> Optional[int]:
+        """注入するエラーのステータスコードを決める（エラーなしの場合はNone）"""
+        with self._random_lock:
+            value = self._random.random()
+        if value < self.config.rate_limit_rate:
+            return 429
+        if value < self.config.rate_limit_rate + self.config.server_error_rate:
+            return self.config.server_error_status
+        return None
+
+class MockWhisperServer:
+    """バックグラウンドのスレッドで動作するモックサーバー"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[MockWhisperConfig] = None):
+        """
+        Parameters:
+        - host: 待ち受けるアドレス
+        - port: 待ち受けるポート（0の場合は空いているポート）
+        - config: 応答特性（省略時は遅延・エラーなし）
+        """
+        self._server = _MockHTTPServer((host, port), config or MockWhisperConfig())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """OpenAIクライアントに指定するベースURL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def stats(self) -> MockWhisperStats:
+        return self._server.stats
+
+    def start(self) -> "MockWhisperServer":
+        # 停止を待つ時間を短くするため、停止要求の確認間隔を短くする
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,),
+                                        name="mock-whisper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        """現在のスレッドで待ち受ける（Ctrl+Cで終了）"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self) -> "MockWhisperServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper APIのローカルモックサーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けるポート")
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの固定の遅延（秒）")
+    parser.add_argument("--latency-per-second", type=float, default=0.0,
+                        help="音声1秒あたりに加える遅延（秒）")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="接続ごとの受信速度の上限（バイト/秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429を返す確率")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="5xxを返す確率")
+    parser.add_argument("--server-error-status", type=int, default=500, help="返す5xxのステータスコード")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="同時に処理するリクエスト数の上限")
+    parser.add_argument("--queue", action="store_true",
+                        help="上限を超えたリクエストを429にせず待たせる")
+    parser.add_argument("--seed", type=int, default=0, help="エラーを注入する乱数のシード")
+    args = parser.parse_args()
+
+    config = MockWhisperConfig(
+        latency=args.latency,
+        latency_per_audio_second=args.latency_per_second,
+        bandwidth=args.bandwidth,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        server_error_status=args.server_error_status,
+        max_concurrency=args.max_concurrency,
+        queue_over_limit=args.queue,
+        seed=args.seed
+    )
+    server = MockWhisperServer(args.host, args.port, config)
+    print(f"モックサーバーを起動しました: {server.base_url}")
+    print("Ctrl+Cで終了")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nモックサーバーを終了します...")
+
+if __name__ == "__main__":
+    main()
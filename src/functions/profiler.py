@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# サンプリングの間隔（秒）。1回のサンプリングは0.1ミリ秒程度のため、50Hzでは常時有効にしても負荷は0.5%程度
+DEFAULT_INTERVAL = 0.02
+
+# 出力形式（speedscope のJSON / flamegraph.pl などで読める collapsed stack）
+FORMATS = ("speedscope", "collapsed")
+DEFAULT_FORMAT = "speedscope"
+
+# 記録するスタックの深さの上限
+MAX_DEPTH = 128
+
+# 最も内側のフレームがこれらのファイルにあるスレッドは待機中とみなして記録しない（ロック・キューの待ち）
+IDLE_FILES = ("threading.py", "queue.py")
+
+# ステージの指定がない間の、プロファイルを開始したスレッドのステージ名
+OTHER_STAGE = "other"
+
+# スレッドごとの現在のステージ（サンプリングするスレッドから読むため、スレッドIDをキーにする）
+_stages: Dict[int, str] = {}
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    このスレッドの処理をパイプラインのステージ name として記録する
+
+    プロファイル中でなくても呼び出せる（辞書を1回更新するだけ）。入れ子にした場合は内側のステージになる。
+    """
+    ident = threading.get_ident()
+    previous = _stages.get(ident)
+    _stages[ident] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            _stages.pop(ident, None)
+        else:
+            _stages[ident] = previous
+
+def staged(name: str, items: Iterable[Any]) -> Iterator[Any]:
+    """items の各要素を取り出す間だけ、取り出すスレッドのステージを name にする（ジェネレーターの外には持ち越さない）"""
+    iterator = iter(items)
+    try:
+        while True:
+            with stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+def _short_path(path: str) -> str:
+    """フレームのファイル名を、作業ディレクトリまたは site-packages からの相対パスにする"""
+    marker = "site-packages" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    cwd = os.getcwd() + os.sep
+    if path.startswith(cwd):
+        return path[len(cwd):]
+    return path
+
+class CpuProfiler:
+    """
+    ステージごとの処理時間をサンプリングで計測し、ファイルごとにプロファイルを書き出すクラス
+
+    プロファイル中はバックグラウンドのスレッドが interval 秒ごとに、stage() でステージを指定したスレッドの
+    スタックを取得する（計測対象のコードには手を加えないため、オーバーヘッドはサンプリングのみ）。
+    サンプルはステージ名を根とするスタックとして集計する。待機中（ロック・キューの待ち）のスレッドは除くが、
+    通信の待ちはそのステージの時間として含まれる（CPU時間ではなく経過時間のサンプリング）。
+    プロセスプールの子プロセスでの処理は、結果を待つスレッドの待ち時間として現れる。
+    """
+
+    def __init__(self, output_dir: str, fmt: str = DEFAULT_FORMAT, interval: float = DEFAULT_INTERVAL):
+        """
+        Parameters:
+        - output_dir: プロファイルの出力ディレクトリ
+        - fmt: 出力形式（speedscope / collapsed）
+        - interval: サンプリングの間隔（秒）
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"不明なプロファイルの形式です: {fmt}（{' / '.join(FORMATS)}）")
+        if interval <= 0:
+            raise ValueError(f"サンプリングの間隔は正の値にしてください: {interval}")
+        self.output_dir = output_dir
+        self.format = fmt
+        self.interval = interval
+        self._lock = threading.Lock()
+        # プロファイル中のスレッド（同じスレッドからの呼び出しのみ入れ子として外側に含める）
+        self._owner: Optional[int] = None
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """
+        ブロックの実行中をサンプリングし、終了時に name のプロファイルを書き出す
+
+        同じスレッドで既にプロファイル中の場合（ディレクトリの処理から呼ばれたファイルの処理など）は外側の
+        プロファイルに含める。サンプリングはステージを指定した全てのスレッドが対象で、同時に処理している
+        ファイルのサンプルを分けられないため、他のスレッドがプロファイル中の場合は計測せずに実行する。
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            owner = self._owner
+            if owner is None:
+                self._owner = ident
+        if owner is not None:
+            if owner != ident:
+                print(f"CPUプロファイル: 他のファイルを計測中のため {name} は計測しません")
+            yield
+            return
+        sampler = _Sampler(self.interval)
+        try:
+            with stage(_stages.get(threading.get_ident(), OTHER_STAGE)):
+                sampler.start()
+                try:
+                    yield
+                finally:
+                    sampler.stop()
+            path = self.write(name, sampler)
+            print(format_summary(path, sampler.summary()))
+        finally:
+            with self._lock:
+                self._owner = None
+
+    def write(self, name: str, sampler: "_Sampler") -> str:
+        """
+        サンプリングの結果を書き出す
+
+        Returns:
+        - str: 出力ファイルのパス
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.format == "collapsed":
+            path = os.path.join(self.output_dir, f"{name}.collapsed.txt")
+            content = to_collapsed(sampler.stacks)
+        else:
+            path = os.path.join(self.output_dir, f"{name}.speedscope.json")
+            content = json.dumps(to_speedscope(name, sampler.stacks, sampler.elapsed), ensure_ascii=False)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+# (関数名, ファイル, 行番号)。ステージは関数名を "[ステージ名]"、ファイルを空にした根のフレームで表す
+Frame = Tuple[str, str, int]
+
+class _Sampler(threading.Thread):
+    """ステージを指定したスレッドのスタックを一定間隔で集計するスレッド"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="cpu-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Dict[Tuple[Frame, ...], float] = defaultdict(float)
+        self.samples = 0
+        self.cost = 0.0
+        self.elapsed = 0.0
+        self._stop_event = threading.Event()
+        self._labels: Dict[Any, Frame] = {}
+
+    def _label(self, code) -> Frame:
+        label = self._labels.get(code)
+        if label is None:
+            label = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+            self._labels[code] = label
+        return label
+
+    def run(self) -> None:
+        started = previous = time.perf_counter()
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            # 前回からの経過時間を重みにする（サンプリングが遅れた分も正しく数える）
+            weight = now - previous
+            previous = now
+            frames = sys._current_frames()
+            for ident, name in list(_stages.items()):
+                frame = frames.get(ident)
+                if ident == own or frame is None or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append((f"[{name}]", "", 0))
+                self.stacks[tuple(reversed(stack))] += weight
+                self.samples += 1
+            del frames
+            self.cost += time.perf_counter() - now
+        self.elapsed = time.perf_counter() - started
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def summary(self) -> Dict[str, Any]:
+        """ステージごとの時間（秒）・サンプル数・サンプリングの負荷（経過時間に対する割合）"""
+        stages: Dict[str, float] = defaultdict(float)
+        for stack, seconds in self.stacks.items():
+            stages[stack[0][0].strip("[]")] += seconds
+        return {
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1])),
+            "samples": self.samples,
+            "elapsed": self.elapsed,
+            "overhead": self.cost / self.elapsed if self.elapsed else 0.0,
+        }
+
+def _frame_name(frame: Frame) -> str:
+    name, path, line = frame
+    return f"{name} ({path}:{line})" if path else name
+
+def to_collapsed(stacks: Dict[Tuple[Frame, ...], float]) -> str:
+    """
+    スタックごとの時間を collapsed stack 形式（"根;...;葉 値" の行）にする
+
+    値はミリ秒単位の整数（flamegraph.pl・speedscope で読み込める）。
+    """
+    lines = []
+    for stack, seconds in sorted(stacks.items(), key=lambda item: -item[1]):
+        lines.append(f"{';'.join(_frame_name(frame).replace(';', ':') for frame in stack)} {max(1, round(seconds * 1000))}")
+    return "\n".join(lines) + "\n"
+
+def to_speedscope(name: str, stacks: Dict[Tuple[Frame, ...], float], elapsed: float) -> Dict[str, Any]:
+    """スタックごとの時間を speedscope のファイル形式（sampled プロファイル、単位は秒）にする"""
+    frames: List[Dict[str, Any]] = []
+    index: Dict[Frame, int] = {}
+    samples = []
+    weights = []
+    for stack, seconds in stacks.items():
+        sample = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                entry: Dict[str, Any] = {"name": frame[0]}
+                if frame[1]:
+                    entry.update(file=frame[1], line=frame[2])
+                frames.append(entry)
+            sample.append(index[frame])
+        samples.append(sample)
+        weights.append(seconds)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "ai-gijiroku",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": max(elapsed, sum(weights)),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+def format_summary(path: str, summary: Dict[str, Any]) -> str:
+    """プロファイルの出力先とステージごとの時間を1行にする"""
+    total = sum(summary["stages"].values())
+    stages = " / ".join(f"{name} {seconds:.2f}秒（{seconds / total * 100:.0f}%）"
+                        for name, seconds in summary["stages"].items()) if total else "サンプルなし"
+    return (f"CPUプロファイル: {path}（{stages}、サンプル {summary['samples']}件、"
+            f"計測の負荷 {summary['overhead'] * 100:.2f}%）")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+import math
+import sys
+import threading
+import numpy as np
+from typing import Dict, List, Optional, TextIO, Tuple
+
+# 表示の更新頻度（Hz）
+DEFAULT_REFRESH_HZ = 4.0
+
+# レベルメーターの表示範囲（dBFS）と幅
+METER_FLOOR_DB = -60.0
+METER_WIDTH = 10
+
+class CaptureMonitor:
+    """
+    録音ループと表示スレッドの間で共有する録音状態
+
+    録音ループ側はブロックの統計値を加算するだけで、表示は一切行わない
+    """
+
+    def __init__(self, sources: List[str], buffer_capacity: int):
+        """
+        Parameters:
+        - sources: 入力ソースの表示名
+        - buffer_capacity: 録音バッファの容量（バイト）
+        """
+        self._lock = threading.Lock()
+        self.sources = list(sources)
+        self.buffer_capacity = buffer_capacity
+        self.elapsed = 0.0
+        self.buffer_used = 0
+        self.dropped_blocks = 0
+        self.paused = False
+        self.overflows = {name: 0 for name in self.sources}
+        self._peak = {name: 0.0 for name in self.sources}
+        self._sum_squares = {name: 0.0 for name in self.sources}
+        self._samples = {name: 0 for name in self.sources}
+
+    def update_source(self, name: str, block: np.ndarray, overflowed: bool = False) -> None:
+        """
+        入力ブロックのピークと二乗和を加算（録音ループから呼び出す）
+
+        Parameters:
+        - name: 入力ソースの表示名
+        - block: 入力ブロック
+        - overflowed: 入力バッファのオーバーフローでデータが欠落したかどうか
+        """
+        flat = np.asarray(block, dtype=np.float32).reshape(-1)
+        peak = float(np.max(np.abs(flat))) if flat.size else 0.0
+        sum_squares = float(np.dot(flat, flat))
+        with self._lock:
+            self._peak[name] = max(self._peak[name], peak)
+            self._sum_squares[name] += sum_squares
+            self._samples[name] += flat.size
+            if overflowed:
+                self.overflows[name] += 1
+
+    def update_progress(self, elapsed: float, buffer_used: int, dropped_blocks: int = 0) -> None:
+        """経過時間とバッファの使用量（バイト）を更新（録音ループから呼び出す）"""
+        with self._lock:
+            self.elapsed = elapsed
+            self.buffer_used = buffer_used
+            self.dropped_blocks += dropped_blocks
+
+    def set_paused(self, paused: bool) -> None:
+        """一時停止中かどうかを更新（録音ループから呼び出す）"""
+        with self._lock:
+            self.paused = paused
+
+    def take_snapshot(self) -> Dict[str, object]:
+        """
+        現在の状態を取得し、レベルの集計をリセット（表示スレッドから呼び出す）
+
+        Returns:
+        - Dict[str, object]: 経過時間・ソースごとの(ピーク, RMS)・バッファ使用率・欠落ブロック数・一時停止中かどうか
+        """
+        with self._lock:
+            levels: Dict[str, Tuple[float, float]] = {}
+            for name in self.sources:
+                samples = self._samples[name]
+                rms = math.sqrt(self._sum_squares[name] / samples) if samples else 0.0
+                levels[name] = (self._peak[name], rms)
+                self._peak[name] = 0.0
+                self._sum_squares[name] = 0.0
+                self._samples[name] = 0
+            return {
+                "elapsed": self.elapsed,
+                "levels": levels,
+                "buffer_fill": self.buffer_used / self.buffer_capacity if self.buffer_capacity else 0.0,
+                "dropped_blocks": self.dropped_blocks + sum(self.overflows.values()),
+                "paused": self.paused,
+            }
+
+def to_dbfs(value: float) -> float:
+    """振幅をdBFSに変換（無音は表示範囲の下限）"""
+    if value <= 0:
+        return METER_FLOOR_DB
+    return max(METER_FLOOR_DB, 20 * math.log10(value))
+
+def format_meter(peak: float, rms: float) -> str:
+    """RMSをバー、ピークを数値で表すレベルメーターの文字列を作成"""
+    filled = int(round((to_dbfs(rms) - METER_FLOOR_DB) / -METER_FLOOR_DB * METER_WIDTH))
+    bar = "#" * filled + "-" * (METER_WIDTH - filled)
+    return f"[{bar}] {to_dbfs(peak):6.1f}dB"
+
+def format_status(snapshot: Dict[str, object]) -> str:
+    """1行分の録音状態の表示を作成"""
+    parts = [f"録音時間: {snapshot['elapsed']:.1f}秒"]
+    if snapshot.get("paused"):
+        parts.append("一時停止中（pキーで再開）")
+    for name, (peak, rms) in snapshot["levels"].items():
+        parts.append(f"{name} {format_meter(peak, rms)}")
+    parts.append(f"バッファ {snapshot['buffer_fill'] * 100:.1f}%")
+    parts.append(f"欠落 {snapshot['dropped_blocks']}")
+    return " | ".join(parts)
+
+class ProgressRenderer(threading.Thread):
+    """録音状態を一定間隔で表示する表示専用スレッド"""
+
+    def __init__(self, monitor: CaptureMonitor, refresh_hz: float = DEFAULT_REFRESH_HZ,
+                 stream: Optional[TextIO] = None):
+        """
+        Parameters:
+        - monitor: 表示する録音状態
+        - refresh_hz: 表示の更新頻度（Hz）
+        - stream: 出力先（省略時は標準出力）
+        """
+        super().__init__(name="progress-renderer", daemon=True)
+        self.monitor = monitor
+        self.interval = 1.0 / refresh_hz
+        self.stream = stream
+        self._stop_event = threading.Event()
+        self._last_length = 0
+
+    def render(self) -> None:
+        """現在の状態で表示を1回更新"""
+        stream = self.stream or sys.stdout
+        line = format_status(self.monitor.take_snapshot())
+        # 前回の表示より短い場合は残りを空白で消す
+        padding = " " * max(0, self._last_length - len(line))
+        self._last_length = len(line)
+        stream.write(f"\r{line}{padding}")
+        stream.flush()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.render()
+
+    def stop(self) -> None:
+        """表示スレッドを停止し、最後の状態を表示して改行する"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.render()
+        stream = self.stream or sys.stdout
+        stream.write("\n")
+        stream.flush()
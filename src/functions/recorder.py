@@ -1,7 +1,5 @@
 #!/usr/bin/env python
 import sounddevice as sd
-import soundfile as sf
-import numpy as np
 import os
 import time
 import sys
@@ -10,24 +8,37 @@ import termios
 import tty
 from typing import Optional, Tuple, Dict, Any
 from datetime import datetime
+from src.functions.audio_source import AudioSource
+from src.functions.capture_buffer import CaptureBuffer, DEFAULT_MEMORY_LIMIT
+from src.functions.devices import DeviceRegistry, DEFAULT_LOOPBACK
+from src.functions.progress import CaptureMonitor, ProgressRenderer
+from src.functions.resample import SpeechCapturePipeline
+
+# 1回の読み込みで取得するフレーム数
+BLOCK_SIZE = 1024
 
 class AudioRecorder:
     """オーディオ録音を管理するクラス"""
     
-    def __init__(self, recordings_dir: str, min_recording_duration: float = 0.5):
+    def __init__(self, recordings_dir: str, min_recording_duration: float = 0.5,
+                 registry: Optional[DeviceRegistry] = None, memory_limit: int = DEFAULT_MEMORY_LIMIT):
         """
         Parameters:
         - recordings_dir: 録音ファイルの保存ディレクトリ
         - min_recording_duration: 最小録音時間（秒）
+        - registry: デバイス一覧のキャッシュ（省略時は最初の参照時に列挙する）
+        - memory_limit: 録音データをメモリに保持する上限（バイト、超えた分は一時ファイルに書き出す）
         """
         self.recordings_dir = recordings_dir
         self.min_recording_duration = min_recording_duration
+        self.registry = registry or DeviceRegistry()
+        self.memory_limit = memory_limit
         os.makedirs(recordings_dir, exist_ok=True)
 
     @staticmethod
-    def list_devices() -> list[Dict[str, Any]]:
+    def list_devices(registry: Optional[DeviceRegistry] = None) -> list[Dict[str, Any]]:
         """利用可能なオーディオデバイスを一覧表示"""
-        devices = sd.query_devices()
+        devices = (registry or DeviceRegistry()).devices
         print("\n利用可能なオーディオデバイス:")
         for i, device in enumerate(devices):
             print(f"\nデバイス {i}:")
@@ -38,29 +49,17 @@ class AudioRecorder:
         return devices
 
     @staticmethod
-    def find_blackhole_device() -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
-        """BlackHoleデバイスのインデックスを検索"""
-        devices = sd.query_devices()
-        for i, device in enumerate(devices):
-            if 'BlackHole' in device['name']:
-                return i, device
-        return None, None
-
-    @staticmethod
-    def _print_progress(elapsed_time: float) -> None:
-        """録音の経過時間を表示"""
-        sys.stdout.write('\r')
-        sys.stdout.write(f"録音時間: {elapsed_time:.1f}秒 ")
-        sys.stdout.flush()
+    def find_blackhole_device(registry: Optional[DeviceRegistry] = None,
+                              name: str = DEFAULT_LOOPBACK) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """BlackHole（またはnameに一致するループバック）デバイスのインデックスを検索"""
+        return (registry or DeviceRegistry()).find(name)
 
     def validate_input_device(self, input_device_id: int) -> Tuple[bool, Optional[str]]:
         """入力デバイスが有効かどうかを検証"""
-        devices = sd.query_devices()
-        
-        if input_device_id >= len(devices):
+        input_device = self.registry.get(input_device_id) if input_device_id is not None else None
+        if input_device is None:
             return False, "有効な入力デバイスIDを指定してください。"
             
-        input_device = devices[input_device_id]
         if input_device['max_input_channels'] == 0:
             return False, f"デバイス {input_device_id} は入力デバイスではありません。"
             
@@ -79,7 +78,10 @@ class AudioRecorder:
         return None
 
     def record(self, filename: Optional[str] = None, sample_rate: int = 48000, 
-               input_device_id: Optional[int] = None) -> Optional[str]:
+               input_device_id: Optional[int] = None, target_rate: Optional[int] = None,
+               loopback: str = DEFAULT_LOOPBACK, interactive: bool = True,
+               output_path: Optional[str] = None, append: bool = False,
+               memory_limit: Optional[int] = None) -> Optional[str]:
         """
         指定された入力デバイスとBlackHoleを使用してオーディオを録音
         
@@ -87,6 +89,12 @@ class AudioRecorder:
         - filename: 保存するファイル名（YYYYMMDD_[指定された名前].wav形式）
         - sample_rate: サンプリングレート（デフォルト48kHz）
         - input_device_id: 入力デバイスのID
+        - target_rate: 指定した場合、キャプチャ直後にモノラル・int16・このレートに変換して保持・保存する
+        - loopback: システム音声を取り込むデバイスの名前（一部でも可）
+        - interactive: Falseの場合は準備の案内とEnterキー待ちを省略してすぐに録音を開始する
+        - output_path: 保存先のパス（指定した場合は filename より優先する）
+        - append: 保存先が既にある場合に末尾へ追記するかどうか（録音セッションの再開）
+        - memory_limit: 録音データをメモリに保持する上限（バイト、省略時は作成時の値）
         
         Returns:
         - Optional[str]: 録音ファイルのパス。エラー時はNone
@@ -98,15 +106,14 @@ class AudioRecorder:
             return None
 
         # BlackHoleデバイスを検索
-        blackhole_idx, blackhole_device = self.find_blackhole_device()
+        blackhole_idx, blackhole_device = self.find_blackhole_device(self.registry, loopback)
         if blackhole_idx is None:
-            print("\nエラー: BlackHoleデバイスが見つかりません。")
+            print(f"\nエラー: {loopback}デバイスが見つかりません。")
             print("1. BlackHoleがインストールされているか確認してください。")
             print("2. システム環境設定 > サウンド で BlackHole 2chが表示されているか確認してください。")
             return None
 
-        devices = sd.query_devices()
-        input_device = devices[input_device_id]
+        input_device = self.registry.get(input_device_id)
 
         # ファイル名の生成 - メモリリーク対策：文字列操作を最適化
         current_date = datetime.now().strftime('%Y%m%d')
@@ -116,41 +123,26 @@ class AudioRecorder:
         else:
             filename = f"{current_date}_{filename_base}"
         
-        filepath = os.path.join(self.recordings_dir, filename)
+        filepath = output_path or os.path.join(self.recordings_dir, filename)
 
-        print("\n録音の準備:")
-        print("1. システム環境設定 > サウンド > 出力 で録音したいデバイスを選択")
-        print("2. オーディオMIDI設定を開き、複数出力装置を作成")
-        print("3. 複数出力装置に、録音したいデバイスとBlackHole 2chの両方を追加")
-        print("4. システム環境設定 > サウンド > 出力 で作成した複数出力装置を選択")
-        print("\n上記の設定が完了したら、Enterキーを押して録音を開始してください。")
-        input()
+        if interactive:
+            print("\n録音の準備:")
+            print("1. システム環境設定 > サウンド > 出力 で録音したいデバイスを選択")
+            print("2. オーディオMIDI設定を開き、複数出力装置を作成")
+            print("3. 複数出力装置に、録音したいデバイスとBlackHole 2chの両方を追加")
+            print("4. システム環境設定 > サウンド > 出力 で作成した複数出力装置を選択")
+            print("\n上記の設定が完了したら、Enterキーを押して録音を開始してください。")
+            input()
 
         print(f"\n使用するデバイス:")
+        print(f"入力デバイス: {input_device['name']}")
         print(f"録音デバイス: {blackhole_device['name']}")
         print(f"保存先: {filepath}")
 
-        # メモリリーク対策：事前に固定サイズのバッファを確保
-        max_frames = 3600 * sample_rate // 1024  # 最大1時間分のフレーム
-        frames = []
-        recording_duration = 0
-        old_settings = None
+        # ストリームの作成（エラー時は作成済みのストリームを閉じる）
         input_stream = None
         blackhole_stream = None
-        
         try:
-            print("\n録音を開始します...")
-            print("qキーを押して録音を停止")
-            print("経過時間:")
-
-            # ターミナルの設定を変更（キー入力を即座に取得するため）
-            try:
-                old_settings = termios.tcgetattr(sys.stdin)
-                tty.setcbreak(sys.stdin.fileno())
-            except (termios.error, IOError, AttributeError):
-                # テスト環境やリダイレクトされた標準入力の場合はスキップ
-                pass
-
             input_stream = sd.InputStream(
                 device=input_device_id,
                 channels=input_device['max_input_channels'],
@@ -164,50 +156,148 @@ class AudioRecorder:
                 samplerate=sample_rate,
                 callback=None
             )
+        except Exception as e:
+            print(f"\nエラー: {str(e)}")
+            for stream in (input_stream, blackhole_stream):
+                if stream is not None:
+                    stream.close()
+            return None
+
+        return self.capture(input_stream, blackhole_stream, filepath, sample_rate, target_rate,
+                            append=append, memory_limit=memory_limit)
+
+    def capture(self, input_stream: Any, blackhole_stream: Any, filepath: str,
+                sample_rate: int = 48000, target_rate: Optional[int] = None,
+                append: bool = False, memory_limit: Optional[int] = None) -> Optional[str]:
+        """
+        2つの入力ソースをミックスして録音する
+
+        qキーが押されるか、AudioSourceが終わりに達するまで録音を続ける。
+        pキーで一時停止・再開する（一時停止中の音声は読み捨て、録音ファイルには含めない）。
+        ストリームは終了時に停止して閉じる。
+        
+        Parameters:
+        - input_stream: 入力デバイスのストリーム（sounddevice.InputStream または AudioSource）
+        - blackhole_stream: システム音声のストリーム（同上）
+        - filepath: 保存先のパス
+        - sample_rate: サンプリングレート
+        - target_rate: 指定した場合、キャプチャ直後にモノラル・int16・このレートに変換して保持・保存する
+        - append: 保存先が既にある場合に末尾へ追記するかどうか
+        - memory_limit: 録音データをメモリに保持する上限（バイト、省略時は作成時の値）
+        
+        Returns:
+        - Optional[str]: 録音ファイルのパス。エラー時はNone
+        """
+        # 仮想ソースは自身で供給の速さを決めるため、経過時間は供給されたフレーム数から求める
+        virtual = isinstance(input_stream, AudioSource) and isinstance(blackhole_stream, AudioSource)
+        recording_duration = 0
+        captured_frames = 0
+        old_settings = None
+        # 音声認識向けの変換（指定時のみ）。バッファとファイルを最初から小さく保つ
+        pipeline = SpeechCapturePipeline(sample_rate, target_rate) if target_rate else None
+        output_rate = target_rate or sample_rate
+        # メモリリーク対策：上限を超えた録音データは一時ファイルに書き出す
+        buffer = CaptureBuffer(filepath, output_rate, memory_limit or self.memory_limit, append=append)
+        # 表示は専用スレッドで一定間隔で行い、録音ループでは状態の更新のみ行う
+        monitor = CaptureMonitor(["入力", "BlackHole"], buffer.memory_limit)
+        renderer = None
+        stopped_by_key = False
+        paused = False
+        # 一時停止していた時間の合計（秒）と、一時停止した時刻
+        paused_seconds = 0.0
+        paused_at = None
+        
+        try:
+            print("\n録音を開始します...")
+            print("qキーを押して録音を停止（pキーで一時停止・再開）")
+            print("経過時間:")
+
+            # ターミナルの設定を変更（キー入力を即座に取得するため）
+            try:
+                old_settings = termios.tcgetattr(sys.stdin)
+                tty.setcbreak(sys.stdin.fileno())
+            except (termios.error, IOError, AttributeError):
+                # テスト環境やリダイレクトされた標準入力の場合はスキップ
+                pass
 
             input_stream.start()
             blackhole_stream.start()
 
             start_time = time.time()
+            renderer = ProgressRenderer(monitor)
+            renderer.start()
             
             # メモリリーク対策：処理をより効率的に
             while True:
                 # 一度に大きなチャンクを読み込む
-                input_data = input_stream.read(1024)[0]
-                blackhole_data = blackhole_stream.read(1024)[0]
+                input_data, input_overflowed = input_stream.read(BLOCK_SIZE)
+                blackhole_data, blackhole_overflowed = blackhole_stream.read(BLOCK_SIZE)
+                monitor.update_source("入力", input_data, bool(input_overflowed))
+                monitor.update_source("BlackHole", blackhole_data, bool(blackhole_overflowed))
                 
                 if input_data.shape[1] != blackhole_data.shape[1]:
                     min_channels = min(input_data.shape[1], blackhole_data.shape[1])
                     input_data = input_data[:, :min_channels]
                     blackhole_data = blackhole_data[:, :min_channels]
+                if len(input_data) != len(blackhole_data):
+                    # 終わりに達したソースのブロックは短くなる
+                    min_frames = min(len(input_data), len(blackhole_data))
+                    input_data = input_data[:min_frames]
+                    blackhole_data = blackhole_data[:min_frames]
                 
-                # メモリリーク対策：一時変数を最小限に
-                frames.append((input_data + blackhole_data) / 2)
-                
-                # フレーム数が最大値を超えた場合、古いフレームを削除
-                if len(frames) > max_frames:
-                    frames = frames[-max_frames:]
+                # メモリリーク対策：一時変数を最小限に（一時停止中はデバイスから読み捨てる）
+                if paused:
+                    pass
+                elif pipeline is not None:
+                    buffer.append(pipeline.process((input_data + blackhole_data) / 2))
+                    captured_frames += len(input_data)
+                else:
+                    buffer.append((input_data + blackhole_data) / 2)
+                    captured_frames += len(input_data)
                 
-                current_time = time.time() - start_time
+                if virtual:
+                    current_time = captured_frames / sample_rate
+                elif paused:
+                    current_time = paused_at - start_time - paused_seconds
+                else:
+                    current_time = time.time() - start_time - paused_seconds
                 recording_duration = current_time
-                
-                # 表示更新は0.5秒ごとに行う
-                if int(current_time * 2) % 2 == 0:
-                    self._print_progress(current_time)
+                monitor.update_progress(current_time, buffer.buffered_bytes)
+
+                if virtual and (input_stream.finished or blackhole_stream.finished):
+                    break
 
                 # qキーが押されたかチェック - メモリリーク対策：効率的なキー処理
                 key = self._is_key_pressed()
                 if key == 'q':
-                    print("\n録音を停止します...")
+                    stopped_by_key = True
                     break
+                if key == 'p':
+                    paused = not paused
+                    if paused:
+                        paused_at = time.time()
+                    else:
+                        paused_seconds += time.time() - paused_at
+                    # 表示は表示スレッドが行う（録音ループでは出力しない）
+                    monitor.set_paused(paused)
 
-                # メモリリーク対策：スリープでCPU使用率を下げる
-                time.sleep(0.01)
+                # メモリリーク対策：スリープでCPU使用率を下げる（仮想ソースは読み込み時に待つ）
+                if not virtual:
+                    time.sleep(0.01)
 
         except Exception as e:
+            if renderer is not None:
+                renderer.stop()
+                renderer = None
             print(f"\nエラー: {str(e)}")
             return None
         finally:
+            # 表示スレッドを停止（最後の状態を表示してから停止メッセージを出す）
+            if renderer is not None:
+                renderer.stop()
+            if stopped_by_key:
+                print("録音を停止します...")
+
             # ターミナルの設定を元に戻す
             if old_settings is not None:
                 try:
@@ -223,27 +313,18 @@ class AudioRecorder:
                 blackhole_stream.stop()
                 blackhole_stream.close()
 
-            if frames:
+            if len(buffer):
                 if recording_duration < self.min_recording_duration:
                     print(f"\nエラー: 録音時間が短すぎます（{recording_duration:.2f}秒）")
                     print(f"最小録音時間は{self.min_recording_duration}秒です。")
+                    buffer.discard()
                     return None
 
                 print("\n録音処理中...")
                 print(f"録音時間: {recording_duration:.2f}秒")
                 
                 try:
-                    # メモリリーク対策：より効率的なnumpy処理
-                    recording = np.concatenate(frames, axis=0)
-
-                    if recording.ndim > 1 and recording.shape[1] > 1:
-                        recording = np.mean(recording, axis=1)
-
-                    sf.write(filepath, recording, sample_rate)
-                    
-                    # メモリリーク対策：明示的にメモリ解放
-                    del frames
-                    del recording
+                    buffer.finalize()
                     
                     print(f"録音が完了しました。")
                     print(f"保存先: {filepath}")
@@ -251,7 +332,8 @@ class AudioRecorder:
 
                 except Exception as e:
                     print(f"\n録音データの処理中にエラーが発生しました: {str(e)}")
+                    buffer.discard()
                     return None
             else:
                 print("\nエラー: 録音データが空です。")
-                return None
\ No newline at end of file
+                return None
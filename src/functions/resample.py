@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Optional
+
+# Whisperが内部で使用するサンプリングレート
+SPEECH_SAMPLE_RATE = 16000
+
+# 1位相あたりのフィルタ長（長いほど遮断特性が急峻になるがCPU負荷が増える）
+DEFAULT_TAPS_PER_PHASE = 32
+
+class PolyphaseResampler:
+    """
+    ブロック単位で入力できる有理数比のポリフェーズリサンプラー
+
+    出力レート/入力レート = up/down とし、Kaiser窓付きsinc関数のローパスフィルタを
+    up個の位相に分解して、必要な出力サンプルだけを計算する。
+    ブロック間のフィルタ状態を保持するため、任意の長さで分割して入力しても
+    一括で処理した場合と同じ結果になる。
+    """
+
+    def __init__(self, input_rate: int, output_rate: int,
+                 taps_per_phase: int = DEFAULT_TAPS_PER_PHASE, beta: float = 8.0):
+        """
+        Parameters:
+        - input_rate: 入力のサンプリングレート（Hz）
+        - output_rate: 出力のサンプリングレート（Hz）
+        - taps_per_phase: 1位相あたりのフィルタ長
+        - beta: Kaiser窓のパラメータ（大きいほど阻止域の減衰が大きい）
+        """
+        divisor = math.gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.taps_per_phase = taps_per_phase
+
+        # ローパスフィルタの設計（遮断周波数は入出力のナイキスト周波数の低い方）
+        num_taps = taps_per_phase * self.up
+        cutoff = 0.5 / max(self.up, self.down)
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, beta)
+        taps *= self.up / taps.sum()
+
+        # 位相ごとのフィルタ（畳み込みを内積で計算できるよう時間方向を反転）
+        self._phases = taps.reshape(taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+        # 直前のブロックの末尾（フィルタ長-1サンプル）
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        # 次の出力サンプルの位置（アップサンプル後の時間軸、入力の先頭からの相対位置）
+        self._position = 0
+        # これまでに受け取った入力サンプル数
+        self._consumed = 0
+
+    @property
+    def delay(self) -> float:
+        """フィルタによる遅延（出力サンプル数）"""
+        return (self.taps_per_phase * self.up - 1) / 2 / self.down
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        モノラルのブロックをリサンプリングする
+
+        Parameters:
+        - block: 入力サンプル（1次元配列）
+
+        Returns:
+        - np.ndarray: 出力サンプル（float32の1次元配列）
+        """
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        buffer = np.concatenate((self._history, block))
+        start = self._consumed
+        self._consumed += len(block)
+
+        # このブロックまでの入力で計算できる出力位置を列挙
+        end_position = self._consumed * self.up
+        positions = np.arange(self._position, end_position, self.down, dtype=np.int64)
+        if len(positions):
+            self._position = int(positions[-1]) + self.down
+
+        # 出力ごとに対応する入力サンプルと位相を求め、窓と位相フィルタの内積を取る
+        input_index = positions // self.up - start
+        phase = positions % self.up
+        windows = sliding_window_view(buffer, self.taps_per_phase)
+        output = np.einsum("ij,ij->i", windows[input_index], self._phases[phase])
+
+        self._history = buffer[len(buffer) - (self.taps_per_phase - 1):]
+        return output.astype(np.float32, copy=False)
+
+def quantize_int16(samples: np.ndarray) -> np.ndarray:
+    """-1.0〜1.0の浮動小数点サンプルをクリップしてint16に量子化する"""
+    scaled = np.clip(samples, -1.0, 1.0) * 32767.0
+    return np.rint(scaled).astype(np.int16)
+
+class SpeechCapturePipeline:
+    """
+    録音ブロックを音声認識向けの形式（モノラル・16kHz・int16）に変換するパイプライン
+
+    キャプチャした直後に変換するため、バッファに保持するデータも書き出すファイルも
+    音声認識に必要な解像度だけになる
+    """
+
+    def __init__(self, input_rate: int, output_rate: int = SPEECH_SAMPLE_RATE,
+                 taps_per_phase: int = DEFAULT_TAPS_PER_PHASE):
+        """
+        Parameters:
+        - input_rate: キャプチャのサンプリングレート（Hz）
+        - output_rate: 保存するサンプリングレート（Hz）
+        - taps_per_phase: リサンプラーの1位相あたりのフィルタ長
+        """
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self._resampler: Optional[PolyphaseResampler] = None
+        if input_rate != output_rate:
+            self._resampler = PolyphaseResampler(input_rate, output_rate, taps_per_phase)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        1ブロックをモノラル化・リサンプリング・量子化する
+
+        Parameters:
+        - block: (フレーム数, チャンネル数) または (フレーム数,) の浮動小数点配列
+
+        Returns:
+        - np.ndarray: int16の1次元配列
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim > 1:
+            block = block.mean(axis=1, dtype=np.float32)
+        if self._resampler is not None:
+            block = self._resampler.process(block)
+        return quantize_int16(block)
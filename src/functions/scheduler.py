@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+import fnmatch
+import os
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import soundfile as sf
+
+# スケジューリングの方針
+POLICY_FIFO = "fifo"          # 到着順（更新時刻の順）
+POLICY_SJF = "sjf"            # 音声の短い順
+POLICY_DEADLINE = "deadline"  # 期限の早い順（期限のないものは最後、同じ期限なら短い順）
+POLICY_PRIORITY = "priority"  # 優先度の高い順（同じ優先度なら短い順）
+POLICIES = (POLICY_FIFO, POLICY_SJF, POLICY_DEADLINE, POLICY_PRIORITY)
+DEFAULT_POLICY = POLICY_SJF
+
+# ヘッダーから長さを読めない形式に仮定するビットレート（bps）
+FALLBACK_BITRATE = 128000
+
+# MP4コンテナ（m4a）のボックスのうち、mvhd を子に持つもの
+_MP4_CONTAINERS = {b"moov"}
+
+# WebM（Matroska）の要素ID
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+_EBML_CLUSTER = 0x1F43B675
+
+def _mp4_duration(path: str) -> Optional[float]:
+    """MP4コンテナの mvhd ボックスから長さ（秒）を読む（音声データは読まない）"""
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        while f.tell() + 8 <= end:
+            start = f.tell()
+            size, kind = struct.unpack(">I4s", f.read(8))
+            header = 8
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                header = 16
+            elif size == 0:
+                size = end - start
+            if size < header:
+                return None
+            if kind == b"mvhd":
+                version = f.read(4)[0]
+                if version == 1:
+                    f.seek(16, os.SEEK_CUR)
+                    timescale, duration = struct.unpack(">IQ", f.read(12))
+                else:
+                    f.seek(8, os.SEEK_CUR)
+                    timescale, duration = struct.unpack(">II", f.read(8))
+                return duration / timescale if timescale else None
+            if kind in _MP4_CONTAINERS:
+                # 子ボックスを順に読む
+                end = start + size
+                continue
+            f.seek(start + size)
+    return None
+
+def _read_ebml_vint(f, keep_marker: bool = False) -> Tuple[int, bool]:
+    """EBMLの可変長整数を読む（要素IDは先頭の長さを示すビットを残す）。(値, 長さ不明か) を返す"""
+    first = f.read(1)[0]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("EBMLの可変長整数が不正です")
+    value = first if keep_marker else first & ((0x80 >> (length - 1)) - 1)
+    for byte in f.read(length - 1):
+        value = value << 8 | byte
+    return value, not keep_marker and value == (1 << (7 * length)) - 1
+
+def _webm_duration(path: str) -> Optional[float]:
+    """WebMの Segment > Info の Duration から長さ（秒）を読む（ブラウザの録画など、記録されていない場合は None）"""
+    scale = 1000000
+    duration = None
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        while f.tell() < end:
+            element, _ = _read_ebml_vint(f, keep_marker=True)
+            size, unknown = _read_ebml_vint(f)
+            start = f.tell()
+            if element in (_EBML_SEGMENT, _EBML_INFO):
+                # 子要素を順に読む
+                if not unknown:
+                    end = min(end, start + size)
+                continue
+            if element == _EBML_CLUSTER or unknown:
+                break
+            if element == _EBML_TIMECODE_SCALE:
+                scale = int.from_bytes(f.read(size), "big")
+            elif element == _EBML_DURATION:
+                duration = struct.unpack(">f" if size == 4 else ">d", f.read(size))[0]
+            f.seek(start + size)
+    return duration * scale / 1e9 if duration is not None else None
+
+def header_duration(path: str) -> float:
+    """
+    音声ファイルの長さ（秒）をヘッダーから求める（デコードはしない）
+
+    WAV/FLAC/MP3などlibsndfileで開ける形式はヘッダーから、m4a/mp4はMP4の mvhd ボックスから、
+    webmは Segment > Info の Duration 要素から読む。
+    読めない場合はファイルサイズと既定のビットレートから推定する。
+
+    Parameters:
+    - path: 音声ファイルのパス
+
+    Returns:
+    - float: 長さ（秒）
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".m4a", ".mp4", ".webm"):
+        try:
+            duration = _webm_duration(path) if extension == ".webm" else _mp4_duration(path)
+            if duration is not None:
+                return duration
+        except (OSError, struct.error, IndexError, ValueError):
+            pass
+    else:
+        try:
+            return sf.info(path).duration
+        except Exception:
+            pass
+    return os.path.getsize(path) * 8 / FALLBACK_BITRATE
+
+def parse_rule(spec: str) -> Tuple[str, str]:
+    """
+    "パターン=値" 形式の指定を分割
+
+    Returns:
+    - Tuple[str, str]: (ファイル名のパターン, 値)
+    """
+    pattern, separator, value = spec.rpartition("=")
+    if not separator or not pattern:
+        raise ValueError(f"指定の形式が正しくありません（パターン=値）: {spec}")
+    return pattern, value
+
+def parse_deadline(value: str, now: Optional[datetime] = None) -> float:
+    """
+    期限の指定をUNIX時間に変換
+
+    Parameters:
+    - value: ISO形式の日時、または当日の時刻（HH:MM）
+    - now: 時刻のみを指定した場合の基準日時
+
+    Returns:
+    - float: 期限（UNIX時間）
+    """
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    try:
+        time_of_day = datetime.strptime(value, "%H:%M")
+    except ValueError:
+        raise ValueError(f"期限の形式が正しくありません（ISO形式の日時またはHH:MM）: {value}")
+    now = now or datetime.now()
+    return now.replace(hour=time_of_day.hour, minute=time_of_day.minute, second=0, microsecond=0).timestamp()
+
+class ScheduleRules:
+    """ファイル名のパターンごとの優先度と期限"""
+
+    def __init__(self, priorities: Iterable[str] = (), deadlines: Iterable[str] = ()):
+        """
+        Parameters:
+        - priorities: "パターン=優先度" のリスト（大きいほど先に処理する）
+        - deadlines: "パターン=期限" のリスト（ISO形式の日時またはHH:MM）
+        """
+        self.priorities = [(pattern, int(value)) for pattern, value in map(parse_rule, priorities)]
+        self.deadlines = [(pattern, parse_deadline(value)) for pattern, value in map(parse_rule, deadlines)]
+
+    @staticmethod
+    def _match(rules: List[Tuple[str, Any]], path: str) -> Optional[Any]:
+        # 後に指定したルールを優先する
+        name = os.path.basename(path)
+        for pattern, value in reversed(rules):
+            if fnmatch.fnmatch(name, pattern):
+                return value
+        return None
+
+    def priority(self, path: str) -> int:
+        """ファイルの優先度（指定がなければ0）"""
+        return self._match(self.priorities, path) or 0
+
+    def deadline(self, path: str) -> Optional[float]:
+        """ファイルの期限（指定がなければNone）"""
+        return self._match(self.deadlines, path)
+
+def describe_file(path: str, rules: Optional[ScheduleRules] = None) -> Dict[str, Any]:
+    """
+    スケジューリングに使用するファイルの情報を取得
+
+    Returns:
+    - Dict[str, Any]: path, duration, mtime, priority, deadline を含む辞書
+    """
+    rules = rules or ScheduleRules()
+    return {
+        "path": path,
+        "duration": header_duration(path),
+        "mtime": os.path.getmtime(path),
+        "priority": rules.priority(path),
+        "deadline": rules.deadline(path),
+    }
+
+def sort_key(policy: str, entry: Dict[str, Any]) -> tuple:
+    """方針に応じた並び替えのキー（小さいほど先に処理する）"""
+    duration = entry["duration"] if entry.get("duration") is not None else float("inf")
+    if policy == POLICY_FIFO:
+        return (entry["mtime"], entry["path"])
+    if policy == POLICY_SJF:
+        return (duration, entry["path"])
+    if policy == POLICY_DEADLINE:
+        deadline = entry["deadline"] if entry.get("deadline") is not None else float("inf")
+        return (deadline, duration, entry["path"])
+    if policy == POLICY_PRIORITY:
+        return (-entry.get("priority", 0), duration, entry["path"])
+    raise ValueError(f"未対応のスケジューリング方針です: {policy}（対応: {', '.join(POLICIES)}）")
+
+def order_files(paths: Iterable[str], policy: str = DEFAULT_POLICY,
+                rules: Optional[ScheduleRules] = None) -> List[Dict[str, Any]]:
+    """
+    音声ファイルを方針に従って処理する順に並べる
+
+    Parameters:
+    - paths: 音声ファイルのパス
+    - policy: スケジューリングの方針（POLICIES のいずれか）
+    - rules: 優先度と期限の指定
+
+    Returns:
+    - List[Dict[str, Any]]: describe_file の結果を処理順に並べたリスト
+    """
+    entries = [describe_file(str(path), rules) for path in paths]
+    return sorted(entries, key=lambda entry: sort_key(policy, entry))
+
+def mean_turnaround(entries: List[Dict[str, Any]], speed: float = 1.0) -> float:
+    """
+    1つずつ順に処理した場合の平均ターンアラウンド時間（秒）
+
+    Parameters:
+    - entries: 処理順に並べたファイルの情報
+    - speed: 音声1秒あたりの処理時間（秒）
+    """
+    if not entries:
+        return 0.0
+    elapsed = 0.0
+    total = 0.0
+    for entry in entries:
+        elapsed += entry["duration"] * speed
+        total += elapsed
+    return total / len(entries)
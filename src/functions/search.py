@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+import hashlib
+import math
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.functions.minutes import format_time, parse_transcript
+from src.functions.stitch import normalize_text
+
+# 1回の埋め込みで処理するセグメント数
+DEFAULT_EMBED_BATCH = 64
+
+# ローカルの埋め込みモデル（日本語の言い換えに対応した多言語モデル、CPUで動作する）
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# スタブの埋め込みの次元数
+STUB_DIMENSIONS = 256
+
+# これより少ない件数は全件と比較する（IVFのクラスタを学習しない）
+IVF_MIN_VECTORS = 4096
+
+# クラスタを学習した時点の件数の何倍になったら学習し直すか（それまでは追加分だけを割り当てる）
+IVF_RETRAIN_GROWTH = 4
+
+# 検索時に調べるクラスタの数
+DEFAULT_NPROBE = 16
+
+# k-means の反復回数と、1クラスタあたりの学習に使うサンプル数
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_CLUSTER = 32
+
+# クラスタの割り当てを計算する際の1ブロックの件数（メモリ使用量を抑える）
+ASSIGN_BLOCK = 16384
+
+# 文字起こし結果のディレクトリ内に作成するインデックスのディレクトリ名
+SEMANTIC_INDEX_DIRNAME = ".semantic_index"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    start REAL NOT NULL,
+    text TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS segments_path ON segments (path);
+"""
+
+class EmbeddingBackend(ABC):
+    """
+    セグメントの埋め込みに使用するモデルの基底クラス
+
+    embed は L2 正規化した float32 の行列（テキスト数 × dimensions）を返す。
+    register_embedding_backend で登録する。
+    """
+
+    dimensions: int
+
+    @abstractmethod
+    def cache_id(self) -> str:
+        """インデックスに記録する識別子（異なるモデルで作成したインデックスは使用しない）"""
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+class StubEmbeddingBackend(EmbeddingBackend):
+    """
+    文字の2-gramをハッシュで次元に割り当てる決定的な埋め込み（テストとオフラインでの動作確認用）
+
+    表記の近いテキストほど類似度が高くなるが、言い換えは区別できない。
+    """
+
+    def __init__(self, dimensions: int = STUB_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def cache_id(self) -> str:
+        return f"stub:{self.dimensions}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            normalized = normalize_text(text).lower()
+            grams = [normalized[i:i + 2] for i in range(len(normalized) - 1)] or [normalized]
+            for gram in grams:
+                value = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+                vectors[row, value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        return _normalize_rows(vectors)
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers のモデルをCPUで実行する埋め込み（pip install sentence-transformers が必要）"""
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, batch_size: int = DEFAULT_EMBED_BATCH):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ValueError("ローカルの埋め込みモデルには sentence-transformers が必要です"
+                             "（pip install sentence-transformers）")
+        self.model_name = model
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def cache_id(self) -> str:
+        return f"local:{self.model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                    normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions)
+
+_BACKENDS: Dict[str, Callable[..., EmbeddingBackend]] = {
+    "local": lambda **kwargs: LocalEmbeddingBackend(**kwargs),
+    "stub": lambda **kwargs: StubEmbeddingBackend(),
+}
+
+def register_embedding_backend(name: str, factory: Callable[..., EmbeddingBackend]) -> None:
+    """
+    埋め込みのバックエンドを登録
+
+    Parameters:
+    - name: open_embedding_backend に渡す名前
+    - factory: open_embedding_backend のキーワード引数を受け取り、EmbeddingBackend を返す関数
+    """
+    _BACKENDS[name] = factory
+
+def embedding_backends() -> List[str]:
+    """登録されているバックエンドの名前"""
+    return sorted(_BACKENDS)
+
+def open_embedding_backend(name: str, **kwargs) -> EmbeddingBackend:
+    """名前を指定してバックエンドを作成"""
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"未対応の埋め込みバックエンドです: {name}（対応: {', '.join(embedding_backends())}）")
+    return factory(**kwargs)
+
+def _kmeans(sample: np.ndarray, clusters: int, seed: int = 0) -> np.ndarray:
+    """正規化済みのベクトルを内積で k-means クラスタリングし、正規化した重心を返す"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=clusters)
+        # 空になったクラスタは前回の重心を残す
+        filled = counts > 0
+        centroids[filled] = sums[filled]
+        centroids = _normalize_rows(centroids)
+    return centroids
+
+class SemanticIndex:
+    """
+    文字起こしのセグメントの埋め込みを保存し、意味の近いセグメントを検索するインデックス
+
+    ベクトルは追記のみの float32 行列（vectors.f32）としてメモリマップで読み、
+    IVF（k-means の重心ごとの転置リスト）で調べる範囲を絞る。
+    追加したセグメントは既存の重心に割り当て、件数が学習時の IVF_RETRAIN_GROWTH 倍になったら学習し直す。
+    セグメントの情報と取り込み済みのファイルはSQLiteに保存する。書き込みは1プロセスから行う。
+    """
+
+    def __init__(self, index_dir: str, backend: EmbeddingBackend, rebuild: bool = False):
+        """
+        Parameters:
+        - index_dir: インデックスのディレクトリ
+        - backend: 埋め込みに使用するバックエンド
+        - rebuild: 既存のインデックスを削除して作り直す
+        """
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self._vectors_path = self.index_dir / "vectors.f32"
+        self._assign_path = self.index_dir / "assign.i32"
+        self._centroids_path = self.index_dir / "centroids.npy"
+        self._order_path = self.index_dir / "ivf_order.npy"
+        self._offsets_path = self.index_dir / "ivf_offsets.npy"
+        if rebuild:
+            for path in self.index_dir.iterdir():
+                path.unlink()
+
+        self._conn = sqlite3.connect(str(self.index_dir / "segments.sqlite3"))
+        self._conn.executescript(_SCHEMA)
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if meta and meta["backend"] != backend.cache_id():
+            self._conn.close()
+            raise ValueError(f"インデックスは別の埋め込みモデル（{meta['backend']}）で作成されています。"
+                             f"作り直してください: {self.index_dir}")
+        self.dimensions = backend.dimensions
+        self.count = int(meta.get("count", 0))
+        self.trained_count = int(meta.get("trained_count", 0))
+        if not meta:
+            self._set_meta(backend=backend.cache_id(), dimensions=self.dimensions, count=0, trained_count=0)
+            self._conn.commit()
+        # 書き込みの途中で終了した場合に備え、記録済みの件数より後ろのデータは捨てる
+        for path, itemsize in ((self._vectors_path, 4 * self.dimensions), (self._assign_path, 4)):
+            if path.exists() and path.stat().st_size > self.count * itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(self.count * itemsize)
+        self._load()
+
+    def _set_meta(self, **values: Any) -> None:
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [(key, str(value)) for key, value in values.items()])
+
+    def _load(self) -> None:
+        if self.count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self.count, self.dimensions))
+        else:
+            self._vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._deleted = np.zeros(self.count, dtype=bool)
+        deleted = [row[0] for row in self._conn.execute("SELECT id FROM segments WHERE deleted = 1")]
+        self._deleted[deleted] = True
+        if self.trained_count and self._centroids_path.exists():
+            self._centroids = np.load(self._centroids_path)
+            self._order = np.load(self._order_path, mmap_mode="r")
+            self._offsets = np.load(self._offsets_path)
+        else:
+            self._centroids = None
+
+    def close(self) -> None:
+        self._vectors = None
+        self._order = None
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def live_count(self) -> int:
+        """削除されていないセグメントの数"""
+        return self.count - int(self._deleted.sum())
+
+    def add(self, entries: Sequence[Tuple[str, float, str]], vectors: Optional[np.ndarray] = None) -> None:
+        """
+        セグメントを追加
+
+        Parameters:
+        - entries: (ファイルのパス, 開始時刻（秒）, テキスト) のリスト
+        - vectors: 埋め込み済みのベクトル（省略時はバックエンドで DEFAULT_EMBED_BATCH 件ずつ埋め込む）
+        """
+        if not entries:
+            return
+        if vectors is None:
+            vectors = np.concatenate([self.backend.embed([entry[2] for entry in entries[i:i + DEFAULT_EMBED_BATCH]])
+                                      for i in range(0, len(entries), DEFAULT_EMBED_BATCH)])
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(entries), self.dimensions):
+            raise ValueError(f"ベクトルの形が一致しません: {vectors.shape}")
+
+        first = self.count
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        self._conn.executemany("INSERT INTO segments (id, path, start, text) VALUES (?, ?, ?, ?)",
+                               [(first + i, path, start, text) for i, (path, start, text) in enumerate(entries)])
+        self.count += len(entries)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dimensions))
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(entries), dtype=bool)])
+        self._update_ivf(first)
+        self._set_meta(count=self.count, trained_count=self.trained_count)
+        self._conn.commit()
+
+    def _assign(self, start: int) -> np.ndarray:
+        labels = [np.argmax(self._vectors[i:i + ASSIGN_BLOCK] @ self._centroids.T, axis=1)
+                  for i in range(start, self.count, ASSIGN_BLOCK)]
+        return np.concatenate(labels).astype(np.int32)
+
+    def _update_ivf(self, first_new: int) -> None:
+        """追加したベクトルを転置リストに反映する（件数が増えた場合はクラスタを学習し直す）"""
+        if self.count < IVF_MIN_VECTORS:
+            return
+        if self._centroids is None or self.count >= self.trained_count * IVF_RETRAIN_GROWTH:
+            clusters = int(math.sqrt(self.count))
+            sample_size = min(self.count, clusters * KMEANS_SAMPLES_PER_CLUSTER)
+            rng = np.random.default_rng(self.count)
+            sample = np.asarray(self._vectors[np.sort(rng.choice(self.count, sample_size, replace=False))])
+            self._centroids = _kmeans(sample, clusters)
+            np.save(self._centroids_path, self._centroids)
+            self.trained_count = self.count
+            first_new = 0
+        with open(self._assign_path, "wb" if first_new == 0 else "ab") as f:
+            f.write(self._assign(first_new).tobytes())
+        assign = np.fromfile(self._assign_path, dtype=np.int32)
+        self._order = np.argsort(assign, kind="stable").astype(np.int32)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self._centroids)))])
+        np.save(self._order_path, self._order)
+        np.save(self._offsets_path, self._offsets)
+
+    def remove_file(self, path: str) -> None:
+        """ファイルのセグメントを削除済みにする（ベクトルは残し、検索結果から除く）"""
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM segments WHERE path = ? AND deleted = 0", (path,))]
+        self._conn.execute("UPDATE segments SET deleted = 1 WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._conn.commit()
+        self._deleted[ids] = True
+
+    def update(self, transcript_dir: str) -> Dict[str, int]:
+        """
+        ディレクトリ内の文字起こし結果（*.txt）のうち、新しいファイルと変更されたファイルを取り込む
+
+        Returns:
+        - Dict[str, int]: added（取り込んだファイル数）, removed（削除されたファイル数）, segments（追加したセグメント数）
+        """
+        stats = {"added": 0, "removed": 0, "segments": 0}
+        indexed = {path: (mtime, size) for path, mtime, size in self._conn.execute("SELECT path, mtime, size FROM files")}
+        current = set()
+        for transcript in sorted(Path(transcript_dir).glob("*.txt")):
+            path = str(transcript)
+            current.add(path)
+            stat = transcript.stat()
+            if indexed.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+            if path in indexed:
+                self.remove_file(path)
+            lines = parse_transcript(transcript.read_text(encoding="utf-8"))
+            self.add([(path, float(line["start"]), line["text"]) for line in lines])
+            self._conn.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                               (path, stat.st_mtime, stat.st_size))
+            self._conn.commit()
+            stats["added"] += 1
+            stats["segments"] += len(lines)
+        for path in set(indexed) - current:
+            self.remove_file(path)
+            stats["removed"] += 1
+        return stats
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """IVFで調べるセグメントの番号（学習前は None で全件）"""
+        if self._centroids is None:
+            return None
+        nprobe = min(nprobe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        ids = np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe])
+        # 学習後に追加したベクトルはまだ割り当てられていない場合がある
+        ids = np.concatenate([ids, np.arange(len(self._order), self.count, dtype=np.int32)])
+        # メモリマップを先頭から順に読むように並べ替える
+        ids.sort()
+        return ids
+
+    def search(self, query: str, limit: int = 10, nprobe: int = DEFAULT_NPROBE) -> List[Dict[str, Any]]:
+        """
+        クエリと意味の近いセグメントを検索
+
+        Returns:
+        - List[Dict[str, Any]]: path, start, text, score（コサイン類似度）を持つ辞書のリスト（類似度の高い順）
+        """
+        if self.count == 0:
+            return []
+        query_vector = self.backend.embed([query])[0]
+        ids = self._candidates(query_vector, nprobe)
+        if ids is None:
+            scores = self._vectors @ query_vector
+            deleted = self._deleted
+        else:
+            scores = self._vectors[ids] @ query_vector
+            deleted = self._deleted[ids]
+        scores = np.where(deleted, -np.inf, scores)
+        top = np.argpartition(-scores, limit - 1)[:limit] if len(scores) > limit else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        selected = [(int(ids[i]) if ids is not None else int(i), float(scores[i])) for i in top]
+
+        placeholders = ",".join("?" * len(selected))
+        rows = {row[0]: row[1:] for row in self._conn.execute(
+            f"SELECT id, path, start, text FROM segments WHERE id IN ({placeholders})", [i for i, _ in selected])}
+        return [{"path": rows[i][0], "start": rows[i][1], "text": rows[i][2], "score": score} for i, score in selected]
+
+def keyword_search(transcript_dir: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    文字起こし結果からクエリを含むセグメントを検索（空白・句読点は無視する）
+
+    Returns:
+    - List[Dict[str, Any]]: path, start, text を持つ辞書のリスト（ファイル名・時刻順）
+    """
+    needle = normalize_text(query).lower()
+    results = []
+    for transcript in sorted(Path(transcript_dir).glob("*.txt")):
+        for line in parse_transcript(transcript.read_text(encoding="utf-8")):
+            if needle in normalize_text(line["text"]).lower():
+                results.append({"path": str(transcript), "start": float(line["start"]), "text": line["text"]})
+                if len(results) >= limit:
+                    return results
+    return results
+
+def format_search_results(results: List[Dict[str, Any]]) -> str:
+    """検索結果を1行ずつの文字列にする"""
+    if not results:
+        return "該当するセグメントはありません"
+    lines = []
+    for result in results:
+        score = f"{result['score']:.3f} " if "score" in result else ""
+        lines.append(f"{score}{Path(result['path']).name} [{format_time(result['start'])}] {result['text']}")
+    return "\n".join(lines)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import json
+from typing import Any, Iterable, List, Tuple, Union
+
+class Segment:
+    """
+    文字起こしの1セグメント（開始・終了時刻（秒）とテキスト）
+
+    辞書より小さく属性アクセスも速いため、レスポンスの解析・統合・整形・保存をこの形のまま行う。
+    segment["start"] のような辞書と同じ読み出しもできる。
+    """
+
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start: float, end: float, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def to_row(self) -> List[Any]:
+        """保存用の [start, end, text] のリスト"""
+        return [self.start, self.end, self.text]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Segment):
+            return NotImplemented
+        return (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+    def __repr__(self) -> str:
+        return f"Segment(start={self.start!r}, end={self.end!r}, text={self.text!r})"
+
+def _from_dict(segment: dict) -> Segment:
+    start = segment["start"]
+    # end のないセグメントは開始時刻で終わるものとする
+    return Segment(start, segment.get("end", start), segment["text"])
+
+def to_segment(value: Union[Segment, dict, list, tuple]) -> Segment:
+    """Segment・APIの辞書・保存した [start, end, text] のいずれかを Segment にする"""
+    if isinstance(value, Segment):
+        return value
+    if isinstance(value, dict):
+        return _from_dict(value)
+    start, end, text = value
+    return Segment(start, end, text)
+
+def load_segments(values: Iterable[Union[Segment, dict, list, tuple]]) -> List[Segment]:
+    """
+    セグメントの並びを Segment のリストにする
+
+    ジョブキューに以前の形式（辞書のリスト）で保存された結果も読み込める。
+    """
+    return [to_segment(value) for value in values]
+
+def dump_segments(segments: Iterable[Segment]) -> List[List[Any]]:
+    """
+    セグメントを保存用の [start, end, text] のリストにする（JSONでキー名を繰り返さない）
+    """
+    return [segment.to_row() for segment in segments]
+
+def parse_response(response: Any) -> Tuple[List[Segment], float]:
+    """
+    verbose_json 形式の文字起こしのレスポンスからセグメントと課金対象の長さを取り出す
+
+    Parameters:
+    - response: レスポンスの本文（bytes / str）、解析済みの辞書、または segments・duration 属性を持つオブジェクト
+
+    Returns:
+    - Tuple[List[Segment], float]: (セグメント, 音声の長さ（秒）)
+    """
+    if isinstance(response, (bytes, bytearray, str)):
+        # 本文は1回だけ解析し、使わないフィールド（id, tokens, avg_logprob など）は読み捨てる
+        response = json.loads(response)
+    if isinstance(response, dict):
+        return [_from_dict(segment) for segment in response.get("segments") or []], response["duration"]
+    return ([Segment(segment.start, segment.end, segment.text) for segment in response.segments or []],
+            response.duration)
@@ -0,0 +1,650 @@
+#!/usr/bin/env python
+"""
+ローカルの文字起こしサービス（HTTP）
+
+音声ファイルをストリーミングでアップロードしてジョブを登録し、ジョブの状態・進捗の確認と、
+文字起こし結果のダウンロード（txt / json / srt / vtt）ができる。ジョブは決まった数のワーカースレッドで
+process_single_file により処理し、処理待ちのジョブが上限に達している間は新しいアップロードを 503 で断る。
+
+    python -m src.main serve --port 8080 --workers 2
+    curl -T meeting.wav "http://127.0.0.1:8080/jobs?filename=meeting.wav"
+    curl -N http://127.0.0.1:8080/jobs/<id>/events
+    curl -o meeting.srt "http://127.0.0.1:8080/jobs/<id>/result?format=srt"
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+from src.functions.minutes import parse_transcript
+from src.functions.segments import Segment
+from src.functions.transcribe import AUDIO_EXTENSIONS, CHUNK_OVERLAP_SECONDS, estimate_file, process_single_file
+
+# 待ち受けるアドレスとポート
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# アップロードされた音声と文字起こし結果を保存するディレクトリ
+DEFAULT_DATA_DIR = "service_data"
+
+# 同時に文字起こしするファイル数（ファイル内のチャンクは transcribe の設定に従って並行して送信する）
+DEFAULT_WORKERS = 2
+
+# 処理中のジョブとは別に受け付ける処理待ちのジョブ数（超えた場合は 503 を返す）
+DEFAULT_MAX_PENDING = 8
+
+# アップロードの上限（バイト、Noneの場合は制限しない）
+DEFAULT_MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024
+
+# 受け付けられない場合にクライアントへ再試行を促すまでの秒数（Retry-After）
+RETRY_AFTER_SECONDS = 30
+
+# アップロードを受信してファイルに書き込む単位（バイト）
+UPLOAD_BLOCK_BYTES = 64 * 1024
+
+# chunked 形式のチャンクサイズ行・トレーラー行の長さの上限（バイト）
+_MAX_LINE_BYTES = 1024
+
+# 進捗の変化がない間にイベントストリームへ送るコメントの間隔（秒、接続の維持と切断の検出）
+EVENT_KEEPALIVE_SECONDS = 15.0
+
+# 文字起こし結果のタイムスタンプは秒単位のため、字幕の各行に最低限与える表示時間（秒）
+MIN_CUE_SECONDS = 1.0
+
+# ジョブの状態
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+# ダウンロードできる形式と Content-Type
+RESULT_FORMATS = {
+    "txt": "text/plain; charset=utf-8",
+    "json": "application/json",
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+}
+
+class UploadTooLargeError(ValueError):
+    """アップロードが上限を超えた"""
+
+def iter_length_body(rfile, length: int) -> Iterator[bytes]:
+    """Content-Length で長さが決まった本文を、一定の大きさのブロックで読み出す"""
+    remaining = length
+    while remaining > 0:
+        block = rfile.read(min(UPLOAD_BLOCK_BYTES, remaining))
+        if not block:
+            raise ValueError("アップロードが途中で終わりました")
+        remaining -= len(block)
+        yield block
+
+def iter_chunked_body(rfile) -> Iterator[bytes]:
+    """Transfer-Encoding: chunked の本文をデコードしながら、一定の大きさ以下のブロックで読み出す"""
+    while True:
+        line = rfile.readline(_MAX_LINE_BYTES)
+        try:
+            size = int(line.split(b";")[0].strip(), 16)
+        except ValueError:
+            raise ValueError("chunked 形式の本文が不正です") from None
+        if size == 0:
+            # トレーラーは読み捨てる
+            while rfile.readline(_MAX_LINE_BYTES) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        yield from iter_length_body(rfile, size)
+        rfile.readline(_MAX_LINE_BYTES)
+
+def transcript_segments(text: str, duration: Optional[float] = None) -> List[Segment]:
+    """
+    文字起こし結果のテキストを、終了時刻付きのセグメントにする
+
+    各行の終了時刻は次の行の開始時刻、最後の行は音声の長さとする（最低 MIN_CUE_SECONDS 秒）。
+    """
+    lines = parse_transcript(text)
+    segments = []
+    for index, line in enumerate(lines):
+        start = float(line["start"])
+        end = float(lines[index + 1]["start"]) if index + 1 < len(lines) else (duration or start)
+        segments.append(Segment(start, max(end, start + MIN_CUE_SECONDS), line["text"]))
+    return segments
+
+def _cue_time(seconds: float, separator: str) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, rest = divmod(milliseconds, 3600 * 1000)
+    minutes, rest = divmod(rest, 60 * 1000)
+    return f"{hours:02d}:{minutes:02d}:{rest // 1000:02d}{separator}{rest % 1000:03d}"
+
+def format_srt(segments: Iterable[Segment]) -> str:
+    """セグメントを SubRip（.srt）形式にする"""
+    cues = [f"{index}\n{_cue_time(segment.start, ',')} --> {_cue_time(segment.end, ',')}\n{segment.text}\n"
+            for index, segment in enumerate(segments, 1)]
+    return "\n".join(cues)
+
+def format_vtt(segments: Iterable[Segment]) -> str:
+    """セグメントを WebVTT（.vtt）形式にする"""
+    cues = [f"{_cue_time(segment.start, '.')} --> {_cue_time(segment.end, '.')}\n{segment.text}\n"
+            for segment in segments]
+    return "\n".join(["WEBVTT\n"] + cues)
+
+class TranscriptionService:
+    """
+    文字起こしジョブの管理（アップロードの保存・ワーカーによる処理・状態と進捗の記録）
+
+    受け付けるジョブの数（処理中と処理待ちの合計）は workers + max_pending までとし、
+    アップロードの前に reserve で枠を確保する。ジョブの状態はメモリに保持する（再起動すると失われる）。
+    """
+
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR, workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING, max_upload_bytes: Optional[int] = DEFAULT_MAX_UPLOAD_BYTES,
+                 overlap_seconds: float = CHUNK_OVERLAP_SECONDS, keep_uploads: bool = False):
+        """
+        Parameters:
+        - data_dir: アップロードされた音声（uploads）と文字起こし結果（transcripts）を保存するディレクトリ
+        - workers: 同時に文字起こしするファイル数
+        - max_pending: 処理中のジョブとは別に受け付ける処理待ちのジョブ数
+        - max_upload_bytes: アップロードの上限（バイト、Noneの場合は制限しない）
+        - overlap_seconds: 隣接チャンクの重なり幅（秒）
+        - keep_uploads: Trueの場合、文字起こしを終えた音声を削除しない
+        """
+        if workers < 1:
+            raise ValueError("ワーカー数は1以上を指定してください")
+        if max_pending < 0:
+            raise ValueError("処理待ちのジョブ数は0以上を指定してください")
+        self.upload_dir = Path(data_dir) / "uploads"
+        self.transcript_dir = Path(data_dir) / "transcripts"
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.transcript_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.overlap_seconds = overlap_seconds
+        self.keep_uploads = keep_uploads
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # ジョブの状態が変わるたびに通知する（イベントストリームの待機に使用）
+        self._changed = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def start(self) -> "TranscriptionService":
+        """ワーカースレッドを起動する"""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"transcription-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self) -> None:
+        """処理中のジョブを終えてからワーカースレッドを停止する（処理待ちのジョブは処理しない）"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def check_upload(self, filename: str, length: Optional[int] = None) -> str:
+        """
+        アップロードのファイル名と長さを確認する
+
+        Returns:
+        - str: 保存に使う拡張子（小文字）
+        """
+        extension = Path(filename).suffix.lower()
+        if extension not in AUDIO_EXTENSIONS:
+            raise ValueError(f"サポートされていないファイル形式です: {filename}"
+                             f"（対応形式: {', '.join(sorted(AUDIO_EXTENSIONS))}）")
+        if length is not None and self.max_upload_bytes is not None and length > self.max_upload_bytes:
+            raise UploadTooLargeError(f"アップロードが上限（{self.max_upload_bytes}バイト）を超えています")
+        return extension
+
+    def reserve(self) -> bool:
+        """ジョブを1件受け付ける枠を確保する（空きがない場合はFalse）"""
+        return not self._closed and self._slots.acquire(blocking=False)
+
+    def release(self) -> None:
+        """reserve で確保した枠を、ジョブを登録せずに返す"""
+        self._slots.release()
+
+    def submit(self, filename: str, blocks: Iterable[bytes]) -> Dict[str, Any]:
+        """
+        アップロードされた音声を保存してジョブを登録する（reserve で枠を確保してから呼び出す）
+
+        本文は受信したブロックごとにファイルへ書き込み、全体をメモリに保持しない。
+        保存に失敗した場合は書きかけのファイルを削除し、枠を返してから例外を送出する。
+
+        Parameters:
+        - filename: クライアントが指定したファイル名（拡張子で形式を判定する）
+        - blocks: 本文のブロック
+
+        Returns:
+        - Dict[str, Any]: ジョブの状態（get と同じ形式）
+        """
+        try:
+            name = Path(filename).name
+            extension = self.check_upload(name)
+            job_id = uuid.uuid4().hex
+            upload_path = self.upload_dir / f"{job_id}{extension}"
+            part_path = upload_path.with_name(upload_path.name + ".part")
+            size = 0
+            try:
+                with open(part_path, "wb") as f:
+                    for block in blocks:
+                        size += len(block)
+                        if self.max_upload_bytes is not None and size > self.max_upload_bytes:
+                            raise UploadTooLargeError(f"アップロードが上限（{self.max_upload_bytes}バイト）を超えています")
+                        f.write(block)
+                os.replace(part_path, upload_path)
+            except BaseException:
+                if part_path.exists():
+                    part_path.unlink()
+                raise
+        except BaseException:
+            self.release()
+            raise
+
+        # 進捗の割合を求めるため、ヘッダーから長さとチャンク数を見積もる（読めない形式では省略する）
+        try:
+            estimate = estimate_file(str(upload_path), self.overlap_seconds)
+            duration, total_chunks = estimate["duration"], estimate["chunks"]
+        except Exception:
+            duration, total_chunks = None, None
+
+        job = {
+            "id": job_id,
+            "filename": name,
+            "status": STATUS_QUEUED,
+            "upload_bytes": size,
+            "duration": duration,
+            "total_chunks": total_chunks,
+            "completed_chunks": 0,
+            "processed_seconds": 0.0,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "version": 0,
+            "upload_path": upload_path,
+            "transcript_path": None,
+        }
+        with self._changed:
+            self._jobs[job_id] = job
+            snapshot = self._snapshot(job)
+        self._queue.put(job_id)
+        return snapshot
+
+    @staticmethod
+    def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+        """ジョブの公開する項目の写し（進捗の割合を含む）"""
+        snapshot = {key: value for key, value in job.items() if not key.endswith("_path")}
+        if job["status"] == STATUS_DONE:
+            snapshot["progress"] = 1.0
+        elif job["duration"]:
+            snapshot["progress"] = min(job["processed_seconds"] / job["duration"], 1.0)
+        else:
+            snapshot["progress"] = None
+        return snapshot
+
+    def _update(self, job_id: str, **changes: Any) -> None:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            job["version"] += 1
+            self._changed.notify_all()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ジョブの状態（存在しない場合はNone）"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """すべてのジョブの状態（登録の順）"""
+        with self._changed:
+            return [self._snapshot(job) for job in self._jobs.values()]
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数"""
+        with self._changed:
+            counts = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+    def wait(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        ジョブの状態が version から変わるまで待つ
+
+        Returns:
+        - Optional[Dict[str, Any]]: 最新の状態（timeout 秒の間に変わらなかった場合は同じ version の状態）。
+          ジョブが削除された場合はNone
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._closed or job_id not in self._jobs or self._jobs[job_id]["version"] != version,
+                timeout)
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def delete(self, job_id: str) -> bool:
+        """
+        完了したジョブと文字起こし結果を削除する
+
+        Returns:
+        - bool: 削除した場合はTrue（存在しない場合はFalse）
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if job["status"] not in FINISHED_STATUSES:
+                raise ValueError("処理が終わっていないジョブは削除できません")
+            del self._jobs[job_id]
+            self._changed.notify_all()
+        for path in (job["upload_path"], job["transcript_path"]):
+            if path is not None and path.exists():
+                path.unlink()
+        return True
+
+    def result(self, job_id: str, result_format: str) -> Tuple[bytes, str, str]:
+        """
+        文字起こし結果を指定した形式で返す
+
+        Returns:
+        - Tuple[bytes, str, str]: (本文, Content-Type, ダウンロードするファイル名)
+        """
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"サポートされていない形式です: {result_format}（対応形式: {', '.join(RESULT_FORMATS)}）")
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job["status"] != STATUS_DONE:
+                raise ValueError(f"文字起こしが完了していません（{job['status']}）")
+            transcript_path, duration, filename = job["transcript_path"], job["duration"], job["filename"]
+
+        text = transcript_path.read_text(encoding="utf-8")
+        if result_format == "txt":
+            body = text
+        else:
+            segments = transcript_segments(text, duration)
+            if result_format == "srt":
+                body = format_srt(segments)
+            elif result_format == "vtt":
+                body = format_vtt(segments)
+            else:
+                body = json.dumps({"id": job_id, "filename": filename, "duration": duration,
+                                   "segments": [{"start": segment.start, "end": segment.end, "text": segment.text}
+                                                for segment in segments]}, ensure_ascii=False)
+        return body.encode("utf-8"), RESULT_FORMATS[result_format], f"{Path(filename).stem}.{result_format}"
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._closed:
+                return
+            self._run(job_id)
+
+    def _run(self, job_id: str) -> None:
+        with self._changed:
+            upload_path = self._jobs[job_id]["upload_path"]
+
+        def progress(event: Dict[str, Any]) -> None:
+            with self._changed:
+                processed = max(self._jobs[job_id]["processed_seconds"], event["end_seconds"])
+            self._update(job_id, completed_chunks=event["completed_chunks"], processed_seconds=processed)
+
+        self._update(job_id, status=STATUS_RUNNING, started_at=time.time())
+        try:
+            transcript_path = process_single_file(str(upload_path), str(self.transcript_dir), self.overlap_seconds,
+                                                  progress=progress)
+            self._update(job_id, status=STATUS_DONE, transcript_path=Path(transcript_path), finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+        finally:
+            if not self.keep_uploads and upload_path.exists():
+                upload_path.unlink()
+            self._slots.release()
+
+# 応答（ステータスコード, 本文, Content-Type, 追加のヘッダー）
+_Response = Tuple[int, bytes, str, Dict[str, str]]
+
+def _json(status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> _Response:
+    return status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json", headers or {}
+
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> _Response:
+    return _json(status, {"error": message}, headers)
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """文字起こしサービスのエンドポイントを処理するハンドラ"""
+    protocol_version = "HTTP/1.1"
+    server: "_ServiceHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_expect_100(self) -> bool:
+        # 100 Continue は受け付けを決めてから返す（断る場合はクライアントに本文を送らせない）
+        return True
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        url = urlsplit(self.path)
+        return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+    def _has_body(self) -> bool:
+        return "Content-Length" in self.headers or "chunked" in self.headers.get("Transfer-Encoding", "").lower()
+
+    def _reject(self, response: _Response) -> None:
+        """本文を読まずに応答して接続を閉じる"""
+        self.close_connection = self._has_body()
+        self._send(*response)
+
+    def _upload(self, query: Dict[str, List[str]]) -> _Response:
+        service = self.server.service
+        filename = (query.get("filename") or [self.headers.get("X-Filename", "")])[0]
+        chunked = "chunked" in self.headers.get("Transfer-Encoding", "").lower()
+        length = None if chunked else self.headers.get("Content-Length")
+        if length is None and not chunked:
+            return _error(411, "Content-Length または Transfer-Encoding: chunked が必要です")
+        try:
+            service.check_upload(filename, int(length) if length is not None else None)
+        except UploadTooLargeError as e:
+            return _error(413, str(e))
+        except ValueError as e:
+            return _error(400, str(e))
+        if not service.reserve():
+            return _error(503, "処理待ちのジョブが上限に達しています。時間をおいて再試行してください",
+                          {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+        if self.headers.get("Expect", "").lower() == "100-continue":
+            self.send_response_only(100)
+            self.end_headers()
+        blocks = iter_chunked_body(self.rfile) if chunked else iter_length_body(self.rfile, int(length))
+        try:
+            job = service.submit(filename, blocks)
+        except UploadTooLargeError as e:
+            self.close_connection = True
+            return _error(413, str(e))
+        except (ValueError, OSError) as e:
+            self.close_connection = True
+            return _error(400, str(e))
+        return _json(202, job, {"Location": f"/jobs/{job['id']}"})
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            self._reject(_error(404, f"Unknown path: {self.path}"))
+            return
+        response = self._upload(query)
+        if response[0] != 202 and not self.close_connection:
+            # 本文を読まずに断った場合は接続を閉じる
+            self.close_connection = self._has_body()
+        self._send(*response)
+
+    def do_GET(self):
+        parts, query = self._route()
+        service = self.server.service
+        if parts == ["health"]:
+            self._send(*_json(200, {"workers": service.workers, "max_pending": service.max_pending,
+                                    "jobs": service.counts()}))
+            return
+        if parts == ["jobs"]:
+            self._send(*_json(200, service.list_jobs()))
+            return
+        if len(parts) < 2 or parts[0] != "jobs" or len(parts) > 3:
+            self._send(*_error(404, f"Unknown path: {self.path}"))
+            return
+        job = service.get(parts[1])
+        if job is None:
+            self._send(*_error(404, f"ジョブが見つかりません: {parts[1]}"))
+            return
+        if len(parts) == 2:
+            self._send(*_json(200, job))
+        elif parts[2] == "events":
+            self._stream_events(job)
+        elif parts[2] == "result":
+            self._send(*self._result(job, (query.get("format") or ["txt"])[0]))
+        else:
+            self._send(*_error(404, f"Unknown path: {self.path}"))
+
+    def _result(self, job: Dict[str, Any], result_format: str) -> _Response:
+        if result_format not in RESULT_FORMATS:
+            return _error(400, f"サポートされていない形式です: {result_format}（対応形式: {', '.join(RESULT_FORMATS)}）")
+        if job["status"] == STATUS_FAILED:
+            return _error(409, f"文字起こしに失敗しました: {job['error']}")
+        if job["status"] != STATUS_DONE:
+            return _error(409, f"文字起こしが完了していません（{job['status']}）",
+                          {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        try:
+            body, content_type, filename = self.server.service.result(job["id"], result_format)
+        except (KeyError, OSError) as e:
+            return _error(404, f"文字起こし結果が見つかりません: {e}")
+        return 200, body, content_type, {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+
+    def _stream_events(self, job: Dict[str, Any]) -> None:
+        """
+        ジョブの状態を Server-Sent Events で送る（状態が変わるたびに1件、完了・失敗で終了）
+        """
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            version = None
+            while job is not None:
+                if job["version"] != version:
+                    version = job["version"]
+                    data = json.dumps(job, ensure_ascii=False)
+                    self.wfile.write(f"id: {version}\nevent: {job['status']}\ndata: {data}\n\n".encode("utf-8"))
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                if job["status"] in FINISHED_STATUSES or self.server.service.closed:
+                    return
+                job = self.server.service.wait(job["id"], version, self.server.keepalive_seconds)
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントが切断した
+            return
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._reject(_error(404, f"Unknown path: {self.path}"))
+            return
+        try:
+            deleted = self.server.service.delete(parts[1])
+        except ValueError as e:
+            self._reject(_error(409, str(e)))
+            return
+        if not deleted:
+            self._reject(_error(404, f"ジョブが見つかりません: {parts[1]}"))
+            return
+        self._reject((204, b"", "application/json", {}))
+
+class _ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: TranscriptionService, keepalive_seconds: float):
+        super().__init__(address, _ServiceHandler)
+        self.service = service
+        self.keepalive_seconds = keepalive_seconds
+
+class TranscriptionServer:
+    """文字起こしサービスを提供する HTTP サーバー"""
+
+    def __init__(self, service: TranscriptionService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 keepalive_seconds: float = EVENT_KEEPALIVE_SECONDS):
+        """
+        Parameters:
+        - service: ジョブを処理するサービス（サーバーの開始・停止に合わせてワーカーを起動・停止する）
+        - host: 待ち受けるアドレス
+        - port: 待ち受けるポート（0の場合は空いているポート）
+        - keepalive_seconds: 進捗の変化がない間にイベントストリームへコメントを送る間隔（秒）
+        """
+        self.service = service
+        self._server = _ServiceHTTPServer((host, port), service, keepalive_seconds)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "TranscriptionServer":
+        self.service.start()
+        # 停止を待つ時間を短くするため、停止要求の確認間隔を短くする
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,),
+                                        name="transcription-service", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.service.close()
+
+    def serve_forever(self) -> None:
+        """現在のスレッドで待ち受ける（Ctrl+Cで終了）"""
+        self.service.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.service.close()
+
+    def __enter__(self) -> "TranscriptionServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+import json
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import soundfile as sf
+from src.functions.capture_buffer import recover_spool
+
+# セッションの状態ファイルの拡張子（音声ファイルと同じディレクトリに <音声ファイル名>.session.json で置く）
+SESSION_SUFFIX = ".session.json"
+
+# セッションの録音中にメモリに保持する上限（バイト）。
+# 超えた分はすぐに一時ファイルに書き出すため、異常終了しても失われるのは数秒分に留まる
+SESSION_MEMORY_LIMIT = 1024 * 1024
+
+# 追記するために音声ファイルを WAV に戻す際に1回で読み書きするフレーム数
+RESTORE_BLOCK_FRAMES = 64 * 1024
+
+# セッション名に使用できない文字（ファイル名の一部になるため）
+_INVALID_NAME = re.compile(r"[\\/:*?\"<>|\s]")
+
+def session_state_path(audio_path: str) -> str:
+    """音声ファイルに対応するセッションの状態ファイルのパス"""
+    return f"{os.path.splitext(audio_path)[0]}{SESSION_SUFFIX}"
+
+def is_session_audio(audio_path: str) -> bool:
+    """録音セッションの音声ファイルかどうか（セッションは文字起こし済みの位置から続きだけを文字起こしする）"""
+    return os.path.exists(session_state_path(str(audio_path)))
+
+class RecordingSession:
+    """
+    複数回の録音を1つの音声ファイルにまとめる録音セッション
+
+    停止・一時停止した録音や、異常終了した録音の続きを同じ名前で再開すると、同じ音声ファイルの末尾に追記する。
+    文字起こし済みの位置（フレーム数）を記録し、続きの文字起こしでは新しく追記された部分だけを送信する。
+    状態は音声ファイルと同じ場所の JSON ファイルに保存する。
+    """
+
+    def __init__(self, state_path: str, state: Dict[str, Any]):
+        self.state_path = state_path
+        self.state = state
+
+    @classmethod
+    def load(cls, state_path: str) -> "RecordingSession":
+        """状態ファイルからセッションを読み込む"""
+        with open(state_path, encoding="utf-8") as f:
+            return cls(state_path, json.load(f))
+
+    @classmethod
+    def create(cls, recordings_dir: str, name: str, sample_rate: int) -> "RecordingSession":
+        """
+        新しいセッションを作成（音声ファイルは YYYYMMDD_[セッション名].wav）
+
+        Parameters:
+        - recordings_dir: 録音ファイルの保存ディレクトリ
+        - name: セッション名
+        - sample_rate: 録音ファイルのサンプリングレート（Hz）。再開時も同じレートで録音する
+        """
+        if not name or _INVALID_NAME.search(name):
+            raise ValueError(f"セッション名に使用できない文字が含まれています: {name!r}")
+        os.makedirs(recordings_dir, exist_ok=True)
+        audio_path = os.path.join(recordings_dir, f"{datetime.now().strftime('%Y%m%d')}_{name}.wav")
+        session = cls(session_state_path(audio_path), {
+            "name": name,
+            "audio_file": os.path.basename(audio_path),
+            "sample_rate": sample_rate,
+            "created_at": time.time(),
+            "runs": [],
+            "transcribed_frames": 0,
+            "billed_seconds": 0.0,
+            "overlap_seconds": 0.0,
+        })
+        session.save()
+        return session
+
+    @property
+    def name(self) -> str:
+        return self.state["name"]
+
+    @property
+    def audio_path(self) -> str:
+        return os.path.join(os.path.dirname(self.state_path), self.state["audio_file"])
+
+    @property
+    def sample_rate(self) -> int:
+        return self.state["sample_rate"]
+
+    @property
+    def frames(self) -> int:
+        """録音済みのフレーム数（ヘッダーから読む）"""
+        if not os.path.exists(self.audio_path):
+            return 0
+        return sf.info(self.audio_path).frames
+
+    @property
+    def transcribed_frames(self) -> int:
+        """文字起こし済みの位置（フレーム数）"""
+        return self.state["transcribed_frames"]
+
+    def save(self) -> None:
+        """状態を保存（書き込み途中で終了しても壊れないよう、一時ファイルに書いてから置き換える）"""
+        self.state["updated_at"] = time.time()
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def restore_wav(self) -> bool:
+        """
+        圧縮（compact）で FLAC などに置き換えた音声ファイルを WAV に戻す（録音の続きを追記できるようにする）
+
+        Returns:
+        - bool: 戻した場合はTrue
+        """
+        source = self.audio_path
+        if os.path.splitext(source)[1].lower() == ".wav" or not os.path.exists(source):
+            return False
+        target = f"{os.path.splitext(source)[0]}.wav"
+        temp_path = f"{target}.tmp"
+        with sf.SoundFile(source) as f:
+            # WAVの8bitは符号なし
+            subtype = "PCM_U8" if f.subtype == "PCM_S8" else f.subtype
+            with sf.SoundFile(temp_path, "w", f.samplerate, f.channels, subtype, format="WAV") as output:
+                for block in f.blocks(RESTORE_BLOCK_FRAMES, dtype="int32", always_2d=True):
+                    output.write(block)
+        os.replace(temp_path, target)
+        self.state["audio_file"] = os.path.basename(target)
+        self.save()
+        os.remove(source)
+        return True
+
+    def recover(self) -> int:
+        """
+        前回の録音が異常終了して残った一時ファイルの録音データを音声ファイルに戻す
+
+        Returns:
+        - int: 戻したフレーム数
+        """
+        frames = recover_spool(self.audio_path)
+        if frames:
+            end = self.frames
+            self.state["runs"].append({"started_at": None, "start_frame": end - frames, "end_frame": end,
+                                       "recovered": True})
+            self.save()
+        return frames
+
+    def add_run(self, started_at: float, start_frame: int) -> None:
+        """1回分の録音（start_frame から現在の末尾まで）を記録"""
+        self.state["runs"].append({"started_at": started_at, "start_frame": start_frame, "end_frame": self.frames})
+        self.save()
+
+    def mark_transcribed(self, frames: int, billed_seconds: float, overlap_seconds: float) -> None:
+        """文字起こし済みの位置を進め、課金対象の長さを累計する"""
+        self.state["transcribed_frames"] = frames
+        self.state["billed_seconds"] += billed_seconds
+        self.state["overlap_seconds"] += overlap_seconds
+        self.save()
+
+def find_session(recordings_dir: str, name: str) -> Optional[RecordingSession]:
+    """名前でセッションを探す（同じ名前が複数ある場合は最後に作成したもの）"""
+    sessions = [session for session in list_sessions(recordings_dir) if session.name == name]
+    return sessions[-1] if sessions else None
+
+def list_sessions(recordings_dir: str) -> List[RecordingSession]:
+    """ディレクトリ内のセッション（作成順）"""
+    if not os.path.isdir(recordings_dir):
+        return []
+    sessions = [RecordingSession.load(str(path)) for path in Path(recordings_dir).glob(f"*{SESSION_SUFFIX}")]
+    return sorted(sessions, key=lambda session: session.state["created_at"])
+
+def open_session(recordings_dir: str, name: str, sample_rate: int) -> RecordingSession:
+    """
+    セッションを再開する（ない場合は作成する）
+
+    音声ファイルが圧縮されている場合は、追記できるように WAV に戻す。
+
+    Parameters:
+    - sample_rate: 録音するサンプリングレート（Hz）。既存のセッションと異なる場合はエラー
+    """
+    session = find_session(recordings_dir, name)
+    if session is None:
+        return RecordingSession.create(recordings_dir, name, sample_rate)
+    if session.sample_rate != sample_rate:
+        raise ValueError(f"セッション {name} は {session.sample_rate}Hz で録音されています"
+                         f"（指定: {sample_rate}Hz）。同じ設定で再開してください")
+    session.restore_wav()
+    return session
@@ -0,0 +1,128 @@
+import re
+from difflib import SequenceMatcher
+from src.functions.segments import Segment, load_segments
+
+# 継ぎ目の重複判定で無視する文字（空白と句読点）
+_IGNORED_CHARS = re.compile(r"[\s、。，．,.!?！？「」『』…・]+")
+
+# 重なり区間で同一発話とみなす開始時刻の差（秒）
+SEAM_TIME_TOLERANCE = 1.0
+
+# 重なり区間で同一発話とみなす文字列類似度の下限
+SEAM_SIMILARITY_THRESHOLD = 0.8
+
+def normalize_text(text):
+    """
+    重複判定用にテキストを正規化する（空白・句読点を除去）
+    """
+    return _IGNORED_CHARS.sub("", text)
+
+def chunk_bounds(chunk):
+    """
+    チャンクのサンプル位置から開始・終了時刻（秒）を計算する
+
+    Args:
+        chunk (dict): start_sample, end_sample, sample_rate を含む辞書
+
+    Returns:
+        tuple: (開始時刻, 終了時刻)
+    """
+    sample_rate = chunk["sample_rate"]
+    return chunk["start_sample"] / sample_rate, chunk["end_sample"] / sample_rate
+
+def text_similarity(a, b):
+    """
+    正規化済みテキスト同士の類似度（0.0〜1.0）を返す
+
+    一方がもう一方に含まれる場合（境界で切れた発話）は1.0とみなす
+    """
+    if not a or not b:
+        return 0.0
+    if a in b or b in a:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # 安価な上限値で足切りしてから正確な類似度を計算する
+    if matcher.real_quick_ratio() < SEAM_SIMILARITY_THRESHOLD:
+        return 0.0
+    if matcher.quick_ratio() < SEAM_SIMILARITY_THRESHOLD:
+        return 0.0
+    return matcher.ratio()
+
+def _find_seam_match(stitched, previous_count, text, start, seam_start):
+    """
+    重なり区間で、直前までのチャンクから出力済みの同一発話を探す
+
+    Args:
+        stitched (list): 出力済みの Segment
+        previous_count (int): 直前までのチャンク由来のセグメント数
+        text (str): 判定対象のテキスト
+        start (float): 判定対象の開始時刻（秒）
+        seam_start (float): 重なり区間の開始時刻（秒）
+
+    Returns:
+        int: 一致したセグメントの位置。見つからない場合はNone
+    """
+    normalized = normalize_text(text)
+    for i in range(previous_count - 1, -1, -1):
+        segment = stitched[i]
+        # 重なり区間の開始までに終わったセグメントは次のチャンクに含まれない
+        if segment.end <= seam_start:
+            break
+        if abs(segment.start - start) > SEAM_TIME_TOLERANCE:
+            continue
+        # 同一発話であれば時間的に重なる（出力済みの発話が終わった後に始まるものは別の発話）
+        if start > segment.end:
+            continue
+        if text_similarity(normalized, normalize_text(segment.text)) >= SEAM_SIMILARITY_THRESHOLD:
+            return i
+    return None
+
+def stitch_segments(chunk_results):
+    """
+    チャンクごとの文字起こし結果を一本のタイムラインに統合する
+
+    各セグメントの時刻には、分割時に確定したチャンクのサンプルオフセットを加算する。
+    APIが返すdurationには依存しないため、スキップされたチャンクがあっても時刻はずれない。
+    チャンクの完了順は問わない（indexで並べ替えてから統合する）。
+
+    隣接チャンクの重なり区間では、開始時刻と文字列類似度で同一発話を照合し、
+    チャンク端からより離れている（切れていない可能性が高い）方を残す。
+
+    Args:
+        chunk_results (list): index, start_sample, end_sample, sample_rate, segments を含む辞書のリスト
+            （segments は Segment、APIの辞書、保存した [start, end, text] のいずれかの並び）
+
+    Returns:
+        list: 絶対時刻の Segment のリスト（開始時刻順）
+    """
+    stitched = []
+    prev_chunk_end = None
+
+    for result in sorted(chunk_results, key=lambda r: r["index"]):
+        offset, chunk_end = chunk_bounds(result)
+        previous_count = len(stitched)
+
+        for segment in load_segments(result["segments"]):
+            text = segment.text.strip()
+            if not normalize_text(text):
+                continue
+            start = offset + segment.start
+            end = max(start, offset + segment.end)
+            merged = Segment(start, end, text)
+
+            # 直前のチャンクと重なる区間では、既出の発話と統合する
+            if prev_chunk_end is not None and start < prev_chunk_end:
+                match = _find_seam_match(stitched, previous_count, text, start, offset)
+                if match is not None:
+                    existing = stitched[match]
+                    if start - offset > prev_chunk_end - existing.end:
+                        stitched[match] = merged
+                    continue
+
+            stitched.append(merged)
+
+        prev_chunk_end = chunk_end
+
+    # 安定ソートで開始時刻順に整列（同時刻は元の順序を維持）
+    stitched.sort(key=lambda s: s.start)
+    return stitched
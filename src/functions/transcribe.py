@@ -1,12 +1,25 @@
 import os
 import argparse
 from pathlib import Path
-from openai import OpenAI
 from dotenv import load_dotenv
-import json
 from datetime import datetime
-from pydub import AudioSegment
+import shutil
 import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+import soundfile as sf
+from src.functions.audio_io import (EncodePool, audio_info, extract_audio, iter_adaptive_chunks, iter_encoded_chunks,
+                                    plan_chunks)
+from src.functions.autotune import AutoTuner, format_report
+from src.functions.http_client import (ConnectionStats, build_timeout, create_client, measure_request,
+                                       DEFAULT_MAX_CONNECTIONS, DEFAULT_READ_TIMEOUT)
+from src.functions.profiler import DEFAULT_FORMAT, DEFAULT_INTERVAL, FORMATS, CpuProfiler, stage, staged
+from src.functions.segments import parse_response
+from src.functions.stitch import chunk_bounds, stitch_segments
+from src.functions.scheduler import (DEFAULT_POLICY, FALLBACK_BITRATE, POLICIES, ScheduleRules, header_duration,
+                                     order_files)
+from src.functions.session import RecordingSession, is_session_audio, session_state_path
 
 # .envファイルから環境変数を読み込む
 load_dotenv()
@@ -15,12 +28,96 @@ load_dotenv()
 if not os.getenv("OPENAI_API_KEY"):
     raise ValueError("環境変数 OPENAI_API_KEY が設定されていません。.envファイルを確認してください。")
 
-# OpenAIクライアントの初期化
-client = OpenAI()
+# HTTP接続の集計（バッチごとに省略できたハンドシェイク数の算出に使用）
+client_stats = ConnectionStats()
+
+# OpenAIクライアントの初期化（コネクションプールはプロセス内で共有し、process_directoryの実行間でも再利用する）
+client = create_client(stats=client_stats)
+
+# ファイルごとのCPUプロファイル（configure_profiler で有効にする。Noneの場合は計測しない）
+profiler = None
 
 # チャンクサイズを20MBに設定（バイト単位）
 CHUNK_SIZE = 20 * 1024 * 1024
 
+# 隣接チャンクの重なり幅（秒）。境界付近の発話の欠落を防ぐ
+CHUNK_OVERLAP_SECONDS = 2.0
+
+# 文字起こしに使用するモデルと言語
+WHISPER_MODEL = "whisper-1"
+TRANSCRIBE_LANGUAGE = "ja"
+
+# 音声ストリームのみを取り出して文字起こしする動画コンテナ
+VIDEO_EXTENSIONS = {".mp4", ".webm"}
+
+# サポートする音声フォーマット（動画コンテナを含む）
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".flac", ".m4a"} | VIDEO_EXTENSIONS
+
+# これより短いチャンクはAPIに送信しない（秒）
+MIN_CHUNK_SECONDS = 0.1
+
+# チャンクを符号化するプロセス数（Noneの場合はCPUコア数）
+ENCODE_WORKERS = None
+
+# チャンクの符号化に使うプロセスプール（プロセス内の全てのファイルで共有し、最初に必要になったときに起動する）
+encode_pool = EncodePool(ENCODE_WORKERS)
+
+# Whisper APIの料金（1分あたりのドル）
+COST_PER_MINUTE = 0.006
+
+# ヘッダーからサンプリングレートとチャンネル数を読めない形式（m4aなど）で、チャンク数の見積もりに仮定する値
+ESTIMATE_SAMPLE_RATE = 48000
+ESTIMATE_CHANNELS = 2
+
+def configure_client(max_connections=DEFAULT_MAX_CONNECTIONS, read_timeout=DEFAULT_READ_TIMEOUT,
+                     http2=False, base_url=None):
+    """
+    モジュール共通のOpenAIクライアントを指定した接続設定で作り直す
+    
+    Args:
+        max_connections (int): コネクションプールの最大接続数
+        read_timeout (float): レスポンス待ちのタイムアウト（秒）
+        http2 (bool): HTTP/2を使用するかどうか
+        base_url (str): APIのベースURL
+    
+    Returns:
+        OpenAI: 新しいクライアント
+    """
+    global client
+    previous = client
+    client = create_client(
+        max_connections=max_connections,
+        timeout=build_timeout(read=read_timeout),
+        http2=http2,
+        stats=client_stats,
+        base_url=base_url
+    )
+    # 置き換えたクライアントのコネクションプールを閉じる
+    previous.close()
+    return client
+
+def configure_profiler(output_dir, fmt=DEFAULT_FORMAT, interval=DEFAULT_INTERVAL):
+    """
+    ファイルごとにステージ（decode / upload / parse / stitch / write）別のサンプリングプロファイルを書き出すようにする
+    
+    Args:
+        output_dir (str): プロファイルの出力ディレクトリ。Noneの場合は計測をやめる
+        fmt (str): 出力形式（speedscope / collapsed）
+        interval (float): サンプリングの間隔（秒）
+    
+    Returns:
+        CpuProfiler: 設定したプロファイラー（無効にした場合はNone）
+    """
+    global profiler
+    profiler = CpuProfiler(output_dir, fmt, interval) if output_dir else None
+    return profiler
+
+def profile_file(name):
+    """プロファイルが有効であれば、ブロックの実行中を name のプロファイルとして計測する"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.profile(name)
+
 def format_timestamp(seconds):
     """
     秒数を[00:00:00]形式の文字列に変換する
@@ -34,250 +131,692 @@ def calculate_audio_cost(duration_seconds):
     """
     音声の長さからコストを計算する（Whisper APIの料金に基づく）
     """
-    # Whisper APIの料金は1分あたり$0.006
-    cost_per_minute = 0.006
     minutes = duration_seconds / 60
-    return round(minutes * cost_per_minute, 4)
+    return round(minutes * COST_PER_MINUTE, 4)
+
+def estimate_file(audio_path, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    音声ファイルの文字起こしの長さとコストを、ヘッダーだけを読んで見積もる（デコード・APIの呼び出しはしない）
+
+    20MBを超えるファイルは分割後のチャンクの重なり区間も課金対象に含める。
+    動画コンテナは取り出した音声の大きさを既定のビットレートから推定する。
+
+    Args:
+        audio_path (str): 音声ファイルのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+
+    Returns:
+        dict: path, duration（秒）, chunks, overlap_seconds, cost_usd
+    """
+    path = Path(audio_path)
+    duration = header_duration(str(path))
+    if path.suffix.lower() in VIDEO_EXTENSIONS:
+        source_bytes = duration * FALLBACK_BITRATE / 8
+    else:
+        source_bytes = path.stat().st_size
+
+    chunks, overlap = 1, 0.0
+    if source_bytes > CHUNK_SIZE:
+        try:
+            info = sf.info(str(path))
+            sample_rate, channels = info.samplerate, info.channels
+        except Exception:
+            sample_rate, channels = ESTIMATE_SAMPLE_RATE, ESTIMATE_CHANNELS
+        bounds = plan_chunks(int(duration * sample_rate), sample_rate, channels, CHUNK_SIZE, overlap_seconds)
+        chunks = len(bounds)
+        overlap = sum(bound[2] for bound in bounds) / sample_rate
+    return {
+        "path": str(path),
+        "duration": duration,
+        "chunks": chunks,
+        "overlap_seconds": overlap,
+        "cost_usd": calculate_audio_cost(duration + overlap),
+    }
+
+def estimate_files(audio_paths, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    複数の音声ファイルの文字起こしの長さとコストを見積もる
+
+    Returns:
+        dict: files（estimate_file の結果のリスト）, duration（秒）, overlap_seconds, cost_usd
+    """
+    files = [estimate_file(path, overlap_seconds) for path in audio_paths]
+    duration = sum(entry["duration"] for entry in files)
+    overlap = sum(entry["overlap_seconds"] for entry in files)
+    return {
+        "files": files,
+        "duration": duration,
+        "overlap_seconds": overlap,
+        "cost_usd": calculate_audio_cost(duration + overlap),
+    }
+
+def format_estimate(estimate):
+    """見積もりをファイルごとの行と合計の行にする"""
+    lines = []
+    for entry in estimate["files"]:
+        chunks = f"（{entry['chunks']}チャンク）" if entry["chunks"] > 1 else ""
+        lines.append(f"{Path(entry['path']).name}: {entry['duration'] / 60:.1f}分{chunks} ${entry['cost_usd']:.4f}")
+    lines.append(f"合計: {len(estimate['files'])}ファイル / {estimate['duration'] / 60:.1f}分"
+                 f"（チャンク重なり {estimate['overlap_seconds']:.0f}秒を含めて課金）/ 推定コスト ${estimate['cost_usd']:.4f}")
+    return "\n".join(lines)
+
+def check_budget(estimate, budget_usd):
+    """
+    見積もりが予算を超える場合はエラーにする（budget_usd が None の場合は確認しない）
+
+    Raises:
+        ValueError: 推定コストが予算を超える場合
+    """
+    if budget_usd is not None and estimate["cost_usd"] > budget_usd:
+        raise ValueError(f"推定コスト ${estimate['cost_usd']:.4f} が予算 ${budget_usd:.4f} を超えるため処理しません"
+                         f"（{len(estimate['files'])}ファイル / {estimate['duration'] / 60:.1f}分）")
 
 def get_audio_duration(audio_path):
     """
     音声ファイルの長さを取得する
     
+    WAV/MP3/FLACはヘッダーから、それ以外はffmpegでデコードしながら数える（ファイル全体をメモリに展開しない）
+    
     Args:
         audio_path (str): 音声ファイルのパス
     
     Returns:
-        float: 音声の長さ（秒）
+        float: 音声の長さ（秒、ミリ秒単位に丸める）
     """
     try:
-        audio = AudioSegment.from_file(audio_path)
-        return len(audio) / 1000.0
+        sample_rate, total_samples = audio_info(str(audio_path))
+        return round(total_samples * 1000 / sample_rate) / 1000.0
     except Exception as e:
         raise ValueError(f"音声ファイルの読み込み中にエラーが発生しました: {str(e)}")
 
-def split_audio(audio_path):
+def iter_audio_chunks(audio_path, overlap_seconds=CHUNK_OVERLAP_SECONDS, tuner=None):
     """
-    音声ファイルを20MB以下のチャンクに分割する
+    音声ファイルを20MB以下のチャンクに分け、WAVに符号化したデータをメモリ上で順に返す
+    
+    20MB以下のファイルは分割せず、元のファイルをそのまま送信するチャンクを1つ返す。
+    それ以上のファイルはチャンクごとに並行して符号化し、最初のチャンクは全体の符号化を待たずに返す。
+    符号化済みで送信を待つチャンクの数には上限があるため、メモリ使用量はファイルの長さによらない。
+    2番目以降のチャンクは、直前のチャンクの末尾 overlap_seconds 秒分を先頭に含む。
+    動画コンテナ（.mp4/.webm）は音声ストリームのみを一時ファイルに取り出してから同様に分ける。
+    tuner を指定した場合、20MBを超えるファイルは先頭から順に読み込み、チャンクごとに tuner が選んだ長さで分ける。
     
     Args:
         audio_path (str): 入力音声ファイルのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        tuner (AutoTuner): チャンクの長さを選ぶ AutoTuner
     
     Returns:
-        list: 一時ファイルのパスのリスト
+        iterator: index, path, start_sample, end_sample, overlap_samples, sample_rate を含む辞書。
+        元のファイル以外を送信するチャンクは name（送信時のファイル名）と data（バイト列）も含む
     """
+    audio_path = str(audio_path)
+    stem = Path(audio_path).stem
+    if Path(audio_path).suffix.lower() not in VIDEO_EXTENSIONS:
+        yield from _iter_source_chunks(audio_path, audio_path, stem, overlap_seconds, tuner)
+        return
+    
+    # 映像はデコードせず、音声ストリームだけを取り出す（取り出した音声はチャンクと共に削除する）
+    temp_dir = tempfile.mkdtemp()
     try:
-        # 音声ファイルを読み込む
-        audio = AudioSegment.from_file(audio_path)
-        
-        # ファイルサイズを取得
-        file_size = os.path.getsize(audio_path)
-        
-        if file_size <= CHUNK_SIZE:
-            # ファイルサイズが20MB以下の場合は分割不要
-            return [audio_path]
-        
-        # チャンクの数を計算
-        num_chunks = (file_size + CHUNK_SIZE - 1) // CHUNK_SIZE  # 切り上げ除算
-        chunk_duration = len(audio) // num_chunks
-        chunks = []
-        
-        # 一時ディレクトリを作成
-        temp_dir = tempfile.mkdtemp()
-        
-        # 音声を分割して一時ファイルとして保存
-        for i, start in enumerate(range(0, len(audio), chunk_duration)):
-            chunk = audio[start:start + chunk_duration]
-            chunk_path = os.path.join(temp_dir, f"chunk_{i}.wav")
-            chunk.export(chunk_path, format="wav")
-            chunks.append(chunk_path)
-        
-        return chunks
-    except Exception as e:
-        print(f"音声ファイルの処理中にエラーが発生しました: {str(e)}")
-        raise
+        source_path = extract_audio(audio_path, temp_dir)
+        yield from _iter_source_chunks(source_path, audio_path, stem, overlap_seconds, tuner)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-def get_response_data(response):
+def _iter_source_chunks(source_path, audio_path, stem, overlap_seconds, tuner=None):
     """
-    OpenAI APIのレスポンスからデータを取得する
+    source_path の音声をチャンクに分けて返す（各チャンクの path は audio_path）
+    
+    source_path が audio_path と異なる（動画から取り出した音声の）場合は、分割しないチャンクもデータを含める
     """
-    if hasattr(response, 'model_dump_json'):
-        # 新しいバージョンのOpenAI APIの場合
-        return json.loads(response.model_dump_json())
-    elif hasattr(response, '__getitem__'):
-        # 辞書形式の場合
-        return response
-    else:
-        # その他の場合（属性としてアクセス）
-        return {
-            'segments': [{
-                'start': segment.start,
-                'text': segment.text
-            } for segment in response.segments],
-            'duration': response.duration
+    if os.path.getsize(source_path) <= CHUNK_SIZE:
+        # ファイルサイズが20MB以下の場合は分割不要
+        sample_rate, total_samples = audio_info(source_path)
+        chunk = {
+            "index": 0,
+            "path": audio_path,
+            "start_sample": 0,
+            "end_sample": total_samples,
+            "overlap_samples": 0,
+            "sample_rate": sample_rate
         }
+        if source_path != audio_path:
+            with open(source_path, "rb") as f:
+                chunk.update(name=stem + Path(source_path).suffix, data=f.read())
+        yield chunk
+        return
+    
+    if tuner is not None:
+        # チャンクの長さは直前までの処理時間から選ぶため、読み込む直前に決める
+        chunks = iter_adaptive_chunks(source_path, tuner.next_chunk_seconds, CHUNK_SIZE, overlap_seconds,
+                                      header_duration(source_path))
+    else:
+        # チャンクはプロセスプールで並行して符号化し、符号化を終えたものから順に返す
+        # （ffmpegでデコードする形式は総サンプル数が事前に分からないため、ヘッダーの長さでチャンクを均等にする）
+        chunks = iter_encoded_chunks(source_path, CHUNK_SIZE, overlap_seconds, header_duration(source_path),
+                                     pool=encode_pool)
+    for chunk in chunks:
+        chunk.update(path=audio_path, name=f"{stem}_chunk_{chunk['index']}.wav")
+        yield chunk
+
+def split_audio_chunks(audio_path, overlap_seconds=CHUNK_OVERLAP_SECONDS, chunk_dir=None):
+    """
+    音声ファイルを20MB以下のチャンクに分割し、各チャンクのサンプル位置を記録する
+    
+    2番目以降のチャンクは、直前のチャンクの末尾 overlap_seconds 秒分を先頭に含む。
+    
+    Args:
+        audio_path (str): 入力音声ファイルのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        chunk_dir (str): チャンクの保存先ディレクトリ（省略時は一時ディレクトリ。共有ボリューム上のワーカー間で受け渡す場合に指定）
+    
+    Returns:
+        list: index, path, start_sample, end_sample, overlap_samples, sample_rate を含む辞書のリスト
+    """
+    chunks = []
+    temp_dir = None
+    
+    for chunk in iter_audio_chunks(audio_path, overlap_seconds):
+        data = chunk.pop("data", None)
+        name = chunk.pop("name", None)
+        if data is not None:
+            # 一時ディレクトリを作成し、チャンクを一時ファイルとして保存
+            if temp_dir is None:
+                temp_dir = chunk_dir or tempfile.mkdtemp()
+                os.makedirs(temp_dir, exist_ok=True)
+            chunk["path"] = os.path.join(temp_dir, f"chunk_{chunk['index']}{Path(name).suffix}")
+            with open(chunk["path"], "wb") as f:
+                f.write(data)
+        chunks.append(chunk)
+    
+    return chunks
 
-def transcribe_audio(audio_path):
+def split_audio(audio_path, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    音声ファイルを20MB以下のチャンクに分割する
+    
+    Args:
+        audio_path (str): 入力音声ファイルのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+    
+    Returns:
+        list: 一時ファイルのパスのリスト
+    """
+    return [chunk["path"] for chunk in split_audio_chunks(audio_path, overlap_seconds)]
+
+def cleanup_chunks(chunks, audio_path):
+    """
+    分割時に作成した一時ファイルと一時ディレクトリを削除する（オリジナルファイル以外）
+    """
+    written = [chunk["path"] for chunk in chunks if chunk["path"] != str(audio_path)]
+    if written:
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(os.path.dirname(written[0]))
+
+def build_prompt_info(total_duration, overlap_duration):
+    """
+    APIの使用情報を作成する
+    
+    Args:
+        total_duration (float): 課金対象の音声の長さ（秒）
+        overlap_duration (float): チャンクの重なりで追加送信した長さ（秒）
+    
+    Returns:
+        dict: 使用情報
+    """
+    return {
+        "model": WHISPER_MODEL,
+        "language": TRANSCRIBE_LANGUAGE,
+        "duration_seconds": total_duration,
+        "cost_usd": calculate_audio_cost(total_duration),
+        "overlap_seconds": overlap_duration,
+        "overlap_cost_usd": calculate_audio_cost(overlap_duration),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def format_transcription(segments):
+    """
+    統合済みセグメント（Segment のリスト）を[HH:MM:SS] 発言内容 形式のテキストにする
+    """
+    return "\n".join(f"{format_timestamp(segment.start)} {segment.text}" for segment in segments)
+
+def _notify_chunk(progress, audio_path, chunk_results, result):
+    """チャンクの完了を進捗コールバックに通知する"""
+    if progress is not None:
+        progress({
+            "file": str(audio_path),
+            "completed_chunks": len(chunk_results),
+            "chunk_index": result["index"],
+            "end_seconds": chunk_bounds(result)[1],
+        })
+
+def transcribe_audio(audio_path, overlap_seconds=CHUNK_OVERLAP_SECONDS, tuner=None, progress=None):
     """
     音声ファイルを文字起こしする
+    
+    Args:
+        audio_path (str): 音声ファイルのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        tuner (AutoTuner): 指定した場合、チャンクの長さと同時リクエスト数を処理時間に応じて調整する
+        progress (callable): 進捗コールバック。チャンク完了ごとに file, completed_chunks, chunk_index,
+            end_seconds（チャンクの終了時刻）を含むイベント辞書を渡す
     """
-    # 音声ファイルを分割
-    chunk_paths = split_audio(audio_path)
+    if tuner is not None:
+        return _transcribe_tuned(audio_path, overlap_seconds, tuner, progress)
     
-    all_transcriptions = []
-    total_duration = 0
-    valid_chunks = False  # 有効なチャンクが1つでもあるかどうか
+    # 音声ファイルを分割（チャンクはメモリ上で符号化し、一時ファイルは作らない。次のチャンクの符号化は送信と並行して進む）
+    chunks = staged("decode", iter_audio_chunks(audio_path, overlap_seconds))
+    chunk_results = []
     
     # 各チャンクを処理
-    for chunk_path in chunk_paths:
-        try:
-            # チャンクの長さをチェック
-            chunk_duration = get_audio_duration(chunk_path)
-            if chunk_duration < 0.1:
-                print(f"警告: チャンク {os.path.basename(chunk_path)} が短すぎます（{chunk_duration:.3f}秒）。スキップします。")
-                continue
-            
-            with open(chunk_path, "rb") as audio_file:
-                # OpenAI APIを使用して文字起こし
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ja",
-                    response_format="verbose_json"
-                )
-                
-                # レスポンスデータを取得
-                response_data = get_response_data(response)
-                
-                # 結果を整形
-                for segment in response_data['segments']:
-                    timestamp = format_timestamp(segment['start'] + total_duration)
-                    text = segment['text'].strip()
-                    all_transcriptions.append(f"{timestamp} {text}")
-                
-                # チャンクの長さを合計に追加
-                total_duration += response_data['duration']
-                valid_chunks = True
-                
-        except Exception as e:
-            if "音声ファイルが短すぎます" not in str(e):
+    try:
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except Exception as e:
+                print(f"音声ファイルの処理中にエラーが発生しました: {str(e)}")
+                raise
+            if chunk is None:
+                break
+            try:
+                result = transcribe_chunk(chunk)
+                if result is not None:
+                    chunk_results.append(result)
+                    _notify_chunk(progress, audio_path, chunk_results, result)
+            except Exception as e:
+                if "音声ファイルが短すぎます" not in str(e):
+                    raise ValueError(f"文字起こし処理中にエラーが発生しました: {str(e)}")
+    finally:
+        # 途中で失敗した場合も符号化のプロセスと一時ファイルを片付ける
+        chunks.close()
+    
+    return build_transcription(chunk_results)
+
+def _transcribe_tuned(audio_path, overlap_seconds, tuner, progress=None):
+    """
+    チャンクを tuner が選んだ同時リクエスト数まで並行して送信し、文字起こしする
+    
+    送信中のチャンクが同時リクエスト数に達している間は、次のチャンクを読み込まずに完了を待つ
+    （メモリに保持するチャンクは同時リクエスト数 + 1 件まで）。
+    """
+    chunks = staged("decode", iter_audio_chunks(audio_path, overlap_seconds, tuner))
+    executor = ThreadPoolExecutor(max_workers=tuner.max_concurrency, thread_name_prefix="transcribe")
+    pending = set()
+    chunk_results = []
+    
+    def collect(done):
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                if "音声ファイルが短すぎます" in str(e):
+                    continue
                 raise ValueError(f"文字起こし処理中にエラーが発生しました: {str(e)}")
+            if result is not None:
+                chunk_results.append(result)
+                _notify_chunk(progress, audio_path, chunk_results, result)
+    
+    try:
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except Exception as e:
+                print(f"音声ファイルの処理中にエラーが発生しました: {str(e)}")
+                raise
+            if chunk is None:
+                break
+            pending.add(executor.submit(_transcribe_measured, chunk, tuner, len(pending) + 1))
+            while len(pending) >= tuner.concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        done, pending = wait(pending)
+        collect(done)
+    finally:
+        chunks.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+    
+    chunk_results.sort(key=lambda result: result["index"])
+    return build_transcription(chunk_results)
+
+def _transcribe_measured(chunk, tuner, in_flight):
+    """1つのチャンクを文字起こしし、処理時間を tuner に記録する"""
+    chunk_start, chunk_end = chunk_bounds(chunk)
+    started = time.perf_counter()
+    try:
+        with measure_request() as timing:
+            result = transcribe_chunk(chunk)
+    except Exception as e:
+        if "音声ファイルが短すぎます" not in str(e):
+            tuner.record_failure()
+        raise
+    if result is not None:
+        tuner.record(chunk_end - chunk_start, time.perf_counter() - started, in_flight,
+                     timing.upload_seconds, timing.wait_seconds)
+    return result
+
+def transcribe_chunk(chunk):
+    """
+    1つのチャンクを文字起こしする
+    
+    Args:
+        chunk (dict): split_audio_chunks または iter_audio_chunks が返すチャンク
     
-    # 一時ファイルを削除（オリジナルファイル以外）
-    if len(chunk_paths) > 1:
-        temp_dir = os.path.dirname(chunk_paths[0])
-        for chunk_path in chunk_paths:
-            if chunk_path != audio_path:
-                os.remove(chunk_path)
-        os.rmdir(temp_dir)
+    Returns:
+        dict: チャンクに segments と duration（課金対象の長さ）を加えた辞書（送信したデータは含まない）。短すぎるチャンクはNone
+    """
+    # チャンクの長さをチェック（分割時のサンプル数から算出）
+    chunk_start, chunk_end = chunk_bounds(chunk)
+    chunk_duration = chunk_end - chunk_start
+    if chunk_duration < MIN_CHUNK_SECONDS:
+        name = chunk.get("name") or os.path.basename(chunk["path"])
+        print(f"警告: チャンク {name} が短すぎます（{chunk_duration:.3f}秒）。スキップします。")
+        return None
     
+    with stage("upload"):
+        if chunk.get("data") is not None:
+            # メモリ上で符号化したチャンクはそのまま送信する
+            response = _create_transcription((chunk["name"], chunk["data"]))
+        else:
+            with open(chunk["path"], "rb") as audio_file:
+                response = _create_transcription(audio_file)
+    
+    # タイムラインの統合はサンプルオフセットを使って後段で行う
+    with stage("parse"):
+        segments, duration = parse_response(response)
+    result = {key: value for key, value in chunk.items() if key != "data"}
+    return dict(result, segments=segments, duration=duration)
+
+def _create_transcription(audio_file):
+    """
+    OpenAI APIを使用して文字起こしし、レスポンスの本文を返す（audio_file はファイルオブジェクトまたは (ファイル名, バイト列)）
+
+    SDKのモデルを経由せず、本文を parse_response で1回だけ解析する。
+    """
+    return client.audio.transcriptions.with_raw_response.create(
+        model=WHISPER_MODEL,
+        file=audio_file,
+        language=TRANSCRIBE_LANGUAGE,
+        response_format="verbose_json"
+    ).content
+
+def build_transcription(chunk_results):
+    """
+    チャンクごとの文字起こし結果を統合する
+    
+    Args:
+        chunk_results (list): transcribe_chunk が返した辞書のリスト
+    
+    Returns:
+        tuple: (文字起こし結果, API使用情報)
+    """
     # 有効なチャンクが1つもない場合はエラー
-    if not valid_chunks:
+    if not chunk_results:
         raise ValueError("処理可能な音声チャンクがありません。全てのチャンクが0.1秒未満です。")
     
+    # 課金対象の長さを合計（重なり区間の分は別途集計）
+    total_duration = sum(chunk["duration"] for chunk in chunk_results)
+    overlap_duration = sum(chunk["overlap_samples"] / chunk["sample_rate"] for chunk in chunk_results)
+    
+    # チャンクの結果を一本のタイムラインに統合
+    with stage("stitch"):
+        transcription = format_transcription(stitch_segments(chunk_results))
+    
     # APIの使用情報を作成
-    cost = calculate_audio_cost(total_duration)
-    prompt_info = {
-        "model": "whisper-1",
-        "language": "ja",
-        "duration_seconds": total_duration,
-        "cost_usd": cost,
-        "timestamp": datetime.now().isoformat()
-    }
+    prompt_info = build_prompt_info(total_duration, overlap_duration)
     
-    return "\n".join(all_transcriptions), prompt_info
+    return transcription, prompt_info
 
-def process_single_file(input_file, output_dir="src/transcripts"):
+def validate_audio_file(input_file):
     """
-    単一の音声ファイルを文字起こしする
+    入力ファイルの形式と存在を確認する
     
     Args:
         input_file (str): 入力音声ファイルのパス
-        output_dir (str): 出力ディレクトリのパス
     
     Returns:
-        Path: 出力ファイルのパス
+        Path: 入力ファイルのパス
     """
     input_path = Path(input_file)
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True)
-    
-    # サポートする音声フォーマット
-    audio_extensions = {".mp3", ".wav", ".m4a"}
     
     # まず拡張子のチェック
-    if input_path.suffix.lower() not in audio_extensions:
+    if input_path.suffix.lower() not in AUDIO_EXTENSIONS:
         raise ValueError(f"サポートされていない音声フォーマットです: {input_path.suffix}")
     
     # 次にファイルの存在チェック
     if not input_path.exists():
         raise FileNotFoundError(f"ファイルが見つかりません: {input_file}")
     
-    try:
-        # 文字起こしの実行
-        transcription, prompt_info = transcribe_audio(str(input_path))
-        
-        # 出力ファイル名の設定
-        output_file = output_path / f"{input_path.stem}.txt"
+    return input_path
+
+def write_transcript(output_file, transcription, prompt_info):
+    """
+    文字起こし結果とAPI使用情報をファイルに保存する
+    
+    Args:
+        output_file (Path): 出力ファイルのパス
+        transcription (str): 文字起こし結果
+        prompt_info (dict): API使用情報
+    """
+    with stage("write"), open(output_file, "w", encoding="utf-8") as f:
+        f.write(transcription)
         
-        # 結果の保存（プロンプト情報を含む）
-        # 文字起こし結果を保存
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(transcription)
+        # API使用情報の追記
+        f.write("\n\n")
+        f.write("=" * 50)
+        f.write("\n[OpenAI API 使用情報]\n")
+        f.write(f"モデル: {prompt_info['model']}\n")
+        f.write(f"言語設定: {prompt_info['language']}\n")
+        f.write(f"音声の長さ: {prompt_info['duration_seconds']:.2f}秒\n")
+        f.write(f"推定コスト: ${prompt_info['cost_usd']:.4f}\n")
+        if prompt_info['overlap_seconds'] > 0:
+            f.write(f"チャンク重なり: {prompt_info['overlap_seconds']:.2f}秒（追加コスト: ${prompt_info['overlap_cost_usd']:.4f}）\n")
+        f.write(f"処理日時: {prompt_info['timestamp']}\n")
+
+def process_single_file(input_file, output_dir="src/transcripts", overlap_seconds=CHUNK_OVERLAP_SECONDS, tuner=None,
+                        progress=None):
+    """
+    単一の音声ファイルを文字起こしする
+    
+    Args:
+        input_file (str): 入力音声ファイルのパス
+        output_dir (str): 出力ディレクトリのパス
+        overlap_seconds (float): 隣接チャンクの重なり幅（秒）
+        tuner (AutoTuner): 指定した場合、チャンクの長さと同時リクエスト数を自動で調整し、選んだ設定を表示する
+        progress (callable): 進捗コールバック（transcribe_audio を参照）
+    
+    Returns:
+        Path: 出力ファイルのパス
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    
+    input_path = validate_audio_file(input_file)
+    
+    with profile_file(input_path.stem):
+        try:
+            # 文字起こしの実行
+            started = time.perf_counter()
+            transcription, prompt_info = transcribe_audio(str(input_path), overlap_seconds, tuner, progress)
+            elapsed = time.perf_counter() - started
+            
+            # 結果の保存（プロンプト情報を含む）
+            output_file = output_path / f"{input_path.stem}.txt"
+            write_transcript(output_file, transcription, prompt_info)
             
-            # API使用情報の追記
-            f.write("\n\n")
-            f.write("=" * 50)
-            f.write("\n[OpenAI API 使用情報]\n")
-            f.write(f"モデル: {prompt_info['model']}\n")
-            f.write(f"言語設定: {prompt_info['language']}\n")
-            f.write(f"音声の長さ: {prompt_info['duration_seconds']:.2f}秒\n")
-            f.write(f"推定コスト: ${prompt_info['cost_usd']:.4f}\n")
-            f.write(f"処理日時: {prompt_info['timestamp']}\n")
+            print(f"文字起こし完了: {input_path.name} -> {output_file.name}")
+            print(f"音声の長さ: {prompt_info['duration_seconds']:.2f}秒")
+            print(f"推定コスト: ${prompt_info['cost_usd']:.4f}")
+            if prompt_info['overlap_seconds'] > 0:
+                print(f"チャンク重なり: {prompt_info['overlap_seconds']:.2f}秒（追加コスト: ${prompt_info['overlap_cost_usd']:.4f}）")
+            if tuner is not None:
+                print(f"{format_report(tuner.report())} / 実測 {prompt_info['duration_seconds'] / elapsed:.1f}音声秒/秒")
+            return output_file
         
-        print(f"文字起こし完了: {input_path.name} -> {output_file.name}")
-        print(f"音声の長さ: {prompt_info['duration_seconds']:.2f}秒")
-        print(f"推定コスト: ${prompt_info['cost_usd']:.4f}")
-        return output_file
+        except Exception as e:
+            print(f"エラー発生 ({input_path.name}): {str(e)}")
+            raise
+
+def transcribe_session(session, output_dir="src/transcripts", overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    録音セッションのうち、まだ文字起こししていない末尾だけを文字起こしし、既存の文字起こし結果に追記する
     
-    except Exception as e:
-        print(f"エラー発生 ({input_path.name}): {str(e)}")
-        raise
+    文字起こし済みの位置の直前 overlap_seconds 秒を文脈として含めて送信し、
+    文字起こし済みの位置より前に始まる発言は除く。タイムスタンプはセッションの音声ファイルの先頭からの時刻。
+    API使用情報はセッション全体の累計を記載する。
+    
+    Args:
+        session (RecordingSession): 録音セッション
+        output_dir (str): 出力ディレクトリのパス
+        overlap_seconds (float): 文字起こし済みの部分と隣接チャンクの重なり幅（秒）
+    
+    Returns:
+        Path: 出力ファイルのパス
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    audio_path = session.audio_path
+    stem = Path(audio_path).stem
+    output_file = output_path / f"{stem}.txt"
+    
+    with profile_file(stem):
+        total = session.frames
+        start = session.transcribed_frames
+        rate = session.sample_rate
+        if total <= start:
+            print(f"新しい録音はありません: {session.name}")
+            return output_file
+        context_start = max(0, start - int(overlap_seconds * rate))
+        
+        # 新しく追記された部分（と直前の文脈）だけを符号化して送信する
+        chunks = staged("decode", iter_encoded_chunks(audio_path, CHUNK_SIZE, overlap_seconds, start_frame=context_start,
+                                                      pool=encode_pool))
+        chunk_results = []
+        try:
+            for chunk in chunks:
+                result = transcribe_chunk(dict(chunk, name=f"{stem}_chunk_{chunk['index']}.wav", path=audio_path))
+                if result is not None:
+                    chunk_results.append(result)
+        finally:
+            chunks.close()
+        
+        with stage("stitch"):
+            segments = [segment for segment in stitch_segments(chunk_results) if segment.start >= start / rate]
+        billed = sum(result["duration"] for result in chunk_results)
+        overlap = (start - context_start) / rate + sum(result["overlap_samples"] / rate for result in chunk_results)
+        
+        # 既存の文字起こし結果（API使用情報より前）に追記する
+        transcription = ""
+        if output_file.exists():
+            transcription = output_file.read_text(encoding="utf-8").split("\n\n" + "=" * 50)[0]
+        new_lines = format_transcription(segments)
+        transcription = "\n".join(part for part in (transcription, new_lines) if part)
+        prompt_info = build_prompt_info(session.state["billed_seconds"] + billed,
+                                        session.state["overlap_seconds"] + overlap)
+        # 書き込み途中で終了しても既存の結果が壊れないよう、一時ファイルに書いてから置き換える
+        temp_file = output_path / f"{stem}.txt.tmp"
+        write_transcript(temp_file, transcription, prompt_info)
+        os.replace(temp_file, output_file)
+        session.mark_transcribed(total, billed, overlap)
+        
+        print(f"文字起こし完了: {session.name}（{start / rate:.2f}秒〜{total / rate:.2f}秒） -> {output_file.name}")
+        print(f"送信した音声の長さ: {billed:.2f}秒（推定コスト: ${calculate_audio_cost(billed):.4f}）")
+        return output_file
 
-def process_directory(input_dir="recordings", output_dir="src/transcripts"):
+def process_directory(input_dir="recordings", output_dir="src/transcripts", overlap_seconds=CHUNK_OVERLAP_SECONDS,
+                      policy=DEFAULT_POLICY, rules=None, budget_usd=None, tuner=None):
     """
     指定されたディレクトリ内の音声ファイルを全て文字起こしする
+    
+    ファイルはヘッダーから求めた長さなどを基に、policy の順に処理する
+    （デフォルトは短い順。長い会議の後ろで短い会議が待たされないようにする）
+    
+    Args:
+        policy (str): スケジューリングの方針（fifo / sjf / deadline / priority）
+        rules (ScheduleRules): ファイル名ごとの優先度と期限
+        budget_usd (float): バッチ全体の推定コストの上限（ドル）。超える場合はAPIを呼び出す前にエラーにする
+        tuner (AutoTuner): 指定した場合、チャンクの長さと同時リクエスト数を自動で調整する（計測値はファイル間で引き継ぐ）
+    
+    Returns:
+        dict: このバッチのHTTPリクエスト数・新規接続数・省略できたハンドシェイク数
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
     
-    # サポートする音声フォーマット
-    audio_extensions = {".mp3", ".wav", ".m4a"}
+    # 音声ファイルを方針に従って並べる（長さはヘッダーから読むためデコードしない）
+    entries = order_files([f for f in sorted(input_path.iterdir()) if f.suffix.lower() in AUDIO_EXTENSIONS],
+                          policy, rules)
+    audio_files = [Path(entry["path"]) for entry in entries]
     
-    # 音声ファイルを名前でソート
-    audio_files = sorted([f for f in input_path.iterdir() if f.suffix.lower() in audio_extensions])
+    # 予算の確認（ヘッダーから見積もるため、APIを呼び出す前に中止できる）
+    if budget_usd is not None:
+        estimate = estimate_files(audio_files, overlap_seconds)
+        print(format_estimate(estimate))
+        check_budget(estimate, budget_usd)
     
-    total_cost = 0
-    total_duration = 0
+    stats_before = client_stats.snapshot()
     
     for audio_file in audio_files:
         try:
-            output_file = process_single_file(audio_file, output_dir)
+            if is_session_audio(audio_file):
+                # 録音セッションは文字起こし済みの位置から続きだけを送信する
+                transcribe_session(RecordingSession.load(session_state_path(str(audio_file))), output_dir,
+                                   overlap_seconds)
+                continue
+            output_file = process_single_file(audio_file, output_dir, overlap_seconds, tuner)
             # コストと時間の集計は実装済みのため、ここでは追加の処理は不要
         except Exception as e:
             print(f"エラー発生 ({audio_file.name}): {str(e)}")
+    
+    # 接続の再利用状況を表示
+    batch_stats = ConnectionStats.diff(stats_before, client_stats.snapshot())
+    if batch_stats["requests"] > 0:
+        print(f"HTTPリクエスト: {batch_stats['requests']}件 / 新規接続: {batch_stats['connections']}件"
+              f"（接続の再利用: {batch_stats['connections_reused']}件、"
+              f"省略できたTLSハンドシェイク: {batch_stats['handshakes_avoided']}回）")
+    return batch_stats
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="音声ファイルの文字起こしを行います")
     parser.add_argument("-f", "--file", help="文字起こしする音声ファイルのパス")
     parser.add_argument("-d", "--directory", help="文字起こしする音声ファイルのディレクトリ")
     parser.add_argument("-o", "--output", default="src/transcripts", help="出力先ディレクトリ（デフォルト: transcripts）")
+    parser.add_argument("--overlap", type=float, default=CHUNK_OVERLAP_SECONDS,
+                        help=f"隣接チャンクの重なり幅（秒、デフォルト: {CHUNK_OVERLAP_SECONDS}）")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"コネクションプールの最大接続数（デフォルト: {DEFAULT_MAX_CONNECTIONS}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_READ_TIMEOUT,
+                        help=f"リクエストごとのレスポンス待ちタイムアウト（秒、デフォルト: {DEFAULT_READ_TIMEOUT}）")
+    parser.add_argument("--http2", action="store_true", help="HTTP/2を使用する（h2パッケージが必要）")
+    parser.add_argument("--policy", choices=POLICIES, default=DEFAULT_POLICY,
+                        help=f"ディレクトリ内のファイルを処理する順序（デフォルト: {DEFAULT_POLICY}）")
+    parser.add_argument("--priority", action="append", default=[], metavar="PATTERN=N",
+                        help="ファイル名のパターンごとの優先度（大きいほど先、--policy priority で使用）")
+    parser.add_argument("--deadline", action="append", default=[], metavar="PATTERN=TIME",
+                        help="ファイル名のパターンごとの期限（ISO形式の日時またはHH:MM、--policy deadline で使用）")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="ディレクトリ全体の推定コストの上限（ドル）。超える場合は文字起こしを始めずに終了する")
+    parser.add_argument("--autotune", action="store_true",
+                        help="チャンクの長さと同時リクエスト数を処理時間に応じて自動で調整する（同時リクエスト数の上限は --max-connections）")
+    parser.add_argument("--profile-cpu", metavar="DIR", default=None,
+                        help="ファイルごとにステージ別のサンプリングプロファイルを DIR に書き出す")
+    parser.add_argument("--profile-format", choices=FORMATS, default=DEFAULT_FORMAT,
+                        help=f"プロファイルの形式（デフォルト: {DEFAULT_FORMAT}）")
+    parser.add_argument("--base-url", default=None,
+                        help="APIのベースURL（例: モックサーバーの http://127.0.0.1:8000/v1。省略時は環境変数 OPENAI_BASE_URL または公式API）")
     
     args = parser.parse_args()
+    configure_client(args.max_connections, args.timeout, args.http2, args.base_url)
+    configure_profiler(args.profile_cpu, args.profile_format)
+    tuner = AutoTuner(max_concurrency=args.max_connections) if args.autotune else None
 
     if args.file:
-        process_single_file(args.file, args.output)
+        process_single_file(args.file, args.output, args.overlap, tuner)
     elif args.directory:
-        process_directory(args.directory, args.output)
+        process_directory(args.directory, args.output, args.overlap, args.policy,
+                          ScheduleRules(args.priority, args.deadline), args.budget, tuner)
     else:
-        process_directory(output_dir=args.output)
\ No newline at end of file
+        process_directory(output_dir=args.output, overlap_seconds=args.overlap, policy=args.policy,
+                          rules=ScheduleRules(args.priority, args.deadline), budget_usd=args.budget, tuner=tuner)
\ No newline at end of file
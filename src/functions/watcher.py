@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, List, Set, Tuple
+
+# inotifyのイベントマスク
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+class _Inotify:
+    """ctypes経由でLinuxのinotifyを使用する最小限のラッパー"""
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed: {directory}")
+
+    def read_events(self, timeout: float) -> List[Tuple[str, int]]:
+        """イベントを待ち、(ファイル名, マスク) のリストを返す"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if name:
+                events.append((name, mask))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class DirectoryWatcher:
+    """
+    ディレクトリに書き込みが完了した音声ファイルを検出するクラス
+
+    inotifyが使える場合はファイルのクローズ（IN_CLOSE_WRITE / IN_MOVED_TO）を完了の合図とする。
+    共有ボリューム（NFS/SMB）では他のマシンからの書き込みがinotifyに通知されないため、
+    定期的なスキャンも併用し、サイズと更新時刻が settle_seconds の間変化しないファイルを完了とみなす。
+    """
+
+    def __init__(self, directory: str, extensions: Set[str], settle_seconds: float = 5.0,
+                 poll_interval: float = 2.0, use_inotify: bool = True):
+        """
+        Parameters:
+        - directory: 監視するディレクトリ
+        - extensions: 対象とするファイルの拡張子
+        - settle_seconds: 変化がなくなってから完了とみなすまでの秒数
+        - poll_interval: ディレクトリをスキャンする間隔（秒）
+        - use_inotify: inotifyを使用するかどうか（Falseの場合はスキャンのみ）
+        """
+        self.directory = Path(directory)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # パス -> (サイズ, 更新時刻, 最後に変化を観測した時刻)
+        self._candidates: Dict[Path, Tuple[int, float, float]] = {}
+        # inotifyでクローズが通知され、その後変更されていないファイル
+        self._closed: Set[Path] = set()
+        # 完了として通知済みのファイル -> (サイズ, 更新時刻)
+        self._reported: Dict[Path, Tuple[int, float]] = {}
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(str(self.directory))
+            except (OSError, AttributeError):
+                # inotifyが使えない環境ではスキャンのみで監視する
+                self._inotify = None
+        self._last_scan = 0.0
+
+    @property
+    def uses_inotify(self) -> bool:
+        """inotifyで監視しているかどうか"""
+        return self._inotify is not None
+
+    def close(self) -> None:
+        """inotifyのファイルディスクリプタを閉じる"""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _is_target(self, path: Path) -> bool:
+        return path.suffix.lower() in self.extensions and not path.name.startswith(".")
+
+    def _observe(self, path: Path, now: float) -> None:
+        """ファイルのサイズと更新時刻を記録し、変化があれば待機時間をリセットする"""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._candidates.pop(path, None)
+            self._closed.discard(path)
+            return
+        signature = (stat.st_size, stat.st_mtime)
+        if self._reported.get(path) == signature:
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[:2] != signature:
+            self._candidates[path] = (signature[0], signature[1], now)
+
+    def _scan(self, now: float) -> None:
+        """ディレクトリ全体をスキャンする"""
+        for path in self.directory.iterdir():
+            if path.is_file() and self._is_target(path):
+                self._observe(path, now)
+        self._last_scan = now
+
+    def wait(self, timeout: float) -> None:
+        """
+        次の変化を待つ
+
+        inotifyが使える場合はイベントを受け取るまで、使えない場合は timeout 秒待つ
+        """
+        if self._inotify is None:
+            time.sleep(timeout)
+            return
+        now = time.time()
+        for name, mask in self._inotify.read_events(timeout):
+            path = self.directory / name
+            if not self._is_target(path):
+                continue
+            self._observe(path, now)
+            if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO) and path in self._candidates:
+                self._closed.add(path)
+            else:
+                self._closed.discard(path)
+
+    def poll(self, now: Optional[float] = None) -> List[Path]:
+        """
+        書き込みが完了したファイルを返す（同じ内容のファイルは一度だけ返す）
+
+        Returns:
+        - List[Path]: 新しく完了したファイル（名前順）
+        """
+        now = time.time() if now is None else now
+        if now - self._last_scan >= self.poll_interval or self._inotify is None:
+            self._scan(now)
+
+        ready = []
+        for path, (size, mtime, changed_at) in list(self._candidates.items()):
+            # クローズ通知があれば即時、なければ一定時間変化がないことを確認する
+            if path in self._closed or now - changed_at >= self.settle_seconds:
+                ready.append(path)
+                self._reported[path] = (size, mtime)
+                del self._candidates[path]
+                self._closed.discard(path)
+        return sorted(ready)
@@ -1,32 +1,466 @@
 #!/usr/bin/env python
 import argparse
 import gc
-from src.workflow.recording_workflow import RecordingWorkflow
+import os
+import time
+from pathlib import Path
+from src.functions.capture_manager import DEFAULT_WRITER_THREADS
+from src.functions.compact import DEFAULT_MIN_AGE_SECONDS, RESULT_FAILED, compact_directory, format_summary
+from src.functions.devices import DEFAULT_LOOPBACK
+from src.functions.job_queue import DEFAULT_LEASE_SECONDS, open_queue
+from src.functions.minutes import (DEFAULT_CONCURRENCY, DEFAULT_WINDOW_TOKENS, MINUTES_CACHE_FILENAME, MinutesCache,
+                                   MinutesGenerator, minutes_backends, open_minutes_backend, write_minutes)
+from src.functions.scheduler import DEFAULT_POLICY, POLICIES, ScheduleRules
+from src.functions.search import (DEFAULT_NPROBE, SEMANTIC_INDEX_DIRNAME, SemanticIndex, embedding_backends,
+                                  format_search_results, keyword_search, open_embedding_backend)
+from src.functions.service import (DEFAULT_DATA_DIR, DEFAULT_HOST, DEFAULT_MAX_PENDING, DEFAULT_MAX_UPLOAD_BYTES,
+                                   DEFAULT_PORT, DEFAULT_WORKERS as DEFAULT_SERVICE_WORKERS, TranscriptionServer,
+                                   TranscriptionService)
+from src.functions.session import find_session, list_sessions
+from src.functions.profiler import DEFAULT_FORMAT as DEFAULT_PROFILE_FORMAT, FORMATS as PROFILE_FORMATS
+from src.functions.transcribe import (check_budget, configure_profiler, estimate_files, format_estimate,
+                                      transcribe_session)
+from src.workflow.multi_recording_workflow import MultiRecordingWorkflow
+from src.workflow.recording_workflow import RecordingWorkflow, RECORDINGS_DIR
+from src.workflow.watch_workflow import WatchWorkflow, QUEUE_FILENAME
+from src.workflow.worker_workflow import WorkerWorkflow, format_queue_status, pending_files, submit_directory
+
+# 共有ジョブキューのデフォルトの場所（watch と同じ）
+DEFAULT_QUEUE = os.path.join(RECORDINGS_DIR, QUEUE_FILENAME)
+
+def build_parser():
+    """コマンドライン引数のパーサーを作成"""
+    # 録音のオプション（サブコマンドを省略した場合と record で共通）
+    record_options = argparse.ArgumentParser(add_help=False)
+    record_options.add_argument('-f', '--filename', type=str,
+                                help='保存するファイル名（YYYYMMDD_[指定された名前].wav形式で保存されます）')
+    record_options.add_argument('-r', '--rate', type=int, default=48000,
+                                help='サンプリングレート（Hz）')
+    record_options.add_argument('--no-transcribe', action='store_true',
+                                help='文字起こしをスキップする')
+    record_options.add_argument('--downsample', action='store_true',
+                                help='キャプチャ時に16kHz・int16・モノラルに変換して保存する（メモリとファイルサイズを削減）')
+    record_options.add_argument('--device', type=str, default=None,
+                                help='入力デバイスの名前（一部でも可）またはID。指定すると確認なしで録音を開始する')
+    record_options.add_argument('--loopback', type=str, default=DEFAULT_LOOPBACK,
+                                help=f'システム音声を取り込むデバイスの名前（デフォルト: {DEFAULT_LOOPBACK}）')
+    record_options.add_argument('--host-api', type=str, default=None,
+                                help='入力デバイスをホストAPI名で絞り込む（例: "Core Audio"）')
+    record_options.add_argument('--session', type=str, default=None,
+                                help='録音セッション名。同じ名前で再開すると同じ録音ファイルに追記し、新しい部分だけを文字起こしする')
+
+    parser = argparse.ArgumentParser(description='オーディオ録音スクリプト', parents=[record_options])
+    parser.add_argument('--profile-cpu', metavar='DIR', default=None,
+                        help='文字起こしするファイルごとにステージ別のサンプリングプロファイルを DIR に書き出す（サブコマンドの前に指定）')
+    parser.add_argument('--profile-format', choices=PROFILE_FORMATS, default=DEFAULT_PROFILE_FORMAT,
+                        help=f'プロファイルの形式（デフォルト: {DEFAULT_PROFILE_FORMAT}）')
+    # サブコマンド省略時は録音を実行する
+    parser.set_defaults(command='record')
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('record', parents=[record_options], help='録音して文字起こしする')
+
+    multi_parser = subparsers.add_parser('multi', help='複数の入力を1つのプロセスで並行して録音する（入力ごとに別のファイル）')
+    multi_parser.add_argument('sessions', nargs='*', metavar='NAME=DEVICE[+DEVICE...]',
+                              help='開始するセッション。+ でつないだデバイスはミックスして1つのファイルに録音する')
+    multi_parser.add_argument('-r', '--rate', type=int, default=48000,
+                              help='サンプリングレート（Hz）')
+    multi_parser.add_argument('--downsample', action='store_true',
+                              help='キャプチャ時に16kHz・int16・モノラルに変換して保存する')
+    multi_parser.add_argument('--host-api', type=str, default=None,
+                              help='入力デバイスをホストAPI名で絞り込む（例: "Core Audio"）')
+    multi_parser.add_argument('--no-transcribe', action='store_true',
+                              help='停止したセッションの文字起こしをスキップする')
+    multi_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                              help='録音ファイルの保存ディレクトリ（デフォルト: recordings）')
+    multi_parser.add_argument('-o', '--output', type=str, default='src/transcripts',
+                              help='文字起こし結果の出力先ディレクトリ（デフォルト: transcripts）')
+    multi_parser.add_argument('--writers', type=int, default=DEFAULT_WRITER_THREADS,
+                              help=f'ミックス・書き出しを行う共有スレッドの数（デフォルト: {DEFAULT_WRITER_THREADS}）')
+
+    session_parser = subparsers.add_parser('session', help='録音セッションの一覧を表示する、または続きを文字起こしする')
+    session_parser.add_argument('name', nargs='?', default=None,
+                                help='文字起こしするセッション名（省略時は一覧を表示）')
+    session_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                                help='録音ファイルのディレクトリ（デフォルト: recordings）')
+    session_parser.add_argument('-o', '--output', type=str, default='src/transcripts',
+                                help='出力先ディレクトリ（デフォルト: transcripts）')
+
+    watch_parser = subparsers.add_parser('watch', help='録音ディレクトリを監視して自動で文字起こしする')
+    watch_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                              help='監視するディレクトリ（デフォルト: recordings）')
+    watch_parser.add_argument('-o', '--output', type=str, default='src/transcripts',
+                              help='出力先ディレクトリ（デフォルト: transcripts）')
+    watch_parser.add_argument('--queue', type=str, default=None,
+                              help='ジョブキューのファイル（デフォルト: 監視ディレクトリ内の.transcribe_queue.sqlite3）')
+    watch_parser.add_argument('--settle', type=float, default=5.0,
+                              help='ファイルの変化がなくなってから処理を始めるまでの秒数（デフォルト: 5.0）')
+    watch_parser.add_argument('--interval', type=float, default=2.0,
+                              help='ディレクトリをスキャンする間隔（秒、デフォルト: 2.0）')
+    watch_parser.add_argument('--poll', action='store_true',
+                              help='inotifyを使わずポーリングのみで監視する（共有ボリューム向け）')
+    watch_parser.add_argument('--enqueue-only', action='store_true',
+                              help='ジョブの登録のみ行い、文字起こしはワーカー（worker）に任せる')
+    watch_parser.add_argument('--policy', choices=POLICIES, default=DEFAULT_POLICY,
+                              help=f'待機中のジョブを処理する順序（デフォルト: {DEFAULT_POLICY}）')
+
+    submit_parser = subparsers.add_parser('submit', help='ディレクトリ内の音声ファイルを共有ジョブキューに登録する')
+    submit_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                               help='登録する音声ファイルのディレクトリ（デフォルト: recordings）')
+    submit_parser.add_argument('-o', '--output', type=str, default='src/transcripts',
+                               help='出力先ディレクトリ。文字起こし済みのファイルは登録しない（デフォルト: transcripts）')
+    submit_parser.add_argument('--queue', type=str, default=DEFAULT_QUEUE,
+                               help=f'ジョブキューのファイルまたはURL（デフォルト: {DEFAULT_QUEUE}）')
+    submit_parser.add_argument('--priority', action='append', default=[], metavar='PATTERN=N',
+                               help='ファイル名のパターンごとの優先度（大きいほど先、ワーカーの --policy priority で使用）')
+    submit_parser.add_argument('--deadline', action='append', default=[], metavar='PATTERN=TIME',
+                               help='ファイル名のパターンごとの期限（ISO形式の日時またはHH:MM、--policy deadline で使用）')
+    submit_parser.add_argument('--budget', type=float, default=None,
+                               help='登録するファイル全体の推定コストの上限（ドル）。超える場合は1件も登録しない')
+
+    estimate_parser = subparsers.add_parser('estimate', help='音声ファイルのヘッダーから文字起こしの長さとコストを見積もる')
+    estimate_parser.add_argument('-f', '--file', type=str, default=None,
+                                 help='見積もる音声ファイル（省略時は --directory 内の全ての音声ファイル）')
+    estimate_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                                 help='見積もる音声ファイルのディレクトリ（デフォルト: recordings）')
+    estimate_parser.add_argument('-o', '--output', type=str, default=None,
+                                 help='指定した場合、文字起こし済みのファイルを除いて見積もる')
+    estimate_parser.add_argument('--budget', type=float, default=None,
+                                 help='推定コストの上限（ドル）。超える場合は終了コード 1 で終了する')
+
+    worker_parser = subparsers.add_parser('worker', help='共有ジョブキューからジョブを取り出して文字起こしする')
+    worker_parser.add_argument('--queue', type=str, default=DEFAULT_QUEUE,
+                               help=f'ジョブキューのファイルまたはURL（デフォルト: {DEFAULT_QUEUE}）')
+    worker_parser.add_argument('-o', '--output', type=str, default='src/transcripts',
+                               help='出力先ディレクトリ（デフォルト: transcripts）')
+    worker_parser.add_argument('--worker-id', type=str, default=None,
+                               help='ワーカー名（デフォルト: ホスト名:プロセスID）')
+    worker_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS,
+                               help=f'ジョブのリースの期間（秒、デフォルト: {DEFAULT_LEASE_SECONDS:.0f}）')
+    worker_parser.add_argument('--policy', choices=POLICIES, default=DEFAULT_POLICY,
+                               help=f'ジョブを取り出す順序（デフォルト: {DEFAULT_POLICY}）')
+    worker_parser.add_argument('--no-split', action='store_true',
+                               help='大きなファイルをチャンクジョブに分割せず、このワーカーで全て処理する')
+    worker_parser.add_argument('--interval', type=float, default=5.0,
+                               help='待機中のジョブがない場合にキューを確認する間隔（秒、デフォルト: 5.0）')
+    worker_parser.add_argument('--exit-when-idle', action='store_true',
+                               help='待機中のジョブがなくなったら終了する')
+
+    status_parser = subparsers.add_parser('status', help='共有ジョブキューの状態とワーカーごとのスループットを表示する')
+    status_parser.add_argument('--queue', type=str, default=DEFAULT_QUEUE,
+                               help=f'ジョブキューのファイルまたはURL（デフォルト: {DEFAULT_QUEUE}）')
+    status_parser.add_argument('--window', type=float, default=60.0,
+                               help='集計する期間（分、0で全期間。デフォルト: 60）')
+
+    compact_parser = subparsers.add_parser('compact', help='録音ディレクトリのWAVファイルをFLACに可逆圧縮して置き換える')
+    compact_parser.add_argument('-d', '--directory', type=str, default=RECORDINGS_DIR,
+                                help='録音ファイルのディレクトリ（デフォルト: recordings）')
+    compact_parser.add_argument('--queue', type=str, default=DEFAULT_QUEUE,
+                                help=f'パスを更新するジョブキューのファイルまたはURL（デフォルト: {DEFAULT_QUEUE}、ファイルがなければ使用しない）')
+    compact_parser.add_argument('--workers', type=int, default=None,
+                                help='変換するプロセス数（デフォルト: CPUコア数）')
+    compact_parser.add_argument('--min-age', type=float, default=DEFAULT_MIN_AGE_SECONDS / 60,
+                                help=f'更新されてからこの時間（分）が経っていないファイルは圧縮しない（デフォルト: {DEFAULT_MIN_AGE_SECONDS / 60:.0f}）')
+
+    serve_parser = subparsers.add_parser('serve', help='音声のアップロードを受け付けて文字起こしするHTTPサービスを起動する')
+    serve_parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                              help=f'待ち受けるアドレス（デフォルト: {DEFAULT_HOST}）')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                              help=f'待ち受けるポート（デフォルト: {DEFAULT_PORT}）')
+    serve_parser.add_argument('--data-dir', type=str, default=DEFAULT_DATA_DIR,
+                              help=f'アップロードされた音声と文字起こし結果を保存するディレクトリ（デフォルト: {DEFAULT_DATA_DIR}）')
+    serve_parser.add_argument('--workers', type=int, default=DEFAULT_SERVICE_WORKERS,
+                              help=f'同時に文字起こしするファイル数（デフォルト: {DEFAULT_SERVICE_WORKERS}）')
+    serve_parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                              help=f'処理待ちのジョブ数の上限。超えたアップロードは503で断る（デフォルト: {DEFAULT_MAX_PENDING}）')
+    serve_parser.add_argument('--max-upload-mb', type=float, default=DEFAULT_MAX_UPLOAD_BYTES / 1024 / 1024,
+                              help=f'アップロードの上限（MB、0で制限なし。デフォルト: {DEFAULT_MAX_UPLOAD_BYTES / 1024 / 1024:.0f}）')
+
+    minutes_parser = subparsers.add_parser('minutes', help='文字起こし結果から議事録（要約・決定事項・アクションアイテム）を作成する')
+    minutes_parser.add_argument('-f', '--file', type=str, default=None,
+                                help='議事録にする文字起こし結果のファイル（省略時は --directory 内の全ての.txt）')
+    minutes_parser.add_argument('-d', '--directory', type=str, default='src/transcripts',
+                                help='文字起こし結果のディレクトリ（デフォルト: transcripts）')
+    minutes_parser.add_argument('-o', '--output', type=str, default='src/minutes',
+                                help='出力先ディレクトリ（デフォルト: minutes）')
+    minutes_parser.add_argument('--backend', choices=minutes_backends(), default='openai',
+                                help='要約に使用するバックエンド（stub は言語モデルを使わない動作確認用。デフォルト: openai）')
+    minutes_parser.add_argument('--model', type=str, default=None,
+                                help='要約に使用するモデル（openai のみ）')
+    minutes_parser.add_argument('--window-tokens', type=int, default=DEFAULT_WINDOW_TOKENS,
+                                help=f'1回に要約する文字起こしのトークン数の上限（デフォルト: {DEFAULT_WINDOW_TOKENS}）')
+    minutes_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                                help=f'同時に実行する要約の数（デフォルト: {DEFAULT_CONCURRENCY}）')
+    minutes_parser.add_argument('--cache', type=str, default=None,
+                                help=f'要約結果のキャッシュのファイル（デフォルト: 出力先ディレクトリ内の{MINUTES_CACHE_FILENAME}）')
+    minutes_parser.add_argument('--no-cache', action='store_true',
+                                help='キャッシュを使わず全て要約し直す')
+
+    search_parser = subparsers.add_parser('search', help='文字起こし結果のセグメントを検索する')
+    search_parser.add_argument('query', type=str, help='検索する語句')
+    search_parser.add_argument('-d', '--directory', type=str, default='src/transcripts',
+                               help='文字起こし結果のディレクトリ（デフォルト: transcripts）')
+    search_parser.add_argument('-n', '--limit', type=int, default=10,
+                               help='表示する件数（デフォルト: 10）')
+    search_parser.add_argument('--semantic', action='store_true',
+                               help='語句を含むセグメントではなく、意味の近いセグメントを検索する')
+    search_parser.add_argument('--backend', choices=embedding_backends(), default='local',
+                               help='埋め込みに使用するバックエンド（stub は動作確認用。デフォルト: local）')
+    search_parser.add_argument('--model', type=str, default=None,
+                               help='埋め込みに使用するモデル（local のみ）')
+    search_parser.add_argument('--index', type=str, default=None,
+                               help=f'インデックスのディレクトリ（デフォルト: 文字起こし結果のディレクトリ内の{SEMANTIC_INDEX_DIRNAME}）')
+    search_parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE,
+                               help=f'検索時に調べるクラスタの数。大きいほど正確で遅い（デフォルト: {DEFAULT_NPROBE}）')
+    search_parser.add_argument('--no-update', action='store_true',
+                               help='新しい文字起こし結果を取り込まずに検索する')
+    search_parser.add_argument('--rebuild', action='store_true',
+                               help='インデックスを作り直す')
+    return parser
+
+def run_watch(args):
+    """監視モードを実行"""
+    workflow = WatchWorkflow(
+        input_dir=args.directory,
+        output_dir=args.output,
+        queue_path=args.queue,
+        settle_seconds=args.settle,
+        poll_interval=args.interval,
+        use_inotify=not args.poll,
+        process=not args.enqueue_only,
+        policy=args.policy
+    )
+    workflow.run()
+    return 0
+
+def run_submit(args):
+    """ディレクトリ内の音声ファイルをジョブキューに登録"""
+    queue = open_queue(args.queue)
+    try:
+        added = submit_directory(queue, args.directory, args.output, ScheduleRules(args.priority, args.deadline),
+                                 args.budget)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return 1
+    finally:
+        queue.close()
+    print(f"キューに追加: {added}件")
+    return 0
+
+def run_estimate(args):
+    """音声ファイルの文字起こしの長さとコストを見積もる（APIは呼び出さない）"""
+    files = [Path(args.file)] if args.file else pending_files(args.directory, args.output)
+    if not files:
+        print(f"音声ファイルが見つかりません: {args.directory}")
+        return 0
+    started = time.perf_counter()
+    estimate = estimate_files(files)
+    elapsed = time.perf_counter() - started
+    print(format_estimate(estimate))
+    print(f"ヘッダーの読み込み: {elapsed * 1000 / len(files):.1f}ms/ファイル")
+    try:
+        check_budget(estimate, args.budget)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return 1
+    return 0
+
+def run_multi(args):
+    """複数のセッションを並行して録音"""
+    workflow = MultiRecordingWorkflow(
+        recordings_dir=args.directory,
+        output_dir=args.output,
+        sample_rate=args.rate,
+        downsample=args.downsample,
+        hostapi=args.host_api,
+        transcribe=not args.no_transcribe,
+        writer_threads=args.writers
+    )
+    return 0 if workflow.run(args.sessions) else 1
+
+def run_session(args):
+    """録音セッションの一覧を表示、または指定したセッションの続きを文字起こし"""
+    if args.name is None:
+        sessions = list_sessions(args.directory)
+        if not sessions:
+            print(f"録音セッションはありません: {args.directory}")
+        for session in sessions:
+            rate = session.sample_rate
+            print(f"{session.name}: {os.path.basename(session.audio_path)} 録音 {session.frames / rate:.1f}秒 / "
+                  f"文字起こし済み {session.transcribed_frames / rate:.1f}秒（{len(session.state['runs'])}回）")
+        return 0
+
+    session = find_session(args.directory, args.name)
+    if session is None:
+        print(f"エラー: 録音セッションが見つかりません: {args.name}")
+        return 1
+    session.recover()
+    output_file = transcribe_session(session, args.output)
+    print(f"出力ファイル: {output_file}")
+    return 0
+
+def run_worker(args):
+    """ワーカーを実行"""
+    workflow = WorkerWorkflow(
+        queue_location=args.queue,
+        output_dir=args.output,
+        worker_id=args.worker_id,
+        lease_seconds=args.lease,
+        split_chunks=not args.no_split,
+        poll_interval=args.interval,
+        policy=args.policy
+    )
+    workflow.run(exit_when_idle=args.exit_when_idle)
+    return 0
+
+def run_status(args):
+    """ジョブキューの状態を表示"""
+    queue = open_queue(args.queue)
+    try:
+        since = time.time() - args.window * 60 if args.window > 0 else None
+        print(format_queue_status(queue.counts(), queue.worker_stats(since)))
+    finally:
+        queue.close()
+    return 0
+
+def run_compact(args):
+    """録音ディレクトリのWAVファイルをFLACに圧縮"""
+    if not os.path.isdir(args.directory):
+        print(f"エラー: ディレクトリが見つかりません: {args.directory}")
+        return 1
+    # キューのファイルは作成しない（監視・ワーカーを使っていない場合）
+    queue = open_queue(args.queue) if '://' in args.queue or os.path.exists(args.queue) else None
+    try:
+        results = compact_directory(args.directory, queue, args.workers, args.min_age * 60)
+    finally:
+        if queue is not None:
+            queue.close()
+    print(format_summary(results))
+    return 1 if any(result['status'] == RESULT_FAILED for result in results) else 0
+
+def run_serve(args):
+    """文字起こしのHTTPサービスを起動（Ctrl+Cで終了）"""
+    max_upload_bytes = int(args.max_upload_mb * 1024 * 1024) if args.max_upload_mb > 0 else None
+    if args.profile_cpu and args.workers > 1:
+        # 同時に処理するジョブのサンプルは分けられないため、1件ずつ処理する場合のみ計測する
+        print("エラー: --profile-cpu は serve --workers 1 の場合のみ使用できます")
+        return 1
+    try:
+        service = TranscriptionService(args.data_dir, args.workers, args.max_pending, max_upload_bytes)
+        server = TranscriptionServer(service, args.host, args.port)
+    except (ValueError, OSError) as e:
+        print(f"エラー: {e}")
+        return 1
+    print(f"文字起こしサービス: {server.base_url}（ワーカー {args.workers}、処理待ちの上限 {args.max_pending}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n文字起こしサービスを終了します")
+    return 0
+
+def run_minutes(args):
+    """文字起こし結果から議事録を作成"""
+    if args.file:
+        transcripts = [args.file]
+    else:
+        transcripts = sorted(str(path) for path in Path(args.directory).glob('*.txt'))
+    if not transcripts:
+        print(f"文字起こし結果が見つかりません: {args.directory}")
+        return 1
+
+    backend_options = {'model': args.model} if args.model else {}
+    backend = open_minutes_backend(args.backend, **backend_options)
+    cache = None
+    if not args.no_cache:
+        cache = MinutesCache(args.cache or os.path.join(args.output, MINUTES_CACHE_FILENAME))
+    generator = MinutesGenerator(backend, cache, window_tokens=args.window_tokens, concurrency=args.concurrency)
+    failed = 0
+    try:
+        for transcript in transcripts:
+            try:
+                output_file = write_minutes(transcript, args.output, generator)
+            except (OSError, ValueError) as e:
+                print(f"議事録の作成に失敗しました: {transcript}: {e}")
+                failed += 1
+                continue
+            print(f"議事録を保存しました: {output_file}")
+    finally:
+        if cache is not None:
+            cache.close()
+    stats = generator.stats
+    print(f"ウィンドウ: {stats['windows']}件（要約 {stats['summarized']}件、統合 {stats['merged']}件、"
+          f"キャッシュ再利用 {stats['cached']}件）")
+    return 1 if failed else 0
+
+def run_search(args):
+    """文字起こし結果のセグメントを検索"""
+    if not args.semantic:
+        print(format_search_results(keyword_search(args.directory, args.query, args.limit)))
+        return 0
+
+    backend_options = {'model': args.model} if args.model else {}
+    backend = open_embedding_backend(args.backend, **backend_options)
+    index_dir = args.index or os.path.join(args.directory, SEMANTIC_INDEX_DIRNAME)
+    with SemanticIndex(index_dir, backend, rebuild=args.rebuild) as index:
+        if not args.no_update:
+            stats = index.update(args.directory)
+            if stats['added'] or stats['removed']:
+                print(f"インデックスを更新: {stats['added']}ファイル（{stats['segments']}セグメント）を追加、"
+                      f"{stats['removed']}ファイルを削除")
+        started = time.perf_counter()
+        results = index.search(args.query, args.limit, args.nprobe)
+        elapsed = time.perf_counter() - started
+        print(format_search_results(results))
+        print(f"検索時間: {elapsed * 1000:.1f}ms（{index.live_count}セグメント）")
+    return 0
 
 def main():
     """メインエントリーポイント"""
     # メモリリーク対策：スクリプト開始時にガベージコレクションを強制実行
     gc.collect()
     
-    parser = argparse.ArgumentParser(description='オーディオ録音スクリプト')
-    parser.add_argument('-f', '--filename', type=str,
-                       help='保存するファイル名（YYYYMMDD_[指定された名前].wav形式で保存されます）')
-    parser.add_argument('-r', '--rate', type=int, default=48000,
-                       help='サンプリングレート（Hz）')
-    parser.add_argument('--no-transcribe', action='store_true',
-                       help='文字起こしをスキップする')
-    
-    args = parser.parse_args()
+    args = build_parser().parse_args()
     
     # メモリリーク対策：引数解析後にガベージコレクション
     gc.collect()
     
+    if args.profile_cpu:
+        configure_profiler(args.profile_cpu, args.profile_format)
+    
+    if args.command == 'watch':
+        return run_watch(args)
+    if args.command == 'submit':
+        return run_submit(args)
+    if args.command == 'estimate':
+        return run_estimate(args)
+    if args.command == 'multi':
+        return run_multi(args)
+    if args.command == 'session':
+        return run_session(args)
+    if args.command == 'worker':
+        return run_worker(args)
+    if args.command == 'status':
+        return run_status(args)
+    if args.command == 'compact':
+        return run_compact(args)
+    if args.command == 'serve':
+        return run_serve(args)
+    if args.command == 'minutes':
+        return run_minutes(args)
+    if args.command == 'search':
+        return run_search(args)
+    
     # ワークフローの実行
     workflow = RecordingWorkflow()
     success = workflow.execute(
         filename=args.filename,
         sample_rate=args.rate,
-        skip_transcribe=args.no_transcribe
+        skip_transcribe=args.no_transcribe,
+        downsample=args.downsample,
+        device=args.device,
+        loopback=args.loopback,
+        hostapi=args.host_api,
+        session=args.session
     )
     
     # メモリリーク対策：ワークフロー終了後にガベージコレクション
@@ -40,4 +474,4 @@ if __name__ == "__main__":
     # メモリリーク対策：スクリプト終了時にもガベージコレクションを実行
     result = main()
     gc.collect()
-    exit(result)
\ No newline at end of file
+    exit(result)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.functions.capture_manager import DEFAULT_WRITER_THREADS, CaptureManager
+from src.functions.compact import COMPACT_EXTENSION
+from src.functions.progress import format_status
+from src.functions.resample import SPEECH_SAMPLE_RATE
+from src.functions.transcribe import process_single_file
+from src.workflow.recording_workflow import RECORDINGS_DIR
+
+# 標準入力から受け付けるコマンドの説明
+COMMAND_HELP = "コマンド: start NAME=DEVICE[+DEVICE...] / stop NAME / status / quit"
+
+def parse_session_spec(spec: str) -> Tuple[str, List[str]]:
+    """
+    セッションの指定（NAME=DEVICE[+DEVICE...]）を名前とデバイスのリストに分ける
+
+    複数のデバイスを + でつなぐと、それらをミックスして1つのファイルに録音する。
+
+    Returns:
+    - Tuple[str, List[str]]: (セッション名, デバイスの名前またはIDのリスト)
+    """
+    name, separator, devices = spec.partition("=")
+    name = name.strip()
+    device_list = [device.strip() for device in devices.split("+") if device.strip()]
+    if not separator or not name or not device_list:
+        raise ValueError(f"セッションの指定が正しくありません: {spec!r}（NAME=DEVICE[+DEVICE...]）")
+    return name, device_list
+
+class MultiRecordingWorkflow:
+    """複数の入力を1つのプロセスで並行して録音し、コマンドでセッションごとに開始・停止するワークフロー"""
+
+    def __init__(self, recordings_dir: str = RECORDINGS_DIR, output_dir: str = "src/transcripts",
+                 sample_rate: int = 48000, downsample: bool = False, hostapi: Optional[str] = None,
+                 transcribe: bool = True, writer_threads: int = DEFAULT_WRITER_THREADS,
+                 manager: Optional[CaptureManager] = None):
+        """
+        Parameters:
+        - recordings_dir: 録音ファイルの保存ディレクトリ（YYYYMMDD_[セッション名].wav で保存。
+          同じ日に同じ名前で再び開始した場合は YYYYMMDD_[セッション名]_2.wav のように番号を付ける）
+        - output_dir: 文字起こし結果の出力ディレクトリ
+        - sample_rate: サンプリングレート（Hz）
+        - downsample: キャプチャ時に16kHz・int16・モノラルに変換するかどうか
+        - hostapi: デバイスをホストAPI名で絞り込む場合に指定
+        - transcribe: セッションの停止後に文字起こしするかどうか
+        - writer_threads: ミックス・書き出しを行う共有スレッドの数
+        - manager: 使用する CaptureManager（省略時は作成する）
+        """
+        self.recordings_dir = recordings_dir
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.target_rate = SPEECH_SAMPLE_RATE if downsample else None
+        self.hostapi = hostapi
+        self.transcribe = transcribe
+        self.manager = manager or CaptureManager(writer_threads)
+        # 文字起こしは録音を止めずに1件ずつ順に行う
+        self._transcriber = ThreadPoolExecutor(max_workers=1, thread_name_prefix="multi-transcribe")
+        self._lock = threading.Lock()
+        self.transcripts: Dict[str, str] = {}
+
+    def start(self, spec: str) -> bool:
+        """
+        セッションの録音を開始する
+
+        Parameters:
+        - spec: NAME=DEVICE[+DEVICE...]
+
+        Returns:
+        - bool: 開始できたかどうか
+        """
+        try:
+            name, devices = parse_session_spec(spec)
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            filepath = self._recording_path(name)
+            self.manager.start_devices(name, devices, filepath, self.sample_rate, self.hostapi,
+                                       target_rate=self.target_rate)
+        except Exception as e:
+            print(f"エラー: {e}")
+            return False
+        print(f"録音を開始しました: {name}（{' + '.join(devices)}） -> {filepath}")
+        return True
+
+    def _recording_path(self, name: str) -> str:
+        """
+        セッションの録音ファイルのパス
+
+        停止したセッションの録音は文字起こし待ちの場合があるため、同じ日に同じ名前で開始しても
+        上書きせず、既存のファイル（録音中の一時ファイル・圧縮後のファイルを含む）と重ならない番号を付ける。
+        """
+        stem = f"{datetime.now().strftime('%Y%m%d')}_{name}"
+        candidate, number = stem, 1
+        while any(os.path.exists(os.path.join(self.recordings_dir, candidate + suffix))
+                  for suffix in (".wav", ".wav.part", COMPACT_EXTENSION)):
+            number += 1
+            candidate = f"{stem}_{number}"
+        return os.path.join(self.recordings_dir, f"{candidate}.wav")
+
+    def stop(self, name: str) -> Optional[str]:
+        """
+        セッションを停止して保存し、文字起こしを登録する
+
+        Returns:
+        - Optional[str]: 録音ファイルのパス。録音データがない場合やエラーの場合はNone
+        """
+        try:
+            session = self.manager.get(name)
+        except ValueError as e:
+            print(f"エラー: {e}")
+            return None
+        if session.done.is_set():
+            print(f"セッション {name} は停止しています")
+            return None
+        filepath = self.manager.stop(name)
+        if session.error:
+            print(f"エラー: セッション {name} で録音に失敗しました: {session.error}")
+        if filepath is None:
+            print(f"録音データがありません: {name}")
+            return None
+        print(f"録音を停止しました: {name}（{session.seconds:.1f}秒） -> {filepath}")
+        if self.transcribe:
+            self._transcriber.submit(self._transcribe, name, filepath)
+        return filepath
+
+    def _transcribe(self, name: str, filepath: str) -> None:
+        try:
+            output_file = process_single_file(filepath, self.output_dir)
+        except Exception as e:
+            print(f"文字起こし中にエラーが発生しました（{name}）: {e}")
+            return
+        with self._lock:
+            self.transcripts[name] = str(output_file)
+        print(f"文字起こしが完了しました（{name}）: {output_file}")
+
+    def print_status(self) -> None:
+        """全てのセッションの状態を表示"""
+        statuses = self.manager.status()
+        if not statuses:
+            print("セッションはありません")
+        for status in statuses:
+            print(f"{status['name']} [{status['state']}] {format_status(status)}")
+
+    def handle_command(self, line: str) -> bool:
+        """
+        1行のコマンドを実行する
+
+        Returns:
+        - bool: コマンドの受け付けを続けるかどうか（quit の場合はFalse）
+        """
+        command, _, argument = line.strip().partition(" ")
+        argument = argument.strip()
+        if command in ("quit", "q", "exit"):
+            return False
+        if command == "start" and argument:
+            self.start(argument)
+        elif command == "stop" and argument:
+            self.stop(argument)
+        elif command == "status":
+            self.print_status()
+        elif command:
+            print(COMMAND_HELP)
+        return True
+
+    def run(self, specs: Iterable[str], commands: Optional[Iterable[str]] = None) -> bool:
+        """
+        セッションを開始し、コマンドを受け付ける。終了時は録音中の全てのセッションを停止して保存する
+
+        Parameters:
+        - specs: 最初に開始するセッションの指定
+        - commands: コマンドの入力（省略時は標準入力）
+
+        Returns:
+        - bool: 全てのセッションが正常に録音・保存できたかどうか
+        """
+        started = [self.start(spec) for spec in specs]
+        print(COMMAND_HELP)
+        try:
+            if commands is None:
+                while True:
+                    try:
+                        line = input()
+                    except EOFError:
+                        break
+                    if not self.handle_command(line):
+                        break
+            else:
+                for line in commands:
+                    if not self.handle_command(line):
+                        break
+        except KeyboardInterrupt:
+            print()
+        finally:
+            for session in self.manager.sessions():
+                if not session.done.is_set():
+                    self.stop(session.name)
+            self.manager.close()
+            self._transcriber.shutdown(wait=True)
+        return all(started) and not any(session.error for session in self.manager.sessions())
@@ -1,17 +1,23 @@
 #!/usr/bin/env python
 import os
+import time
+from datetime import datetime
 from typing import Optional
+from src.functions.devices import DEFAULT_LOOPBACK
 from src.functions.recorder import AudioRecorder
-from src.functions.transcribe import process_single_file
+from src.functions.resample import SPEECH_SAMPLE_RATE
+from src.functions.session import SESSION_MEMORY_LIMIT, open_session
+from src.functions.transcribe import process_single_file, transcribe_session
+
+# 録音ファイルの保存ディレクトリ
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'recordings')
 
 class RecordingWorkflow:
     """録音から文字起こしまでのワークフローを管理するクラス"""
     
     def __init__(self):
         """ワークフローの初期化"""
-        self.recorder = AudioRecorder(
-            recordings_dir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'recordings')
-        )
+        self.recorder = AudioRecorder(recordings_dir=RECORDINGS_DIR)
 
     def select_input_device(self) -> Optional[int]:
         """
@@ -20,7 +26,7 @@ class RecordingWorkflow:
         Returns:
         - Optional[int]: 選択されたデバイスID。キャンセル時はNone
         """
-        devices = self.recorder.list_devices()
+        devices = self.recorder.list_devices(self.recorder.registry)
         
         # メモリリーク対策：ガベージコレクションを強制実行
         import gc
@@ -40,6 +46,23 @@ class RecordingWorkflow:
         # メモリリーク対策：ループを抜けた後もガベージコレクションを実行
         gc.collect()
 
+    def resolve_input_device(self, device: str, hostapi: Optional[str] = None) -> Optional[int]:
+        """
+        名前またはIDで指定された入力デバイスを確認なしで解決する
+
+        Parameters:
+        - device: デバイス名（一部でも可）またはデバイスID
+        - hostapi: ホストAPI名で絞り込む場合に指定
+
+        Returns:
+        - Optional[int]: デバイスID。見つからない場合はNone
+        """
+        device_id, input_device = self.recorder.registry.resolve(device, hostapi)
+        if input_device is None:
+            print(f"\nエラー: 入力デバイスが見つかりません: {device}")
+            return None
+        return device_id
+
     def get_filename(self, default_filename: Optional[str] = None) -> str:
         """
         ファイル名を取得する
@@ -65,7 +88,9 @@ class RecordingWorkflow:
         return filename
 
     def execute(self, filename: Optional[str] = None, sample_rate: int = 48000,
-                skip_transcribe: bool = False) -> bool:
+                skip_transcribe: bool = False, downsample: bool = False,
+                device: Optional[str] = None, loopback: str = DEFAULT_LOOPBACK,
+                hostapi: Optional[str] = None, session: Optional[str] = None) -> bool:
         """
         録音から文字起こしまでのワークフローを実行
         
@@ -73,6 +98,12 @@ class RecordingWorkflow:
         - filename: 保存するファイル名（オプション）
         - sample_rate: サンプリングレート
         - skip_transcribe: 文字起こしをスキップするかどうか
+        - downsample: キャプチャ時に16kHz・int16・モノラルに変換するかどうか
+        - device: 入力デバイスの名前またはID。指定した場合は入力を求めずに録音を開始する
+        - loopback: システム音声を取り込むデバイスの名前
+        - hostapi: デバイスをホストAPI名で絞り込む場合に指定
+        - session: 録音セッション名。指定した場合は同じセッションの録音ファイルに追記し、
+          文字起こしはまだ文字起こししていない部分だけを行う
         
         Returns:
         - bool: ワークフローが正常に完了したかどうか
@@ -81,19 +112,32 @@ class RecordingWorkflow:
         import gc
         gc.collect()
         
-        # 入力デバイスの選択
-        device_id = self.select_input_device()
+        # 入力デバイスの選択（指定がある場合は確認なしで開始する）
+        interactive = device is None
+        if interactive:
+            device_id = self.select_input_device()
+        else:
+            device_id = self.resolve_input_device(device, hostapi)
         if device_id is None:
             return False
 
-        # ファイル名の取得
-        filename = self.get_filename(filename)
+        if session is not None:
+            return self.execute_session(session, device_id, sample_rate, skip_transcribe, downsample,
+                                        loopback, interactive)
+
+        # ファイル名の取得（確認なしの場合は開始時刻を使用）
+        if interactive:
+            filename = self.get_filename(filename)
+        else:
+            filename = filename or datetime.now().strftime('%H%M%S')
         
         # メモリリーク対策：各ステップの間でガベージコレクションを実行
         gc.collect()
         
         # 録音の実行
-        audio_file = self.recorder.record(filename, sample_rate, device_id)
+        target_rate = SPEECH_SAMPLE_RATE if downsample else None
+        audio_file = self.recorder.record(filename, sample_rate, device_id, target_rate=target_rate,
+                                          loopback=loopback, interactive=interactive)
         if not audio_file:
             return False
         
@@ -118,4 +162,52 @@ class RecordingWorkflow:
         # メモリリーク対策：終了時にガベージコレクション
         gc.collect()
                 
-        return True
\ No newline at end of file
+        return True
+
+    def execute_session(self, name: str, device_id: int, sample_rate: int = 48000, skip_transcribe: bool = False,
+                        downsample: bool = False, loopback: str = DEFAULT_LOOPBACK, interactive: bool = True) -> bool:
+        """
+        録音セッションを開始・再開して録音し、新しく録音した部分を文字起こしする
+
+        前回の録音が異常終了していた場合は、一時ファイルに残った録音データを先にセッションに戻す。
+
+        Parameters:
+        - name: セッション名
+        - device_id: 入力デバイスのID
+
+        Returns:
+        - bool: ワークフローが正常に完了したかどうか
+        """
+        target_rate = SPEECH_SAMPLE_RATE if downsample else None
+        try:
+            recording_session = open_session(RECORDINGS_DIR, name, target_rate or sample_rate)
+        except ValueError as e:
+            print(f"\nエラー: {str(e)}")
+            return False
+
+        recovered = recording_session.recover()
+        if recovered:
+            print(f"\n前回の録音の続きを復元しました: {recovered / recording_session.sample_rate:.2f}秒")
+        start_frame = recording_session.frames
+        if start_frame:
+            print(f"\nセッション {name} を再開します（録音済み: {start_frame / recording_session.sample_rate:.2f}秒）")
+
+        started_at = time.time()
+        audio_file = self.recorder.record(sample_rate=sample_rate, input_device_id=device_id, target_rate=target_rate,
+                                          loopback=loopback, interactive=interactive,
+                                          output_path=recording_session.audio_path, append=True,
+                                          memory_limit=SESSION_MEMORY_LIMIT)
+        if audio_file:
+            recording_session.add_run(started_at, start_frame)
+        elif not recovered:
+            return False
+
+        if not skip_transcribe:
+            print("\n新しく録音した部分を文字起こしします...")
+            try:
+                output_file = transcribe_session(recording_session)
+                print(f"出力ファイル: {output_file}")
+            except Exception as e:
+                print(f"文字起こし中にエラーが発生しました: {str(e)}")
+                return False
+        return True
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from src.functions.job_queue import DEFAULT_LEASE_SECONDS, KIND_FILE, default_worker_id, open_queue
+from src.functions.scheduler import DEFAULT_POLICY
+from src.functions.session import is_session_audio
+from src.functions.watcher import DirectoryWatcher
+from src.functions.transcribe import AUDIO_EXTENSIONS, process_single_file
+from src.workflow.worker_workflow import LeaseKeeper
+
+# ジョブキューのデフォルトのファイル名（監視ディレクトリ内に作成）
+QUEUE_FILENAME = ".transcribe_queue.sqlite3"
+
+class WatchWorkflow:
+    """録音ディレクトリを監視し、新しい音声ファイルを文字起こしするワークフロー"""
+
+    def __init__(self, input_dir: str, output_dir: str = "src/transcripts",
+                 queue_path: Optional[str] = None, settle_seconds: float = 5.0,
+                 poll_interval: float = 2.0, use_inotify: bool = True, process: bool = True,
+                 policy: str = DEFAULT_POLICY, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """
+        Parameters:
+        - input_dir: 監視する録音ディレクトリ
+        - output_dir: 文字起こし結果の出力ディレクトリ
+        - queue_path: ジョブキューのSQLiteファイルまたはURL（省略時は監視ディレクトリ内）
+        - settle_seconds: ファイルの変化がなくなってから完了とみなすまでの秒数
+        - poll_interval: ディレクトリをスキャンする間隔（秒）
+        - use_inotify: inotifyを使用するかどうか
+        - process: 登録したジョブをこのプロセスで文字起こしするかどうか（Falseの場合は登録のみ行い、ワーカーに任せる）
+        - policy: 待機中のジョブを処理する順序の方針（fifo / sjf / deadline / priority）
+        - lease_seconds: 取り出したジョブのリースの期間（秒、処理中は延長する）
+        """
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.queue = open_queue(queue_path or os.path.join(input_dir, QUEUE_FILENAME), policy=policy)
+        self.watcher = DirectoryWatcher(input_dir, AUDIO_EXTENSIONS, settle_seconds,
+                                        poll_interval, use_inotify)
+        self.poll_interval = poll_interval
+        self.process = process
+        # キューをワーカーと共有するため、ワーカーと同じくリース付きで取り出す
+        self.worker_id = f"watch:{default_worker_id()}"
+        self.lease_seconds = lease_seconds
+
+    def close(self) -> None:
+        """監視とキューを終了する"""
+        self.watcher.close()
+        self.queue.close()
+
+    def _has_transcript(self, audio_file: Path) -> bool:
+        """音声ファイルより新しい文字起こし結果が既にあるかどうか"""
+        transcript = Path(self.output_dir) / f"{audio_file.stem}.txt"
+        return transcript.exists() and transcript.stat().st_mtime >= audio_file.stat().st_mtime
+
+    def enqueue_ready_files(self) -> int:
+        """
+        書き込みが完了したファイルをジョブキューに登録
+
+        Returns:
+        - int: 新しく登録したジョブの数
+        """
+        added = 0
+        for audio_file in self.watcher.poll():
+            try:
+                if self._has_transcript(audio_file):
+                    continue
+                # 録音セッションは録音の終了時に続きだけを文字起こしする
+                if is_session_audio(str(audio_file)):
+                    continue
+                if self.queue.enqueue(str(audio_file)):
+                    print(f"キューに追加: {audio_file.name}")
+                    added += 1
+            except FileNotFoundError:
+                # 検出後に移動・削除されたファイルは無視する
+                continue
+        return added
+
+    def process_pending(self, stop_event: Optional[threading.Event] = None) -> int:
+        """
+        待機中のジョブを方針の順に文字起こしする
+
+        取り出すのはファイルのジョブだけで、ワーカーが分割したチャンクジョブはワーカーに任せる。
+        処理中はリースを延長し、ワーカーの起動時に処理中のジョブが待機中に戻されないようにする。
+
+        Returns:
+        - int: 処理したジョブの数
+        """
+        processed = 0
+        while stop_event is None or not stop_event.is_set():
+            job = self.queue.claim(self.worker_id, self.lease_seconds, kind=KIND_FILE)
+            if job is None:
+                break
+            keeper = LeaseKeeper(self.queue, job["id"], self.worker_id, self.lease_seconds)
+            keeper.start()
+            try:
+                output_file = process_single_file(job["path"], self.output_dir)
+                self.queue.complete(job["id"], str(output_file), self.worker_id)
+            except Exception as e:
+                self.queue.fail(job["id"], str(e), self.worker_id)
+            finally:
+                keeper.stop()
+            processed += 1
+        return processed
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> None:
+        """
+        停止されるまで監視と文字起こしを繰り返す
+
+        Parameters:
+        - stop_event: セットされると監視を終了するイベント（省略時はCtrl+Cまで継続）
+        """
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"前回中断されたジョブを再開します: {requeued}件")
+
+        mode = "inotify" if self.watcher.uses_inotify else "ポーリング"
+        print(f"\n監視を開始します: {self.input_dir}（{mode}）")
+        print("Ctrl+Cで終了")
+
+        try:
+            while stop_event is None or not stop_event.is_set():
+                self.enqueue_ready_files()
+                if self.process:
+                    self.process_pending(stop_event)
+                self.watcher.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            print("\n監視を終了します...")
+        finally:
+            self.close()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.functions.job_queue import (
+    DEFAULT_LEASE_SECONDS, KIND_CHUNK, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, STATUS_RUNNING,
+    STATUS_SPLIT, QueueBackend, default_worker_id, open_queue
+)
+from src.functions.scheduler import DEFAULT_POLICY, ScheduleRules
+from src.functions.segments import dump_segments
+from src.functions.session import is_session_audio
+from src.functions.transcribe import (
+    AUDIO_EXTENSIONS, CHUNK_OVERLAP_SECONDS, build_transcription, check_budget, cleanup_chunks, estimate_files,
+    format_estimate, profile_file, split_audio_chunks, transcribe_chunk, validate_audio_file, write_transcript
+)
+
+# チャンクを置くディレクトリ（キューと同じ共有ボリューム上に作成）
+CHUNKS_DIRNAME = "chunks"
+
+class LeaseKeeper(threading.Thread):
+    """処理中のジョブのリースを定期的に延長するスレッド"""
+
+    def __init__(self, queue: QueueBackend, job_id: int, worker: str, lease_seconds: float):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        # 延長できなかった（期限切れで他のワーカーに移った）かどうか
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        # 期限の3分の1ごとに延長し、一時的な遅れがあっても期限が切れないようにする
+        while not self._stop_event.wait(self.lease_seconds / 3):
+            if not self.queue.renew(self.job_id, self.worker, self.lease_seconds):
+                self.lost = True
+                break
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+def pending_files(input_dir: str, output_dir: Optional[str] = None) -> List[Path]:
+    """
+    ディレクトリ内の音声ファイルのうち、文字起こしが必要なもの（録音セッションの音声ファイルは除く）
+
+    Parameters:
+    - output_dir: 指定した場合、音声ファイルより新しい文字起こし結果があるファイルは除く
+    """
+    files = []
+    for audio_file in sorted(Path(input_dir).iterdir()):
+        if audio_file.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        # 録音セッションは続きだけを文字起こしするため、ファイル全体のジョブにはしない
+        if is_session_audio(str(audio_file)):
+            continue
+        if output_dir is not None:
+            transcript = Path(output_dir) / f"{audio_file.stem}.txt"
+            if transcript.exists() and transcript.stat().st_mtime >= audio_file.stat().st_mtime:
+                continue
+        files.append(audio_file)
+    return files
+
+def submit_directory(queue: QueueBackend, input_dir: str, output_dir: Optional[str] = None,
+                     rules: Optional[ScheduleRules] = None, budget_usd: Optional[float] = None) -> int:
+    """
+    ディレクトリ内の音声ファイルをジョブキューに登録
+
+    Parameters:
+    - output_dir: 指定した場合、音声ファイルより新しい文字起こし結果があるファイルは登録しない
+    - rules: ファイル名ごとの優先度と期限
+    - budget_usd: 登録するファイル全体の推定コストの上限（ドル）。超える場合は1件も登録せずにエラーにする
+
+    Returns:
+    - int: 新しく登録したジョブの数
+    """
+    rules = rules or ScheduleRules()
+    files = pending_files(input_dir, output_dir)
+    if budget_usd is not None:
+        estimate = estimate_files(files)
+        print(format_estimate(estimate))
+        check_budget(estimate, budget_usd)
+    added = 0
+    for audio_file in files:
+        path = str(audio_file)
+        if queue.enqueue(path, rules.priority(path), rules.deadline(path)):
+            added += 1
+    return added
+
+class WorkerWorkflow:
+    """
+    共有ジョブキューからジョブを取り出して文字起こしするワーカー
+
+    任意の数のワーカーを複数のホストで起動できる。20MBを超えるファイルはチャンクごとのジョブに
+    分割してキューに戻すため、1つのファイルを複数のワーカーで並行して処理する。
+    最後のチャンクを完了したワーカーが結果を統合して出力する。
+    チャンクジョブは元のファイルの残りの処理量で順序付けされ、短いファイルと交互に処理される。
+    """
+
+    def __init__(self, queue_location: str, output_dir: str = "src/transcripts",
+                 worker_id: Optional[str] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 split_chunks: bool = True, poll_interval: float = 5.0,
+                 overlap_seconds: float = CHUNK_OVERLAP_SECONDS, policy: str = DEFAULT_POLICY):
+        """
+        Parameters:
+        - queue_location: ジョブキューの場所（SQLiteファイルのパスまたはURL）
+        - output_dir: 文字起こし結果の出力ディレクトリ（全ワーカーで共有）
+        - worker_id: ワーカー名（省略時は ホスト名:プロセスID）
+        - lease_seconds: ジョブのリースの期間（秒）
+        - split_chunks: 大きなファイルをチャンクジョブに分割するかどうか
+        - poll_interval: 待機中のジョブがない場合にキューを確認する間隔（秒）
+        - overlap_seconds: 隣接チャンクの重なり幅（秒）
+        - policy: ジョブを取り出す順序の方針（fifo / sjf / deadline / priority）
+        """
+        self.queue = open_queue(queue_location, policy=policy)
+        self.output_dir = output_dir
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.split_chunks = split_chunks
+        self.poll_interval = poll_interval
+        self.overlap_seconds = overlap_seconds
+        self.chunk_root = os.path.join(self.queue.shared_dir, CHUNKS_DIRNAME)
+
+    def close(self) -> None:
+        """キューを閉じる"""
+        self.queue.close()
+
+    def _output_file(self, job: Dict[str, Any]) -> Path:
+        output_path = Path(self.output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        return output_path / f"{Path(job['path']).stem}.txt"
+
+    def _write(self, job: Dict[str, Any], chunk_results: List[Dict[str, Any]]) -> Path:
+        """チャンクの結果を統合して出力"""
+        transcription, prompt_info = build_transcription(chunk_results)
+        output_file = self._output_file(job)
+        write_transcript(output_file, transcription, prompt_info)
+        print(f"文字起こし完了: {Path(job['path']).name} -> {output_file.name}")
+        return output_file
+
+    def _process_file(self, job: Dict[str, Any]) -> None:
+        """ファイルのジョブを文字起こしする（大きなファイルはチャンクジョブに分割する）"""
+        validate_audio_file(job["path"])
+        chunk_dir = os.path.join(self.chunk_root, str(job["id"]))
+        chunks = split_audio_chunks(job["path"], self.overlap_seconds, chunk_dir)
+        if self.split_chunks and len(chunks) > 1:
+            if self.queue.split(job["id"], chunks, self.worker_id):
+                print(f"チャンクに分割: {Path(job['path']).name}（{len(chunks)}件）")
+            else:
+                cleanup_chunks(chunks, job["path"])
+            return
+
+        try:
+            results = [result for result in (transcribe_chunk(chunk) for chunk in chunks) if result is not None]
+        finally:
+            cleanup_chunks(chunks, job["path"])
+        output_file = self._write(job, results)
+        self.queue.complete(job["id"], str(output_file), self.worker_id,
+                            sum(result["duration"] for result in results))
+
+    def _process_chunk(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """チャンクジョブを文字起こしし、最後のチャンクであれば統合する元のジョブを返す"""
+        result = transcribe_chunk(dict(job["chunk"], path=job["path"]))
+        stored = None
+        if result is not None:
+            stored = {"segments": dump_segments(result["segments"]), "duration": result["duration"]}
+        return self.queue.complete_chunk(job["id"], stored, self.worker_id,
+                                         stored["duration"] if stored else None, self.lease_seconds)
+
+    def _merge(self, job: Dict[str, Any], chunks: List[Dict[str, Any]]) -> None:
+        """全てのチャンクジョブの結果を統合して出力"""
+        results = [dict(chunk["chunk"], path=chunk["path"], **chunk["result"])
+                   for chunk in chunks if chunk["result"] is not None]
+        output_file = self._write(job, results)
+        if self.queue.complete(job["id"], str(output_file), self.worker_id):
+            shutil.rmtree(os.path.join(self.chunk_root, str(job["id"])), ignore_errors=True)
+
+    def process_job(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        1つのジョブを処理
+
+        Returns:
+        - Optional[Dict[str, Any]]: 続けて統合する元のジョブ（最後のチャンクを処理した場合）
+        """
+        if job["kind"] == KIND_CHUNK:
+            return self._process_chunk(job)
+        chunks = self.queue.list_chunks(job["id"])
+        if chunks and all(chunk["status"] == STATUS_DONE for chunk in chunks):
+            # 統合の途中でリースが切れたジョブは、分割し直さずに統合だけを行う
+            self._merge(job, chunks)
+        else:
+            self._process_file(job)
+        return None
+
+    def _run_job(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """リースを延長しながらジョブを処理し、失敗した場合はキューに記録する"""
+        keeper = LeaseKeeper(self.queue, job["id"], self.worker_id, self.lease_seconds)
+        keeper.start()
+        name = Path(job["path"]).stem
+        if job["kind"] == KIND_CHUNK:
+            name = f"{name}_chunk_{job['chunk']['index']}"
+        try:
+            with profile_file(name):
+                return self.process_job(job)
+        except Exception as e:
+            print(f"エラー発生 ({Path(job['path']).name}): {str(e)}")
+            self.queue.fail(job["id"], str(e), self.worker_id)
+            return None
+        finally:
+            keeper.stop()
+            if keeper.lost:
+                print(f"警告: リースの期限が切れたため、他のワーカーが再処理します: {Path(job['path']).name}")
+
+    def run_once(self) -> bool:
+        """
+        待機中のジョブを1件取り出して処理
+
+        Returns:
+        - bool: ジョブを処理した場合はTrue
+        """
+        job = self.queue.claim(self.worker_id, self.lease_seconds)
+        if job is None:
+            return False
+        while job is not None:
+            job = self._run_job(job)
+        return True
+
+    def run(self, stop_event: Optional[threading.Event] = None, exit_when_idle: bool = False) -> int:
+        """
+        停止されるまでジョブを処理する
+
+        Parameters:
+        - stop_event: セットされると終了するイベント（省略時はCtrl+Cまで継続）
+        - exit_when_idle: 待機中のジョブがなくなったら終了するかどうか
+
+        Returns:
+        - int: 処理したジョブの数
+        """
+        print(f"\nワーカーを開始します: {self.worker_id}")
+        print("Ctrl+Cで終了")
+        processed = 0
+        try:
+            self.queue.heartbeat(self.worker_id)
+            while stop_event is None or not stop_event.is_set():
+                if self.run_once():
+                    processed += 1
+                    continue
+                if exit_when_idle:
+                    break
+                self.queue.heartbeat(self.worker_id)
+                if stop_event is not None:
+                    stop_event.wait(self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("\nワーカーを終了します...")
+        finally:
+            self.close()
+        return processed
+
+def format_queue_status(counts: Dict[str, int], stats: List[Dict[str, Any]], now: Optional[float] = None) -> str:
+    """
+    キューの状態とワーカーごとのスループットを表示用の文字列にする
+
+    Parameters:
+    - counts: JobQueue.counts の結果
+    - stats: JobQueue.worker_stats の結果
+    - now: 現在時刻（UNIX時間）
+    """
+    now = now or time.time()
+    lines = ["ジョブ: " + " / ".join(
+        f"{label} {counts.get(status, 0)}"
+        for status, label in ((STATUS_PENDING, "待機中"), (STATUS_RUNNING, "実行中"), (STATUS_SPLIT, "分割済み"),
+                              (STATUS_DONE, "完了"), (STATUS_FAILED, "失敗"))
+    )]
+    if not stats:
+        lines.append("ワーカー: なし")
+        return "\n".join(lines)
+
+    lines.append(f"{'ワーカー':<24} {'完了':>5} {'失敗':>5} {'実行中':>5} {'音声(分)':>9} {'分/時':>8} {'倍速':>6}  最終応答")
+    for row in stats:
+        # 最初の処理開始から最後の完了（実行中なら現在）までの音声の処理量
+        end = now if row["running"] else (row["last_finished"] or now)
+        span = end - row["first_started"] if row["first_started"] is not None else 0.0
+        audio_minutes = row["audio_seconds"] / 60
+        per_hour = audio_minutes / span * 3600 if span > 0 else 0.0
+        speed = row["audio_seconds"] / row["busy_seconds"] if row["busy_seconds"] else 0.0
+        last_seen = datetime.fromtimestamp(row["last_seen"]).strftime("%H:%M:%S") if row["last_seen"] else "-"
+        lines.append(f"{row['worker']:<24} {row['done']:>5} {row['failed']:>5} {row['running']:>5} "
+                     f"{audio_minutes:>9.1f} {per_hour:>8.1f} {speed:>6.1f}  {last_seen}")
+    return "\n".join(lines)
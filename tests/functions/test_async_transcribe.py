@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from pydub import AudioSegment
+from src.functions.async_transcribe import iter_segments, transcribe_file, process_files
+from src.functions.transcribe import split_audio_chunks
+
+def create_test_audio(duration_ms=5000, directory=None, name=None):
+    """テスト用の無音の音声ファイルを作成する"""
+    audio = AudioSegment.silent(duration=duration_ms)
+    if directory is not None:
+        path = os.path.join(directory, name)
+        audio.export(path, format="wav")
+        return path
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        audio.export(temp_file.name, format="wav")
+        return temp_file.name
+
+def make_client(create):
+    """create が返す辞書を本文とするレスポンスを返す、非同期クライアントのモックを作成する"""
+    async def raw_create(**kwargs):
+        return MagicMock(content=json.dumps(await create(**kwargs)))
+
+    client = MagicMock()
+    client.audio.transcriptions.with_raw_response.create = AsyncMock(side_effect=raw_create)
+    return client
+
+def chunk_number(file):
+    """アップロードされたファイル名（chunk_N.wav）からチャンク番号を取り出す"""
+    name = os.path.splitext(file[0])[0]
+    return int(name.split("_")[1]) if name.startswith("chunk_") else 0
+
+def test_transcribe_file_does_not_print(capsys):
+    """非同期APIは結果を返し、標準出力には何も表示しない"""
+    async def create(**kwargs):
+        return {"segments": [{"start": 0.2, "end": 0.8, "text": " テストテキスト "}], "duration": 1.0}
+
+    client = make_client(create)
+    test_audio = create_test_audio(duration_ms=1000)
+
+    try:
+        transcription, prompt_info = asyncio.run(transcribe_file(test_audio, client=client))
+    finally:
+        os.remove(test_audio)
+
+    assert transcription == "[00:00:00] テストテキスト"
+    assert prompt_info["model"] == "whisper-1"
+    assert prompt_info["duration_seconds"] == 1.0
+    assert capsys.readouterr().out == ""
+
+def test_iter_segments_orders_out_of_order_chunks():
+    """後のチャンクが先に完了しても、セグメントは時刻順に返される"""
+    async def create(**kwargs):
+        index = chunk_number(kwargs["file"])
+        # 後ろのチャンクほど早く完了させる
+        await asyncio.sleep(0.05 * (10 - index))
+        return {"segments": [{"start": 1.5, "end": 1.8, "text": f"発言{index}"}], "duration": 3.0}
+
+    client = make_client(create)
+    events = []
+    test_audio = create_test_audio(duration_ms=10000)
+
+    async def collect():
+        return [segment async for segment in iter_segments(
+            test_audio, client, overlap_seconds=1.0, progress=events.append
+        )]
+
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 2):
+            segments = asyncio.run(collect())
+    finally:
+        os.remove(test_audio)
+
+    total = client.audio.transcriptions.with_raw_response.create.call_count
+    assert total > 1
+    assert [segment["text"] for segment in segments] == [f"発言{i}" for i in range(total)]
+    starts = [segment["start"] for segment in segments]
+    assert starts == sorted(starts)
+    assert [event["completed_chunks"] for event in events] == list(range(1, total + 1))
+    assert all(event["total_chunks"] == total for event in events)
+
+def test_iter_segments_cancellation_cleans_up():
+    """キャンセル時に送信中のリクエストを中断し、一時ファイルを削除する"""
+    started = []
+
+    async def create(**kwargs):
+        started.append(kwargs["file"][0])
+        await asyncio.sleep(60)
+
+    client = make_client(create)
+    test_audio = create_test_audio(duration_ms=10000)
+    created_dirs = []
+    original_mkdtemp = tempfile.mkdtemp
+
+    def tracking_mkdtemp(*args, **kwargs):
+        path = original_mkdtemp(*args, **kwargs)
+        created_dirs.append(path)
+        return path
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(transcribe_file(test_audio, client=client))
+        while not started:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 2), \
+             patch('src.functions.transcribe.tempfile.mkdtemp', side_effect=tracking_mkdtemp):
+            asyncio.run(run_and_cancel())
+    finally:
+        os.remove(test_audio)
+
+    assert len(created_dirs) == 1
+    assert not os.path.exists(created_dirs[0])
+
+def test_iter_segments_cancellation_during_split_cleans_up():
+    """分割の途中でキャンセルされた場合も、分割を待って書き出されたチャンクを削除する"""
+    splitting = threading.Event()
+    release = threading.Event()
+    created_dirs = []
+    original_mkdtemp = tempfile.mkdtemp
+
+    def tracking_mkdtemp(*args, **kwargs):
+        path = original_mkdtemp(*args, **kwargs)
+        created_dirs.append(path)
+        return path
+
+    def slow_split(*args, **kwargs):
+        splitting.set()
+        release.wait(10)
+        return split_audio_chunks(*args, **kwargs)
+
+    client = make_client(AsyncMock())
+    test_audio = create_test_audio(duration_ms=10000)
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(transcribe_file(test_audio, client=client))
+        while not splitting.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 2), \
+             patch('src.functions.transcribe.tempfile.mkdtemp', side_effect=tracking_mkdtemp), \
+             patch('src.functions.async_transcribe.split_audio_chunks', side_effect=slow_split):
+            asyncio.run(run_and_cancel())
+    finally:
+        os.remove(test_audio)
+
+    assert len(created_dirs) == 1
+    assert not os.path.exists(created_dirs[0])
+    client.audio.transcriptions.with_raw_response.create.assert_not_called()
+
+def test_iter_segments_all_chunks_too_short():
+    """全てのチャンクが短すぎる場合はAPIを呼ばずにエラーにする"""
+    client = make_client(AsyncMock())
+    test_audio = create_test_audio(duration_ms=50)
+
+    try:
+        with pytest.raises(ValueError) as exc_info:
+            asyncio.run(transcribe_file(test_audio, client=client))
+    finally:
+        os.remove(test_audio)
+
+    assert "処理可能な音声チャンクがありません" in str(exc_info.value)
+    client.audio.transcriptions.with_raw_response.create.assert_not_called()
+
+def test_process_files_shares_client(tmp_path):
+    """複数ファイルを1つのクライアントで並行処理し、失敗したファイルは例外として返す"""
+    async def create(**kwargs):
+        await asyncio.sleep(0.01)
+        return {"segments": [{"start": 0, "end": 1.0, "text": "テストテキスト"}], "duration": 1.0}
+
+    client = make_client(create)
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    files = [create_test_audio(1000, str(input_dir), f"meeting{i}.wav") for i in range(3)]
+    files.append(str(input_dir / "missing.wav"))
+
+    results = asyncio.run(process_files(files, str(tmp_path / "transcripts"), client=client))
+
+    assert client.audio.transcriptions.with_raw_response.create.call_count == 3
+    for result in results[:3]:
+        assert result.exists()
+        content = result.read_text(encoding="utf-8")
+        assert "テストテキスト" in content
+        assert "[OpenAI API 使用情報]" in content
+    assert isinstance(results[3], FileNotFoundError)
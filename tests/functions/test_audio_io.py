@@ -0,0 +1,372 @@
+import io
+import os
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+import numpy as np
+import soundfile as sf
+from src.functions.audio_io import (
+    AudioReader, EncodePool, audio_info, encode_wav, extract_audio, iter_adaptive_chunks, iter_encoded_chunks,
+    iter_pcm_chunks, max_chunk_frames, plan_chunks, prefetch, probe_audio_codec
+)
+
+# ffmpeg の代わりに使用するスクリプト。入力ファイルの "FAKE レート 秒数 [終了コード]" に従い、
+# 連番のサンプルを ffmpeg と同じくデータ長未定のWAVとして標準出力（または最後の引数のファイル）に書き出す。
+# libsndfile で読める音声ファイルは全体を一度にデコードして書き出す
+FAKE_FFMPEG = """#!{python}
+import os, struct, sys
+import soundfile
+args = sys.argv[1:]
+with open(os.environ["FAKE_FFMPEG_LOG"], "a") as log:
+    log.write(" ".join(args) + "\\n")
+source = args[args.index("-i") + 1]
+content = open(source, "rb").read()
+samples = None
+if content.startswith(b"FAKE"):
+    fields = [field for field in content.decode().split() if "=" not in field]
+    rate, frames = int(fields[1]), int(float(fields[2]) * int(fields[1]))
+else:
+    try:
+        samples, rate = soundfile.read(source, dtype="int16")
+    except Exception:
+        sys.stderr.write("Invalid data found when processing input\\n")
+        sys.exit(1)
+    fields, frames = [], len(samples)
+if args[-1] != "pipe:1":
+    # 音声の取り出し: データ長を記録したWAVをファイルに書き出す
+    with open(args[-1], "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 36 + frames * 2) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16))
+        f.write(b"data" + struct.pack("<I", frames * 2) + b"\\x00\\x00" * frames)
+    sys.exit(0)
+out = sys.stdout.buffer
+out.write(b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE")
+out.write(b"LIST" + struct.pack("<I", 3) + b"abc\\x00")
+out.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16))
+out.write(b"data" + struct.pack("<I", 0xFFFFFFFF))
+if samples is not None:
+    out.write(samples.tobytes())
+for start in range(0, frames if samples is None else 0, 1000):
+    out.write(struct.pack("<%dh" % min(1000, frames - start),
+                          *[i % 30000 for i in range(start, min(start + 1000, frames))]))
+    out.flush()
+sys.exit(int(fields[3]) if len(fields) > 3 else 0)
+"""
+
+# ffprobe の代わりに使用するスクリプト。入力ファイルの "codec=名前" をコーデック名として出力する
+FAKE_FFPROBE = """#!{python}
+import sys
+fields = open(sys.argv[-1]).read().split()
+codecs = [field.split("=", 1)[1] for field in fields if field.startswith("codec=")]
+if codecs:
+    print(codecs[0])
+"""
+
+class TestAudioIO(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.temp_dir, "ffmpeg.log")
+        for name, source in (("ffmpeg", FAKE_FFMPEG), ("ffprobe", FAKE_FFPROBE)):
+            script = os.path.join(self.temp_dir, name)
+            with open(script, "w") as f:
+                f.write(source.format(python=sys.executable))
+            os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+            patcher = patch(f'src.functions.audio_io.{name.upper()}_BINARY', script)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        env = patch.dict(os.environ, {"FAKE_FFMPEG_LOG": self.log_path})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _fake(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def _spawns(self):
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path) as f:
+            return len(f.readlines())
+
+    def _ffmpeg_args(self):
+        with open(self.log_path) as f:
+            return f.read().split()
+
+    def test_libsndfile_formats_do_not_spawn_ffmpeg(self):
+        # WAVはファイルから直接読み、総フレーム数はヘッダーから求める
+        path = os.path.join(self.temp_dir, "a.wav")
+        sf.write(path, np.arange(3000, dtype=np.int16), 1000)
+
+        self.assertEqual(audio_info(path), (1000, 3000))
+        with AudioReader(path, block_frames=1024) as reader:
+            blocks = list(reader.blocks())
+        self.assertEqual([len(block) for block in blocks], [1024, 1024, 952])
+        self.assertEqual(self._spawns(), 0)
+
+    def test_pipe_decoding_in_blocks(self):
+        # libsndfile で開けない形式は1つの ffmpeg プロセスからブロックごとに読む
+        path = self._fake("a.m4a", "FAKE 8000 2.5")
+
+        with AudioReader(path, block_frames=4096) as reader:
+            self.assertEqual((reader.samplerate, reader.channels, reader.frames), (8000, 1, None))
+            blocks = list(reader.blocks())
+        self.assertTrue(all(len(block) == 4096 for block in blocks[:-1]))
+        samples = np.concatenate(blocks)[:, 0]
+        self.assertEqual(len(samples), 20000)
+        np.testing.assert_array_equal(samples, np.arange(20000) % 30000)
+        self.assertEqual(self._spawns(), 1)
+        args = self._ffmpeg_args()
+        self.assertIn("pcm_s16le", args)
+        self.assertEqual(args[-1], "pipe:1")
+
+    def test_audio_info_counts_piped_frames(self):
+        path = self._fake("a.m4a", "FAKE 16000 3")
+        self.assertEqual(audio_info(path), (16000, 48000))
+
+    def test_ffmpeg_error_is_reported(self):
+        # デコードできないファイルは ffmpeg のエラー出力を含めて例外にする
+        with self.assertRaises(ValueError) as error:
+            AudioReader(self._fake("broken.m4a", "broken"))
+        self.assertIn("Invalid data found", str(error.exception))
+
+        # 途中で異常終了した場合も例外にする
+        with self.assertRaises(ValueError):
+            audio_info(self._fake("truncated.m4a", "FAKE 8000 1 1"))
+
+    def test_missing_ffmpeg(self):
+        path = self._fake("a.m4a", "FAKE 8000 1")
+        with patch('src.functions.audio_io.FFMPEG_BINARY', os.path.join(self.temp_dir, "missing")):
+            with self.assertRaises(ValueError) as error:
+                AudioReader(path)
+        self.assertIn("ffmpeg が見つかりません", str(error.exception))
+
+    def test_encode_wav(self):
+        samples = np.arange(500, dtype=np.int16).reshape(-1, 1)
+        data = encode_wav(samples, 8000)
+        self.assertEqual(struct.unpack("<4s", data[:4])[0], b"RIFF")
+        self.assertEqual(len(data), 44 + 1000)
+
+    def test_chunks_from_pipe_fit_limit_and_overlap(self):
+        # 見積もりの長さでチャンクを均等にし、重なりを含めて上限以下のWAVにする
+        path = self._fake("a.m4a", "FAKE 1000 10")
+        chunk_bytes = 44 + 2 * 3000
+        chunks = list(iter_pcm_chunks(path, chunk_bytes, overlap_seconds=1.0, estimated_seconds=10.0))
+
+        self.assertEqual(max_chunk_frames(chunk_bytes, 1), 3000)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(chunks[-1]["end_sample"], 10000)
+        for prev, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk["overlap_samples"], 1000)
+            self.assertEqual(chunk["start_sample"], prev["end_sample"] - 1000)
+        for chunk in chunks:
+            self.assertLessEqual(len(encode_wav(chunk["samples"], 1000)), chunk_bytes)
+            np.testing.assert_array_equal(chunk["samples"][:, 0],
+                                          np.arange(chunk["start_sample"], chunk["end_sample"]))
+        self.assertEqual(self._spawns(), 1)
+
+    def test_chunks_without_estimate(self):
+        # 長さの見積もりがなくても上限以下のチャンクに分ける
+        path = self._fake("a.m4a", "FAKE 1000 10")
+        chunks = list(iter_pcm_chunks(path, 44 + 2 * 3000, overlap_seconds=1.0))
+        self.assertEqual(chunks[-1]["end_sample"], 10000)
+        self.assertTrue(all(len(chunk["samples"]) <= 3000 for chunk in chunks))
+
+    def test_overlap_too_large(self):
+        path = self._fake("a.m4a", "FAKE 1000 10")
+        with self.assertRaises(ValueError):
+            list(iter_pcm_chunks(path, 44 + 2 * 1000, overlap_seconds=1.0))
+
+    def test_probe_audio_codec(self):
+        self.assertEqual(probe_audio_codec(self._fake("a.mp4", "FAKE 8000 1 codec=aac")), "aac")
+        self.assertIsNone(probe_audio_codec(self._fake("b.mp4", "FAKE 8000 1")))
+
+    def test_extract_audio_stream_copy(self):
+        # APIが受け付けるコーデックは再符号化せずに音声ストリームだけをコピーする
+        output_dir = os.path.join(self.temp_dir, "out")
+        os.makedirs(output_dir)
+        for name, codec, extension in (("zoom.mp4", "aac", ".m4a"), ("teams.webm", "opus", ".ogg")):
+            path = self._fake(name, f"FAKE 8000 2 codec={codec}")
+            output = extract_audio(path, output_dir)
+            self.assertEqual(output, os.path.join(output_dir, os.path.splitext(name)[0] + extension))
+            args = self._ffmpeg_args()
+            self.assertEqual(args[args.index("-c:a") + 1], "copy")
+            self.assertIn("-vn", args)
+            self.assertEqual(audio_info(output), (8000, 16000))
+            os.remove(self.log_path)
+
+    def test_extract_audio_transcodes_other_codecs(self):
+        # それ以外のコーデックは音声のみを再符号化する
+        path = self._fake("a.mp4", "FAKE 8000 1 codec=pcm_s24le")
+        output = extract_audio(path, self.temp_dir)
+        self.assertTrue(output.endswith("a.m4a"))
+        args = self._ffmpeg_args()
+        self.assertEqual(args[args.index("-c:a") + 1], "aac")
+        self.assertEqual(args[args.index("-map") + 1], "0:a:0")
+
+    def test_extract_audio_without_audio_stream(self):
+        with self.assertRaises(ValueError) as error:
+            extract_audio(self._fake("a.mp4", "FAKE 8000 1"), self.temp_dir)
+        self.assertIn("音声ストリームがありません", str(error.exception))
+
+    def _decode(self, data):
+        samples, _ = sf.read(io.BytesIO(data), dtype="int16")
+        return samples
+
+    def test_plan_chunks_matches_streamed_chunks(self):
+        path = os.path.join(self.temp_dir, "a.wav")
+        sf.write(path, np.zeros(10000, dtype=np.int16), 1000)
+        streamed = [(chunk["start_sample"], chunk["end_sample"], chunk["overlap_samples"])
+                    for chunk in iter_pcm_chunks(path, 44 + 2 * 3000, 1.0)]
+        self.assertEqual(plan_chunks(10000, 1000, 1, 44 + 2 * 3000, 1.0), streamed)
+
+    def test_encoded_chunks_in_process_pool(self):
+        # シークできる形式は複数のプロセスで符号化し、元の順序で返す
+        path = os.path.join(self.temp_dir, "a.wav")
+        sf.write(path, np.arange(10000, dtype=np.int16), 1000)
+        chunks = list(iter_encoded_chunks(path, 44 + 2 * 3000, 1.0, workers=2, prefetch_size=1))
+
+        self.assertEqual([chunk["index"] for chunk in chunks], list(range(5)))
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk["data"]), 44 + 2 * 3000)
+            np.testing.assert_array_equal(self._decode(chunk["data"]),
+                                          np.arange(chunk["start_sample"], chunk["end_sample"]))
+        self.assertEqual(chunks[-1]["end_sample"], 10000)
+        self.assertEqual(self._spawns(), 0)
+
+    def test_shared_encode_pool_is_reused(self):
+        # 共有のプールを渡した場合は、複数のファイルで同じプロセスを使い、ファイルごとに起動しない
+        paths = []
+        for name in ("a.wav", "b.wav"):
+            path = os.path.join(self.temp_dir, name)
+            sf.write(path, np.arange(10000, dtype=np.int16), 1000)
+            paths.append(path)
+
+        with EncodePool(2) as pool, \
+                patch('src.functions.audio_io.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as mock_pool:
+            for path in paths:
+                chunks = list(iter_encoded_chunks(path, 44 + 2 * 3000, 1.0, pool=pool))
+                self.assertEqual([chunk["index"] for chunk in chunks], list(range(5)))
+                np.testing.assert_array_equal(self._decode(chunks[-1]["data"]),
+                                              np.arange(chunks[-1]["start_sample"], 10000))
+            # 途中で読むのをやめても共有のプールは止めない
+            next(iter_encoded_chunks(paths[0], 44 + 2 * 3000, 1.0, pool=pool, prefetch_size=0))
+            self.assertEqual(len(list(iter_encoded_chunks(paths[1], 44 + 2 * 3000, 1.0, pool=pool))), 5)
+        mock_pool.assert_called_once()
+
+    def test_mp3_is_decoded_by_ffmpeg(self):
+        # libsndfile の MPEG デコーダーはブロック単位の読み込みで音声が崩れるため、MP3は ffmpeg で順に読む
+        path = os.path.join(self.temp_dir, "a.mp3")
+        sf.write(path, (np.sin(np.arange(16000 * 3) / 5) * 10000).astype(np.int16), 16000, format="MP3")
+        full, _ = sf.read(path, dtype="int16")
+
+        # 長さはヘッダーから読む（デコードしない）
+        self.assertEqual(audio_info(path), (16000, len(full)))
+        self.assertEqual(self._spawns(), 0)
+
+        with patch('src.functions.audio_io.ProcessPoolExecutor') as mock_pool:
+            chunks = list(iter_encoded_chunks(path, 44 + 2 * 16000, 0.5, workers=2))
+        mock_pool.assert_not_called()
+        self.assertEqual(self._spawns(), 1)
+        for chunk in chunks:
+            np.testing.assert_array_equal(self._decode(chunk["data"]), full[chunk["start_sample"]:chunk["end_sample"]])
+
+    def test_encoded_chunks_from_pipe(self):
+        # ffmpeg でデコードする形式はスレッドで順に符号化する
+        path = self._fake("a.m4a", "FAKE 1000 10")
+        chunks = list(iter_encoded_chunks(path, 44 + 2 * 3000, 1.0, estimated_seconds=10.0))
+
+        self.assertEqual(len(chunks), 5)
+        for chunk in chunks:
+            np.testing.assert_array_equal(self._decode(chunk["data"]),
+                                          np.arange(chunk["start_sample"], chunk["end_sample"]))
+
+    def test_adaptive_chunks_follow_requested_lengths(self):
+        # チャンクごとに指定した長さで分け、上限を超える長さは切り詰める
+        path = os.path.join(self.temp_dir, "a.wav")
+        sf.write(path, np.arange(10000, dtype=np.int16), 1000)
+        requests = []
+
+        def next_seconds(remaining, limit):
+            requests.append((remaining, limit))
+            return [1.0, 2.0, 10.0][min(len(requests) - 1, 2)]
+
+        chunks = list(iter_adaptive_chunks(path, next_seconds, 44 + 2 * 3000, 0.5))
+
+        self.assertEqual([(c["start_sample"], c["end_sample"], c["overlap_samples"]) for c in chunks],
+                         [(0, 1000, 0), (500, 3000, 500), (2500, 5500, 500), (5000, 8000, 500), (7500, 10000, 500)])
+        self.assertEqual(requests[:3], [(10.0, 3.0), (9.0, 2.5), (7.0, 2.5)])
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk["data"]), 44 + 2 * 3000)
+            np.testing.assert_array_equal(self._decode(chunk["data"]),
+                                          np.arange(chunk["start_sample"], chunk["end_sample"]))
+
+    def test_adaptive_chunks_from_pipe(self):
+        # ffmpeg でデコードする形式は見積もりの長さから残りの秒数を求める
+        path = self._fake("a.m4a", "FAKE 1000 10")
+        remaining = []
+        chunks = list(iter_adaptive_chunks(path, lambda left, limit: remaining.append(left) or 4.0,
+                                           44 + 2 * 5000, 0.0, estimated_seconds=10.0))
+
+        self.assertEqual([chunk["end_sample"] for chunk in chunks], [4000, 8000, 10000])
+        self.assertEqual(remaining[:3], [10.0, 6.0, 2.0])
+        self.assertEqual(self._spawns(), 1)
+
+    def test_prefetch_returns_first_item_before_source_finishes(self):
+        # 最初の要素は残りの取り出しを待たずに返り、先読みは上限までで止まる
+        release = threading.Event()
+        produced = []
+
+        def source():
+            for i in range(10):
+                produced.append(i)
+                yield i
+                if i == 0:
+                    release.wait(5)
+
+        items = prefetch(source(), size=2)
+        self.assertEqual(next(items), 0)
+        self.assertEqual(produced, [0])
+        release.set()
+        self.assertEqual(next(items), 1)
+        threading.Event().wait(0.3)
+        # 取り出し済み2件 + キュー2件 + 投入待ち1件
+        self.assertLessEqual(len(produced), 5)
+        self.assertEqual(list(items), list(range(2, 10)))
+
+    def test_prefetch_propagates_errors_and_closes_source(self):
+        closed = threading.Event()
+
+        def failing():
+            yield 1
+            raise ValueError("デコード失敗")
+
+        items = prefetch(failing())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+        def endless():
+            try:
+                while True:
+                    yield 0
+            finally:
+                closed.set()
+
+        items = prefetch(endless(), size=1)
+        next(items)
+        items.close()
+        self.assertTrue(closed.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
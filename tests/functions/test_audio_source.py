@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+import soundfile as sf
+from src.functions.audio_source import AudioSource, SyntheticSource, FileSource
+
+class TestAudioSource(unittest.TestCase):
+    def test_requires_generate(self):
+        """_generate を実装していないソースは作成時にエラーになる"""
+        class IncompleteSource(AudioSource):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSource(16000, 1)
+
+class TestSyntheticSource(unittest.TestCase):
+    def test_blocks_are_deterministic(self):
+        # ブロックの分け方に関係なく同じ信号になる
+        whole, _ = SyntheticSource(16000, 2, seed=3).read(5000)
+        source = SyntheticSource(16000, 2, seed=3)
+        parts = [source.read(n)[0] for n in (1024, 1, 3000, 975)]
+        np.testing.assert_array_equal(np.concatenate(parts), whole)
+        self.assertEqual(whole.shape, (5000, 2))
+        self.assertEqual(whole.dtype, np.float32)
+
+    def test_non_integer_frequency(self):
+        source = SyntheticSource(8000, 1, frequencies=[440.5], noise=0)
+        block, _ = source.read(8000 * 2)
+        expected = 0.25 * np.sin(2 * np.pi * 440.5 * np.arange(16000) / 8000)
+        np.testing.assert_allclose(block[:, 0], expected, atol=1e-6)
+
+    def test_duration(self):
+        # 指定した長さで終わり、最後のブロックは短くなる
+        source = SyntheticSource(1000, 1, duration=2.5)
+        lengths = []
+        while not source.finished:
+            lengths.append(len(source.read(1024)[0]))
+        self.assertEqual(lengths, [1024, 1024, 452])
+        self.assertEqual(source.frames_read, 2500)
+
+    def test_realtime_pacing(self):
+        # 実時間モードでは供給の速さが実時間に合わせられる
+        source = SyntheticSource(8000, 1, realtime=True)
+        source.start()
+        start = time.monotonic()
+        for _ in range(4):
+            source.read(400)
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+        self.assertEqual(source.dropped_frames, 0)
+
+    def test_realtime_overflow(self):
+        # 読み出しが遅れて保持できる量を超えると古いデータが捨てられる
+        source = SyntheticSource(8000, 1, realtime=True, latency_blocks=2)
+        source.start()
+        time.sleep(0.2)
+        block, overflowed = source.read(100)
+        self.assertTrue(overflowed)
+        self.assertEqual(len(block), 100)
+        self.assertGreater(source.dropped_frames, 1000)
+
+class TestFileSource(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, "input.wav")
+        self.samples = np.linspace(-0.5, 0.5, 3000, dtype=np.float32).reshape(1500, 2)
+        sf.write(self.path, self.samples, 8000, subtype='FLOAT')
+
+    def test_reads_file_and_pads_last_block(self):
+        source = FileSource(self.path)
+        blocks = []
+        while not source.finished:
+            blocks.append(source.read(1024)[0])
+        source.close()
+        self.assertEqual([len(block) for block in blocks], [1024, 1024])
+        recording = np.concatenate(blocks)
+        np.testing.assert_array_equal(recording[:1500], self.samples)
+        self.assertFalse(recording[1500:].any())
+
+    def test_loop_with_duration(self):
+        source = FileSource(self.path, loop=True, duration=0.5)
+        blocks = []
+        while not source.finished:
+            blocks.append(source.read(1024)[0])
+        source.close()
+        recording = np.concatenate(blocks)
+        self.assertEqual(len(recording), 4000)
+        np.testing.assert_array_equal(recording[1500:3000], self.samples)
+
+    def test_rejects_mismatched_rate(self):
+        with self.assertRaises(ValueError):
+            FileSource(self.path, samplerate=48000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import threading
+import unittest
+from src.functions.autotune import (
+    AutoTuner, PROBE_RATIO, REPROBE_CHUNKS, TARGET_OVERHEAD_RATIO, fit_latency, format_report
+)
+
+def _latency(seconds, overhead=2.0, per_second=0.01):
+    return overhead + per_second * seconds
+
+class TestAutoTuner(unittest.TestCase):
+    def test_fit_latency(self):
+        samples = [(seconds, _latency(seconds)) for seconds in (60, 240, 600)]
+        overhead, per_second = fit_latency(samples)
+        self.assertAlmostEqual(overhead, 2.0)
+        self.assertAlmostEqual(per_second, 0.01)
+        # 長さが揃っていると傾向は求められない
+        self.assertIsNone(fit_latency([(300, 5.0), (300, 5.5)]))
+        self.assertIsNone(fit_latency([(300, 5.0)]))
+
+    def test_first_chunk_is_probe(self):
+        tuner = AutoTuner(initial_chunk_seconds=400)
+        self.assertEqual(tuner.next_chunk_seconds(), 400 / PROBE_RATIO)
+        self.assertEqual(tuner.next_chunk_seconds(), 400)
+
+    def test_chunk_length_targets_overhead_ratio(self):
+        # 固定の待ち時間の割合が目標になる長さを選ぶ
+        tuner = AutoTuner(max_chunk_seconds=10000, initial_chunk_seconds=400)
+        for seconds in (100, 400):
+            tuner.next_chunk_seconds()
+            tuner.record(seconds, _latency(seconds))
+        expected = 2.0 * (1 - TARGET_OVERHEAD_RATIO) / (TARGET_OVERHEAD_RATIO * 0.01)
+        self.assertAlmostEqual(tuner.chunk_seconds, expected)
+        overhead = 2.0 / _latency(tuner.chunk_seconds)
+        self.assertAlmostEqual(overhead, TARGET_OVERHEAD_RATIO)
+
+    def test_chunk_length_bounds(self):
+        tuner = AutoTuner(min_chunk_seconds=60, max_chunk_seconds=600)
+        for seconds in (100, 400):
+            tuner.record(seconds, _latency(seconds, overhead=50.0))
+        self.assertEqual(tuner.chunk_seconds, 600)
+        # チャンクの最大サイズに収まる長さで切り詰め、そのことを報告する
+        tuner.next_chunk_seconds()
+        self.assertEqual(tuner.next_chunk_seconds(limit=300.0), 300.0)
+        self.assertTrue(tuner.report()["size_limited"])
+
+        tuner = AutoTuner(min_chunk_seconds=60, max_chunk_seconds=600)
+        for seconds in (100, 400):
+            tuner.record(seconds, _latency(seconds, overhead=0.0))
+        self.assertEqual(tuner.chunk_seconds, 60)
+
+        with self.assertRaises(ValueError):
+            AutoTuner(min_chunk_seconds=120, max_chunk_seconds=60)
+        with self.assertRaises(ValueError):
+            AutoTuner(max_concurrency=0)
+
+    def test_remaining_audio_is_split_evenly(self):
+        # 残りを同時リクエスト数の倍数のチャンクに均等に分ける
+        tuner = AutoTuner(initial_chunk_seconds=300, initial_concurrency=2)
+        tuner.next_chunk_seconds()
+        self.assertAlmostEqual(tuner.next_chunk_seconds(remaining=900), 225)
+        # 下限より短い端数は残さない
+        self.assertAlmostEqual(tuner.next_chunk_seconds(remaining=320), 160)
+        self.assertAlmostEqual(tuner.next_chunk_seconds(remaining=50), 50)
+
+    def _run(self, tuner, speed, chunks=200, seconds=300.0):
+        """同時リクエスト数に応じた処理時間を返すサーバーを模擬して記録し、同時リクエスト数の推移を返す"""
+        history = []
+        for _ in range(chunks):
+            c = tuner.concurrency
+            tuner.record(seconds, seconds / speed(c), in_flight=c)
+            history.append(c)
+        return history
+
+    def test_concurrency_increases_while_throughput_improves(self):
+        # 1リクエストあたりの速度が変わらない間は、上限まで同時リクエスト数を増やす
+        tuner = AutoTuner(max_concurrency=4)
+        self._run(tuner, lambda c: 100.0)
+        self.assertEqual(tuner.concurrency, 4)
+        self.assertAlmostEqual(tuner.report()["throughput"], 400.0)
+
+    def test_concurrency_settles_at_bandwidth_limit(self):
+        # 3接続以上では帯域を分け合うだけの場合、3に落ち着く
+        tuner = AutoTuner(max_concurrency=8)
+        self._run(tuner, lambda c: 300.0 / max(c, 3))
+        self.assertEqual(tuner.concurrency, 3)
+
+    def test_concurrency_is_probed_again(self):
+        # 戻した後も REPROBE_CHUNKS チャンクごとに増やしてみて、回線が空けば追従する
+        limit = [2]
+        tuner = AutoTuner(max_concurrency=8)
+        self._run(tuner, lambda c: 200.0 / max(c, limit[0]), chunks=50)
+        self.assertEqual(tuner.concurrency, 2)
+        limit[0] = 5
+        history = self._run(tuner, lambda c: 200.0 / max(c, limit[0]), chunks=10 * REPROBE_CHUNKS)
+        # 後半は（定期的に6を試す以外は）5で送信する
+        later = history[len(history) // 2:]
+        self.assertEqual(max(set(later), key=later.count), 5)
+        self.assertLessEqual(max(later), 6)
+
+    def test_failure_halves_concurrency(self):
+        tuner = AutoTuner(max_concurrency=8, initial_concurrency=8)
+        tuner.record_failure()
+        self.assertEqual(tuner.concurrency, 4)
+        self.assertEqual(tuner.report()["failures"], 1)
+
+    def test_concurrent_records(self):
+        tuner = AutoTuner(max_concurrency=4)
+
+        def worker():
+            for _ in range(100):
+                tuner.next_chunk_seconds(remaining=3600)
+                tuner.record(300, 3.0, in_flight=tuner.concurrency)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tuner.report()["chunks"], 400)
+        self.assertLessEqual(tuner.concurrency, 4)
+
+    def test_format_report(self):
+        tuner = AutoTuner()
+        self.assertIn("同時リクエスト 1", format_report(tuner.report()))
+        for seconds in (100, 400):
+            tuner.record(seconds, _latency(seconds), upload_seconds=0.5, wait_seconds=1.0)
+        line = format_report(tuner.report())
+        self.assertIn("アップロード 0.50秒", line)
+        self.assertIn("固定の待ち時間 2.00秒", line)
+
+if __name__ == '__main__':
+    unittest.main()
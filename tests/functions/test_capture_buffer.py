@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from src.functions.capture_buffer import CaptureBuffer, append_audio, recover_spool
+
+class TestCaptureBuffer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, "recording.wav")
+
+    def _blocks(self, count):
+        rng = np.random.default_rng(0)
+        return [rng.uniform(-0.5, 0.5, (1024, 2)).astype(np.float32) for _ in range(count)]
+
+    def test_short_recording_stays_in_memory(self):
+        buffer = CaptureBuffer(self.path, 16000)
+        blocks = self._blocks(3)
+        for block in blocks:
+            buffer.append(block)
+        self.assertFalse(buffer.spilled)
+        self.assertEqual(len(buffer), 3072)
+        buffer.finalize()
+
+        recording, rate = sf.read(self.path, dtype='float32')
+        self.assertEqual(rate, 16000)
+        expected = np.concatenate(blocks).mean(axis=1)
+        np.testing.assert_allclose(recording, expected, atol=1 / 32767)
+
+    def test_spills_over_memory_limit(self):
+        # 上限を超えた分は一時ファイルに書き出され、メモリ上の保持量は上限未満に保たれる
+        buffer = CaptureBuffer(self.path, 16000, memory_limit=3 * 4096)
+        blocks = self._blocks(10)
+        for block in blocks:
+            buffer.append(block)
+            self.assertLess(buffer.buffered_bytes, buffer.memory_limit)
+        self.assertTrue(buffer.spilled)
+        self.assertTrue(os.path.exists(buffer.spool_path))
+        buffer.finalize()
+
+        self.assertFalse(os.path.exists(buffer.spool_path))
+        recording, _ = sf.read(self.path, dtype='float32')
+        expected = np.concatenate(blocks).mean(axis=1)
+        np.testing.assert_allclose(recording, expected, atol=1 / 32767)
+
+    def test_discard_removes_spool(self):
+        buffer = CaptureBuffer(self.path, 16000, memory_limit=4096)
+        for block in self._blocks(3):
+            buffer.append(block)
+        buffer.discard()
+        self.assertFalse(os.path.exists(buffer.spool_path))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_append_to_existing_recording(self):
+        sf.write(self.path, np.full(1000, 0.25, dtype=np.float32), 16000)
+        buffer = CaptureBuffer(self.path, 16000, memory_limit=4096, append=True)
+        for block in self._blocks(3):
+            buffer.append(block)
+        buffer.finalize()
+
+        self.assertFalse(os.path.exists(buffer.spool_path))
+        recording, _ = sf.read(self.path, dtype='float32')
+        self.assertEqual(len(recording), 1000 + 3072)
+        np.testing.assert_allclose(recording[:1000], 0.25, atol=1 / 32767)
+        expected = np.concatenate(self._blocks(3)).mean(axis=1)
+        np.testing.assert_allclose(recording[1000:], expected, atol=1 / 32767)
+
+    def test_append_without_existing_recording_creates_it(self):
+        buffer = CaptureBuffer(self.path, 16000, append=True)
+        buffer.append(self._blocks(1)[0])
+        buffer.finalize()
+        self.assertEqual(sf.info(self.path).frames, 1024)
+
+    def test_append_audio_rejects_different_format(self):
+        sf.write(self.path, np.zeros(100, dtype=np.float32), 16000)
+        other = os.path.join(self.temp_dir.name, "other.wav")
+        sf.write(other, np.zeros(100, dtype=np.float32), 48000)
+        with self.assertRaises(ValueError):
+            append_audio(self.path, other)
+
+    def test_recover_spool_after_crash(self):
+        # 書き出しのたびにヘッダーを更新するため、閉じずに終了した一時ファイルも読み出せる
+        buffer = CaptureBuffer(self.path, 16000, memory_limit=4096)
+        for block in self._blocks(3):
+            buffer.append(block)
+        self.assertEqual(sf.info(buffer.spool_path).frames, len(buffer) - buffer.buffered_bytes // 4)
+        buffer._spool.close()
+
+        self.assertEqual(recover_spool(self.path), 3072 - buffer.buffered_bytes // 4)
+        self.assertFalse(os.path.exists(buffer.spool_path))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(recover_spool(self.path), 0)
+
+if __name__ == '__main__':
+    unittest.main()
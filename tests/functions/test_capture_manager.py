@@ -0,0 +1,165 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import soundfile as sf
+from src.functions.audio_source import SyntheticSource
+from src.functions.capture_manager import (
+    STATE_FAILED, STATE_RUNNING, STATE_STOPPED, CaptureManager, mix_blocks
+)
+from src.functions.devices import DeviceRegistry
+
+class FailingSource(SyntheticSource):
+    """指定したフレーム数を読み込んだ後にエラーになるソース（デバイスの取り外しの再現）"""
+
+    def __init__(self, *args, fail_after, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_after = fail_after
+
+    def read(self, frames):
+        if self.frames_read >= self.fail_after:
+            raise OSError("デバイスが取り外されました")
+        return super().read(frames)
+
+class TestCaptureManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.manager = CaptureManager(writer_threads=2)
+        self.addCleanup(self.manager.close)
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir.name, f"{name}.wav")
+
+    def test_mix_blocks_matches_recorder(self):
+        a = np.ones((1024, 2), dtype=np.float32) * 0.5
+        b = np.ones((1000, 4), dtype=np.float32) * 0.3
+        mixed = mix_blocks([a, b])
+        self.assertEqual(mixed.shape, (1000, 2))
+        self.assertEqual(mixed.dtype, np.float32)
+        np.testing.assert_allclose(mixed, 0.4)
+        self.assertIs(mix_blocks([a]), a)
+
+    def test_sessions_record_concurrently_to_separate_files(self):
+        rate = 16000
+        for i in range(6):
+            self.manager.start(f"room{i}", [SyntheticSource(rate, 2, 2 + i * 0.5, seed=i),
+                                            SyntheticSource(rate, 2, 2 + i * 0.5, seed=10 + i)],
+                               self._path(f"room{i}"), rate)
+        for i in range(6):
+            self.assertEqual(self.manager.wait(f"room{i}", timeout=30), self._path(f"room{i}"))
+
+        for i, status in enumerate(self.manager.status()):
+            self.assertEqual(status["state"], STATE_STOPPED)
+            recording, saved_rate = sf.read(self._path(f"room{i}"), dtype='float32')
+            self.assertEqual(saved_rate, rate)
+            self.assertEqual(len(recording), int((2 + i * 0.5) * rate))
+            # AudioRecorder.capture と同じミックス
+            expected = (SyntheticSource(rate, 2, seed=i).read(1024)[0]
+                        + SyntheticSource(rate, 2, seed=10 + i).read(1024)[0]).mean(axis=1) / 2
+            np.testing.assert_allclose(recording[:1024], expected, atol=1 / 32767)
+            self.assertFalse(os.path.exists(f"{self._path(f'room{i}')}.part"))
+
+    def test_thread_count_does_not_grow_with_sessions(self):
+        rate = 8000
+        before = threading.active_count()
+        for i in range(16):
+            self.manager.start(f"room{i}", [SyntheticSource(rate, 1, realtime=True)], self._path(f"room{i}"), rate)
+        time.sleep(0.3)
+        # 読み込みスレッド1つと書き出しスレッド2つ以外にスレッドは増えない
+        self.assertLessEqual(threading.active_count(), before + 2)
+        for status in self.manager.status():
+            self.assertEqual(status["state"], STATE_RUNNING)
+            self.assertGreater(status["seconds"], 0)
+
+    def test_stop_one_session_while_others_continue(self):
+        rate = 8000
+        for name in ("a", "b", "c"):
+            self.manager.start(name, [SyntheticSource(rate, 1, realtime=True)], self._path(name), rate)
+        time.sleep(0.3)
+        self.assertEqual(self.manager.stop("b"), self._path("b"))
+        self.assertGreater(sf.info(self._path("b")).duration, 0.1)
+        states = {status["name"]: status["state"] for status in self.manager.status()}
+        self.assertEqual(states, {"a": STATE_RUNNING, "b": STATE_STOPPED, "c": STATE_RUNNING})
+
+        # 停止したセッションは同じ名前で開始し直せる（保存先に追記）
+        length = sf.info(self._path("b")).frames
+        self.manager.start("b", [SyntheticSource(rate, 1, 1)], self._path("b"), rate, append=True)
+        self.manager.wait("b", timeout=10)
+        self.assertEqual(sf.info(self._path("b")).frames, length + rate)
+
+        self.manager.close()
+        for name in ("a", "c"):
+            self.assertTrue(os.path.exists(self._path(name)))
+
+    def test_rejects_duplicate_name_and_filepath(self):
+        rate = 8000
+        self.manager.start("a", [SyntheticSource(rate, 1, realtime=True)], self._path("a"), rate)
+        with self.assertRaises(ValueError):
+            self.manager.start("a", [SyntheticSource(rate, 1)], self._path("other"), rate)
+        with self.assertRaises(ValueError):
+            self.manager.start("b", [SyntheticSource(rate, 1)], self._path("a"), rate)
+        with self.assertRaises(ValueError):
+            self.manager.stop("missing")
+
+    def test_failed_input_keeps_recorded_audio_and_other_sessions(self):
+        rate = 8000
+        self.manager.start("broken", [FailingSource(rate, 1, 10, fail_after=4096)], self._path("broken"), rate)
+        self.manager.start("ok", [SyntheticSource(rate, 1, 1)], self._path("ok"), rate)
+        self.assertEqual(self.manager.wait("broken", timeout=10), self._path("broken"))
+        self.assertEqual(self.manager.wait("ok", timeout=10), self._path("ok"))
+
+        broken = self.manager.get("broken")
+        self.assertEqual(broken.state, STATE_FAILED)
+        self.assertIn("取り外されました", broken.error)
+        self.assertEqual(sf.info(self._path("broken")).frames, 4096)
+        self.assertEqual(sf.info(self._path("ok")).frames, rate)
+
+    def test_downsampled_session(self):
+        self.manager.start("speech", [SyntheticSource(48000, 2, 1)], self._path("speech"), 48000, target_rate=16000)
+        self.manager.wait("speech", timeout=10)
+        info = sf.info(self._path("speech"))
+        self.assertEqual(info.samplerate, 16000)
+        self.assertAlmostEqual(info.duration, 1.0, delta=0.01)
+
+    def test_start_devices(self):
+        registry = MagicMock()
+        registry.resolve.side_effect = lambda device, hostapi, reinit=True: (
+            (3, {'name': 'USB Mic', 'max_input_channels': 2}) if device == "USB" else (None, None))
+        manager = CaptureManager(writer_threads=1, registry=registry)
+        self.addCleanup(manager.close)
+        with self.assertRaises(ValueError):
+            manager.start_devices("a", ["USB", "Missing"], self._path("a"))
+
+        stream = SyntheticSource(48000, 2, 0.5)
+        with patch('src.functions.capture_manager.sd.InputStream', return_value=stream) as mock_stream:
+            session = manager.start_devices("a", ["USB"], self._path("a"), 48000)
+        mock_stream.assert_called_once_with(device=3, channels=2, samplerate=48000, callback=None)
+        self.assertEqual(session.labels, ["USB Mic"])
+        self.assertEqual(manager.wait("a", timeout=10), self._path("a"))
+    def test_unknown_device_keeps_live_sessions(self):
+        """録音中に見つからないデバイスを指定しても、PortAudioを再初期化せず録音中のストリームを止めない"""
+        devices = [{'name': 'USB Mic', 'max_input_channels': 1, 'max_output_channels': 0, 'hostapi': 0}]
+        manager = CaptureManager(writer_threads=1, registry=DeviceRegistry())
+        self.addCleanup(manager.close)
+        stream = SyntheticSource(8000, 1, realtime=True)
+        stream.stop = MagicMock(wraps=stream.stop)
+        with patch('sounddevice.query_devices', return_value=devices), \
+             patch('sounddevice._terminate', create=True) as mock_terminate, \
+             patch('sounddevice._initialize', create=True) as mock_initialize, \
+             patch('src.functions.capture_manager.sd.InputStream', return_value=stream):
+            session = manager.start_devices("a", ["USB"], self._path("a"), 8000)
+            with self.assertRaises(ValueError):
+                manager.start_devices("b", ["Missing"], self._path("b"), 8000)
+        mock_terminate.assert_not_called()
+        mock_initialize.assert_not_called()
+        self.assertEqual(session.status()["state"], STATE_RUNNING)
+        stream.stop.assert_not_called()
+        time.sleep(0.2)
+        self.assertEqual(manager.stop("a", timeout=10), self._path("a"))
+
+if __name__ == '__main__':
+    unittest.main()
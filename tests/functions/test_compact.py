@@ -0,0 +1,166 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+import soundfile as sf
+from src.functions.compact import (
+    RESULT_CONVERTED, RESULT_FAILED, RESULT_SKIPPED, compact_directory, compacted_path, convert_file, find_candidates,
+    format_summary, sample_hash
+)
+from src.functions.job_queue import STATUS_DONE, STATUS_PENDING, JobQueue
+from src.functions.session import RecordingSession, open_session, session_state_path
+from src.functions.transcribe import validate_audio_file
+
+def _write_speech(path, seconds=2.0, rate=16000, channels=1, subtype="PCM_16", seed=0):
+    """圧縮が効く程度に規則的な音声（正弦波と小さな雑音）を書き出す"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    samples = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(len(t))
+    samples = np.repeat(samples[:, None], channels, axis=1)
+    sf.write(path, samples, rate, subtype=subtype)
+    return path
+
+def _age(path, seconds=3600):
+    """ファイルの更新時刻を過去にする"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+    return os.stat(path).st_mtime
+
+class TestCompact(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.recordings = self.temp_dir.name
+
+    def test_convert_file_is_lossless(self):
+        """16bit・24bit・ステレオのWAVをFLACに変換し、デコードしたサンプルが一致する"""
+        for name, subtype, channels in (("a.wav", "PCM_16", 1), ("b.wav", "PCM_24", 2)):
+            path = _write_speech(os.path.join(self.recordings, name), subtype=subtype, channels=channels)
+            expected = sample_hash(path)
+            result = convert_file(path)
+            self.assertEqual(result["status"], RESULT_CONVERTED)
+            self.assertEqual(sample_hash(result["temp"]), expected)
+            self.assertLess(result["compacted_bytes"], result["original_bytes"])
+            info = sf.info(result["temp"])
+            self.assertEqual((info.format, info.subtype, info.channels), ("FLAC", subtype, channels))
+            # 元のファイルは変更しない
+            self.assertTrue(os.path.exists(path))
+            self.assertFalse(os.path.exists(compacted_path(path)))
+
+    def test_float_wav_is_skipped(self):
+        """浮動小数点のWAVはFLACで可逆に保存できないため対象にしない"""
+        path = _write_speech(os.path.join(self.recordings, "float.wav"), subtype="FLOAT")
+        result = convert_file(path)
+        self.assertEqual(result["status"], RESULT_SKIPPED)
+        self.assertIn("FLOAT", result["reason"])
+        self.assertFalse(os.path.exists(compacted_path(path) + ".tmp"))
+
+    def test_existing_target_with_different_content_fails(self):
+        path = _write_speech(os.path.join(self.recordings, "a.wav"))
+        _write_speech(compacted_path(path), seed=1)
+        result = convert_file(path)
+        self.assertEqual(result["status"], RESULT_FAILED)
+
+    def test_mismatched_samples_keep_original(self):
+        """検証でサンプルが一致しない場合は一時ファイルを削除し、元のファイルを残す"""
+        path = _write_speech(os.path.join(self.recordings, "a.wav"))
+        with patch("src.functions.compact.sample_hash", return_value="0" * 64):
+            result = convert_file(path)
+        self.assertEqual(result["status"], RESULT_FAILED)
+        self.assertEqual(os.listdir(self.recordings), ["a.wav"])
+
+    def test_compact_directory(self):
+        """対象のWAVを置き換え、キューのジョブと録音セッションの参照を更新する"""
+        queue = JobQueue(os.path.join(self.recordings, ".transcribe_queue.sqlite3"))
+        self.addCleanup(queue.close)
+        done = _write_speech(os.path.join(self.recordings, "done.wav"))
+        pending = _write_speech(os.path.join(self.recordings, "pending.wav"), seed=1)
+        recent = _write_speech(os.path.join(self.recordings, "recent.wav"), seed=2)
+        recording = _write_speech(os.path.join(self.recordings, "recording.wav"), seed=3)
+        with open(recording + ".part", "wb") as f:
+            f.write(b"")
+        session = open_session(self.recordings, "定例", 16000)
+        _write_speech(session.audio_path, seed=4)
+        hashes = {path: sample_hash(path) for path in (done, pending, session.audio_path)}
+        mtimes = {path: _age(path) for path in (done, pending, recording, session.audio_path)}
+        queue.enqueue(done)
+        queue.enqueue(pending)
+        queue.complete(queue.claim()["id"], "done.txt")
+
+        with patch("builtins.print"):
+            results = compact_directory(self.recordings, queue, workers=2, min_age_seconds=600)
+
+        statuses = {os.path.basename(result["path"]): result["status"] for result in results}
+        self.assertEqual(statuses, {"done.wav": RESULT_CONVERTED, "pending.wav": RESULT_CONVERTED,
+                                    "recent.wav": RESULT_SKIPPED, "recording.wav": RESULT_SKIPPED,
+                                    os.path.basename(session.audio_path): RESULT_CONVERTED})
+        for path, digest in hashes.items():
+            flac = compacted_path(path)
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(sample_hash(flac), digest)
+            # 更新時刻は元のファイルのまま（文字起こし済みの判定が変わらない）
+            self.assertEqual(os.stat(flac).st_mtime, mtimes[path])
+        self.assertTrue(os.path.exists(recent) and os.path.exists(recording))
+        self.assertFalse([name for name in os.listdir(self.recordings) if name.endswith(".tmp")])
+
+        # ジョブは状態を保ったまま置き換えたファイルを参照し、登録し直しても重複しない
+        jobs = {job["status"]: job["path"] for job in queue.list_jobs()}
+        self.assertEqual(jobs, {STATUS_DONE: os.path.abspath(compacted_path(done)),
+                                STATUS_PENDING: os.path.abspath(compacted_path(pending))})
+        self.assertFalse(queue.enqueue(compacted_path(pending)))
+
+        # 録音セッションは圧縮したファイルを参照し、文字起こしの対象としても読める
+        loaded = RecordingSession.load(session_state_path(session.audio_path))
+        self.assertEqual(loaded.audio_path, compacted_path(session.audio_path))
+        self.assertEqual(loaded.frames, 32000)
+        validate_audio_file(loaded.audio_path)
+        self.assertIn("圧縮: 3ファイル", format_summary(results))
+
+    def test_running_job_is_skipped(self):
+        """文字起こし中のファイルは置き換えない"""
+        queue = JobQueue(os.path.join(self.recordings, "queue.sqlite3"))
+        self.addCleanup(queue.close)
+        path = _write_speech(os.path.join(self.recordings, "a.wav"))
+        _age(path)
+        queue.enqueue(path)
+        queue.claim()
+        with patch("builtins.print"):
+            results = compact_directory(self.recordings, queue, workers=1, min_age_seconds=0)
+        self.assertEqual([result["reason"] for result in results], ["文字起こし中です"])
+        self.assertTrue(os.path.exists(path))
+
+    def test_job_claimed_during_conversion_is_skipped(self):
+        """探した後・置き換える前に文字起こしが始まったファイルは置き換えず、変換後のファイルを削除する"""
+        queue = JobQueue(os.path.join(self.recordings, "queue.sqlite3"))
+        self.addCleanup(queue.close)
+        path = _write_speech(os.path.join(self.recordings, "a.wav"))
+        _age(path)
+        queue.enqueue(path)
+
+        def claim_after_search(*args):
+            candidates = find_candidates(*args)
+            queue.claim("worker", 60)
+            return candidates
+
+        with patch("src.functions.compact.find_candidates", side_effect=claim_after_search), \
+                patch("builtins.print"):
+            results = compact_directory(self.recordings, queue, workers=1, min_age_seconds=0)
+        self.assertEqual([(result["status"], result["reason"]) for result in results],
+                         [(RESULT_SKIPPED, "文字起こし中です")])
+        self.assertEqual(sorted(os.listdir(self.recordings)), ["a.wav", "queue.sqlite3"])
+        self.assertEqual(queue.get(1)["path"], os.path.abspath(path))
+
+    def test_interrupted_swap_is_completed(self):
+        """置き換えの途中で終了し、FLACとWAVの両方が残った場合は、内容を確かめてWAVを削除する"""
+        path = _write_speech(os.path.join(self.recordings, "a.wav"))
+        _age(path)
+        sf.write(compacted_path(path), sf.read(path, dtype="int16")[0], 16000, format="FLAC")
+        with patch("builtins.print"):
+            results = compact_directory(self.recordings, workers=1, min_age_seconds=0)
+        self.assertEqual(results[0]["status"], RESULT_CONVERTED)
+        self.assertEqual(os.listdir(self.recordings), ["a.flac"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+from src.functions.devices import DeviceRegistry
+
+DEVICES = [
+    {'name': 'MacBook Pro Microphone', 'max_input_channels': 1, 'max_output_channels': 0,
+     'default_samplerate': 48000, 'hostapi': 0},
+    {'name': 'BlackHole 2ch', 'max_input_channels': 2, 'max_output_channels': 2,
+     'default_samplerate': 48000, 'hostapi': 0},
+    {'name': 'MacBook Pro Speakers', 'max_input_channels': 0, 'max_output_channels': 2,
+     'default_samplerate': 48000, 'hostapi': 0},
+    {'name': 'USB Mic', 'max_input_channels': 1, 'max_output_channels': 0,
+     'default_samplerate': 44100, 'hostapi': 1},
+]
+HOSTAPIS = [{'name': 'Core Audio'}, {'name': 'JACK Audio Connection Kit'}]
+
+class TestDeviceRegistry(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('sounddevice.query_devices', return_value=DEVICES)
+        self.mock_query = patcher.start()
+        self.addCleanup(patcher.stop)
+        hostapis = patch('sounddevice.query_hostapis', return_value=HOSTAPIS)
+        hostapis.start()
+        self.addCleanup(hostapis.stop)
+        self.registry = DeviceRegistry()
+
+    def test_enumerates_once(self):
+        # 何度検索してもデバイスの列挙は一度だけ
+        self.assertEqual(self.registry.get(1)['name'], 'BlackHole 2ch')
+        self.assertEqual(self.registry.find('blackhole')[0], 1)
+        self.assertEqual(self.registry.resolve('0')[0], 0)
+        self.assertIsNone(self.registry.get(10))
+        self.assertEqual(self.mock_query.call_count, 1)
+
+    def test_find_by_name_pattern(self):
+        # 大文字小文字を区別しない部分一致で、入力を持たないデバイスは除外される
+        self.assertEqual(self.registry.find('macbook pro'), (0, DEVICES[0]))
+        self.assertEqual(self.registry.find('Speakers', input_only=False), (2, DEVICES[2]))
+        # 完全一致は部分一致より優先される
+        self.assertEqual(self.registry.find('usb mic')[0], 3)
+
+    def test_find_by_hostapi(self):
+        self.assertEqual(self.registry.find('mic', hostapi='jack')[0], 3)
+        self.assertEqual(self.registry.find('mic', hostapi='core audio')[0], 0)
+
+    def test_resolve_rejects_output_device(self):
+        self.assertEqual(self.registry.resolve('2'), (None, None))
+
+    def test_expired_cache_does_not_reinitialize(self):
+        # 期限切れの一覧は取り直すが、録音中のストリームを止めないよう再初期化はしない
+        registry = DeviceRegistry(max_age=0)
+        with patch('sounddevice._terminate', create=True) as mock_terminate, \
+             patch('sounddevice._initialize', create=True) as mock_initialize:
+            registry.devices
+            registry.devices
+        self.assertEqual(self.mock_query.call_count, 2)
+        mock_terminate.assert_not_called()
+        mock_initialize.assert_not_called()
+
+    def test_refreshes_on_hot_plug(self):
+        # 見つからないデバイスは一覧を取り直してから検索する
+        self.assertEqual(self.registry.find('USB Mic')[0], 3)
+        plugged = DEVICES + [{'name': 'Conference Speakerphone', 'max_input_channels': 2,
+                              'max_output_channels': 2, 'default_samplerate': 48000, 'hostapi': 0}]
+        self.mock_query.return_value = plugged
+        with patch('sounddevice._terminate', create=True) as mock_terminate, \
+             patch('sounddevice._initialize', create=True) as mock_initialize:
+            index, device = self.registry.find('speakerphone')
+        self.assertEqual(index, 4)
+        mock_terminate.assert_called_once()
+        mock_initialize.assert_called_once()
+        self.assertEqual(self.mock_query.call_count, 2)
+
+    def test_not_found(self):
+        with patch('sounddevice._terminate', create=True), patch('sounddevice._initialize', create=True):
+            self.assertEqual(self.registry.find('missing'), (None, None))
+            self.assertEqual(self.registry.resolve('missing'), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from src.functions.http_client import (
+    ConnectionStats,
+    build_timeout,
+    create_client,
+    create_async_client,
+    measure_request,
+)
+
+class _TranscriptionHandler(BaseHTTPRequestHandler):
+    """keep-aliveで verbose_json を返すだけのテスト用ハンドラ"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "text": "テストテキスト",
+            "language": "japanese",
+            "duration": 1.0,
+            "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": 1.0, "text": "テストテキスト",
+                          "tokens": [], "temperature": 0.0, "avg_logprob": 0.0,
+                          "compression_ratio": 1.0, "no_speech_prob": 0.0}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server_url():
+    """テスト用サーバーを起動し、ベースURLを返す"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TranscriptionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+def _transcribe(client):
+    return client.audio.transcriptions.create(
+        model="whisper-1", file=("test.wav", b"RIFF"), response_format="verbose_json"
+    )
+
+def test_create_client_reuses_connection(server_url):
+    """同じクライアントで送信したリクエストは1本の接続を再利用する"""
+    stats = ConnectionStats()
+    client = create_client(max_connections=2, stats=stats, base_url=server_url)
+
+    try:
+        for _ in range(3):
+            response = _transcribe(client)
+            assert response.segments[0].text == "テストテキスト"
+    finally:
+        client.close()
+
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 3
+    assert snapshot["connections"] == 1
+    assert snapshot["connections_reused"] == 2
+    # 平文HTTPのためTLSハンドシェイクは発生せず、省略できたハンドシェイクもない
+    assert snapshot["tls_handshakes"] == 0
+    assert snapshot["handshakes_avoided"] == 0
+
+def test_create_async_client_reuses_connection(server_url):
+    """非同期クライアントでも直列のリクエストは接続を再利用する"""
+    stats = ConnectionStats()
+
+    async def run():
+        async with create_async_client(max_connections=2, stats=stats,
+                                       base_url=server_url) as client:
+            for _ in range(3):
+                await client.audio.transcriptions.create(
+                    model="whisper-1", file=("test.wav", b"RIFF"), response_format="verbose_json"
+                )
+
+    asyncio.run(run())
+
+    assert stats.requests == 3
+    assert stats.connections == 1
+    assert stats.connections_reused == 2
+
+def test_create_client_applies_pool_and_timeout():
+    """プールの上限とタイムアウトがhttpxクライアントに反映される"""
+    timeout = build_timeout(connect=1.0, read=5.0)
+    client = create_client(max_connections=8, timeout=timeout)
+
+    try:
+        pool = client._client._transport._pool
+        assert pool._max_connections == 8
+        assert pool._max_keepalive_connections == 8
+        assert client.timeout.connect == 1.0
+        assert client.timeout.read == 5.0
+    finally:
+        client.close()
+
+def test_connection_stats_counts_tls_handshakes():
+    """省略できたハンドシェイク数はHTTPSのリクエスト数とTLSハンドシェイク数から求める"""
+    stats = ConnectionStats()
+    for _ in range(3):
+        stats.record_request(secure=True)
+    stats.record_request(secure=False)
+    stats.record_event("connection.connect_tcp.complete")
+    stats.record_event("connection.start_tls.complete")
+    stats.record_event("connection.connect_tcp.complete")
+
+    assert stats.handshakes_avoided == 2
+    assert stats.connections_reused == 2
+
+def test_connection_stats_diff():
+    """バッチ前後のスナップショットの差分から省略できたハンドシェイク数を求める"""
+    before = {"requests": 5, "tls_requests": 5, "connections": 2, "tls_handshakes": 2}
+    after = {"requests": 15, "tls_requests": 15, "connections": 3, "tls_handshakes": 3}
+
+    diff = ConnectionStats.diff(before, after)
+
+    assert diff == {"requests": 10, "tls_requests": 10, "connections": 1, "tls_handshakes": 1,
+                    "connections_reused": 9, "handshakes_avoided": 9}
+
+def test_configure_client_closes_previous_client():
+    """クライアントを作り直すときに、置き換えたクライアントのコネクションプールを閉じる"""
+    from src.functions import transcribe
+    with patch("src.functions.transcribe.client", create_client()) as previous:
+        replaced = transcribe.configure_client(max_connections=3)
+        try:
+            assert previous.is_closed()
+            assert not replaced.is_closed()
+        finally:
+            replaced.close()
+
+def test_measure_request_records_upload_and_wait(server_url):
+    """計測中に送信したリクエストのアップロード時間と応答待ちの時間を記録する"""
+    client = create_client(base_url=server_url)
+
+    try:
+        with measure_request() as timing:
+            _transcribe(client)
+        _transcribe(client)
+    finally:
+        client.close()
+
+    assert timing.upload_seconds is not None and timing.upload_seconds >= 0
+    assert timing.wait_seconds is not None and timing.wait_seconds >= 0
@@ -0,0 +1,310 @@
+import os
+import sqlite3
+import unittest
+import tempfile
+import shutil
+from unittest.mock import patch
+from src.functions.job_queue import (
+    JobQueue, QueueBackend, open_queue, register_backend, STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED,
+    STATUS_SPLIT, KIND_CHUNK
+)
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "queue.sqlite3")
+        self.queue = JobQueue(self.db_path, max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _create_file(self, name, content=b"data"):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_enqueue_is_idempotent(self):
+        """同じ内容のファイルは一度だけ登録される"""
+        path = self._create_file("a.wav")
+        self.assertTrue(self.queue.enqueue(path))
+        self.assertFalse(self.queue.enqueue(path))
+        self.assertEqual(self.queue.counts(), {STATUS_PENDING: 1})
+
+    def test_enqueue_changed_file_again(self):
+        """内容が変わったファイルは新しいジョブとして登録される"""
+        path = self._create_file("a.wav")
+        self.queue.enqueue(path)
+        with open(path, "ab") as f:
+            f.write(b"more")
+        self.assertTrue(self.queue.enqueue(path))
+
+    def test_relocate(self):
+        """ファイルのジョブを置き換えたファイルに移し、実行中のジョブは移さない"""
+        moved = self._create_file("a.wav")
+        running = self._create_file("b.wav", b"other")
+        self.queue.enqueue(moved)
+        self.queue.enqueue(running)
+        self.queue.claim()
+        self.queue.claim()
+        self.queue.complete(1, "a.txt")
+        target = self._create_file("a.flac", b"flac")
+        stat = os.stat(target)
+
+        self.assertEqual(self.queue.relocate(moved, target, stat.st_size, stat.st_mtime), 1)
+        self.assertIsNone(self.queue.relocate(running, self._create_file("b.flac"), 4, stat.st_mtime))
+        self.assertEqual([job["path"] for job in self.queue.list_jobs()], [os.path.abspath(target), running])
+        self.assertEqual(self.queue.get(1)["status"], STATUS_DONE)
+        self.assertFalse(self.queue.enqueue(target))
+
+    def test_claim_in_fifo_order(self):
+        """登録順にジョブを取り出し、実行中にする"""
+        first = self._create_file("b.wav")
+        second = self._create_file("a.wav")
+        self.queue.enqueue(first)
+        self.queue.enqueue(second)
+
+        job = self.queue.claim()
+        self.assertEqual(job["path"], os.path.abspath(first))
+        self.assertEqual(job["status"], STATUS_RUNNING)
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(self.queue.claim()["path"], os.path.abspath(second))
+        self.assertIsNone(self.queue.claim())
+
+    def test_complete_and_fail(self):
+        """失敗したジョブは上限まで再試行され、その後失敗として残る"""
+        self.queue.enqueue(self._create_file("a.wav"))
+
+        job = self.queue.claim()
+        self.queue.fail(job["id"], "一時的なエラー")
+        self.assertEqual(self.queue.get(job["id"])["status"], STATUS_PENDING)
+
+        job = self.queue.claim()
+        self.queue.fail(job["id"], "再度のエラー")
+        failed = self.queue.get(job["id"])
+        self.assertEqual(failed["status"], STATUS_FAILED)
+        self.assertEqual(failed["error"], "再度のエラー")
+
+        self.queue.enqueue(self._create_file("b.wav"))
+        job = self.queue.claim()
+        self.queue.complete(job["id"], "b.txt")
+        self.assertEqual(self.queue.get(job["id"])["status"], STATUS_DONE)
+        self.assertEqual(self.queue.get(job["id"])["output"], "b.txt")
+
+    def test_queue_persists_and_requeues_running(self):
+        """プロセスを再起動しても、実行中だったジョブは待機中に戻して再開できる"""
+        self.queue.enqueue(self._create_file("a.wav"))
+        self.queue.claim()
+        self.queue.close()
+
+        self.queue = JobQueue(self.db_path)
+        self.assertEqual(self.queue.counts(), {STATUS_RUNNING: 1})
+        self.assertEqual(self.queue.requeue_running(), 1)
+        self.assertIsNotNone(self.queue.claim())
+
+    def test_expired_lease_is_requeued(self):
+        """リースの期限が切れたジョブは他のワーカーが取り出せる"""
+        self.queue.enqueue(self._create_file("a.wav"))
+        job = self.queue.claim("worker-a", lease_seconds=60)
+        self.assertEqual(job["worker"], "worker-a")
+        self.assertIsNone(self.queue.claim("worker-b", lease_seconds=60))
+
+        now = job["lease_expires"] + 1
+        with patch('src.functions.job_queue.time.time', return_value=now):
+            reclaimed = self.queue.claim("worker-b", lease_seconds=60)
+        self.assertEqual(reclaimed["id"], job["id"])
+        self.assertEqual(reclaimed["worker"], "worker-b")
+
+        # 期限切れ後の元のワーカーの結果は書き戻されない
+        self.assertFalse(self.queue.renew(job["id"], "worker-a"))
+        self.assertFalse(self.queue.complete(job["id"], "a.txt", "worker-a"))
+        self.assertTrue(self.queue.complete(job["id"], "a.txt", "worker-b", audio_seconds=30.0))
+        self.assertEqual(self.queue.get(job["id"])["status"], STATUS_DONE)
+
+    def test_expired_lease_counts_as_attempt(self):
+        """期限切れを繰り返したジョブは再試行の上限で失敗になる"""
+        self.queue.enqueue(self._create_file("a.wav"))
+        for _ in range(2):
+            job = self.queue.claim("worker-a", lease_seconds=1)
+            with patch('src.functions.job_queue.time.time', return_value=job["lease_expires"] + 1):
+                self.queue.requeue_expired()
+        failed = self.queue.get(job["id"])
+        self.assertEqual(failed["status"], STATUS_FAILED)
+        self.assertIn("リースの期限切れ", failed["error"])
+
+    def test_requeue_running_keeps_active_leases(self):
+        """期限内のリースを持つジョブは再起動時にも戻さない"""
+        self.queue.enqueue(self._create_file("a.wav"))
+        self.queue.claim("worker-a", lease_seconds=60)
+        self.assertEqual(self.queue.requeue_running(), 0)
+
+    def _split(self, count=2):
+        self.queue.enqueue(self._create_file("long.wav"))
+        job = self.queue.claim("worker-a", lease_seconds=60)
+        chunks = [{"index": i, "path": self._create_file(f"chunk_{i}.wav", bytes([i])), "start_sample": i * 100,
+                   "end_sample": (i + 1) * 100, "overlap_samples": 0, "sample_rate": 100} for i in range(count)]
+        return job, self.queue.split(job["id"], chunks, "worker-a")
+
+    def test_split_and_complete_chunks(self):
+        """最後のチャンクを完了したワーカーが元のジョブを統合のために取り出す"""
+        job, chunk_ids = self._split()
+        self.assertEqual(len(chunk_ids), 2)
+        self.assertEqual(self.queue.get(job["id"])["status"], STATUS_SPLIT)
+
+        first = self.queue.claim("worker-a", lease_seconds=60)
+        second = self.queue.claim("worker-b", lease_seconds=60)
+        self.assertEqual(first["kind"], KIND_CHUNK)
+        self.assertEqual(first["chunk"]["start_sample"], 0)
+
+        result = {"segments": [{"start": 0.0, "end": 1.0, "text": "a"}], "duration": 1.0}
+        self.assertIsNone(self.queue.complete_chunk(second["id"], result, "worker-b", 1.0, 60))
+        parent = self.queue.complete_chunk(first["id"], result, "worker-a", 1.0, 60)
+        self.assertEqual(parent["id"], job["id"])
+        self.assertEqual(parent["status"], STATUS_RUNNING)
+        self.assertEqual(parent["worker"], "worker-a")
+
+        chunks = self.queue.list_chunks(job["id"])
+        self.assertEqual([chunk["chunk"]["index"] for chunk in chunks], [0, 1])
+        self.assertEqual(chunks[1]["result"], result)
+
+    def test_failed_chunk_fails_parent(self):
+        """再試行の上限に達したチャンクがあると元のジョブと残りのチャンクも失敗になる"""
+        job, chunk_ids = self._split(3)
+        for _ in range(2):
+            chunk = self.queue.claim("worker-a")
+            self.queue.fail(chunk["id"], "APIエラー", "worker-a")
+        self.assertEqual(self.queue.get(job["id"])["status"], STATUS_FAILED)
+        self.assertEqual(self.queue.counts(), {STATUS_FAILED: 4})
+
+    def test_worker_stats(self):
+        """ワーカーごとに完了数と処理した音声の長さを集計する"""
+        for name in ("a.wav", "b.wav", "c.wav"):
+            self.queue.enqueue(self._create_file(name))
+        for worker in ("worker-a", "worker-a", "worker-b"):
+            job = self.queue.claim(worker, lease_seconds=60)
+            self.queue.complete(job["id"], "out.txt", worker, audio_seconds=60.0)
+        self.queue.heartbeat("worker-c")
+
+        stats = {row["worker"]: row for row in self.queue.worker_stats()}
+        self.assertEqual(sorted(stats), ["worker-a", "worker-b", "worker-c"])
+        self.assertEqual(stats["worker-a"]["done"], 2)
+        self.assertEqual(stats["worker-a"]["audio_seconds"], 120.0)
+        self.assertEqual(stats["worker-b"]["done"], 1)
+        self.assertEqual(stats["worker-c"]["done"], 0)
+        self.assertIsNotNone(stats["worker-c"]["last_seen"])
+
+    def test_migrates_previous_schema(self):
+        """以前のバージョンのキューを開くと不足している列を追加する"""
+        self.queue.close()
+        old_path = os.path.join(self.temp_dir, "old.sqlite3")
+        conn = sqlite3.connect(old_path)
+        conn.executescript(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "mtime REAL NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, output TEXT, "
+            "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (path, size, mtime));"
+            "INSERT INTO jobs (path, size, mtime, status, created_at, updated_at) "
+            "VALUES ('/tmp/a.wav', 1, 1.0, 'pending', 0, 0);"
+        )
+        conn.close()
+
+        self.queue = JobQueue(old_path)
+        job = self.queue.claim("worker-a", lease_seconds=60)
+        self.assertEqual(job["path"], "/tmp/a.wav")
+        self.assertEqual(job["kind"], "file")
+
+    def _enqueue_durations(self, queue, durations, **kwargs):
+        paths = {}
+        for name, duration in durations.items():
+            path = self._create_file(name, name.encode())
+            queue.enqueue(path, duration=duration, **kwargs.get(name, {}))
+            paths[name] = os.path.abspath(path)
+        return paths
+
+    def test_claim_shortest_job_first(self):
+        """SJFでは短いファイルから取り出す"""
+        queue = JobQueue(self.db_path, policy="sjf")
+        try:
+            self._enqueue_durations(queue, {"allhands.wav": 14400, "standup.wav": 600, "review.wav": 1800})
+            names = [os.path.basename(queue.claim()["path"]) for _ in range(3)]
+        finally:
+            queue.close()
+        self.assertEqual(names, ["standup.wav", "review.wav", "allhands.wav"])
+
+    def test_claim_priority_and_deadline(self):
+        """優先度・期限の方針では指定したジョブを先に取り出し、同じ場合は短い順にする"""
+        self._enqueue_durations(self.queue, {"a.wav": 600, "b.wav": 60, "c.wav": 3600})
+        self.queue.close()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET priority = 5, deadline = 100 WHERE path LIKE '%c.wav'")
+            conn.execute("UPDATE jobs SET deadline = 50 WHERE path LIKE '%a.wav'")
+
+        for policy, expected in (("priority", ["c.wav", "b.wav", "a.wav"]),
+                                 ("deadline", ["a.wav", "c.wav", "b.wav"])):
+            self.queue = JobQueue(self.db_path, policy=policy)
+            names = [os.path.basename(self.queue.claim()["path"]) for _ in range(3)]
+            self.assertEqual(names, expected)
+            self.assertEqual(self.queue.requeue_running(), 3)
+            self.queue.close()
+        self.queue = JobQueue(self.db_path)
+
+    def test_chunks_interleave_with_short_files(self):
+        """分割された長いファイルの残りのチャンクは、残りの処理量より短いファイルの後に取り出す"""
+        queue = JobQueue(self.db_path, policy="sjf")
+        try:
+            self._enqueue_durations(queue, {"allhands.wav": 3000})
+            parent = queue.claim("worker-a")
+            chunks = [{"index": i, "path": self._create_file(f"chunk_{i}.wav", bytes([i])),
+                       "start_sample": i * 1000, "end_sample": (i + 1) * 1000, "overlap_samples": 0,
+                       "sample_rate": 1} for i in range(3)]
+            queue.split(parent["id"], chunks, "worker-a")
+
+            def claim_name():
+                job = queue.claim("worker-b")
+                if job["kind"] == KIND_CHUNK:
+                    queue.complete_chunk(job["id"], None, "worker-b")
+                    return "chunk"
+                return os.path.basename(job["path"])
+
+            # 後から届いたファイルは、長いファイルの残りの処理量と比べて順序が決まる
+            self._enqueue_durations(queue, {"standup1.wav": 600})
+            self.assertEqual(claim_name(), "standup1.wav")
+            self.assertEqual(claim_name(), "chunk")         # 残り3000秒
+            self._enqueue_durations(queue, {"review.wav": 2500})
+            self.assertEqual(claim_name(), "chunk")         # 残り2000秒 < 2500秒
+            self._enqueue_durations(queue, {"standup2.wav": 600})
+            self.assertEqual(claim_name(), "standup2.wav")  # 600秒 < 残り1000秒
+            self.assertEqual(claim_name(), "chunk")
+            self.assertEqual(claim_name(), "review.wav")
+        finally:
+            queue.close()
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            JobQueue(self.db_path, policy="random")
+
+    def test_open_queue(self):
+        """場所のスキームに応じたバックエンドでキューを開く"""
+        self.queue.close()
+        self.queue = open_queue(f"sqlite://{self.db_path}")
+        self.assertIsInstance(self.queue, JobQueue)
+        self.assertEqual(self.queue.shared_dir, self.temp_dir)
+
+        opened = []
+        register_backend("memory-test", lambda location, **kwargs: opened.append(location) or self.queue)
+        self.assertIs(open_queue("memory-test://jobs"), self.queue)
+        self.assertEqual(opened, ["jobs"])
+        with self.assertRaises(ValueError):
+            open_queue("unknown://jobs")
+
+    def test_incomplete_backend_is_rejected(self):
+        """メソッドを実装していないバックエンドは作成時にエラーになる"""
+        class PartialBackend(QueueBackend):
+            def claim(self, worker=None, lease_seconds=None):
+                return None
+
+        with self.assertRaises(TypeError):
+            PartialBackend()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+from src.functions.minutes import (
+    MinutesBackend, MinutesCache, MinutesGenerator, OpenAIMinutesBackend, StubMinutesBackend,
+    estimate_tokens, format_minutes, open_minutes_backend, parse_transcript, register_minutes_backend,
+    split_windows, write_minutes
+)
+
+def make_transcript(count, edits=None):
+    """count 行の文字起こし結果（edits で指定した行を置き換える）"""
+    edits = edits or {}
+    lines = []
+    for i in range(count):
+        text = edits.get(i, f"議題{i}について担当者{i % 7}が説明しました。")
+        lines.append(f"[{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}] {text}")
+    return "\n".join(lines) + "\n\n" + "=" * 50 + "\nAPI使用情報:\n合計時間: 1.0分\n"
+
+class CountingBackend(StubMinutesBackend):
+    """呼び出された入力を記録するスタブ"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summarized = []
+        self.merged = []
+
+    def summarize(self, window_text):
+        with self.lock:
+            self.summarized.append(window_text)
+        return super().summarize(window_text)
+
+    def merge(self, partials):
+        with self.lock:
+            self.merged.append(partials)
+        return super().merge(partials)
+
+class TestMinutes(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_transcript_skips_usage_section(self):
+        text = "[00:00:01] おはようございます\n続きの発言\n[01:02:03] 次の議題です\n" + make_transcript(0)
+        lines = parse_transcript(text)
+        self.assertEqual(lines, [{"start": 1, "text": "おはようございます続きの発言"},
+                                 {"start": 3723, "text": "次の議題です"}])
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens("会議"), 2)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("会議 abc"), 3)
+
+    def test_split_windows_respects_token_budget(self):
+        windows = split_windows(parse_transcript(make_transcript(200)), max_tokens=200)
+        self.assertGreater(len(windows), 1)
+        for window in windows:
+            self.assertLessEqual(window["tokens"], 200)
+        # 全ての行がどれか1つのウィンドウに順に含まれる
+        joined = "\n".join(window["text"] for window in windows)
+        self.assertEqual(joined.count("\n") + 1, 200)
+        self.assertEqual([window["index"] for window in windows], list(range(len(windows))))
+
+    def test_split_windows_edit_changes_only_nearby_windows(self):
+        original = split_windows(parse_transcript(make_transcript(400)), max_tokens=600)
+        edited = split_windows(parse_transcript(make_transcript(400, {200: "予算を一割増やす案で決定しました。" * 2})),
+                               max_tokens=600)
+        unchanged = {window["text"] for window in original} & {window["text"] for window in edited}
+        self.assertGreaterEqual(len(unchanged), len(original) - 3)
+
+    def test_generate_with_stub_extracts_decisions_and_action_items(self):
+        text = make_transcript(50, {10: "次回の日程は金曜日に決定しました。", 30: "山田さん、資料の作成をお願いします。"})
+        generator = MinutesGenerator(StubMinutesBackend(), window_tokens=150)
+        minutes = generator.generate(text)
+        self.assertEqual(minutes["decisions"], ["[00:00:10] 次回の日程は金曜日に決定しました。"])
+        self.assertEqual(minutes["action_items"], ["[00:00:30] 山田さん、資料の作成をお願いします。"])
+        self.assertEqual(minutes["start"], 0)
+        self.assertEqual(minutes["end"], 49)
+        self.assertTrue(minutes["summary"].startswith("[00:00:00] 議題0"))
+
+    def test_reduce_is_hierarchical(self):
+        backend = CountingBackend()
+        generator = MinutesGenerator(backend, window_tokens=100, fan_in=3, concurrency=4)
+        generator.generate(make_transcript(300))
+        windows = len(backend.summarized)
+        self.assertGreater(windows, 9)
+        # 1回の統合に渡す件数は上限以下で、最後に1つにまとまるまで段階的に統合される
+        self.assertTrue(all(2 <= len(partials) <= 3 for partials in backend.merged))
+        self.assertGreaterEqual(len(backend.merged), (windows - 1) // 2)
+        self.assertEqual(generator.stats["summarized"], windows)
+
+    def test_cache_recomputes_only_edited_windows(self):
+        cache = MinutesCache(os.path.join(self.temp_dir, "cache.sqlite3"))
+        try:
+            first = CountingBackend()
+            MinutesGenerator(first, cache, window_tokens=600).generate(make_transcript(400))
+
+            again = CountingBackend()
+            MinutesGenerator(again, cache, window_tokens=600).generate(make_transcript(400))
+            self.assertEqual(again.summarized, [])
+            self.assertEqual(again.merged, [])
+
+            edited = CountingBackend()
+            MinutesGenerator(edited, cache, window_tokens=600).generate(
+                make_transcript(400, {200: "予算案を承認しました。"}))
+            self.assertGreaterEqual(len(edited.summarized), 1)
+            self.assertLessEqual(len(edited.summarized), 3)
+            self.assertLess(len(edited.merged), len(first.merged))
+        finally:
+            cache.close()
+
+    def test_cache_is_keyed_by_backend(self):
+        cache = MinutesCache(os.path.join(self.temp_dir, "cache.sqlite3"))
+        try:
+            MinutesGenerator(CountingBackend(), cache).generate(make_transcript(10))
+            other = OpenAIMinutesBackend(model="other-model", client=MagicMock())
+            other.client.chat.completions.create.return_value.choices[0].message.content = json.dumps(
+                {"summary": "要約", "decisions": [], "action_items": []})
+            minutes = MinutesGenerator(other, cache).generate(make_transcript(10))
+            self.assertEqual(minutes["summary"], "要約")
+        finally:
+            cache.close()
+
+    def test_openai_backend_requests_json(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices[0].message.content = json.dumps(
+            {"summary": ["一文目", "二文目"], "decisions": "予算を承認", "action_items": ["[00:01:00] 田中: 見積もり"]})
+        backend = OpenAIMinutesBackend(model="test-model", client=client)
+        result = backend.summarize("[00:00:00] 発言")
+        self.assertEqual(result, {"summary": "一文目\n二文目", "decisions": ["予算を承認"],
+                                  "action_items": ["[00:01:00] 田中: 見積もり"]})
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["model"], "test-model")
+        self.assertEqual(kwargs["response_format"], {"type": "json_object"})
+        self.assertEqual(kwargs["messages"][1]["content"], "[00:00:00] 発言")
+
+    def test_openai_backend_rejects_invalid_json(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices[0].message.content = "JSONではない"
+        with self.assertRaises(ValueError):
+            OpenAIMinutesBackend(client=client).merge([])
+
+    def test_register_backend(self):
+        class FixedBackend(MinutesBackend):
+            def cache_id(self):
+                return "fixed"
+
+            def summarize(self, window_text):
+                return {"summary": "固定", "decisions": [], "action_items": []}
+
+            def merge(self, partials):
+                return self.summarize("")
+
+        register_minutes_backend("fixed", lambda **kwargs: FixedBackend())
+        self.assertIsInstance(open_minutes_backend("fixed"), FixedBackend)
+        with self.assertRaises(ValueError):
+            open_minutes_backend("unknown")
+
+    def test_incomplete_backend_is_rejected(self):
+        """merge を実装していないバックエンドは作成時にエラーになる"""
+        class PartialBackend(MinutesBackend):
+            def cache_id(self):
+                return "partial"
+
+            def summarize(self, window_text):
+                return {"summary": "", "decisions": [], "action_items": []}
+
+        with self.assertRaises(TypeError):
+            PartialBackend()
+
+    def test_generate_rejects_empty_transcript(self):
+        with self.assertRaises(ValueError):
+            MinutesGenerator(StubMinutesBackend()).generate(make_transcript(0))
+
+    def test_write_minutes(self):
+        transcript = os.path.join(self.temp_dir, "20250101_会議_transcript.txt")
+        with open(transcript, "w", encoding="utf-8") as f:
+            f.write(make_transcript(5, {2: "方針を決定しました。"}))
+        output = write_minutes(transcript, os.path.join(self.temp_dir, "minutes"),
+                               MinutesGenerator(StubMinutesBackend()))
+        self.assertEqual(output.name, "20250101_会議_transcript_minutes.md")
+        content = output.read_text(encoding="utf-8")
+        self.assertIn("# 議事録: 20250101_会議_transcript", content)
+        self.assertIn("## 決定事項\n\n- [00:00:02] 方針を決定しました。", content)
+        self.assertIn("## アクションアイテム\n\n（なし）", content)
+
+    def test_format_minutes_without_items(self):
+        content = format_minutes({"summary": "", "decisions": [], "action_items": [], "start": 0, "end": 65}, "会議")
+        self.assertIn("対象: 00:00:00 〜 00:01:05", content)
+        self.assertIn("## 要約\n\n（なし）", content)
+
+if __name__ == '__main__':
+    unittest.main()
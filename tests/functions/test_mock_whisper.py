@@ -0,0 +1,164 @@
+import io
+import threading
+import time
+import numpy as np
+import openai
+import pytest
+import soundfile as sf
+from unittest.mock import patch
+from src.functions.http_client import create_client
+from src.functions.mock_whisper import (
+    MockWhisperConfig,
+    MockWhisperServer,
+    build_segments,
+    parse_multipart,
+)
+from src.functions.transcribe import transcribe_audio
+
+def _wav_bytes(seconds, rate=16000):
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * rate), dtype=np.int16), rate, format="WAV")
+    return buffer.getvalue()
+
+def _transcribe(client, data, response_format="verbose_json"):
+    return client.audio.transcriptions.create(
+        model="whisper-1", file=("test.wav", data), language="ja", response_format=response_format
+    )
+
+@pytest.fixture
+def mock_server():
+    """設定を指定してモックサーバーを起動するファクトリ"""
+    servers = []
+
+    def start(**config):
+        server = MockWhisperServer(config=MockWhisperConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+def test_build_segments_is_deterministic():
+    """セグメントは音声の長さだけから決まる"""
+    segments = build_segments(12.0, segment_seconds=5.0)
+    assert [(s["start"], s["end"]) for s in segments] == [(0.0, 5.0), (5.0, 10.0), (10.0, 12.0)]
+    assert build_segments(12.0, 5.0) == segments
+    assert build_segments(0.0) == []
+
+def test_parse_multipart():
+    body = (b'--b\r\nContent-Disposition: form-data; name="model"\r\n\r\nwhisper-1\r\n'
+            b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.wav"\r\n'
+            b'Content-Type: audio/wav\r\n\r\n\x00\r\n--\xff\r\n--b--\r\n')
+    fields = parse_multipart('multipart/form-data; boundary="b"', body)
+    assert fields["model"] == (None, b"whisper-1")
+    assert fields["file"] == ("a.wav", b"\x00\r\n--\xff")
+
+def test_verbose_json_contract(mock_server):
+    """OpenAIクライアントから verbose_json の応答として読める"""
+    server = mock_server()
+    client = create_client(base_url=server.base_url)
+    try:
+        response = _transcribe(client, _wav_bytes(12.0))
+        text = _transcribe(client, _wav_bytes(3.0), response_format="text")
+    finally:
+        client.close()
+
+    assert response.duration == pytest.approx(12.0)
+    assert response.language == "ja"
+    assert [segment.end for segment in response.segments] == [5.0, 10.0, 12.0]
+    assert text.startswith("セグメント1")
+    stats = server.stats.snapshot()
+    assert stats["requests"] == 2
+    assert stats["audio_seconds"] == pytest.approx(15.0)
+    assert stats["status_counts"] == {200: 2}
+
+def test_transcribe_audio_end_to_end(mock_server, tmp_path):
+    """transcribe_audio がベースURLで指定したモックサーバーにアップロードして結果を統合する"""
+    server = mock_server(latency=0.01)
+    audio_file = tmp_path / "meeting.wav"
+    sf.write(audio_file, np.zeros(16000 * 12, dtype=np.int16), 16000)
+    client = create_client(base_url=server.base_url)
+    try:
+        with patch("src.functions.transcribe.client", client):
+            transcription, prompt_info = transcribe_audio(str(audio_file))
+    finally:
+        client.close()
+
+    assert transcription.splitlines()[1].startswith("[00:00:05] セグメント2")
+    assert prompt_info["duration_seconds"] == pytest.approx(12.0)
+    assert server.stats.snapshot()["bytes_received"] > 16000 * 12 * 2
+
+def test_injected_errors(mock_server):
+    """429と5xxを指定した確率で返す"""
+    server = mock_server(rate_limit_rate=1.0, retry_after=0)
+    client = create_client(base_url=server.base_url, max_retries=0)
+    with pytest.raises(openai.RateLimitError):
+        _transcribe(client, _wav_bytes(1.0))
+    client.close()
+
+    server = mock_server(server_error_rate=1.0, server_error_status=503)
+    client = create_client(base_url=server.base_url, max_retries=0)
+    with pytest.raises(openai.InternalServerError):
+        _transcribe(client, _wav_bytes(1.0))
+    client.close()
+    assert server.stats.snapshot()["status_counts"] == {503: 1}
+
+def test_injected_errors_are_retried(mock_server):
+    """一部のリクエストだけが失敗する場合はクライアントの再試行で成功する"""
+    server = mock_server(server_error_rate=0.5, retry_after=0.01, seed=1)
+    client = create_client(base_url=server.base_url, max_retries=10)
+    try:
+        for _ in range(5):
+            assert _transcribe(client, _wav_bytes(1.0)).duration == pytest.approx(1.0)
+    finally:
+        client.close()
+    counts = server.stats.snapshot()["status_counts"]
+    assert counts[200] == 5
+    assert counts.get(500, 0) > 0
+
+def _run_concurrently(server, count, max_retries=0):
+    results = []
+    client = create_client(base_url=server.base_url, max_connections=count, max_retries=max_retries)
+
+    def worker():
+        try:
+            results.append(_transcribe(client, _wav_bytes(1.0)).duration)
+        except openai.RateLimitError as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+    return results
+
+def test_concurrency_limit_rejects(mock_server):
+    """上限を超えた同時リクエストは429で拒否される"""
+    server = mock_server(latency=0.3, max_concurrency=1)
+    results = _run_concurrently(server, 3)
+    assert sum(isinstance(result, openai.RateLimitError) for result in results) == 2
+    assert server.stats.snapshot()["peak_concurrency"] == 1
+
+def test_concurrency_limit_queues(mock_server):
+    """queue_over_limit の場合は上限を超えたリクエストを順番に処理する"""
+    server = mock_server(latency=0.1, max_concurrency=2, queue_over_limit=True)
+    start = time.monotonic()
+    results = _run_concurrently(server, 4)
+    assert results == [1.0] * 4
+    assert server.stats.snapshot()["peak_concurrency"] == 2
+    assert time.monotonic() - start >= 0.2
+
+def test_bandwidth_limit(mock_server):
+    """受信速度の上限に合わせてアップロードに時間がかかる"""
+    server = mock_server(bandwidth=400_000)
+    data = _wav_bytes(6.0)  # 約192KB
+    client = create_client(base_url=server.base_url)
+    start = time.monotonic()
+    try:
+        _transcribe(client, data)
+    finally:
+        client.close()
+    assert time.monotonic() - start >= len(data) / 400_000 * 0.9
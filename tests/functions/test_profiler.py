@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from src.functions.profiler import CpuProfiler, _stages, stage, staged, to_collapsed
+
+def _busy(seconds):
+    """指定した時間だけCPUを使う"""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+def stage_busy(name, seconds):
+    with stage(name):
+        _busy(seconds)
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage_nesting(self):
+        ident = threading.get_ident()
+        with stage("decode"):
+            self.assertEqual(_stages[ident], "decode")
+            with stage("upload"):
+                self.assertEqual(_stages[ident], "upload")
+            self.assertEqual(_stages[ident], "decode")
+        self.assertNotIn(ident, _stages)
+
+    def test_staged_only_while_fetching(self):
+        # 要素を取り出す間だけステージを設定し、利用側の処理には持ち越さない
+        seen = []
+
+        def items():
+            for i in range(3):
+                seen.append(_stages.get(threading.get_ident()))
+                yield i
+
+        for _ in staged("decode", items()):
+            self.assertNotIn(threading.get_ident(), _stages)
+        self.assertEqual(seen, ["decode"] * 3)
+
+    def test_profile_writes_speedscope_by_stage(self):
+        profiler = CpuProfiler(self.temp_dir, interval=0.005)
+        worker = threading.Thread(target=lambda: stage_busy("upload", 0.2))
+        with profiler.profile("meeting"):
+            worker.start()
+            with stage("decode"):
+                _busy(0.2)
+            worker.join()
+            # 待機中のスレッド（ロックの待ち）は記録しない
+            with stage("write"):
+                threading.Event().wait(0.1)
+
+        with open(os.path.join(self.temp_dir, "meeting.speedscope.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        frames = data["shared"]["frames"]
+        profile = data["profiles"][0]
+        self.assertEqual(profile["type"], "sampled")
+        self.assertEqual(len(profile["samples"]), len(profile["weights"]))
+        roots = {frames[sample[0]]["name"] for sample in profile["samples"]}
+        self.assertIn("[decode]", roots)
+        self.assertIn("[upload]", roots)
+        self.assertNotIn("[write]", roots)
+        busy = [i for i, frame in enumerate(frames) if frame["name"] == "_busy"]
+        self.assertEqual(len(busy), 1)
+        self.assertTrue(frames[busy[0]]["file"].endswith("test_profiler.py"))
+        seconds = sum(weight for sample, weight in zip(profile["samples"], profile["weights"])
+                      if frames[sample[0]]["name"] == "[decode]")
+        self.assertGreater(seconds, 0.1)
+        # プロファイルの終了後はサンプリングのスレッドが残らない
+        self.assertFalse(any(thread.name == "cpu-profiler" for thread in threading.enumerate()))
+
+    def test_profile_collapsed_and_nested(self):
+        # 入れ子のプロファイルは外側にまとめて1ファイルにする
+        profiler = CpuProfiler(self.temp_dir, fmt="collapsed", interval=0.005)
+        with profiler.profile("batch"):
+            with profiler.profile("file"):
+                with stage("stitch"):
+                    _busy(0.1)
+        self.assertEqual(os.listdir(self.temp_dir), ["batch.collapsed.txt"])
+        with open(os.path.join(self.temp_dir, "batch.collapsed.txt"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, value = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("[stitch];"))
+            self.assertGreater(int(value), 0)
+
+    def test_profile_from_other_thread_is_not_nested(self):
+        # 他のスレッドのプロファイル中は入れ子として扱わず、計測せずに実行する
+        profiler = CpuProfiler(self.temp_dir, fmt="collapsed", interval=0.005)
+        started, release = threading.Event(), threading.Event()
+
+        def first():
+            with profiler.profile("first"):
+                started.set()
+                release.wait(10)
+                stage_busy("upload", 0.05)
+
+        thread = threading.Thread(target=first)
+        thread.start()
+        started.wait(10)
+        with patch("builtins.print") as mock_print:
+            with profiler.profile("second"):
+                _busy(0.01)
+        release.set()
+        thread.join()
+        self.assertIn("second は計測しません", mock_print.call_args.args[0])
+        self.assertEqual(os.listdir(self.temp_dir), ["first.collapsed.txt"])
+        # 最初のプロファイルの終了後は次のプロファイルを取れる
+        with patch("builtins.print"), profiler.profile("third"):
+            stage_busy("upload", 0.05)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ["first.collapsed.txt", "third.collapsed.txt"])
+
+    def test_to_collapsed(self):
+        stacks = {(("[parse]", "", 0), ("get_response_data", "src/functions/transcribe.py", 10)): 0.25}
+        self.assertEqual(to_collapsed(stacks), "[parse];get_response_data (src/functions/transcribe.py:10) 250\n")
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            CpuProfiler(self.temp_dir, fmt="pprof")
+        with self.assertRaises(ValueError):
+            CpuProfiler(self.temp_dir, interval=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import io
+import threading
+import time
+import unittest
+import numpy as np
+from src.functions.progress import (
+    CaptureMonitor, ProgressRenderer, format_meter, format_status, to_dbfs, METER_FLOOR_DB
+)
+
+class TestCaptureMonitor(unittest.TestCase):
+    def test_peak_and_rms(self):
+        # ピークは最大振幅、RMSは前回の取得以降の全ブロックから計算する
+        monitor = CaptureMonitor(["入力"], buffer_capacity=10)
+        monitor.update_source("入力", np.full((4, 2), 0.5, dtype=np.float32))
+        monitor.update_source("入力", np.array([[-1.0, 0.0]], dtype=np.float32))
+
+        peak, rms = monitor.take_snapshot()["levels"]["入力"]
+        self.assertAlmostEqual(peak, 1.0)
+        self.assertAlmostEqual(rms, np.sqrt((8 * 0.25 + 1.0) / 10), places=6)
+
+        # 取得後はレベルの集計がリセットされる
+        self.assertEqual(monitor.take_snapshot()["levels"]["入力"], (0.0, 0.0))
+
+    def test_buffer_fill_and_dropped_blocks(self):
+        monitor = CaptureMonitor(["入力", "BlackHole"], buffer_capacity=8)
+        monitor.update_source("入力", np.zeros((4, 1)), overflowed=True)
+        monitor.update_source("BlackHole", np.zeros((4, 1)), overflowed=False)
+        monitor.update_progress(1.5, 2, dropped_blocks=3)
+
+        snapshot = monitor.take_snapshot()
+        self.assertEqual(snapshot["elapsed"], 1.5)
+        self.assertEqual(snapshot["buffer_fill"], 0.25)
+        self.assertEqual(snapshot["dropped_blocks"], 4)
+        self.assertFalse(snapshot["paused"])
+        monitor.set_paused(True)
+        self.assertTrue(monitor.take_snapshot()["paused"])
+
+    def test_concurrent_updates(self):
+        # 録音ループと表示スレッドが同時にアクセスしても集計が不整合にならない
+        monitor = CaptureMonitor(["入力"], buffer_capacity=1)
+        block = np.ones(100, dtype=np.float32)
+        levels = []
+
+        def reader():
+            for _ in range(200):
+                levels.append(monitor.take_snapshot()["levels"]["入力"][1])
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for _ in range(1000):
+            monitor.update_source("入力", block)
+        thread.join()
+
+        # 全て振幅1.0のブロックなのでRMSは常に0か1
+        levels.append(monitor.take_snapshot()["levels"]["入力"][1])
+        self.assertTrue(all(rms in (0.0, 1.0) for rms in levels))
+
+class TestFormatting(unittest.TestCase):
+    def test_to_dbfs(self):
+        self.assertAlmostEqual(to_dbfs(1.0), 0.0)
+        self.assertAlmostEqual(to_dbfs(0.1), -20.0)
+        self.assertEqual(to_dbfs(0.0), METER_FLOOR_DB)
+        self.assertEqual(to_dbfs(1e-9), METER_FLOOR_DB)
+
+    def test_format_meter(self):
+        self.assertEqual(format_meter(1.0, 1.0), "[##########]    0.0dB")
+        self.assertEqual(format_meter(0.0, 0.0), "[----------]  -60.0dB")
+        self.assertEqual(format_meter(0.1, 10 ** -1.5), "[#####-----]  -20.0dB")
+
+    def test_format_status(self):
+        line = format_status({
+            "elapsed": 12.34,
+            "levels": {"入力": (1.0, 1.0)},
+            "buffer_fill": 0.5,
+            "dropped_blocks": 2,
+        })
+        self.assertEqual(line, "録音時間: 12.3秒 | 入力 [##########]    0.0dB | バッファ 50.0% | 欠落 2")
+        paused = format_status({"elapsed": 1.0, "levels": {}, "buffer_fill": 0.0, "dropped_blocks": 0,
+                                "paused": True})
+        self.assertEqual(paused, "録音時間: 1.0秒 | 一時停止中（pキーで再開） | バッファ 0.0% | 欠落 0")
+
+class TestProgressRenderer(unittest.TestCase):
+    def test_refreshes_at_fixed_rate(self):
+        monitor = CaptureMonitor(["入力"], buffer_capacity=10)
+        stream = io.StringIO()
+        renderer = ProgressRenderer(monitor, refresh_hz=50, stream=stream)
+        renderer.start()
+        time.sleep(0.3)
+        renderer.stop()
+
+        output = stream.getvalue()
+        updates = output.count("\r")
+        # 50Hzで0.3秒間（停止時の最終表示を含む）
+        self.assertGreaterEqual(updates, 3)
+        self.assertLessEqual(updates, 20)
+        self.assertTrue(output.endswith("\n"))
+        self.assertFalse(renderer.is_alive())
+
+    def test_clears_shorter_line(self):
+        # 前回より短い表示は空白で上書きする
+        monitor = CaptureMonitor(["入力"], buffer_capacity=10)
+        stream = io.StringIO()
+        renderer = ProgressRenderer(monitor, stream=stream)
+        monitor.update_progress(100.0, 0, dropped_blocks=1000)
+        renderer.render()
+        first = stream.getvalue()
+        monitor.update_progress(1.0, 0)
+        stream.truncate(0)
+        stream.seek(0)
+        renderer.render()
+        self.assertEqual(len(stream.getvalue()), len(first))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
+import os
+import tempfile
+import tracemalloc
 import unittest
 from unittest.mock import patch, MagicMock, call
 import numpy as np
+import soundfile as sf
 from datetime import datetime
+from src.functions.audio_source import SyntheticSource
 from src.functions.recorder import AudioRecorder
 
 class TestAudioRecorder(unittest.TestCase):
@@ -140,6 +145,34 @@ class TestAudioRecorder(unittest.TestCase):
         mock_blackhole_stream.stop.assert_called_once()
         mock_blackhole_stream.close.assert_called_once()
 
+    @patch('sounddevice.InputStream')
+    @patch('builtins.input', return_value='')
+    @patch('soundfile.write')
+    @patch('time.time')
+    def test_record_with_downsampling(self, mock_time, mock_write, mock_input, mock_input_stream):
+        """キャプチャ時に16kHz・int16・モノラルに変換して保存することをテスト"""
+        mock_time.side_effect = [0, self.min_recording_duration + 0.1, self.min_recording_duration + 0.2]
+
+        mock_input_device_stream = MagicMock()
+        mock_blackhole_stream = MagicMock()
+        mock_input_device_stream.read.return_value = (np.ones((1024, 2), dtype=np.float32) * 0.5, None)
+        mock_blackhole_stream.read.return_value = (np.ones((1024, 2), dtype=np.float32) * 0.3, None)
+        mock_input_stream.side_effect = [mock_input_device_stream, mock_blackhole_stream]
+
+        with patch('sounddevice.query_devices', return_value=self.mock_devices), \
+             patch.object(AudioRecorder, '_is_key_pressed') as mock_key_pressed:
+            mock_key_pressed.side_effect = [None, 'q']
+            result = self.recorder.record(input_device_id=0, target_rate=16000)
+
+        self.assertIsNotNone(result)
+        mock_write.assert_called_once()
+        _, recording, rate = mock_write.call_args[0]
+        self.assertEqual(rate, 16000)
+        self.assertEqual(recording.dtype, np.int16)
+        self.assertEqual(recording.ndim, 1)
+        # 2ブロック分（2048フレーム）の48kHz入力が1/3の長さになる
+        self.assertAlmostEqual(len(recording), 2048 // 3, delta=1)
+
     @patch('sounddevice.InputStream')
     @patch('builtins.input', return_value='')
     @patch('soundfile.write')
@@ -239,5 +272,74 @@ class TestAudioRecorder(unittest.TestCase):
             self.recorder.record(input_device_id=2)  # Device 3 (入力チャンネルなし)
             mock_print.assert_any_call("\nエラー: デバイス 2 は入力デバイスではありません。")
 
+    def test_capture_long_session_with_virtual_sources(self):
+        """仮想ソースで取り込み・ミックス・書き出しの全経路を流し、メモリ上限と欠落なしを確認"""
+        rate, channels, seconds = 96000, 4, 20
+        memory_limit = 1024 * 1024
+        with tempfile.TemporaryDirectory() as recordings_dir:
+            recorder = AudioRecorder(recordings_dir, memory_limit=memory_limit)
+            microphone = SyntheticSource(rate, channels, seconds, seed=1)
+            loopback = SyntheticSource(rate, channels, seconds, seed=2)
+            filepath = os.path.join(recordings_dir, "session.wav")
+
+            tracemalloc.start()
+            with patch('builtins.print'), patch('src.functions.progress.sys.stdout'):
+                result = recorder.capture(microphone, loopback, filepath, rate)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.assertEqual(result, filepath)
+            # 録音データは上限ごとに書き出されるため、録音全体（約7MB）より十分小さい
+            self.assertLess(peak, 2 * memory_limit + 4 * 1024 * 1024)
+            self.assertEqual(microphone.dropped_frames + loopback.dropped_frames, 0)
+            self.assertFalse(os.path.exists(f"{filepath}.part"))
+
+            recording, saved_rate = sf.read(filepath, dtype='float32')
+            self.assertEqual(saved_rate, rate)
+            self.assertEqual(len(recording), rate * seconds)
+            # 先頭ブロックが2つのソースの全チャンネル平均になっている
+            expected = (SyntheticSource(rate, channels, seed=1).read(1024)[0]
+                        + SyntheticSource(rate, channels, seed=2).read(1024)[0]).mean(axis=1) / 2
+            np.testing.assert_allclose(recording[:1024], expected, atol=1 / 32767)
+
+    def test_capture_pause_discards_audio(self):
+        """pキーで一時停止している間に読み込んだ音声は録音ファイルに含めない"""
+        rate, seconds = 16000, 2
+        # 3ブロック目の後で一時停止し、5ブロック読み捨ててから再開する
+        keys = [None, None, 'p', None, None, None, None, 'p'] + [None] * 100
+        with tempfile.TemporaryDirectory() as recordings_dir:
+            recorder = AudioRecorder(recordings_dir)
+            filepath = os.path.join(recordings_dir, "paused.wav")
+            with patch('builtins.print') as mock_print, patch('src.functions.progress.sys.stdout'), \
+                    patch.object(AudioRecorder, '_is_key_pressed', side_effect=keys):
+                result = recorder.capture(SyntheticSource(rate, 1, seconds, seed=1),
+                                          SyntheticSource(rate, 1, seconds, seed=2), filepath, rate)
+
+            self.assertEqual(result, filepath)
+            # 一時停止の表示は表示スレッドの状態行で行い、録音ループからは出力しない
+            printed = " ".join(str(call.args) for call in mock_print.call_args_list)
+            self.assertNotIn("一時停止しました", printed)
+            self.assertNotIn("再開しました", printed)
+            recording, _ = sf.read(filepath, dtype='float32')
+            self.assertEqual(len(recording), rate * seconds - 5 * 1024)
+            # 再開後のブロックは一時停止前のブロックの直後に続く
+            source = SyntheticSource(rate, 1, seed=1)
+            other = SyntheticSource(rate, 1, seed=2)
+            blocks = [(source.read(1024)[0] + other.read(1024)[0])[:, 0] / 2 for _ in range(9)]
+            np.testing.assert_allclose(recording[3 * 1024:4 * 1024], blocks[8], atol=1 / 32767)
+
+    def test_capture_appends_to_existing_recording(self):
+        rate = 16000
+        with tempfile.TemporaryDirectory() as recordings_dir:
+            recorder = AudioRecorder(recordings_dir)
+            filepath = os.path.join(recordings_dir, "session.wav")
+            sf.write(filepath, np.zeros(rate, dtype=np.float32), rate)
+            with patch('builtins.print'), patch('src.functions.progress.sys.stdout'):
+                result = recorder.capture(SyntheticSource(rate, 1, 1), SyntheticSource(rate, 1, 1), filepath, rate,
+                                          append=True, memory_limit=8192)
+            self.assertEqual(result, filepath)
+            self.assertEqual(sf.info(filepath).frames, 2 * rate)
+            self.assertFalse(os.path.exists(f"{filepath}.part"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
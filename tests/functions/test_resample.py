@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+from src.functions.resample import PolyphaseResampler, SpeechCapturePipeline, quantize_int16
+
+def sine(frequency, rate, seconds, amplitude=0.5):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def rms(samples):
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+class TestPolyphaseResampler(unittest.TestCase):
+    def test_output_length(self):
+        # 出力サンプル数は入力の長さ×出力レート/入力レートになる
+        for input_rate, output_rate in [(48000, 16000), (44100, 16000), (16000, 48000)]:
+            resampler = PolyphaseResampler(input_rate, output_rate)
+            output = resampler.process(np.zeros(input_rate, dtype=np.float32))
+            self.assertAlmostEqual(len(output), output_rate, delta=1)
+
+    def test_streaming_matches_single_block(self):
+        # 任意のブロック長で分割しても一括処理と同じ結果になる
+        signal = np.random.default_rng(0).uniform(-1, 1, 48000).astype(np.float32)
+        expected = PolyphaseResampler(44100, 16000).process(signal)
+
+        resampler = PolyphaseResampler(44100, 16000)
+        sizes = np.random.default_rng(1).integers(1, 3000, size=200)
+        blocks = np.split(signal, np.cumsum(sizes)[np.cumsum(sizes) < len(signal)])
+        streamed = np.concatenate([resampler.process(block) for block in blocks])
+
+        np.testing.assert_allclose(streamed, expected, atol=1e-5)
+
+    def test_passband_and_stopband(self):
+        # 通過域（1kHz）は振幅を保ち、新しいナイキスト周波数（8kHz）を超える成分は減衰する
+        resampler = PolyphaseResampler(48000, 16000)
+        passed = resampler.process(sine(1000, 48000, 1.0))[1000:]
+        self.assertAlmostEqual(rms(passed), 0.5 / np.sqrt(2), delta=0.01)
+
+        resampler = PolyphaseResampler(48000, 16000)
+        aliased = resampler.process(sine(12000, 48000, 1.0))[1000:]
+        self.assertLess(rms(aliased), 0.005)
+
+class TestSpeechCapturePipeline(unittest.TestCase):
+    def test_quantize_int16_clips(self):
+        # 範囲外の値はクリップしてint16に変換する
+        quantized = quantize_int16(np.array([-2.0, -1.0, 0.0, 0.5, 1.5], dtype=np.float32))
+        self.assertEqual(quantized.dtype, np.int16)
+        self.assertEqual(quantized.tolist(), [-32767, -32767, 0, 16384, 32767])
+
+    def test_pipeline_outputs_mono_int16(self):
+        # 多チャンネルのブロックをモノラル・16kHz・int16に変換する
+        pipeline = SpeechCapturePipeline(48000, 16000)
+        block = np.stack([sine(440, 48000, 0.1), sine(440, 48000, 0.1)], axis=1)
+
+        output = pipeline.process(block)
+
+        self.assertEqual(output.dtype, np.int16)
+        self.assertEqual(output.ndim, 1)
+        self.assertEqual(len(output), 1600)
+        # 1ブロックあたりのバイト数は float32 ステレオ 48kHz の 1/12
+        self.assertEqual(block.astype(np.float32).nbytes // output.nbytes, 12)
+
+    def test_pipeline_without_resampling(self):
+        # 入出力のレートが同じ場合はリサンプリングせずに量子化のみ行う
+        pipeline = SpeechCapturePipeline(16000, 16000)
+        block = np.full((160, 1), 0.25, dtype=np.float32)
+        np.testing.assert_array_equal(pipeline.process(block), np.full(160, 8192, dtype=np.int16))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import struct
+import unittest
+import tempfile
+import shutil
+from datetime import datetime
+import numpy as np
+import soundfile as sf
+from src.functions.scheduler import (
+    FALLBACK_BITRATE, POLICY_DEADLINE, POLICY_FIFO, POLICY_PRIORITY, POLICY_SJF, ScheduleRules,
+    header_duration, mean_turnaround, order_files, parse_deadline
+)
+
+def mp4_box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+def write_m4a(path, timescale, duration, version=0):
+    """mvhd ボックスだけを持つ最小限のMP4ファイル（音声データの代わりに大きな mdat を置く）"""
+    if version == 1:
+        mvhd = bytes([1, 0, 0, 0]) + struct.pack(">QQIQ", 0, 0, timescale, duration)
+    else:
+        mvhd = bytes([0, 0, 0, 0]) + struct.pack(">IIII", 0, 0, timescale, duration)
+    with open(path, "wb") as f:
+        f.write(mp4_box(b"ftyp", b"M4A \x00\x00\x00\x00"))
+        f.write(mp4_box(b"mdat", b"\x00" * 100000))
+        f.write(mp4_box(b"moov", mp4_box(b"mvhd", mvhd + b"\x00" * 80)))
+
+def ebml(element_id, payload, unknown_size=False):
+    size = b"\x01\xff\xff\xff\xff\xff\xff\xff" if unknown_size else b"\x01" + struct.pack(">Q", len(payload))[1:]
+    return element_id + size + payload
+
+def write_webm(path, duration=None, timecode_scale=None):
+    """Segment > Info に Duration を持つ最小限のWebMファイル（録画中のように Segment の長さは不明にする）"""
+    info = b""
+    if timecode_scale is not None:
+        info += ebml(b"\x2a\xd7\xb1", struct.pack(">I", timecode_scale))
+    if duration is not None:
+        info += ebml(b"\x44\x89", struct.pack(">d", duration))
+    segment = ebml(b"\x11\x4d\x9b\x74", b"\x00" * 20) + ebml(b"\x15\x49\xa9\x66", info)
+    segment += ebml(b"\x1f\x43\xb6\x75", b"\x00" * 100000)
+    with open(path, "wb") as f:
+        f.write(ebml(b"\x1a\x45\xdf\xa3", b"\x42\x82\x84webm"))
+        f.write(ebml(b"\x18\x53\x80\x67", segment, unknown_size=True))
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _wav(self, name, seconds, mtime=None):
+        path = os.path.join(self.temp_dir, name)
+        sf.write(path, np.zeros(int(seconds * 100), dtype=np.int16), 100)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_header_duration_wav(self):
+        # WAVはヘッダーから長さを求める
+        self.assertAlmostEqual(header_duration(self._wav("a.wav", 12.5)), 12.5)
+
+    def test_header_duration_m4a(self):
+        # m4aは mvhd ボックスから長さを求める（version 0 / 1）
+        path = os.path.join(self.temp_dir, "a.m4a")
+        write_m4a(path, 1000, 600500)
+        self.assertAlmostEqual(header_duration(path), 600.5)
+        write_m4a(path, 44100, 44100 * 7200, version=1)
+        self.assertAlmostEqual(header_duration(path), 7200.0)
+
+    def test_header_duration_webm(self):
+        # webmは Segment > Info の Duration から長さを求める（単位は TimecodeScale）
+        path = os.path.join(self.temp_dir, "a.webm")
+        write_webm(path, 1234500.0)
+        self.assertAlmostEqual(header_duration(path), 1234.5)
+        write_webm(path, 600.0, timecode_scale=1000000000)
+        self.assertAlmostEqual(header_duration(path), 600.0)
+        # Duration のないファイルはサイズから推定する
+        write_webm(path)
+        self.assertAlmostEqual(header_duration(path), os.path.getsize(path) * 8 / FALLBACK_BITRATE)
+
+    def test_header_duration_fallback(self):
+        # 読めない形式はサイズと既定のビットレートから推定する
+        path = os.path.join(self.temp_dir, "broken.mp3")
+        with open(path, "wb") as f:
+            f.write(b"\x01" * 16000)
+        self.assertAlmostEqual(header_duration(path), 16000 * 8 / FALLBACK_BITRATE)
+
+    def test_parse_deadline(self):
+        now = datetime(2026, 10, 19, 8, 30)
+        self.assertEqual(parse_deadline("2026-10-20T09:00"), datetime(2026, 10, 20, 9, 0).timestamp())
+        self.assertEqual(parse_deadline("17:45", now), datetime(2026, 10, 19, 17, 45).timestamp())
+        with self.assertRaises(ValueError):
+            parse_deadline("明日")
+
+    def test_schedule_rules(self):
+        # ファイル名のパターンで優先度と期限を指定し、後の指定を優先する
+        rules = ScheduleRules(["*standup*=5", "*=1", "allhands_*.wav=9"], ["allhands_*=2026-10-20T09:00"])
+        self.assertEqual(rules.priority("/rec/allhands_1019.wav"), 9)
+        self.assertEqual(rules.priority("/rec/standup.wav"), 1)
+        self.assertIsNotNone(rules.deadline("/rec/allhands_1019.wav"))
+        self.assertIsNone(rules.deadline("/rec/standup.wav"))
+        with self.assertRaises(ValueError):
+            ScheduleRules(["standup"])
+
+    def test_order_files_by_policy(self):
+        # 方針ごとの処理順
+        allhands = self._wav("a_allhands.wav", 240, mtime=1000)
+        standup = self._wav("b_standup.wav", 10, mtime=3000)
+        review = self._wav("c_review.wav", 60, mtime=2000)
+        paths = [allhands, standup, review]
+        rules = ScheduleRules(["*review*=5"], ["*allhands*=2026-10-20T09:00"])
+
+        def order(policy):
+            return [os.path.basename(entry["path"]) for entry in order_files(paths, policy, rules)]
+
+        self.assertEqual(order(POLICY_SJF), ["b_standup.wav", "c_review.wav", "a_allhands.wav"])
+        self.assertEqual(order(POLICY_FIFO), ["a_allhands.wav", "c_review.wav", "b_standup.wav"])
+        self.assertEqual(order(POLICY_DEADLINE), ["a_allhands.wav", "b_standup.wav", "c_review.wav"])
+        self.assertEqual(order(POLICY_PRIORITY), ["c_review.wav", "b_standup.wav", "a_allhands.wav"])
+        with self.assertRaises(ValueError):
+            order_files(paths, "random")
+
+    def test_sjf_lowers_mean_turnaround(self):
+        # 短い順に処理すると、1本の長い会議の後ろで待たされる時間がなくなる
+        entries = [{"path": "allhands", "duration": 4 * 3600}] + \
+                  [{"path": f"standup{i}", "duration": 600} for i in range(12)]
+        sjf = sorted(entries, key=lambda entry: entry["duration"])
+        self.assertLess(mean_turnaround(sjf), mean_turnaround(entries) / 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from src.functions import search
+from src.functions.search import (
+    EmbeddingBackend, SemanticIndex, StubEmbeddingBackend, format_search_results, keyword_search,
+    open_embedding_backend
+)
+
+class TableBackend(EmbeddingBackend):
+    """テキストに対応するベクトルを表から返す埋め込み（IVFの検証用）"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.dimensions = vectors.shape[1]
+
+    def cache_id(self):
+        return f"table:{self.dimensions}"
+
+    def embed(self, texts):
+        return np.stack([self.vectors[int(text)] for text in texts])
+
+def clustered_vectors(count, dimensions=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.1 * rng.normal(size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.transcripts = os.path.join(self.temp_dir, "transcripts")
+        os.makedirs(self.transcripts)
+        self.index_dir = os.path.join(self.transcripts, ".semantic_index")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, name, lines):
+        path = os.path.join(self.transcripts, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(f"[00:00:{i:02d}] {text}" for i, text in enumerate(lines)))
+            f.write("\n\n" + "=" * 50 + "\n[OpenAI API 使用情報]\n")
+        return path
+
+    def test_stub_embedding_is_deterministic_and_normalized(self):
+        backend = StubEmbeddingBackend()
+        vectors = backend.embed(["来期の予算について", "来期の予算について。", "昼食の場所"])
+        self.assertEqual(vectors.shape, (3, backend.dimensions))
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+        np.testing.assert_array_equal(vectors, backend.embed(["来期の予算について", "来期の予算について。", "昼食の場所"]))
+        self.assertAlmostEqual(float(vectors[0] @ vectors[1]), 1.0, places=5)
+        self.assertLess(float(vectors[0] @ vectors[2]), 0.5)
+
+    def test_update_and_search(self):
+        self._write("a.txt", ["来期の予算を見直します", "採用計画について話しました"])
+        self._write("b.txt", ["昼食は会議室でとります"])
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            self.assertEqual(index.update(self.transcripts), {"added": 2, "removed": 0, "segments": 3})
+            results = index.search("予算の見直し", limit=2)
+            self.assertEqual(len(results), 2)
+            self.assertEqual(results[0]["text"], "来期の予算を見直します")
+            self.assertEqual(results[0]["start"], 0.0)
+            self.assertTrue(results[0]["path"].endswith("a.txt"))
+            self.assertGreaterEqual(results[0]["score"], results[1]["score"])
+            # 変更のないファイルは取り込み直さない
+            self.assertEqual(index.update(self.transcripts), {"added": 0, "removed": 0, "segments": 0})
+
+    def test_update_replaces_modified_and_removed_files(self):
+        path = self._write("a.txt", ["来期の予算を見直します"])
+        other = self._write("b.txt", ["昼食は会議室でとります"])
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            index.update(self.transcripts)
+            self._write("a.txt", ["採用計画について話しました"])
+            os.utime(path, (1, 1))
+            os.remove(other)
+            self.assertEqual(index.update(self.transcripts), {"added": 1, "removed": 1, "segments": 1})
+            self.assertEqual(index.live_count, 1)
+            texts = [result["text"] for result in index.search("予算", limit=10)]
+            self.assertEqual(texts, ["採用計画について話しました"])
+
+    def test_index_persists_and_checks_backend(self):
+        self._write("a.txt", ["来期の予算を見直します", "採用計画について話しました"])
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            index.update(self.transcripts)
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            self.assertEqual(index.count, 2)
+            self.assertEqual(index.search("採用", limit=1)[0]["text"], "採用計画について話しました")
+        with self.assertRaises(ValueError):
+            SemanticIndex(self.index_dir, StubEmbeddingBackend(dimensions=64))
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend(dimensions=64), rebuild=True) as index:
+            self.assertEqual(index.count, 0)
+            self.assertEqual(index.search("採用"), [])
+
+    def test_discards_partially_written_vectors(self):
+        self._write("a.txt", ["来期の予算を見直します"])
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            index.update(self.transcripts)
+        with open(os.path.join(self.index_dir, "vectors.f32"), "ab") as f:
+            f.write(b"\x00" * 100)
+        with SemanticIndex(self.index_dir, StubEmbeddingBackend()) as index:
+            index.add([("b.txt", 0.0, "採用計画について話しました")])
+            self.assertEqual(index.search("採用計画", limit=1)[0]["text"], "採用計画について話しました")
+        self.assertEqual(os.path.getsize(os.path.join(self.index_dir, "vectors.f32")), 2 * 256 * 4)
+
+    def test_ivf_is_trained_and_updated_incrementally(self):
+        vectors = clustered_vectors(3000)
+        backend = TableBackend(vectors)
+        entries = [("meeting.txt", float(i), str(i)) for i in range(len(vectors))]
+        with patch.object(search, "IVF_MIN_VECTORS", 500), patch.object(search, "IVF_RETRAIN_GROWTH", 4):
+            with SemanticIndex(self.index_dir, backend) as index:
+                index.add(entries[:400], vectors[:400])
+                self.assertEqual(index.trained_count, 0)
+                index.add(entries[400:600], vectors[400:600])
+                self.assertEqual(index.trained_count, 600)
+                # 学習時の4倍に達するまでは、追加分を既存のクラスタに割り当てる
+                index.add(entries[600:2000], vectors[600:2000])
+                self.assertEqual(index.trained_count, 600)
+                index.add(entries[2000:], vectors[2000:])
+                self.assertEqual(index.trained_count, 3000)
+                self.assertEqual(os.path.getsize(os.path.join(self.index_dir, "assign.i32")), 3000 * 4)
+
+            with SemanticIndex(self.index_dir, backend) as index:
+                hits = sum(index.search(str(i), limit=1, nprobe=4)[0]["text"] == str(i) for i in range(0, 3000, 97))
+                self.assertGreaterEqual(hits, 30)
+
+    def test_ivf_search_matches_exhaustive_search(self):
+        vectors = clustered_vectors(2000, seed=1)
+        backend = TableBackend(vectors)
+        entries = [("meeting.txt", float(i), str(i)) for i in range(len(vectors))]
+        with SemanticIndex(os.path.join(self.temp_dir, "flat"), backend) as flat:
+            flat.add(entries, vectors)
+            expected = [result["text"] for result in flat.search("5", limit=5)]
+        with patch.object(search, "IVF_MIN_VECTORS", 500):
+            with SemanticIndex(self.index_dir, backend) as index:
+                index.add(entries, vectors)
+                actual = [result["text"] for result in index.search("5", limit=5, nprobe=len(index._centroids))]
+        self.assertEqual(actual, expected)
+
+    def test_keyword_search(self):
+        self._write("a.txt", ["来期の予算を見直します", "採用計画について"])
+        self._write("b.txt", ["予算、承認されました"])
+        results = keyword_search(self.transcripts, "予算")
+        self.assertEqual([result["text"] for result in results], ["来期の予算を見直します", "予算、承認されました"])
+        self.assertEqual(len(keyword_search(self.transcripts, "予算", limit=1)), 1)
+        self.assertIn("a.txt [00:00:00] 来期の予算を見直します", format_search_results(results))
+        self.assertEqual(format_search_results([]), "該当するセグメントはありません")
+
+    def test_open_embedding_backend(self):
+        self.assertIsInstance(open_embedding_backend("stub"), StubEmbeddingBackend)
+        with self.assertRaises(ValueError):
+            open_embedding_backend("unknown")
+        with patch.dict(sys.modules, {"sentence_transformers": None}):
+            with self.assertRaises(ValueError):
+                open_embedding_backend("local")
+
+    def test_incomplete_backend_is_rejected(self):
+        """embed を実装していないバックエンドは作成時にエラーになる"""
+        class PartialBackend(EmbeddingBackend):
+            def cache_id(self):
+                return "partial"
+
+        with self.assertRaises(TypeError):
+            PartialBackend()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import unittest
+from types import SimpleNamespace
+from openai.types.audio import TranscriptionVerbose
+from src.functions.segments import Segment, dump_segments, load_segments, parse_response
+
+RESPONSE = {
+    "task": "transcribe",
+    "language": "japanese",
+    "duration": 3.5,
+    "text": "こんにちは。本日の議題です。",
+    "segments": [
+        {"id": 0, "seek": 0, "start": 0.0, "end": 1.2, "text": "こんにちは。", "tokens": [1, 2],
+         "temperature": 0.0, "avg_logprob": -0.2, "compression_ratio": 1.0, "no_speech_prob": 0.01},
+        {"id": 1, "seek": 0, "start": 1.2, "end": 3.5, "text": "本日の議題です。", "tokens": [3],
+         "temperature": 0.0, "avg_logprob": -0.3, "compression_ratio": 1.1, "no_speech_prob": 0.02},
+    ],
+}
+
+EXPECTED = [Segment(0.0, 1.2, "こんにちは。"), Segment(1.2, 3.5, "本日の議題です。")]
+
+class TestSegment(unittest.TestCase):
+    def test_attribute_and_item_access(self):
+        """属性と辞書と同じキーのどちらでも読み出せる"""
+        segment = Segment(1.0, 2.0, "テスト")
+        self.assertEqual((segment.start, segment["end"], segment.get("text")), (1.0, 2.0, "テスト"))
+        self.assertIsNone(segment.get("speaker"))
+        with self.assertRaises(KeyError):
+            segment["speaker"]
+
+    def test_slots(self):
+        """インスタンスごとの辞書を持たない"""
+        segment = Segment(1.0, 2.0, "テスト")
+        self.assertFalse(hasattr(segment, "__dict__"))
+        with self.assertRaises(AttributeError):
+            segment.speaker = "A"
+
+class TestParseResponse(unittest.TestCase):
+    def test_raw_body(self):
+        """レスポンスの本文（bytes / str）から必要なフィールドだけを取り出す"""
+        body = json.dumps(RESPONSE, ensure_ascii=False)
+        self.assertEqual(parse_response(body.encode("utf-8")), (EXPECTED, 3.5))
+        self.assertEqual(parse_response(body), (EXPECTED, 3.5))
+
+    def test_dict(self):
+        self.assertEqual(parse_response(RESPONSE), (EXPECTED, 3.5))
+
+    def test_sdk_object(self):
+        """SDKのモデルは属性から直接読み出す"""
+        self.assertEqual(parse_response(TranscriptionVerbose.model_validate(RESPONSE)), (EXPECTED, 3.5))
+        response = SimpleNamespace(duration=1.0, segments=[SimpleNamespace(start=0.1, end=0.9, text="はい")])
+        self.assertEqual(parse_response(response), ([Segment(0.1, 0.9, "はい")], 1.0))
+
+    def test_missing_segments_and_end(self):
+        """segments のないレスポンスは空、end のないセグメントは開始時刻で終わるものとする"""
+        self.assertEqual(parse_response('{"duration": 0.5}'), ([], 0.5))
+        self.assertEqual(parse_response({"duration": 1.0, "segments": [{"start": 0.2, "text": "a"}]}),
+                         ([Segment(0.2, 0.2, "a")], 1.0))
+
+class TestStorage(unittest.TestCase):
+    def test_round_trip(self):
+        """保存用の行に変換し、JSONを経由して元に戻せる"""
+        stored = json.loads(json.dumps(dump_segments(EXPECTED)))
+        self.assertEqual(stored, [[0.0, 1.2, "こんにちは。"], [1.2, 3.5, "本日の議題です。"]])
+        self.assertEqual(load_segments(stored), EXPECTED)
+
+    def test_load_legacy_dicts(self):
+        """以前の形式（辞書のリスト）で保存した結果も読み込める"""
+        legacy = [{"start": 0.0, "end": 1.2, "text": "こんにちは。"}, {"start": 1.2, "end": 3.5, "text": "本日の議題です。"}]
+        self.assertEqual(load_segments(legacy), EXPECTED)
+
+if __name__ == "__main__":
+    unittest.main()
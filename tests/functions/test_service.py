@@ -0,0 +1,218 @@
+import http.client
+import io
+import json
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import soundfile as sf
+from src.functions.http_client import create_client
+from src.functions.mock_whisper import MockWhisperServer
+from src.functions.segments import Segment
+from src.functions.service import (
+    STATUS_DONE, STATUS_FAILED, TranscriptionServer, TranscriptionService, format_srt, format_vtt,
+    transcript_segments
+)
+
+TRANSCRIPT = "[00:00:00] こんにちは。\n[00:00:03] 本日の議題です。\n[00:00:03] 続けます。\n"
+
+def _wav_bytes(seconds, rate=16000):
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * rate), dtype=np.int16), rate, format="WAV")
+    return buffer.getvalue()
+
+def _fake_process(input_file, output_dir, overlap_seconds, progress=None):
+    """文字起こしの代わりに進捗を2回通知して決まった結果を書き出す"""
+    for index, end in enumerate((2.0, 4.0)):
+        progress({"file": input_file, "completed_chunks": index + 1, "chunk_index": index, "end_seconds": end})
+    output_file = Path(output_dir) / f"{Path(input_file).stem}.txt"
+    output_file.write_text(TRANSCRIPT, encoding="utf-8")
+    return output_file
+
+class _ServiceTestCase(unittest.TestCase):
+    def start_server(self, **options):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.data_dir = Path(temp_dir.name)
+        self.service = TranscriptionService(temp_dir.name, **options)
+        server = TranscriptionServer(self.service, port=0, keepalive_seconds=0.05).start()
+        self.addCleanup(server.stop)
+        host, port = server.base_url[len("http://"):].split(":")
+        self.address = (host, int(port))
+
+    def request(self, method, path, body=None, headers=None, encode_chunked=False):
+        """リクエストを送り、(ステータス, ヘッダー, 本文) を返す"""
+        connection = http.client.HTTPConnection(*self.address, timeout=10)
+        try:
+            connection.request(method, path, body, headers or {}, encode_chunked=encode_chunked)
+            response = connection.getresponse()
+            return response.status, response.headers, response.read()
+        finally:
+            connection.close()
+
+    def upload(self, data, filename="meeting.wav", **kwargs):
+        return self.request("POST", f"/jobs?filename={filename}", data, **kwargs)
+
+    def wait_finished(self, job_id, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = json.loads(self.request("GET", f"/jobs/{job_id}")[2])
+            if job["status"] in (STATUS_DONE, STATUS_FAILED):
+                return job
+            time.sleep(0.02)
+        self.fail("ジョブが完了しませんでした")
+
+@patch("src.functions.service.process_single_file", side_effect=_fake_process)
+class TestTranscriptionService(_ServiceTestCase):
+    def test_upload_status_and_results(self, mock_process):
+        """アップロードしたジョブが処理され、進捗と各形式の結果を取得できる"""
+        self.start_server()
+        status, headers, body = self.upload(_wav_bytes(5.0))
+        self.assertEqual(status, 202)
+        job = json.loads(body)
+        self.assertEqual((job["filename"], job["duration"], job["total_chunks"]), ("meeting.wav", 5.0, 1))
+        self.assertEqual(headers["Location"], f"/jobs/{job['id']}")
+
+        job = self.wait_finished(job["id"])
+        self.assertEqual((job["status"], job["completed_chunks"], job["processed_seconds"], job["progress"]),
+                         (STATUS_DONE, 2, 4.0, 1.0))
+        # 文字起こしを終えた音声は削除する
+        self.assertEqual(list((self.data_dir / "uploads").iterdir()), [])
+
+        status, headers, body = self.request("GET", f"/jobs/{job['id']}/result")
+        self.assertEqual((status, body.decode("utf-8")), (200, TRANSCRIPT))
+        self.assertEqual(headers["Content-Disposition"], "attachment; filename*=UTF-8''meeting.txt")
+        segments = json.loads(self.request("GET", f"/jobs/{job['id']}/result?format=json")[2])["segments"]
+        self.assertEqual(segments[-1], {"start": 3.0, "end": 5.0, "text": "続けます。"})
+        srt = self.request("GET", f"/jobs/{job['id']}/result?format=srt")[2].decode("utf-8")
+        self.assertTrue(srt.startswith("1\n00:00:00,000 --> 00:00:03,000\nこんにちは。\n"))
+        vtt = self.request("GET", f"/jobs/{job['id']}/result?format=vtt")[2].decode("utf-8")
+        self.assertTrue(vtt.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:03.000\n"))
+        self.assertEqual(self.request("GET", f"/jobs/{job['id']}/result?format=docx")[0], 400)
+
+        self.assertEqual(self.request("DELETE", f"/jobs/{job['id']}")[0], 204)
+        self.assertEqual(self.request("GET", f"/jobs/{job['id']}")[0], 404)
+        self.assertEqual(list((self.data_dir / "transcripts").iterdir()), [])
+
+    def test_chunked_upload_is_streamed(self, mock_process):
+        """chunked 形式の本文をブロックごとにファイルへ書き込む"""
+        self.start_server()
+        data = _wav_bytes(3.0)
+        blocks = (data[offset:offset + 10000] for offset in range(0, len(data), 10000))
+        status, _, body = self.upload(blocks, encode_chunked=True,
+                                      headers={"Transfer-Encoding": "chunked"})
+        self.assertEqual(status, 202)
+        job = json.loads(body)
+        self.assertEqual((job["upload_bytes"], job["duration"]), (len(data), 3.0))
+        self.assertEqual(self.wait_finished(job["id"])["status"], STATUS_DONE)
+
+    def test_invalid_uploads(self, mock_process):
+        self.start_server(max_upload_bytes=1000)
+        self.assertEqual(self.upload(b"abc", filename="notes.txt")[0], 400)
+        self.assertEqual(self.upload(b"0" * 2000)[0], 413)
+        blocks = iter([b"0" * 600, b"0" * 600])
+        self.assertEqual(self.upload(blocks, encode_chunked=True, headers={"Transfer-Encoding": "chunked"})[0], 413)
+        self.assertEqual(list((self.data_dir / "uploads").iterdir()), [])
+        self.assertEqual(self.request("GET", "/jobs/unknown")[0], 404)
+        # 枠は返しているため、続けて受け付けられる
+        self.assertEqual(self.upload(b"0" * 100)[0], 202)
+
+    def test_backpressure(self, mock_process):
+        """処理中と処理待ちのジョブが上限に達している間は 503 で断る"""
+        release = threading.Event()
+
+        def blocking_process(*args, **kwargs):
+            release.wait(10)
+            return _fake_process(*args, **kwargs)
+
+        mock_process.side_effect = blocking_process
+        self.start_server(workers=1, max_pending=1)
+        first = json.loads(self.upload(_wav_bytes(1.0))[2])
+        second = json.loads(self.upload(_wav_bytes(1.0))[2])
+        status, headers, _ = self.upload(_wav_bytes(1.0))
+        self.assertEqual((status, headers["Retry-After"]), (503, "30"))
+        self.assertEqual(self.request("GET", f"/jobs/{first['id']}/result")[0], 409)
+        health = json.loads(self.request("GET", "/health")[2])
+        self.assertEqual(health["jobs"]["running"] + health["jobs"]["queued"], 2)
+
+        # Expect: 100-continue を送るクライアントには、本文を送らせる前に断る
+        with socket.create_connection(self.address, timeout=10) as connection:
+            connection.sendall(b"POST /jobs?filename=a.wav HTTP/1.1\r\nHost: localhost\r\n"
+                               b"Content-Length: 1000000\r\nExpect: 100-continue\r\n\r\n")
+            self.assertTrue(connection.recv(4096).startswith(b"HTTP/1.1 503 "))
+
+        release.set()
+        self.assertEqual(self.wait_finished(second["id"])["status"], STATUS_DONE)
+        with socket.create_connection(self.address, timeout=10) as connection:
+            connection.sendall(b"POST /jobs?filename=a.wav HTTP/1.1\r\nHost: localhost\r\n"
+                               b"Content-Length: 4\r\nExpect: 100-continue\r\n\r\n")
+            self.assertTrue(connection.recv(4096).startswith(b"HTTP/1.1 100 Continue"))
+            connection.sendall(b"abcd")
+            self.assertTrue(connection.recv(4096).startswith(b"HTTP/1.1 202 "))
+
+    def test_event_stream(self, mock_process):
+        """イベントストリームは状態の変化を送り、完了で終わる"""
+        release = threading.Event()
+
+        def blocking_process(*args, **kwargs):
+            release.wait(10)
+            return _fake_process(*args, **kwargs)
+
+        mock_process.side_effect = blocking_process
+        self.start_server(workers=1)
+        job = json.loads(self.upload(_wav_bytes(4.0))[2])
+        threading.Timer(0.2, release.set).start()
+        status, headers, body = self.request("GET", f"/jobs/{job['id']}/events")
+        self.assertEqual((status, headers["Content-Type"]), (200, "text/event-stream; charset=utf-8"))
+        events = [json.loads(line[len("data: "):]) for line in body.decode("utf-8").splitlines()
+                  if line.startswith("data: ")]
+        # 送信までの間に続けて変わった状態は最新のものだけを送る
+        self.assertEqual([events[0]["status"], events[-1]["status"]], ["running", STATUS_DONE])
+        progress = [event["progress"] for event in events]
+        self.assertEqual(progress, sorted(progress))
+        self.assertIn(": keepalive", body.decode("utf-8"))
+
+    def test_failed_job(self, mock_process):
+        mock_process.side_effect = RuntimeError("APIエラー")
+        self.start_server()
+        job = self.wait_finished(json.loads(self.upload(_wav_bytes(1.0))[2])["id"])
+        self.assertEqual((job["status"], job["error"]), (STATUS_FAILED, "APIエラー"))
+        status, _, body = self.request("GET", f"/jobs/{job['id']}/result")
+        self.assertEqual(status, 409)
+        self.assertIn("APIエラー", json.loads(body)["error"])
+
+class TestEndToEnd(_ServiceTestCase):
+    def test_transcribe_with_mock_whisper(self):
+        """モックサーバーを使い、アップロードから字幕のダウンロードまでを通して確認する"""
+        with MockWhisperServer() as whisper:
+            client = create_client(base_url=whisper.base_url)
+            self.addCleanup(client.close)
+            with patch("src.functions.transcribe.client", client), patch("builtins.print"):
+                self.start_server()
+                job = json.loads(self.upload(_wav_bytes(12.0))[2])
+                job = self.wait_finished(job["id"])
+                self.assertEqual((job["status"], job["completed_chunks"], job["progress"]), (STATUS_DONE, 1, 1.0))
+                srt = self.request("GET", f"/jobs/{job['id']}/result?format=srt")[2].decode("utf-8")
+        self.assertIn("2\n00:00:05,000 --> 00:00:10,000\nセグメント2", srt)
+
+class TestFormats(unittest.TestCase):
+    def test_transcript_segments(self):
+        """終了時刻は次の行の開始時刻、最後の行は音声の長さ（同じ秒の行にも最低1秒）"""
+        self.assertEqual(transcript_segments(TRANSCRIPT + "=" * 50 + "\nAPI使用情報\n", 4.5), [
+            Segment(0.0, 3.0, "こんにちは。"), Segment(3.0, 4.0, "本日の議題です。"), Segment(3.0, 4.5, "続けます。")
+        ])
+        self.assertEqual(transcript_segments("[01:00:00] 最後\n"), [Segment(3600.0, 3601.0, "最後")])
+
+    def test_subtitles(self):
+        segments = [Segment(0.0, 1.5, "はい"), Segment(3661.25, 3662.0, "いいえ")]
+        self.assertEqual(format_srt(segments),
+                         "1\n00:00:00,000 --> 00:00:01,500\nはい\n\n2\n01:01:01,250 --> 01:01:02,000\nいいえ\n")
+        self.assertEqual(format_vtt(segments),
+                         "WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nはい\n\n01:01:01.250 --> 01:01:02.000\nいいえ\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+import soundfile as sf
+from src.functions.capture_buffer import CaptureBuffer
+from src.functions.session import (
+    RecordingSession, find_session, is_session_audio, list_sessions, open_session, session_state_path
+)
+
+class TestRecordingSession(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.recordings = self.temp_dir.name
+
+    def _record(self, session, seconds, value=0.25):
+        buffer = CaptureBuffer(session.audio_path, session.sample_rate, append=True)
+        buffer.append(np.full((int(seconds * session.sample_rate), 2), value, dtype=np.float32))
+        buffer.finalize()
+
+    def test_create_and_resume(self):
+        session = open_session(self.recordings, "定例", 16000)
+        self.assertTrue(os.path.basename(session.audio_path).endswith("_定例.wav"))
+        self.assertEqual(session.frames, 0)
+        self.assertTrue(is_session_audio(session.audio_path))
+        self.assertFalse(is_session_audio(os.path.join(self.recordings, "other.wav")))
+        self._record(session, 1.0)
+        session.add_run(time.time(), 0)
+
+        resumed = open_session(self.recordings, "定例", 16000)
+        self.assertEqual(resumed.state_path, session.state_path)
+        self._record(resumed, 0.5, value=-0.25)
+        resumed.add_run(time.time(), 16000)
+
+        recording, _ = sf.read(session.audio_path, dtype='float32')
+        self.assertEqual(len(recording), 24000)
+        self.assertGreater(recording[15999], 0)
+        self.assertLess(recording[16000], 0)
+        with open(session.state_path, encoding="utf-8") as f:
+            runs = json.load(f)["runs"]
+        self.assertEqual([(run["start_frame"], run["end_frame"]) for run in runs], [(0, 16000), (16000, 24000)])
+
+    def test_rejects_different_sample_rate_and_invalid_name(self):
+        open_session(self.recordings, "定例", 16000)
+        with self.assertRaises(ValueError):
+            open_session(self.recordings, "定例", 48000)
+        with self.assertRaises(ValueError):
+            open_session(self.recordings, "a/b", 16000)
+
+    def test_recover_appends_spool_left_by_crash(self):
+        session = open_session(self.recordings, "定例", 16000)
+        self._record(session, 1.0)
+        session.add_run(time.time(), 0)
+        # 書き出し済みの一時ファイルを残したまま終了した録音
+        buffer = CaptureBuffer(session.audio_path, 16000, memory_limit=4096, append=True)
+        buffer.append(np.full((8000, 1), 0.5, dtype=np.float32))
+        buffer._spool.close()
+
+        self.assertEqual(session.recover(), 8000)
+        self.assertEqual(session.frames, 24000)
+        self.assertFalse(os.path.exists(f"{session.audio_path}.part"))
+        self.assertTrue(session.state["runs"][-1]["recovered"])
+        self.assertEqual(session.recover(), 0)
+
+    def test_resume_compacted_session(self):
+        """FLACに圧縮したセッションを再開すると、WAVに戻してから追記する"""
+        session = open_session(self.recordings, "定例", 16000)
+        self._record(session, 1.0)
+        session.add_run(time.time(), 0)
+        samples, _ = sf.read(session.audio_path, dtype='int16')
+        flac_path = session.audio_path[:-len(".wav")] + ".flac"
+        sf.write(flac_path, samples, 16000, format="FLAC")
+        os.remove(session.audio_path)
+        session.state["audio_file"] = os.path.basename(flac_path)
+        session.save()
+
+        resumed = open_session(self.recordings, "定例", 16000)
+        self.assertTrue(resumed.audio_path.endswith("_定例.wav"))
+        self.assertFalse(os.path.exists(flac_path))
+        self.assertEqual(resumed.frames, 16000)
+        self._record(resumed, 0.5)
+        restored, _ = sf.read(resumed.audio_path, dtype='int16')
+        np.testing.assert_array_equal(restored[:16000], samples)
+        self.assertEqual(len(restored), 24000)
+
+    def test_mark_transcribed_accumulates(self):
+        session = open_session(self.recordings, "定例", 16000)
+        session.mark_transcribed(16000, 1.0, 0.0)
+        session.mark_transcribed(32000, 1.5, 0.5)
+        loaded = RecordingSession.load(session_state_path(session.audio_path))
+        self.assertEqual(loaded.transcribed_frames, 32000)
+        self.assertEqual(loaded.state["billed_seconds"], 2.5)
+        self.assertEqual(loaded.state["overlap_seconds"], 0.5)
+        self.assertFalse(os.path.exists(f"{session.state_path}.tmp"))
+
+    def test_list_and_find_sessions(self):
+        self.assertEqual(list_sessions(os.path.join(self.recordings, "missing")), [])
+        open_session(self.recordings, "朝会", 16000)
+        open_session(self.recordings, "定例", 16000)
+        self.assertEqual([session.name for session in list_sessions(self.recordings)], ["朝会", "定例"])
+        self.assertEqual(find_session(self.recordings, "定例").name, "定例")
+        self.assertIsNone(find_session(self.recordings, "週次"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import random
+import pytest
+from hypothesis import given, settings, strategies as st
+from src.functions.segments import Segment
+from src.functions.stitch import normalize_text, stitch_segments, text_similarity
+
+SAMPLE_RATE = 16000
+
+def make_chunk(index, start_sample, end_sample, segments):
+    """テスト用のチャンク結果を作成する"""
+    return {
+        "index": index,
+        "start_sample": start_sample,
+        "end_sample": end_sample,
+        "sample_rate": SAMPLE_RATE,
+        "segments": segments
+    }
+
+@st.composite
+def segment_streams(draw, max_segment_samples=SAMPLE_RATE * 2):
+    """
+    重ならないセグメントの列を生成する（絶対時刻、サンプル単位）
+    """
+    count = draw(st.integers(min_value=1, max_value=30))
+    cursor = 0
+    segments = []
+    for i in range(count):
+        cursor += draw(st.integers(min_value=0, max_value=SAMPLE_RATE))
+        length = draw(st.integers(min_value=1, max_value=max_segment_samples))
+        segments.append((cursor, cursor + length, f"発言{i}"))
+        cursor += length
+    return segments, cursor
+
+@st.composite
+def chunked_streams(draw, overlap_samples=0):
+    """
+    セグメント列とチャンクの分割位置を生成する
+
+    重なりがある場合、全てのセグメントがいずれかのチャンクに完全に収まるよう、
+    セグメント長は重なり幅以下、チャンク間隔は重なり幅以上にする
+    """
+    max_segment = overlap_samples if overlap_samples else SAMPLE_RATE * 2
+    segments, total = draw(segment_streams(max_segment_samples=max_segment))
+    min_spacing = max(overlap_samples, 1)
+    cuts = [0]
+    while True:
+        step = draw(st.integers(min_value=min_spacing, max_value=SAMPLE_RATE * 10))
+        if cuts[-1] + step >= total:
+            break
+        cuts.append(cuts[-1] + step)
+    cuts.append(total)
+    order_seed = draw(st.integers(min_value=0, max_value=2**32 - 1))
+    return segments, cuts, order_seed
+
+def build_chunks(segments, cuts, overlap_samples):
+    """
+    セグメント列をチャンクごとの相対時刻の結果に変換する
+
+    チャンク i は [cuts[i] - overlap, cuts[i + 1]] を覆い、
+    完全に収まるセグメントのみを含む（Whisperが境界をまたぐ発話を落とす状況を模す）
+    """
+    chunks = []
+    for i in range(len(cuts) - 1):
+        start = max(0, cuts[i] - overlap_samples)
+        end = cuts[i + 1]
+        chunk_segments = [
+            {
+                "start": (s - start) / SAMPLE_RATE,
+                "end": (e - start) / SAMPLE_RATE,
+                "text": text
+            }
+            for s, e, text in segments
+            if s >= start and e <= end
+        ]
+        chunks.append(make_chunk(i, start, end, chunk_segments))
+    return chunks
+
+@settings(max_examples=200, deadline=None)
+@given(chunked_streams())
+def test_stitch_without_overlap_restores_timeline(data):
+    """重なりなしの分割では、完了順に関わらず元のタイムラインが復元される"""
+    segments, cuts, order_seed = data
+    expected = [(s, e, text) for s, e, text in segments
+                if any(s >= cuts[i] and e <= cuts[i + 1] for i in range(len(cuts) - 1))]
+    chunks = build_chunks(segments, cuts, overlap_samples=0)
+    random.Random(order_seed).shuffle(chunks)
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["text"] for seg in stitched] == [text for _, _, text in expected]
+    for seg, (s, e, _) in zip(stitched, expected):
+        assert seg["start"] == pytest.approx(s / SAMPLE_RATE)
+        assert seg["end"] == pytest.approx(e / SAMPLE_RATE)
+
+@settings(max_examples=200, deadline=None)
+@given(st.integers(min_value=1, max_value=SAMPLE_RATE * 2).flatmap(
+    lambda overlap: st.tuples(st.just(overlap), chunked_streams(overlap_samples=overlap))))
+def test_stitch_with_overlap_removes_seam_duplicates(data):
+    """重なりありの分割では、継ぎ目の重複が除去され全セグメントが1回ずつ残る"""
+    overlap, (segments, cuts, order_seed) = data
+    chunks = build_chunks(segments, cuts, overlap_samples=overlap)
+    random.Random(order_seed).shuffle(chunks)
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["text"] for seg in stitched] == [text for _, _, text in segments]
+    for seg, (s, _, _) in zip(stitched, segments):
+        assert seg["start"] == pytest.approx(s / SAMPLE_RATE)
+
+@settings(max_examples=100, deadline=None)
+@given(chunked_streams())
+def test_stitch_output_is_monotonic(data):
+    """統合結果の開始時刻は単調非減少で、終了時刻は開始時刻以上になる"""
+    segments, cuts, order_seed = data
+    chunks = build_chunks(segments, cuts, overlap_samples=0)
+    random.Random(order_seed).shuffle(chunks)
+
+    stitched = stitch_segments(chunks)
+
+    starts = [seg["start"] for seg in stitched]
+    assert starts == sorted(starts)
+    assert all(seg["end"] >= seg["start"] for seg in stitched)
+
+def test_stitch_ignores_reported_duration_after_skipped_chunk():
+    """途中のチャンクがスキップされても、後続チャンクの時刻はサンプル位置から決まる"""
+    chunks = [
+        make_chunk(0, 0, SAMPLE_RATE * 10, [{"start": 1.0, "end": 2.0, "text": "最初"}]),
+        # index 1 は短すぎてスキップされた想定
+        make_chunk(2, SAMPLE_RATE * 25, SAMPLE_RATE * 35, [{"start": 0.5, "end": 1.0, "text": "最後"}]),
+    ]
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["start"] for seg in stitched] == [1.0, 25.5]
+
+def test_stitch_segment_without_end():
+    """endを持たないセグメントはstartをendとして扱う"""
+    stitched = stitch_segments([make_chunk(0, 0, SAMPLE_RATE, [{"start": 0.2, "text": " テスト "}])])
+    assert stitched == [Segment(0.2, 0.2, "テスト")]
+
+def test_normalize_text():
+    """空白と句読点を除去して比較できる形にする"""
+    assert normalize_text(" こんにちは、 世界。") == "こんにちは世界"
+
+def test_stitch_merges_similar_text_in_overlap():
+    """重なり区間の類似した発話は1つに統合され、チャンク端から遠い方が残る"""
+    chunks = [
+        # 前のチャンクの末尾（9.5〜10.0秒）で発話が切れている
+        make_chunk(0, 0, SAMPLE_RATE * 10, [
+            {"start": 5.0, "end": 7.0, "text": "今日の議題です"},
+            {"start": 8.5, "end": 10.0, "text": "予算の確認をお願いしま"},
+        ]),
+        # 次のチャンクは8秒地点から始まり、同じ発話を完全に含む
+        make_chunk(1, SAMPLE_RATE * 8, SAMPLE_RATE * 18, [
+            {"start": 0.6, "end": 3.0, "text": "予算の確認をお願いします。"},
+            {"start": 4.0, "end": 5.0, "text": "承知しました"},
+        ]),
+    ]
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["text"] for seg in stitched] == ["今日の議題です", "予算の確認をお願いします。", "承知しました"]
+    assert stitched[1]["start"] == pytest.approx(8.6)
+
+def test_stitch_keeps_distinct_text_in_overlap():
+    """重なり区間でも内容の異なる発話は両方残す"""
+    chunks = [
+        make_chunk(0, 0, SAMPLE_RATE * 10, [{"start": 8.5, "end": 9.5, "text": "はい"}]),
+        make_chunk(1, SAMPLE_RATE * 8, SAMPLE_RATE * 18, [{"start": 0.7, "end": 1.5, "text": "次の議題に移ります"}]),
+    ]
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["text"] for seg in stitched] == ["はい", "次の議題に移ります"]
+
+def test_stitch_does_not_merge_same_text_far_apart():
+    """同じ文言でも開始時刻が離れていれば別の発話として扱う"""
+    chunks = [
+        make_chunk(0, 0, SAMPLE_RATE * 10, [{"start": 6.0, "end": 6.5, "text": "はい"}]),
+        make_chunk(1, SAMPLE_RATE * 6, SAMPLE_RATE * 16, [
+            {"start": 0.0, "end": 0.5, "text": "はい"},
+            {"start": 3.5, "end": 4.0, "text": "はい"},
+        ]),
+    ]
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["start"] for seg in stitched] == [6.0, 9.5]
+
+def test_text_similarity():
+    """包含関係は1.0、無関係な文字列は閾値未満になる"""
+    assert text_similarity("確認をお願いしま", "確認をお願いします") == 1.0
+    assert text_similarity("予算の確認", "次の議題") < 0.8
+    assert text_similarity("", "テスト") == 0.0
+
+def test_stitch_does_not_merge_similar_text_after_segment_end():
+    """出力済みの発話が終わった後に始まる発話は、文言が似ていても統合しない"""
+    chunks = [
+        # 重なり区間（8秒〜）の開始ちょうど、またはその直後に終わる発話
+        make_chunk(0, 0, SAMPLE_RATE * 10, [
+            {"start": 7.0, "end": 8.0, "text": "発言8"},
+            {"start": 7.5, "end": 8.1, "text": "発言9"},
+        ]),
+        make_chunk(1, SAMPLE_RATE * 8, SAMPLE_RATE * 18, [
+            {"start": 0.5, "end": 1.0, "text": "発言18"},
+            {"start": 0.5, "end": 1.5, "text": "発言19"},
+        ]),
+    ]
+
+    stitched = stitch_segments(chunks)
+
+    assert [seg["text"] for seg in stitched] == ["発言8", "発言9", "発言18", "発言19"]
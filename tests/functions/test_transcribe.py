@@ -1,7 +1,10 @@
 import pytest
+import io
 import os
 import json
 import tempfile
+import threading
+import time
 from pathlib import Path
 from src.functions.transcribe import (
     format_timestamp,
@@ -10,11 +13,24 @@ from src.functions.transcribe import (
     process_single_file,
     calculate_audio_cost,
     split_audio,
+    split_audio_chunks,
     get_audio_duration,
+    estimate_file,
+    estimate_files,
+    format_estimate,
+    check_budget,
+    transcribe_session,
+    configure_profiler,
     CHUNK_SIZE
 )
+from src.functions.autotune import AutoTuner
+from src.functions.capture_buffer import CaptureBuffer
+from src.functions.session import open_session
+from src.functions.scheduler import ScheduleRules
 from unittest.mock import patch, MagicMock
 from pydub import AudioSegment
+import numpy as np
+import soundfile as sf
 
 def test_format_timestamp():
     """タイムスタンプのフォーマット機能をテストする"""
@@ -104,19 +120,167 @@ def test_split_audio():
                     os.remove(chunk_path)
             os.rmdir(temp_dir)
 
+def test_split_audio_chunks_with_overlap():
+    """重なり付き分割で、各チャンクが直前のチャンクの末尾を含むことをテストする"""
+    test_audio = create_test_audio(duration_ms=10000)
+    chunks = []
+    
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 3):
+            chunks = split_audio_chunks(test_audio, overlap_seconds=1.0)
+        
+        assert len(chunks) > 1
+        sample_rate = chunks[0]["sample_rate"]
+        assert chunks[0]["start_sample"] == 0
+        assert chunks[0]["overlap_samples"] == 0
+        for prev, chunk in zip(chunks, chunks[1:]):
+            # 重なり幅だけ直前のチャンクの終端より前から始まる
+            assert chunk["overlap_samples"] == sample_rate
+            assert chunk["start_sample"] == prev["end_sample"] - sample_rate
+            assert get_audio_duration(chunk["path"]) == pytest.approx(
+                (chunk["end_sample"] - chunk["start_sample"]) / sample_rate, abs=0.001)
+            assert os.path.getsize(chunk["path"]) <= os.path.getsize(test_audio) // 3
+        assert chunks[-1]["end_sample"] == sample_rate * 10
+    
+    finally:
+        os.remove(test_audio)
+        if len(chunks) > 1:
+            for chunk in chunks:
+                os.remove(chunk["path"])
+            os.rmdir(os.path.dirname(chunks[0]["path"]))
+
+@patch('src.functions.transcribe.client')
+def test_transcribe_audio_reports_overlap_cost(mock_client):
+    """重なり区間の長さと追加コストが使用情報に含まれることをテストする"""
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "segments": [{"start": 0.5, "end": 1.5, "text": "テストテキスト"}],
+        "duration": 4.0
+    })
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
+    
+    test_audio = create_test_audio(duration_ms=10000)
+    
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 2):
+            transcription, prompt_info = transcribe_audio(test_audio, overlap_seconds=1.0)
+        
+        num_chunks = mock_client.audio.transcriptions.with_raw_response.create.call_count
+        assert num_chunks > 1
+        assert prompt_info["overlap_seconds"] == pytest.approx(1.0 * (num_chunks - 1))
+        assert prompt_info["overlap_cost_usd"] > 0
+        # チャンクごとに異なる位置の発話として扱われる
+        assert transcription.count("テストテキスト") == num_chunks
+    
+    finally:
+        os.remove(test_audio)
+
+@patch('src.functions.transcribe.client')
+def test_transcribe_audio_reports_progress(mock_client):
+    """チャンクの文字起こしが終わるたびに進捗コールバックが呼ばれることをテストする"""
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "segments": [{"start": 0.5, "end": 1.5, "text": "テストテキスト"}],
+        "duration": 4.0
+    })
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
+    
+    test_audio = create_test_audio(duration_ms=10000)
+    events = []
+    
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 3):
+            transcribe_audio(test_audio, overlap_seconds=1.0, progress=events.append)
+        
+        assert [event["completed_chunks"] for event in events] == list(range(1, len(events) + 1))
+        assert [event["chunk_index"] for event in events] == list(range(len(events)))
+        assert len(events) > 1
+        assert events[-1]["end_seconds"] == pytest.approx(10.0)
+        assert all(event["file"] == test_audio for event in events)
+    
+    finally:
+        os.remove(test_audio)
+
+@patch('src.functions.transcribe.client')
+def test_transcribe_audio_uploads_chunks_from_memory(mock_client):
+    """分割したチャンクは一時ファイルを作らず、メモリ上のWAVとして送信されることをテストする"""
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "segments": [{"start": 0.5, "end": 1.5, "text": "テストテキスト"}],
+        "duration": 4.0
+    })
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
+    
+    test_audio = create_test_audio(duration_ms=10000)
+    
+    try:
+        with patch('src.functions.transcribe.CHUNK_SIZE', os.path.getsize(test_audio) // 3), \
+                patch('tempfile.mkdtemp') as mock_mkdtemp:
+            transcribe_audio(test_audio, overlap_seconds=1.0)
+        
+        mock_mkdtemp.assert_not_called()
+        uploads = [call.kwargs["file"] for call in mock_client.audio.transcriptions.with_raw_response.create.call_args_list]
+        assert len(uploads) > 1
+        stem = Path(test_audio).stem
+        for i, (name, data) in enumerate(uploads):
+            assert name == f"{stem}_chunk_{i}.wav"
+            assert data[:4] == b"RIFF"
+            assert len(data) <= os.path.getsize(test_audio) // 3
+    
+    finally:
+        os.remove(test_audio)
+
+def test_transcribe_audio_with_autotune(tmp_path):
+    """自動調整ではチャンクの長さを変えながら並行して送信し、順序どおりに統合することをテストする"""
+    path = str(tmp_path / "long.wav")
+    sf.write(path, np.zeros(16000 * 60, dtype=np.int16), 16000)
+    lock = threading.Lock()
+    active = [0, 0]
+    uploads = []
+
+    def create(audio_file):
+        name, data = audio_file
+        duration = sf.info(io.BytesIO(data)).duration
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+            uploads.append(duration)
+        time.sleep(0.05 + 0.002 * duration)
+        with lock:
+            active[0] -= 1
+        index = int(name.rsplit("_", 1)[1].split(".")[0])
+        return {"segments": [{"start": 1.0, "end": 1.5, "text": f"チャンク{index}"}], "duration": duration}
+
+    tuner = AutoTuner(min_chunk_seconds=1.0, initial_chunk_seconds=8.0, max_concurrency=3)
+    with patch('src.functions.transcribe.CHUNK_SIZE', 16000 * 2 * 12), \
+            patch('src.functions.transcribe._create_transcription', side_effect=create):
+        transcription, prompt_info = transcribe_audio(path, overlap_seconds=0.5, tuner=tuner)
+
+    lines = transcription.splitlines()
+    assert [line.split(" ")[1] for line in lines] == [f"チャンク{i}" for i in range(len(uploads))]
+    # 最初は短い計測用のチャンクで、長さは最大サイズ（12秒）を超えない
+    assert uploads[0] == pytest.approx(2.0)
+    assert max(uploads) <= 12.0
+    assert len(set(round(duration) for duration in uploads)) > 1
+    assert prompt_info["duration_seconds"] == pytest.approx(60.0 + 0.5 * (len(uploads) - 1))
+    assert active[1] > 1
+    report = tuner.report()
+    assert report["chunks"] == len(uploads)
+    assert 1 <= report["concurrency"] <= 3
+
 @patch('src.functions.transcribe.client')
 def test_transcribe_audio_with_mixed_chunks(mock_client):
     """短いチャンクと正常なチャンクが混在する音声ファイルの文字起こし機能をテストする"""
     # モックの設定
     mock_response = MagicMock()
-    mock_response.model_dump_json.return_value = json.dumps({
+    mock_response.content = json.dumps({
         "segments": [{
             "start": 0,
             "text": "テストテキスト"
         }],
         "duration": 1.0
     })
-    mock_client.audio.transcriptions.create.return_value = mock_response
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
     
     # テスト用の音声ファイルを作成（1秒）
     test_audio = create_test_audio(duration_ms=1000)
@@ -165,14 +329,14 @@ def test_process_directory(mock_client, tmp_path):
     """ディレクトリ処理機能をテストする"""
     # モックの設定
     mock_response = MagicMock()
-    mock_response.model_dump_json.return_value = json.dumps({
+    mock_response.content = json.dumps({
         "segments": [{
             "start": 0,
             "text": "テストテキスト"
         }],
         "duration": 60
     })
-    mock_client.audio.transcriptions.create.return_value = mock_response
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
     
     # テスト用のディレクトリ構造を作成
     input_dir = tmp_path / "recordings"
@@ -228,14 +392,14 @@ def test_process_single_file(mock_client, tmp_path):
     """単一ファイル処理機能をテストする"""
     # モックの設定
     mock_response = MagicMock()
-    mock_response.model_dump_json.return_value = json.dumps({
+    mock_response.content = json.dumps({
         "segments": [{
             "start": 0,
             "text": "テストテキスト"
         }],
         "duration": 60
     })
-    mock_client.audio.transcriptions.create.return_value = mock_response
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
     
     # テスト用のディレクトリ構造を作成
     output_dir = tmp_path / "transcripts"
@@ -268,6 +432,59 @@ def test_process_single_file(mock_client, tmp_path):
         # テストファイルを削除
         os.remove(test_audio)
 
+@patch('src.functions.transcribe.client')
+def test_process_single_file_writes_profile(mock_client, tmp_path):
+    """プロファイルを有効にすると、ファイルごとにステージ別のプロファイルを書き出すことをテストする"""
+    def create(**kwargs):
+        time.sleep(0.1)
+        response = MagicMock()
+        response.content = json.dumps({
+            "segments": [{"start": 0.5, "end": 1.0, "text": "テストテキスト"}], "duration": 1.0
+        })
+        return response
+    mock_client.audio.transcriptions.with_raw_response.create.side_effect = create
+    path = str(tmp_path / "standup.wav")
+    sf.write(path, np.zeros(16000, dtype=np.int16), 16000)
+
+    configure_profiler(str(tmp_path / "profiles"), "collapsed", interval=0.005)
+    try:
+        process_single_file(path, str(tmp_path / "transcripts"))
+    finally:
+        configure_profiler(None)
+
+    content = (tmp_path / "profiles" / "standup.collapsed.txt").read_text(encoding="utf-8")
+    assert any(line.startswith("[upload];") for line in content.splitlines())
+
+@patch('src.functions.transcribe.client')
+def test_process_single_file_video(mock_client, tmp_path):
+    """動画ファイルは音声ストリームのみを取り出して送信し、取り出した音声は削除されることをテストする"""
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "segments": [{"start": 0, "end": 1.0, "text": "テストテキスト"}],
+        "duration": 1.0
+    })
+    mock_client.audio.transcriptions.with_raw_response.create.return_value = mock_response
+    video = tmp_path / "meeting.mp4"
+    video.write_bytes(b"\x00" * 1000)
+    extracted_dirs = []
+    
+    def fake_extract(path, output_dir):
+        # 音声ストリーム（AAC）を m4a として取り出した想定
+        extracted_dirs.append(output_dir)
+        output_path = os.path.join(output_dir, "meeting.m4a")
+        AudioSegment.silent(duration=1000).export(output_path, format="wav")
+        return output_path
+    
+    with patch('src.functions.transcribe.extract_audio', side_effect=fake_extract) as mock_extract:
+        output_file = process_single_file(str(video), str(tmp_path / "transcripts"))
+    
+    mock_extract.assert_called_once()
+    assert output_file.name == "meeting.txt"
+    name, data = mock_client.audio.transcriptions.with_raw_response.create.call_args.kwargs["file"]
+    assert name == "meeting.m4a"
+    assert data[:4] == b"RIFF"
+    assert not os.path.exists(extracted_dirs[0])
+
 def test_process_single_file_invalid_file():
     """存在しないファイルを指定した場合のエラーテスト"""
     with pytest.raises(FileNotFoundError):
@@ -276,4 +493,132 @@ def test_process_single_file_invalid_file():
 def test_process_single_file_invalid_format():
     """サポートされていない形式のファイルを指定した場合のエラーテスト"""
     with pytest.raises(ValueError):
-        process_single_file("test.txt")
\ No newline at end of file
+        process_single_file("test.txt")
+
+def test_process_directory_shortest_first(tmp_path):
+    """ディレクトリ内のファイルはヘッダーから求めた長さの短い順に処理する"""
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    for name, duration_ms in (("a_allhands.wav", 3000), ("b_standup.wav", 500), ("c_review.wav", 1500)):
+        AudioSegment.silent(duration=duration_ms, frame_rate=8000).export(input_dir / name, format="wav")
+
+    with patch('src.functions.transcribe.process_single_file') as mock_process_single_file:
+        process_directory(str(input_dir), str(tmp_path / "transcripts"))
+        order = [call.args[0].name for call in mock_process_single_file.call_args_list]
+    assert order == ["b_standup.wav", "c_review.wav", "a_allhands.wav"]
+
+    with patch('src.functions.transcribe.process_single_file') as mock_process_single_file:
+        process_directory(str(input_dir), str(tmp_path / "transcripts"), policy="priority",
+                          rules=ScheduleRules(["*allhands*=1"]))
+        order = [call.args[0].name for call in mock_process_single_file.call_args_list]
+    assert order == ["a_allhands.wav", "b_standup.wav", "c_review.wav"]
+
+def test_estimate_file_reads_only_header(tmp_path):
+    """見積もりはヘッダーから長さを読み、音声をデコードしない"""
+    path = tmp_path / "meeting.wav"
+    AudioSegment.silent(duration=90000, frame_rate=8000).export(path, format="wav")
+    with patch('src.functions.transcribe.audio_info', side_effect=AssertionError("デコードしない")):
+        estimate = estimate_file(str(path))
+    assert estimate["duration"] == pytest.approx(90.0)
+    assert estimate["chunks"] == 1
+    assert estimate["overlap_seconds"] == 0.0
+    assert estimate["cost_usd"] == calculate_audio_cost(90.0)
+
+def test_estimate_file_includes_chunk_overlap(tmp_path):
+    """チャンクに分割されるファイルは重なり区間の分も見積もる"""
+    path = tmp_path / "long.wav"
+    AudioSegment.silent(duration=60000, frame_rate=8000).export(path, format="wav")
+    with patch('src.functions.transcribe.CHUNK_SIZE', 200000):
+        estimate = estimate_file(str(path), overlap_seconds=2.0)
+        chunks = split_audio_chunks(str(path), overlap_seconds=2.0)
+    assert estimate["chunks"] == len(chunks) > 1
+    assert estimate["overlap_seconds"] == pytest.approx(2.0 * (len(chunks) - 1))
+    assert estimate["cost_usd"] == calculate_audio_cost(60.0 + estimate["overlap_seconds"])
+    for chunk in chunks:
+        if chunk["path"] != str(path):
+            os.remove(chunk["path"])
+
+def test_estimate_files_and_budget(tmp_path):
+    """複数ファイルの合計を見積もり、予算を超える場合はエラーにする"""
+    paths = []
+    for name, duration_ms in (("a.wav", 60000), ("b.wav", 120000)):
+        AudioSegment.silent(duration=duration_ms, frame_rate=8000).export(tmp_path / name, format="wav")
+        paths.append(tmp_path / name)
+    estimate = estimate_files(paths)
+    assert estimate["duration"] == pytest.approx(180.0)
+    assert estimate["cost_usd"] == 0.018
+    text = format_estimate(estimate)
+    assert "a.wav: 1.0分 $0.0060" in text
+    assert "合計: 2ファイル / 3.0分" in text
+    check_budget(estimate, None)
+    check_budget(estimate, 0.018)
+    with pytest.raises(ValueError, match="予算"):
+        check_budget(estimate, 0.01)
+
+def test_process_directory_refuses_batch_over_budget(tmp_path):
+    """予算を超えるバッチはAPIを呼び出す前に中止する"""
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    AudioSegment.silent(duration=600000, frame_rate=8000).export(input_dir / "meeting.wav", format="wav")
+
+    with patch('src.functions.transcribe.process_single_file') as mock_process_single_file:
+        with pytest.raises(ValueError, match="予算"):
+            process_directory(str(input_dir), str(tmp_path / "transcripts"), budget_usd=0.05)
+        mock_process_single_file.assert_not_called()
+
+        process_directory(str(input_dir), str(tmp_path / "transcripts"), budget_usd=0.06)
+        mock_process_single_file.assert_called_once()
+
+def _session_response(segments, duration):
+    return json.dumps({"segments": segments, "duration": duration})
+
+def _append_recording(session, seconds):
+    buffer = CaptureBuffer(session.audio_path, session.sample_rate, append=True)
+    buffer.append(np.full(int(seconds * session.sample_rate), 0.1, dtype=np.float32))
+    buffer.finalize()
+
+def test_transcribe_session_sends_only_new_audio(tmp_path):
+    """録音セッションの続きは、文字起こし済みの位置の直前の重なり幅から後ろだけを送信して追記する"""
+    session = open_session(str(tmp_path / "recordings"), "定例", 8000)
+    output_dir = tmp_path / "transcripts"
+    _append_recording(session, 10)
+
+    with patch('src.functions.transcribe._create_transcription',
+               return_value=_session_response([{"start": 1.0, "end": 3.0, "text": "はじめの発言"}], 10.0)) as mock_create:
+        output_file = transcribe_session(session, str(output_dir), overlap_seconds=2.0)
+    assert sf.info(io.BytesIO(mock_create.call_args.args[0][1])).duration == pytest.approx(10.0, abs=0.01)
+    assert session.transcribed_frames == 80000
+
+    # 5秒追記した分は、重なり幅2秒を含む7秒だけが送信される
+    _append_recording(session, 5)
+    segments = [{"start": 0.5, "end": 1.5, "text": "重なり区間の発言"}, {"start": 3.0, "end": 4.0, "text": "続きの発言"}]
+    with patch('src.functions.transcribe._create_transcription',
+               return_value=_session_response(segments, 7.0)) as mock_create:
+        assert transcribe_session(session, str(output_dir), overlap_seconds=2.0) == output_file
+    assert sf.info(io.BytesIO(mock_create.call_args.args[0][1])).duration == pytest.approx(7.0, abs=0.01)
+
+    content = output_file.read_text(encoding="utf-8")
+    lines = content.split("\n\n" + "=" * 50)[0].splitlines()
+    assert lines == ["[00:00:01] はじめの発言", "[00:00:11] 続きの発言"]
+    assert session.transcribed_frames == 120000
+    assert session.state["billed_seconds"] == pytest.approx(17.0)
+    assert session.state["overlap_seconds"] == pytest.approx(2.0)
+    assert content.count("=" * 50) == 1
+
+    # 新しい録音がなければAPIを呼び出さない
+    with patch('src.functions.transcribe._create_transcription') as mock_create:
+        transcribe_session(session, str(output_dir), overlap_seconds=2.0)
+    mock_create.assert_not_called()
+
+def test_process_directory_routes_sessions(tmp_path):
+    """ディレクトリ処理では録音セッションを続きの文字起こしとして扱う"""
+    recordings = tmp_path / "recordings"
+    session = open_session(str(recordings), "定例", 8000)
+    _append_recording(session, 1)
+    AudioSegment.silent(duration=500, frame_rate=8000).export(recordings / "standup.wav", format="wav")
+
+    with patch('src.functions.transcribe.process_single_file') as mock_process_single_file, \
+            patch('src.functions.transcribe.transcribe_session') as mock_transcribe_session:
+        process_directory(str(recordings), str(tmp_path / "transcripts"))
+    assert [call.args[0].name for call in mock_process_single_file.call_args_list] == ["standup.wav"]
+    assert mock_transcribe_session.call_args.args[0].name == "定例"
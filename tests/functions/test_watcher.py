@@ -0,0 +1,81 @@
+import os
+import time
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+from src.functions.watcher import DirectoryWatcher
+
+class TestDirectoryWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, name, content=b"data", mode="wb"):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, mode) as f:
+            f.write(content)
+        return Path(path)
+
+    def test_polling_waits_until_file_settles(self):
+        """ポーリングではサイズと更新時刻が一定時間変化しなくなるまで待つ"""
+        watcher = DirectoryWatcher(self.temp_dir, {".wav"}, settle_seconds=5.0,
+                                   poll_interval=0, use_inotify=False)
+        path = self._write("meeting.wav")
+        self._write("notes.txt")
+        self._write(".partial.wav")
+
+        self.assertEqual(watcher.poll(now=100.0), [])
+        self.assertEqual(watcher.poll(now=103.0), [])
+
+        # 書き込みが続いている間は待機時間がリセットされる
+        self._write("meeting.wav", b"more", mode="ab")
+        self.assertEqual(watcher.poll(now=106.0), [])
+        self.assertEqual(watcher.poll(now=110.0), [])
+        self.assertEqual(watcher.poll(now=111.0), [path])
+
+        # 通知済みのファイルは再度返さない
+        self.assertEqual(watcher.poll(now=200.0), [])
+
+    def test_polling_reports_rewritten_file_again(self):
+        """通知済みのファイルが書き換えられた場合は再度通知する"""
+        watcher = DirectoryWatcher(self.temp_dir, {".wav"}, settle_seconds=1.0,
+                                   poll_interval=0, use_inotify=False)
+        path = self._write("meeting.wav")
+        watcher.poll(now=100.0)
+        self.assertEqual(watcher.poll(now=102.0), [path])
+
+        self._write("meeting.wav", b"new recording")
+        watcher.poll(now=103.0)
+        self.assertEqual(watcher.poll(now=105.0), [path])
+
+    @unittest.skipUnless(os.uname().sysname == "Linux", "inotifyはLinuxのみ")
+    def test_inotify_reports_closed_file_immediately(self):
+        """inotifyではファイルのクローズを検出した時点で通知する"""
+        watcher = DirectoryWatcher(self.temp_dir, {".wav"}, settle_seconds=60.0, poll_interval=60.0)
+        try:
+            if not watcher.uses_inotify:
+                self.skipTest("inotifyが使用できない環境")
+            watcher.poll()
+
+            path = Path(self.temp_dir) / "meeting.wav"
+            with open(path, "wb") as f:
+                f.write(b"data")
+                f.flush()
+                watcher.wait(0.1)
+                # 書き込み中（クローズ前）は通知しない
+                self.assertEqual(watcher.poll(), [])
+
+            deadline = time.time() + 2.0
+            ready = []
+            while not ready and time.time() < deadline:
+                watcher.wait(0.1)
+                ready = watcher.poll()
+            self.assertEqual(ready, [path])
+        finally:
+            watcher.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import os
 import pytest
 from unittest.mock import patch, MagicMock
 from src.main import main
@@ -12,7 +13,10 @@ def test_main_with_default_arguments():
         mock_args.return_value = MagicMock(
             filename=None,
             rate=48000,
-            no_transcribe=False
+            no_transcribe=False,
+            device=None,
+            session=None,
+            profile_cpu=None
         )
         
         # AudioRecorderのモック設定
@@ -45,7 +49,10 @@ def test_main_with_custom_arguments():
         mock_args.return_value = MagicMock(
             filename="test_recording",
             rate=44100,
-            no_transcribe=True
+            no_transcribe=True,
+            device=None,
+            session=None,
+            profile_cpu=None
         )
         
         # AudioRecorderのモック設定
@@ -74,7 +81,10 @@ def test_main_workflow_failure():
         mock_args.return_value = MagicMock(
             filename=None,
             rate=48000,
-            no_transcribe=False
+            no_transcribe=False,
+            device=None,
+            session=None,
+            profile_cpu=None
         )
         
         # AudioRecorderのモック設定
@@ -92,4 +102,226 @@ def test_main_workflow_failure():
 
         # アサーション
         assert result == 1
-        mock_recorder_instance.record.assert_called_once()
\ No newline at end of file
+        mock_recorder_instance.record.assert_called_once()
+
+def test_main_watch_command():
+    """watchサブコマンドで監視ワークフローが起動されることのテスト"""
+    with patch('sys.argv', ['main', 'watch', '-d', 'shared/recordings', '--poll', '--settle', '10']), \
+         patch('src.main.WatchWorkflow') as mock_workflow:
+        result = main()
+
+    assert result == 0
+    kwargs = mock_workflow.call_args.kwargs
+    assert kwargs['input_dir'] == 'shared/recordings'
+    assert kwargs['settle_seconds'] == 10.0
+    assert kwargs['use_inotify'] is False
+    mock_workflow.return_value.run.assert_called_once()
+
+def test_main_without_subcommand_records():
+    """サブコマンドを省略した場合は録音を実行することのテスト"""
+    with patch('sys.argv', ['main']), \
+         patch('src.main.RecordingWorkflow') as mock_workflow:
+        mock_workflow.return_value.execute.return_value = True
+        result = main()
+
+    assert result == 0
+    mock_workflow.return_value.execute.assert_called_once_with(
+        filename=None, sample_rate=48000, skip_transcribe=False, downsample=False,
+        device=None, loopback='BlackHole', hostapi=None, session=None
+    )
+
+def test_main_record_options_without_subcommand():
+    """サブコマンドを省略しても録音のオプションを指定できることのテスト"""
+    with patch('sys.argv', ['main', '-f', 'x', '--no-transcribe']), \
+         patch('src.main.RecordingWorkflow') as mock_workflow:
+        mock_workflow.return_value.execute.return_value = True
+        assert main() == 0
+
+    kwargs = mock_workflow.return_value.execute.call_args.kwargs
+    assert (kwargs['filename'], kwargs['skip_transcribe']) == ('x', True)
+
+def test_main_record_with_device():
+    """--device指定時は入力デバイスとループバックがワークフローに渡されることのテスト"""
+    with patch('sys.argv', ['main', 'record', '--device', 'USB Mic', '--loopback', 'Loopback Audio',
+                            '--host-api', 'Core Audio', '-f', 'weekly']), \
+         patch('src.main.RecordingWorkflow') as mock_workflow:
+        mock_workflow.return_value.execute.return_value = True
+        result = main()
+
+    assert result == 0
+    mock_workflow.return_value.execute.assert_called_once_with(
+        filename='weekly', sample_rate=48000, skip_transcribe=False, downsample=False,
+        device='USB Mic', loopback='Loopback Audio', hostapi='Core Audio', session=None
+    )
+
+def test_main_worker_command():
+    """workerサブコマンドでワーカーが起動されることのテスト"""
+    with patch('sys.argv', ['main', 'worker', '--queue', 'shared/queue.sqlite3', '--worker-id', 'host-a',
+                            '--lease', '60', '--exit-when-idle']), \
+         patch('src.main.WorkerWorkflow') as mock_workflow:
+        result = main()
+
+    assert result == 0
+    kwargs = mock_workflow.call_args.kwargs
+    assert kwargs['queue_location'] == 'shared/queue.sqlite3'
+    assert kwargs['worker_id'] == 'host-a'
+    assert kwargs['lease_seconds'] == 60.0
+    assert kwargs['split_chunks'] is True
+    mock_workflow.return_value.run.assert_called_once_with(exit_when_idle=True)
+
+def test_main_status_command(tmp_path, capsys):
+    """statusサブコマンドでキューの状態が表示されることのテスト"""
+    queue_path = str(tmp_path / "queue.sqlite3")
+    with patch('sys.argv', ['main', 'status', '--queue', queue_path]):
+        result = main()
+
+    assert result == 0
+    output = capsys.readouterr().out
+    assert "待機中 0" in output
+    assert "ワーカー: なし" in output
+
+def test_main_minutes_command(tmp_path, capsys):
+    """minutesサブコマンドで議事録が作成され、2回目はキャッシュが使われることのテスト"""
+    transcripts = tmp_path / "transcripts"
+    transcripts.mkdir()
+    (transcripts / "meeting_transcript.txt").write_text(
+        "[00:00:01] 開始します\n[00:00:05] 来週リリースすることに決定しました\n", encoding="utf-8")
+    output = tmp_path / "minutes"
+    argv = ['main', 'minutes', '-d', str(transcripts), '-o', str(output), '--backend', 'stub']
+    with patch('sys.argv', argv):
+        assert main() == 0
+    assert "- [00:00:05] 来週リリースすることに決定しました" in (output / "meeting_transcript_minutes.md").read_text(
+        encoding="utf-8")
+    assert (output / ".minutes_cache.sqlite3").exists()
+
+    with patch('sys.argv', argv):
+        assert main() == 0
+    assert "要約 0件、統合 0件、キャッシュ再利用 1件" in capsys.readouterr().out
+
+def test_main_search_command(tmp_path, capsys):
+    """searchサブコマンドでキーワード検索と意味検索ができることのテスト"""
+    (tmp_path / "meeting.txt").write_text("[00:00:01] 来期の予算を見直します\n[00:00:09] 昼食にしましょう\n",
+                                          encoding="utf-8")
+    with patch('sys.argv', ['main', 'search', '予算', '-d', str(tmp_path)]):
+        assert main() == 0
+    assert "meeting.txt [00:00:01] 来期の予算を見直します" in capsys.readouterr().out
+
+    with patch('sys.argv', ['main', 'search', '予算の見直し', '-d', str(tmp_path), '--semantic', '--backend', 'stub',
+                            '-n', '1']):
+        assert main() == 0
+    output = capsys.readouterr().out
+    assert "1ファイル（2セグメント）を追加" in output
+    assert "meeting.txt [00:00:01] 来期の予算を見直します" in output
+    assert "昼食" not in output
+    assert (tmp_path / ".semantic_index" / "vectors.f32").exists()
+
+def test_main_estimate_command(tmp_path, capsys):
+    """estimateサブコマンドで見積もりが表示され、予算を超える場合は終了コード1になることのテスト"""
+    import numpy as np
+    import soundfile as sf
+    sf.write(str(tmp_path / "meeting.wav"), np.zeros(8000 * 120, dtype=np.int16), 8000)
+    with patch('sys.argv', ['main', 'estimate', '-d', str(tmp_path)]):
+        assert main() == 0
+    output = capsys.readouterr().out
+    assert "meeting.wav: 2.0分 $0.0120" in output
+    assert "合計: 1ファイル / 2.0分" in output
+
+    with patch('sys.argv', ['main', 'estimate', '-d', str(tmp_path), '--budget', '0.01']):
+        assert main() == 1
+    assert "予算 $0.0100 を超える" in capsys.readouterr().out
+
+def test_main_compact_command(tmp_path, capsys):
+    """compactサブコマンドでWAVがFLACに置き換えられ、キューのファイルがなければ作成しないことのテスト"""
+    import time
+    import numpy as np
+    import soundfile as sf
+    path = tmp_path / "meeting.wav"
+    sf.write(str(path), np.zeros(8000, dtype=np.int16), 8000)
+    past = time.time() - 3600
+    os.utime(path, (past, past))
+    queue = tmp_path / "queue.sqlite3"
+    with patch('sys.argv', ['main', 'compact', '-d', str(tmp_path), '--queue', str(queue), '--workers', '1']):
+        assert main() == 0
+    assert sorted(os.listdir(tmp_path)) == ["meeting.flac"]
+    assert "圧縮: 1ファイル" in capsys.readouterr().out
+
+    with patch('sys.argv', ['main', 'compact', '-d', str(tmp_path / "missing")]):
+        assert main() == 1
+
+def test_main_serve_command(tmp_path, capsys):
+    """serveサブコマンドで指定した設定のサービスが起動されることのテスト"""
+    with patch('sys.argv', ['main', 'serve', '--port', '0', '--data-dir', str(tmp_path), '--workers', '3',
+                            '--max-pending', '1', '--max-upload-mb', '0']), \
+         patch('src.main.TranscriptionServer.serve_forever', side_effect=KeyboardInterrupt) as mock_serve:
+        assert main() == 0
+    mock_serve.assert_called_once()
+    assert "ワーカー 3、処理待ちの上限 1" in capsys.readouterr().out
+    assert (tmp_path / "uploads").is_dir()
+
+    with patch('sys.argv', ['main', 'serve', '--data-dir', str(tmp_path), '--workers', '0']):
+        assert main() == 1
+    assert "エラー: ワーカー数は1以上" in capsys.readouterr().out
+
+    with patch('sys.argv', ['main', '--profile-cpu', str(tmp_path / "profiles"), 'serve', '--data-dir', str(tmp_path),
+                            '--workers', '2']), \
+         patch('src.main.configure_profiler'), \
+         patch('src.main.TranscriptionServer.serve_forever') as mock_serve:
+        assert main() == 1
+    mock_serve.assert_not_called()
+    assert "--profile-cpu は serve --workers 1" in capsys.readouterr().out
+
+def test_main_record_session():
+    """record --session でセッション名がワークフローに渡されることのテスト"""
+    with patch('sys.argv', ['main', 'record', '--device', 'USB Mic', '--session', 'weekly']), \
+         patch('src.main.RecordingWorkflow') as mock_workflow:
+        mock_workflow.return_value.execute.return_value = True
+        assert main() == 0
+    assert mock_workflow.return_value.execute.call_args.kwargs['session'] == 'weekly'
+
+def test_main_session_command(tmp_path, capsys):
+    """sessionサブコマンドでセッションの一覧表示と続きの文字起こしができることのテスト"""
+    import numpy as np
+    import soundfile as sf
+    from src.functions.session import open_session
+    with patch('sys.argv', ['main', 'session', '-d', str(tmp_path)]):
+        assert main() == 0
+    assert "録音セッションはありません" in capsys.readouterr().out
+
+    session = open_session(str(tmp_path), "weekly", 8000)
+    sf.write(session.audio_path, np.zeros(8000 * 3, dtype=np.int16), 8000)
+    with patch('sys.argv', ['main', 'session', '-d', str(tmp_path)]):
+        assert main() == 0
+    assert "weekly: " in capsys.readouterr().out
+
+    output = tmp_path / "transcripts"
+    with patch('sys.argv', ['main', 'session', 'weekly', '-d', str(tmp_path), '-o', str(output)]), \
+         patch('src.main.transcribe_session', return_value=output / "out.txt") as mock_transcribe:
+        assert main() == 0
+    assert mock_transcribe.call_args.args[0].name == "weekly"
+    assert mock_transcribe.call_args.args[1] == str(output)
+
+    with patch('sys.argv', ['main', 'session', 'missing', '-d', str(tmp_path)]):
+        assert main() == 1
+
+def test_main_multi_command():
+    """multiサブコマンドで複数のセッションの録音が開始されることのテスト"""
+    with patch('sys.argv', ['main', 'multi', 'roomA=USB Mic', 'roomB=Zoom+BlackHole', '--downsample',
+                            '--no-transcribe', '--writers', '2']), \
+         patch('src.main.MultiRecordingWorkflow') as mock_workflow:
+        mock_workflow.return_value.run.return_value = True
+        assert main() == 0
+    kwargs = mock_workflow.call_args.kwargs
+    assert kwargs['downsample'] is True
+    assert kwargs['transcribe'] is False
+    assert kwargs['writer_threads'] == 2
+    mock_workflow.return_value.run.assert_called_once_with(['roomA=USB Mic', 'roomB=Zoom+BlackHole'])
+
+def test_main_profile_cpu_option(tmp_path):
+    """--profile-cpu を指定するとサブコマンドの文字起こしでプロファイルが有効になることのテスト"""
+    with patch('sys.argv', ['main', '--profile-cpu', str(tmp_path), '--profile-format', 'collapsed', 'watch']), \
+         patch('src.main.configure_profiler') as mock_configure, \
+         patch('src.main.WatchWorkflow'):
+        result = main()
+
+    assert result == 0
+    mock_configure.assert_called_once_with(str(tmp_path), 'collapsed')
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from src.functions.audio_source import SyntheticSource
+from src.functions.capture_manager import CaptureManager
+from src.workflow.multi_recording_workflow import MultiRecordingWorkflow, parse_session_spec
+
+class TestMultiRecordingWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        registry = MagicMock()
+        registry.resolve.side_effect = lambda device, hostapi, reinit=True: (
+            (0, {'name': device, 'max_input_channels': 1}) if device != "Missing" else (None, None))
+        self.manager = CaptureManager(writer_threads=2, registry=registry)
+        self.workflow = MultiRecordingWorkflow(self.temp_dir.name, os.path.join(self.temp_dir.name, "transcripts"),
+                                               sample_rate=8000, manager=self.manager)
+        # デバイスの代わりに実時間で供給する合成音声を使う
+        patcher = patch('src.functions.capture_manager.sd.InputStream',
+                        side_effect=lambda **kwargs: SyntheticSource(kwargs['samplerate'], kwargs['channels'],
+                                                                     realtime=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_session_spec(self):
+        self.assertEqual(parse_session_spec("roomA=USB Mic + BlackHole"), ("roomA", ["USB Mic", "BlackHole"]))
+        self.assertEqual(parse_session_spec("roomB=3"), ("roomB", ["3"]))
+        for spec in ("roomA", "=USB", "roomA="):
+            with self.assertRaises(ValueError):
+                parse_session_spec(spec)
+
+    def test_start_stop_and_transcribe_each_session(self):
+        with patch('src.workflow.multi_recording_workflow.process_single_file',
+                   side_effect=lambda path, output_dir: f"{path}.txt") as mock_process, \
+             patch('builtins.print'):
+            commands = iter(["start roomB=Zoom", "status", "stop roomA", "stop roomA", "start bad=Missing", "quit"])
+            success = self.workflow.run(["roomA=USB Mic+BlackHole"], (self._delay(line) for line in commands))
+
+        self.assertTrue(success)
+        processed = sorted(os.path.basename(call.args[0]) for call in mock_process.call_args_list)
+        self.assertEqual(len(processed), 2)
+        self.assertTrue(processed[0].endswith("_roomA.wav"))
+        self.assertTrue(processed[1].endswith("_roomB.wav"))
+        self.assertEqual(set(self.workflow.transcripts), {"roomA", "roomB"})
+        self.assertEqual(self.manager.get("roomA").labels, ["USB Mic", "BlackHole"])
+
+    def test_restart_keeps_earlier_recording(self):
+        """同じ日に同じ名前のセッションを再び開始しても、前の録音（文字起こし待ち）を上書きしない"""
+        with patch('src.workflow.multi_recording_workflow.process_single_file',
+                   side_effect=lambda path, output_dir: f"{path}.txt") as mock_process, \
+             patch('builtins.print'):
+            commands = iter(["stop roomA", "start roomA=USB Mic", "stop roomA", "quit"])
+            self.assertTrue(self.workflow.run(["roomA=USB Mic"], (self._delay(line) for line in commands)))
+
+        first, second = [call.args[0] for call in mock_process.call_args_list]
+        self.assertTrue(first.endswith("_roomA.wav"))
+        self.assertEqual(second, first[:-len(".wav")] + "_2.wav")
+        self.assertTrue(os.path.getsize(first) > 0 and os.path.getsize(second) > 0)
+
+    def test_start_failure_is_reported(self):
+        with patch('builtins.print'):
+            self.assertFalse(self.workflow.run(["bad=Missing"], ["quit"]))
+
+    @staticmethod
+    def _delay(line):
+        # 録音データが溜まるまで少し待ってからコマンドを実行する
+        time.sleep(0.2)
+        return line
+
+if __name__ == '__main__':
+    unittest.main()
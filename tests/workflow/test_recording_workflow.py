@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 from src.workflow.recording_workflow import RecordingWorkflow
@@ -78,5 +79,51 @@ class TestRecordingWorkflow(unittest.TestCase):
             result = self.workflow.execute(skip_transcribe=True)
             self.assertTrue(result)
 
+    @patch.object(RecordingWorkflow, 'select_input_device')
+    @patch.object(RecordingWorkflow, 'get_filename')
+    def test_execute_with_device_name(self, mock_get_filename, mock_select_input_device):
+        # デバイス名を指定した場合は入力を求めずに録音を開始する
+        with patch.object(self.workflow.recorder.registry, 'resolve', return_value=(3, {'name': 'USB Mic'})), \
+             patch.object(self.workflow.recorder, 'record', return_value="test_audio.wav") as mock_record:
+            result = self.workflow.execute(filename="standup", skip_transcribe=True,
+                                           device="USB Mic", loopback="Loopback")
+
+        self.assertTrue(result)
+        mock_select_input_device.assert_not_called()
+        mock_get_filename.assert_not_called()
+        mock_record.assert_called_once_with("standup", 48000, 3, target_rate=None,
+                                            loopback="Loopback", interactive=False)
+
+    def test_execute_with_unknown_device(self):
+        # 指定したデバイスが見つからない場合は録音しない
+        with patch.object(self.workflow.recorder.registry, 'resolve', return_value=(None, None)), \
+             patch.object(self.workflow.recorder, 'record') as mock_record:
+            result = self.workflow.execute(device="Missing")
+
+        self.assertFalse(result)
+        mock_record.assert_not_called()
+
+    def test_execute_session(self):
+        # セッションを指定した場合は同じ録音ファイルに追記し、続きを文字起こしする
+        with tempfile.TemporaryDirectory() as recordings_dir, \
+             patch('src.workflow.recording_workflow.RECORDINGS_DIR', recordings_dir), \
+             patch.object(self.workflow.recorder.registry, 'resolve', return_value=(3, {'name': 'USB Mic'})), \
+             patch('src.workflow.recording_workflow.transcribe_session', return_value="out.txt") as mock_transcribe:
+            with patch.object(self.workflow.recorder, 'record', return_value="session.wav") as mock_record:
+                self.assertTrue(self.workflow.execute(device="USB Mic", session="weekly", downsample=True))
+            session = mock_transcribe.call_args.args[0]
+            self.assertEqual(session.name, "weekly")
+            self.assertEqual(session.sample_rate, 16000)
+            self.assertEqual(len(session.state["runs"]), 1)
+            kwargs = mock_record.call_args.kwargs
+            self.assertEqual(kwargs["output_path"], session.audio_path)
+            self.assertTrue(kwargs["append"])
+            self.assertEqual(kwargs["target_rate"], 16000)
+
+            # 再開時に録音設定が異なる場合は録音しない
+            with patch.object(self.workflow.recorder, 'record') as mock_record:
+                self.assertFalse(self.workflow.execute(device="USB Mic", session="weekly"))
+            mock_record.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from src.functions.job_queue import KIND_CHUNK, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, STATUS_RUNNING, STATUS_SPLIT
+from src.workflow.watch_workflow import WatchWorkflow
+
+class TestWatchWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, "recordings")
+        self.output_dir = os.path.join(self.temp_dir, "transcripts")
+        os.makedirs(self.input_dir)
+        self.workflow = WatchWorkflow(self.input_dir, self.output_dir, settle_seconds=0,
+                                      poll_interval=0, use_inotify=False)
+
+    def tearDown(self):
+        self.workflow.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, name):
+        path = os.path.join(self.input_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"data")
+        return path
+
+    def test_enqueue_and_process_new_files(self):
+        # 新しい音声ファイルをキューに登録し、文字起こしする
+        self._write("a.wav")
+        self._write("b.m4a")
+        self._write("memo.txt")
+
+        with patch('src.workflow.watch_workflow.process_single_file', return_value="out.txt") as mock_process:
+            self.assertEqual(self.workflow.enqueue_ready_files(), 2)
+            self.assertEqual(self.workflow.process_pending(), 2)
+
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(self.workflow.queue.counts(), {STATUS_DONE: 2})
+
+    def test_skip_files_with_existing_transcript(self):
+        # 既に文字起こし済みのファイルは登録しない
+        self._write("a.wav")
+        os.makedirs(self.output_dir)
+        Path(self.output_dir, "a.txt").write_text("done", encoding="utf-8")
+
+        self.assertEqual(self.workflow.enqueue_ready_files(), 0)
+
+    def test_skip_session_audio(self):
+        # 録音セッションの音声ファイルは録音中も追記されるため登録しない
+        self._write("20250101_定例.wav")
+        Path(self.input_dir, "20250101_定例.session.json").write_text("{}", encoding="utf-8")
+
+        self.assertEqual(self.workflow.enqueue_ready_files(), 0)
+
+    def test_failed_job_is_recorded(self):
+        # 文字起こしに失敗したジョブは再試行の上限後に失敗として残る
+        self._write("a.wav")
+        self.workflow.enqueue_ready_files()
+
+        with patch('src.workflow.watch_workflow.process_single_file', side_effect=ValueError("APIエラー")):
+            self.workflow.process_pending()
+
+        jobs = self.workflow.queue.list_jobs()
+        self.assertEqual(jobs[0]["status"], STATUS_FAILED)
+        self.assertEqual(jobs[0]["error"], "APIエラー")
+
+    def test_chunk_jobs_are_left_to_workers(self):
+        # ワーカーが分割したチャンクジョブは取り出さず、ファイルのジョブだけを処理する
+        queue = self.workflow.queue
+        queue.enqueue(self._write("long.wav"))
+        parent = queue.claim("worker-a", lease_seconds=60)
+        # チャンクはワーカーと同じく監視対象の外（共有ディレクトリの chunks）に置く
+        chunks = []
+        for i in range(2):
+            path = os.path.join(self.temp_dir, f"chunk_{i}.wav")
+            Path(path).write_bytes(b"data")
+            chunks.append({"index": i, "path": path, "start_sample": i * 100, "end_sample": (i + 1) * 100,
+                           "overlap_samples": 0, "sample_rate": 100})
+        queue.split(parent["id"], chunks, "worker-a")
+        self._write("a.wav")
+        self.workflow.enqueue_ready_files()
+
+        with patch('src.workflow.watch_workflow.process_single_file', return_value="out.txt") as mock_process:
+            self.assertEqual(self.workflow.process_pending(), 1)
+
+        self.assertEqual([Path(call.args[0]).name for call in mock_process.call_args_list], ["a.wav"])
+        statuses = {job["kind"]: job["status"] for job in queue.list_jobs() if Path(job["path"]).name != "a.wav"}
+        self.assertEqual(statuses, {KIND_CHUNK: STATUS_PENDING, "file": STATUS_SPLIT})
+
+    def test_running_job_holds_lease(self):
+        # 処理中のジョブはリース付きで取り出し、ワーカーの起動時に待機中へ戻されない
+        self._write("a.wav")
+        self.workflow.enqueue_ready_files()
+        seen = []
+
+        def process(path, output_dir):
+            job = self.workflow.queue.list_jobs(STATUS_RUNNING)[0]
+            seen.append((job["worker"], job["lease_expires"] is not None, self.workflow.queue.requeue_running()))
+            return "out.txt"
+
+        with patch('src.workflow.watch_workflow.process_single_file', side_effect=process):
+            self.workflow.process_pending()
+
+        self.assertEqual(seen, [(self.workflow.worker_id, True, 0)])
+        self.assertEqual(self.workflow.queue.counts(), {STATUS_DONE: 1})
+
+    def test_run_stops_on_event(self):
+        # 停止イベントで監視ループを終了する
+        stop_event = threading.Event()
+        self._write("a.wav")
+
+        def process(path, output_dir):
+            stop_event.set()
+            return "out.txt"
+
+        with patch('src.workflow.watch_workflow.process_single_file', side_effect=process) as mock_process:
+            self.workflow.run(stop_event)
+
+        mock_process.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
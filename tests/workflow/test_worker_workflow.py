@@ -0,0 +1,212 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+import soundfile as sf
+from src.functions.job_queue import JobQueue, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, STATUS_SPLIT
+from src.functions.segments import Segment
+from src.workflow.worker_workflow import WorkerWorkflow, format_queue_status, submit_directory
+
+def fake_transcribe_chunk(chunk):
+    """チャンクの開始位置を発言内容とする文字起こし結果"""
+    # 重なり区間の後（このチャンクで新しく始まる位置）から発言がある
+    start = (chunk["start_sample"] + chunk["overlap_samples"]) / chunk["sample_rate"]
+    duration = (chunk["end_sample"] - chunk["start_sample"]) / chunk["sample_rate"]
+    offset = chunk["overlap_samples"] / chunk["sample_rate"]
+    segment = Segment(offset, duration, f"{start:.0f}秒から")
+    return dict(chunk, segments=[segment], duration=duration)
+
+class TestWorkerWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, "recordings")
+        self.output_dir = os.path.join(self.temp_dir, "transcripts")
+        self.queue_path = os.path.join(self.temp_dir, "shared", "queue.sqlite3")
+        os.makedirs(self.input_dir)
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _worker(self, name, **kwargs):
+        worker = WorkerWorkflow(self.queue_path, self.output_dir, worker_id=name, poll_interval=0, **kwargs)
+        self.workers.append(worker)
+        return worker
+
+    def _write(self, name, seconds):
+        path = os.path.join(self.input_dir, name)
+        sf.write(path, np.zeros(int(seconds * 1000), dtype=np.int16), 1000)
+        return path
+
+    def test_submit_directory(self):
+        # 音声ファイルのみを登録し、文字起こし済みのファイルは除く
+        self._write("a.wav", 1)
+        self._write("b.wav", 1)
+        open(os.path.join(self.input_dir, "memo.txt"), "w").close()
+        os.makedirs(self.output_dir)
+        open(os.path.join(self.output_dir, "b.txt"), "w").close()
+
+        queue = JobQueue(self.queue_path)
+        try:
+            self.assertEqual(submit_directory(queue, self.input_dir, self.output_dir), 1)
+            self.assertEqual(submit_directory(queue, self.input_dir, self.output_dir), 0)
+        finally:
+            queue.close()
+
+    def test_submit_directory_skips_session_audio(self):
+        # 録音セッションは続きだけを文字起こしするため、ファイル全体のジョブとしては登録しない
+        self._write("a.wav", 1)
+        self._write("20250101_定例.wav", 1)
+        open(os.path.join(self.input_dir, "20250101_定例.session.json"), "w").close()
+
+        queue = JobQueue(self.queue_path)
+        try:
+            self.assertEqual(submit_directory(queue, self.input_dir, self.output_dir), 1)
+        finally:
+            queue.close()
+
+    def test_submit_directory_refuses_batch_over_budget(self):
+        # 予算を超える場合は1件も登録しない
+        self._write("a.wav", 600)
+        self._write("b.wav", 600)
+        queue = JobQueue(self.queue_path)
+        try:
+            with self.assertRaises(ValueError):
+                submit_directory(queue, self.input_dir, budget_usd=0.1)
+            self.assertEqual(queue.counts(), {})
+            self.assertEqual(submit_directory(queue, self.input_dir, budget_usd=0.12), 2)
+        finally:
+            queue.close()
+
+    def test_small_file_is_processed_as_one_job(self):
+        # 20MB以下のファイルは分割せずに処理する
+        self._write("a.wav", 2)
+        worker = self._worker("worker-a")
+        submit_directory(worker.queue, self.input_dir)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=fake_transcribe_chunk):
+            self.assertTrue(worker.run_once())
+            self.assertFalse(worker.run_once())
+
+        job = worker.queue.list_jobs()[0]
+        self.assertEqual(job["status"], STATUS_DONE)
+        self.assertEqual(job["worker"], "worker-a")
+        self.assertEqual(job["audio_seconds"], 2.0)
+        with open(os.path.join(self.output_dir, "a.txt"), encoding="utf-8") as f:
+            self.assertTrue(f.read().startswith("[00:00:00] 0秒から"))
+
+    @patch('src.functions.transcribe.CHUNK_SIZE', 8000)
+    def test_large_file_is_split_across_workers(self):
+        # 大きなファイルはチャンクジョブに分割され、複数のワーカーで処理される
+        self._write("long.wav", 10)
+        first = self._worker("worker-a")
+        second = self._worker("worker-b")
+        submit_directory(first.queue, self.input_dir)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=fake_transcribe_chunk):
+            self.assertTrue(first.run_once())
+            parent = first.queue.list_jobs()[0]
+            self.assertEqual(parent["status"], STATUS_SPLIT)
+            chunks = first.queue.list_chunks(parent["id"])
+            self.assertGreater(len(chunks), 2)
+            for chunk in chunks:
+                self.assertTrue(chunk["path"].startswith(os.path.join(self.temp_dir, "shared", "chunks")))
+
+            # 2つのワーカーが交互にチャンクを処理し、最後のチャンクを処理したワーカーが統合する
+            while first.run_once() | second.run_once():
+                pass
+
+        parent = first.queue.get(parent["id"])
+        self.assertEqual(parent["status"], STATUS_DONE)
+        workers = {chunk["worker"] for chunk in first.queue.list_chunks(parent["id"])}
+        self.assertEqual(workers, {"worker-a", "worker-b"})
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "shared", "chunks", str(parent["id"]))))
+        with open(os.path.join(self.output_dir, "long.txt"), encoding="utf-8") as f:
+            lines = f.read().split("\n\n")[0].splitlines()
+        self.assertEqual(lines[0], "[00:00:00] 0秒から")
+        self.assertEqual(len(lines), len(chunks))
+
+    @patch('src.functions.transcribe.CHUNK_SIZE', 8000)
+    def test_no_split_processes_whole_file(self):
+        # 分割しない設定では1つのワーカーが全てのチャンクを処理する
+        self._write("long.wav", 10)
+        worker = self._worker("worker-a", split_chunks=False)
+        submit_directory(worker.queue, self.input_dir)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=fake_transcribe_chunk) as mock_chunk:
+            self.assertTrue(worker.run_once())
+
+        self.assertGreater(mock_chunk.call_count, 2)
+        self.assertEqual(len(worker.queue.list_jobs()), 1)
+        self.assertEqual(worker.queue.list_jobs()[0]["status"], STATUS_DONE)
+
+    def test_failed_job_is_retried(self):
+        # 失敗したジョブはキューに戻り、再試行の上限後に失敗として残る
+        self._write("a.wav", 1)
+        worker = self._worker("worker-a")
+        submit_directory(worker.queue, self.input_dir)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=ValueError("APIエラー")):
+            worker.run_once()
+            self.assertEqual(worker.queue.counts(), {STATUS_PENDING: 1})
+            while worker.run_once():
+                pass
+
+        job = worker.queue.list_jobs()[0]
+        self.assertEqual(job["status"], STATUS_FAILED)
+        self.assertEqual(job["error"], "APIエラー")
+
+    def test_lease_is_renewed_during_long_job(self):
+        # 処理中はリースを延長し続ける
+        self._write("a.wav", 1)
+        worker = self._worker("worker-a", lease_seconds=0.3)
+        submit_directory(worker.queue, self.input_dir)
+        renewed = threading.Event()
+
+        def slow_transcribe(chunk):
+            expires = worker.queue.list_jobs()[0]["lease_expires"]
+            for _ in range(50):
+                if worker.queue.list_jobs()[0]["lease_expires"] > expires:
+                    renewed.set()
+                    break
+                threading.Event().wait(0.02)
+            return fake_transcribe_chunk(chunk)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=slow_transcribe):
+            worker.run_once()
+
+        self.assertTrue(renewed.is_set())
+        self.assertEqual(worker.queue.list_jobs()[0]["status"], STATUS_DONE)
+
+    def test_run_exits_when_idle(self):
+        # 待機中のジョブがなくなると終了する
+        self._write("a.wav", 1)
+        self._write("b.wav", 1)
+        worker = self._worker("worker-a")
+        submit_directory(worker.queue, self.input_dir)
+
+        with patch('src.workflow.worker_workflow.transcribe_chunk', side_effect=fake_transcribe_chunk):
+            self.assertEqual(worker.run(exit_when_idle=True), 2)
+
+    def test_format_queue_status(self):
+        # ジョブ数とワーカーごとの処理速度を表示する
+        stats = [{"worker": "host-a:1", "host": "host-a", "last_seen": 1000.0, "done": 3, "failed": 1,
+                  "running": 0, "audio_seconds": 3600.0, "busy_seconds": 600.0,
+                  "first_started": 0.0, "last_finished": 1800.0}]
+        text = format_queue_status({STATUS_PENDING: 5, STATUS_DONE: 3}, stats, now=2000.0)
+
+        self.assertIn("待機中 5", text)
+        self.assertIn("完了 3", text)
+        row = text.splitlines()[-1]
+        self.assertTrue(row.startswith("host-a:1"))
+        # 30分で60分の音声を処理 → 120分/時、処理時間の6倍速
+        self.assertIn("120.0", row)
+        self.assertIn("6.0", row)
+
+if __name__ == '__main__':
+    unittest.main()